@@ -19,14 +19,18 @@
 
 
 from . import dataset, exceptions, loaders, schema
-from ._high_level import (describe_dataset,
+from ._high_level import (aload_dataset,
+                          aload_schemata_manager,
+                          describe_dataset,
                           export_schemata_manager,
                           get_config,
                           get_dataset_metadata,
                           init,
                           list_all_datasets,
                           load_dataset,
-                          load_schemata_manager)
+                          load_datasets,
+                          load_schemata_manager,
+                          set_http_session)
 from ._version import version as __version__
 
 __all__ = (
@@ -36,6 +40,8 @@ __all__ = (
            'loaders',
            'schema',
            # high-level functions
+           'aload_dataset',
+           'aload_schemata_manager',
            'describe_dataset',
            'export_schemata_manager',
            'get_config',
@@ -43,7 +49,9 @@ __all__ = (
            'init',
            'list_all_datasets',
            'load_dataset',
+           'load_datasets',
            'load_schemata_manager',
+           'set_http_session',
            # _version
            '__version__'
 )
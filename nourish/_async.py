@@ -0,0 +1,102 @@
+# Copyright 2021 Edward Leardi. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"Utilities for the asyncio API."
+
+
+import asyncio
+from concurrent.futures import Executor
+import os
+import ssl
+from types import TracebackType
+from typing import TYPE_CHECKING, Any, Callable, Optional, Type, TypeVar
+
+if TYPE_CHECKING:
+    import aiohttp
+
+
+_T = TypeVar('_T')
+
+
+async def run_in_executor(executor: Optional[Executor], func: Callable[..., _T], *args: Any) -> _T:
+    """Run a blocking function in an executor without blocking the event loop.
+
+    A function that has started can't be interrupted. If the awaiting task is cancelled, the cancellation is therefore
+    only propagated after the function has returned, so that whatever it holds (e.g., files it is extracting) is
+    released before the caller cleans up after itself (e.g., releases a directory lock).
+
+    :param executor: The executor to run ``func`` in. ``None`` means the default executor of the event loop.
+    :param func: The function to run.
+    :param args: Positional arguments passed to ``func``.
+    :return: The return value of ``func``.
+    """
+
+    future = asyncio.get_event_loop().run_in_executor(executor, func, *args)
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        if not future.done():
+            await asyncio.wait((future,))
+        raise
+
+
+def create_client_session(*, pool_size: int = 10, timeout: Optional[float] = 60.0) -> 'aiohttp.ClientSession':
+    """Create an :class:`aiohttp.ClientSession`, the asynchronous counterpart of
+    :func:`nourish._http.create_session`. The CA bundle in the ``REQUESTS_CA_BUNDLE`` or ``CURL_CA_BUNDLE`` environment
+    variable is trusted in the same way as :mod:`requests` does, so that both APIs accept the same servers. Must be
+    called from a coroutine.
+
+    :param pool_size: Maximum number of connections per host.
+    :param timeout: Connect and read timeout in seconds. ``None`` means waiting forever.
+    :raises ImportError: :mod:`aiohttp` is not installed.
+    :return: The created session.
+    """
+
+    try:
+        import aiohttp
+    except ImportError as e:
+        raise ImportError('The asyncio API of Nourish requires aiohttp. Install it with `pip install nourish[async]`.'
+                          f'\nCaused by:\n{e}')
+
+    ca_bundle = os.environ.get('REQUESTS_CA_BUNDLE') or os.environ.get('CURL_CA_BUNDLE')
+    ssl_context = ssl.create_default_context(cafile=ca_bundle) if ca_bundle else True
+    return aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit_per_host=pool_size, ssl=ssl_context),
+                                 timeout=aiohttp.ClientTimeout(sock_connect=timeout, sock_read=timeout))
+
+
+class ClientSessionContext:
+    """Async context manager that provides an :class:`aiohttp.ClientSession`: ``session`` if it is given, otherwise a
+    session created with ``options`` that is closed on exit.
+
+    :param session: A session owned by the caller, which is left open.
+    :param options: Keyword arguments passed to :func:`create_client_session` if ``session`` is ``None``.
+    """
+
+    def __init__(self, session: Optional['aiohttp.ClientSession'], **options: Any) -> None:
+        self._session = session
+        self._options = options
+        self._owned: Optional['aiohttp.ClientSession'] = None
+
+    async def __aenter__(self) -> 'aiohttp.ClientSession':
+        if self._session is not None:
+            return self._session
+        self._owned = create_client_session(**self._options)
+        return self._owned
+
+    async def __aexit__(self, exc_type: Optional[Type[BaseException]], exc_value: Optional[BaseException],
+                        traceback: Optional[TracebackType]) -> None:
+        if self._owned is not None:
+            await self._owned.close()
+            self._owned = None
@@ -0,0 +1,217 @@
+# Copyright 2021 Edward Leardi. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"Content-addressed cache of dataset archives."
+
+
+from contextlib import contextmanager
+import hashlib
+import os
+import pathlib
+import shutil
+import time
+from typing import Iterator, List, Optional
+from uuid import uuid4
+
+from . import typing as typing_
+
+
+class ArchiveCache:
+    """Stores downloaded dataset archives keyed by their SHA512 checksums, so that extracting the same archive again
+    (e.g., after :meth:`dataset.Dataset.delete`, or into another data directory) doesn't download it again.
+
+    An archive is stored as :file:`{sha512}{suffixes}` directly under ``cache_dir``, where ``suffixes`` are the suffixes
+    of the archive's original file name, so that its format can still be guessed from the name. The total size of the
+    cache is kept under ``max_size`` by evicting the least recently used archives. Usage is tracked by the modification
+    times of the archives. Several processes may share a cache: archives are only added by atomic renames, archives that
+    disappear in the middle of an operation are treated as absent, and archives that are being extracted are pinned by
+    hard links, which evictions don't remove.
+
+    :param cache_dir: Directory of the cache. Created when the first archive is added.
+    :param max_size: Maximum total size of the archives in bytes.
+    """
+
+    # Prefix of the name of an archive that is being added to the cache, or of a pin of an archive
+    _TMP_PREFIX = '.tmp-'
+
+    # Seconds since their last modification after which files with _TMP_PREFIX are considered left behind by crashed
+    # processes and removed
+    _TMP_MAX_AGE = 24 * 60 * 60.0
+
+    def __init__(self, cache_dir: typing_.PathLike, max_size: int) -> None:
+        """Constructor method.
+        """
+        self._cache_dir: pathlib.Path = pathlib.Path(os.path.abspath(cache_dir))
+        self._max_size: int = max_size
+
+    @property
+    def cache_dir(self) -> pathlib.Path:
+        "Directory of the cache."
+        return self._cache_dir
+
+    def _entries(self) -> List[pathlib.Path]:
+        "All archives in the cache."
+        if not self._cache_dir.is_dir():
+            return []
+        return [entry for entry in self._cache_dir.iterdir() if not entry.name.startswith(self._TMP_PREFIX)]
+
+    def _find(self, sha512: str) -> Optional[pathlib.Path]:
+        "Path to the archive with the checksum ``sha512``, or ``None`` if it isn't in the cache."
+        for entry in self._entries():
+            if entry.name.split('.', 1)[0] == sha512:
+                return entry
+        return None
+
+    def get(self, sha512: str, *, chunk_size: int = 1024 * 1024) -> Optional[pathlib.Path]:
+        """Look up an archive and mark it as recently used. The archive is verified against ``sha512`` first; an archive
+        that fails the verification (e.g., because it was modified outside of this class) is removed from the cache.
+
+        :param sha512: Hex digest of the SHA512 checksum of the archive.
+        :param chunk_size: Number of bytes read at a time while verifying the archive.
+        :return: Path to the archive, or ``None`` if it isn't in the cache.
+        """
+
+        archive = self._find(sha512)
+        if archive is None or not self._verify(archive, archive, sha512, chunk_size=chunk_size):
+            return None
+        return archive
+
+    @contextmanager
+    def pinning(self, sha512: str, *, chunk_size: int = 1024 * 1024) -> Iterator[Optional[pathlib.Path]]:
+        """Same as :meth:`.get`, but the archive is hard-linked to a temporary name in the cache for the duration of the
+        context, so that it can still be read if it is evicted in the meantime, e.g., by another process. If the file
+        system doesn't support hard links, the archive itself is provided.
+
+        Example:
+
+        .. code-block:: python
+
+           with cache.pinning(sha512) as archive:
+               if archive is not None:
+                   # extract the archive ...
+
+        :param sha512: Same as ``sha512`` in :meth:`.get`.
+        :param chunk_size: Same as ``chunk_size`` in :meth:`.get`.
+        :return: Path to the pinned archive, or ``None`` if it isn't in the cache.
+        """
+
+        archive = self._find(sha512)
+        if archive is None:
+            yield None
+            return
+        pin = self._cache_dir / f'{self._TMP_PREFIX}{uuid4()}{"".join(archive.suffixes)}'
+        try:
+            os.link(archive, pin)
+        except FileNotFoundError:  # Evicted by another process in the meantime
+            yield None
+            return
+        except OSError:
+            pin = archive
+        try:
+            yield pin if self._verify(archive, pin, sha512, chunk_size=chunk_size) else None
+        finally:
+            if pin != archive:
+                self._remove(pin)
+
+    def _verify(self, archive: pathlib.Path, path: pathlib.Path, sha512: str, *, chunk_size: int) -> bool:
+        """Verify an archive against ``sha512`` and mark it as recently used. An archive that fails the verification is
+        removed from the cache.
+
+        :param archive: Path to the archive.
+        :param path: Path to the archive or to a hard link to it, which is read.
+        :param sha512: Same as ``sha512`` in :meth:`.get`.
+        :param chunk_size: Same as ``chunk_size`` in :meth:`.get`.
+        :return: ``True`` if the archive passed the verification.
+        """
+
+        hasher = hashlib.sha512()
+        try:
+            # A hard link shares its modification time with the archive. Renew it first, so that the link isn't taken
+            # for one left behind by a crashed process.
+            os.utime(path)
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(chunk_size), b''):
+                    hasher.update(chunk)
+        except FileNotFoundError:  # Evicted by another process in the meantime
+            return False
+        if hasher.hexdigest() != sha512:
+            self._remove(archive)
+            return False
+        return True
+
+    def put(self, archive_fp: typing_.PathLike, sha512: str) -> bool:
+        """Move an archive into the cache, then evict the least recently used archives until the cache fits in its
+        budget again. The archive isn't moved if it alone exceeds the budget.
+
+        :param archive_fp: Path to the archive. It must have already been verified against ``sha512``.
+        :param sha512: Hex digest of the SHA512 checksum of the archive.
+        :return: ``True`` if the archive has been moved into the cache, ``False`` if it is left in place.
+        """
+
+        archive_fp = pathlib.Path(archive_fp)
+        if archive_fp.stat().st_size > self._max_size:
+            return False
+
+        self._cache_dir.mkdir(parents=True, exist_ok=True)
+        target = self._cache_dir / (sha512 + ''.join(archive_fp.suffixes))
+        # Moving may be a copy across file systems, so move to a temporary name first and rename it atomically
+        tmp_fp = self._cache_dir / f'{self._TMP_PREFIX}{uuid4()}'
+        shutil.move(str(archive_fp), str(tmp_fp))
+        os.replace(tmp_fp, target)
+
+        self._evict(keep=target)
+        return True
+
+    def _evict(self, keep: pathlib.Path) -> None:
+        """Remove the least recently used archives until the total size is within the budget, and the temporary files
+        that crashed processes left behind.
+
+        :param keep: An archive that is never evicted, because it has just been added.
+        """
+
+        expired = time.time() - self._TMP_MAX_AGE
+        for tmp_fp in self._cache_dir.glob(f'{self._TMP_PREFIX}*'):
+            try:
+                if tmp_fp.stat().st_mtime < expired:
+                    self._remove(tmp_fp)
+            except FileNotFoundError:
+                pass
+
+        entries = []
+        for entry in self._entries():
+            try:
+                entries.append((entry.stat(), entry))
+            except FileNotFoundError:
+                pass
+        total_size = sum(stat.st_size for stat, _ in entries)
+        for stat, entry in sorted(entries, key=lambda e: e[0].st_mtime):
+            if total_size <= self._max_size:
+                break
+            if entry != keep and self._remove(entry):
+                total_size -= stat.st_size
+
+    @staticmethod
+    def _remove(archive: pathlib.Path) -> bool:
+        """Remove an archive from the cache.
+
+        :return: ``True`` if the archive has been removed by this call.
+        """
+        try:
+            archive.unlink()
+        except FileNotFoundError:  # Removed by another process
+            return False
+        except PermissionError:  # Opened by another process on Windows; it will be evicted later
+            return False
+        return True
@@ -0,0 +1,107 @@
+# Copyright 2021 Edward Leardi. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"Memory-compact dtypes of loaded tables."
+
+
+from typing import Any, Dict, Iterable, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd  # type: ignore[import]
+from pandas.api.types import (infer_dtype, is_float_dtype, is_integer_dtype, is_object_dtype,  # type: ignore[import]
+                              is_string_dtype)
+
+
+# String columns with at most this ratio of distinct values to rows become categorical
+CATEGORY_RATIO = 0.5
+
+
+class MemoryReport(NamedTuple):
+    "The memory usage of a table before and after its dtypes were compacted."
+    # Bytes used by the table as loaded, including the objects its columns refer to
+    before: int
+    # Bytes used by the compacted table
+    after: int
+    # The new dtype of each column whose dtype was changed
+    dtypes: Dict[str, str]
+
+
+def compact_dtypes(data: Any, *, pinned: Iterable[Any] = ()) -> Tuple[Any, Optional[MemoryReport]]:
+    """Change the dtypes of the columns of a table to ones that hold the same values in less memory:
+
+    - String columns with few distinct values become categorical.
+    - Other columns of Python strings become Arrow-backed strings if :mod:`pyarrow` is installed.
+    - Integer columns are downcast to the smallest signed integer type that holds all their values.
+    - Float columns are downcast to ``float32`` if no value changes.
+
+    A column only gets a new dtype if it uses less memory with it. The statistics that decide the new dtypes are taken
+    in one pass over each column.
+
+    :param data: The table. Data other than a :class:`pandas.DataFrame`, e.g., the string of a plain text file, is
+        returned unchanged.
+    :param pinned: The columns whose dtypes are kept, e.g., those whose types the schema gives.
+    :return: The compacted table, which shares the columns that aren't changed with ``data``, and the memory report, or
+        ``data`` and ``None`` if it isn't a :class:`pandas.DataFrame`.
+    """
+
+    if not isinstance(data, pd.DataFrame):
+        return data, None
+
+    pinned = set(pinned)
+    before = data.memory_usage(deep=True)
+    columns = {}
+    dtypes = {}
+    for position, column in enumerate(data.columns):
+        if column in pinned:
+            continue
+        series = data.iloc[:, position]
+        compacted = _compact_series(series)
+        if compacted is not None and compacted.memory_usage(deep=True, index=False) < before.iloc[position + 1]:
+            columns[position] = compacted
+            dtypes[str(column)] = str(compacted.dtype)
+
+    if columns:
+        # Columns are replaced by position, because column names may repeat
+        data = pd.concat([columns.get(position, data.iloc[:, position]) for position in range(data.shape[1])], axis=1)
+    return data, MemoryReport(before=int(before.sum()), after=int(data.memory_usage(deep=True).sum()), dtypes=dtypes)
+
+
+def _compact_series(series: pd.Series) -> Optional[pd.Series]:
+    """Convert a column to its compact dtype.
+
+    :return: The converted column, or ``None`` if it has no compact dtype.
+    """
+
+    if is_integer_dtype(series.dtype) and isinstance(series.dtype, np.dtype):
+        return pd.to_numeric(series, downcast='integer')
+    if is_float_dtype(series.dtype) and series.dtype == np.float64:
+        compacted = series.astype(np.float32)
+        lossless = (compacted.astype(np.float64) == series) | series.isna()
+        return compacted if lossless.all() else None
+    if is_object_dtype(series.dtype):
+        if infer_dtype(series, skipna=True) != 'string':
+            return None
+    elif not is_string_dtype(series.dtype):  # E.g., categorical, datetime, and bool columns
+        return None
+
+    count = series.count()
+    if count > 0 and series.nunique() <= count * CATEGORY_RATIO:
+        return series.astype('category')
+    if is_object_dtype(series.dtype):
+        try:
+            return series.astype('string[pyarrow]')
+        except (ImportError, TypeError):  # pyarrow isn't installed, or pandas doesn't support Arrow-backed strings
+            return None
+    return None
@@ -20,8 +20,9 @@
 
 import os
 import pathlib
-from typing import Union
+from typing import Optional, Union
 
+from pydantic import NonNegativeFloat, NonNegativeInt, PositiveFloat, PositiveInt
 from pydantic.dataclasses import dataclass
 
 
@@ -43,6 +44,47 @@ class Config:
     # DATADIR is the default dir where datasets files are downloaded/loaded to/from.
     DATADIR: pathlib.Path = pathlib.Path.home() / '.nourish' / 'data'
 
+    # Number of concurrent connections used to download a dataset archive. Values greater than 1 enable segmented
+    # downloads, in which the archive is split into byte ranges of at most DOWNLOAD_SEGMENT_SIZE bytes that are
+    # fetched in parallel.
+    DOWNLOAD_CONNECTIONS: PositiveInt = 1
+    DOWNLOAD_SEGMENT_SIZE: PositiveInt = 64 * 1024 * 1024
+
+    # Whether tarballs are extracted while they are being downloaded, without saving the archive to the disk first.
+    STREAM_EXTRACT: bool = False
+
+    # Maximum number of worker processes that extract an archive in parallel. Zip archives are extracted member by
+    # member, and bzip2 and xz files, including compressed tarballs, are decompressed block by block. Other formats are
+    # extracted serially.
+    EXTRACTION_WORKERS: PositiveInt = 1
+
+    # Whether archives are extracted with native tools (pigz, pbzip2, xz, and GNU tar) when they are on PATH. Formats
+    # whose tools are missing are extracted in Python.
+    NATIVE_EXTRACTION: bool = False
+
+    # Settings of the HTTP session shared by all network I/O: the maximum number of keep-alive connections per host, the
+    # number of retries of failed requests and the backoff factor in seconds between them, and the default timeout in
+    # seconds. They don't apply to a session set with set_http_session.
+    HTTP_POOL_SIZE: PositiveInt = 10
+    HTTP_MAX_RETRIES: NonNegativeInt = 3
+    HTTP_BACKOFF_FACTOR: NonNegativeFloat = 0.5
+    HTTP_TIMEOUT: PositiveFloat = 60.0
+
+    # Maximum total size in bytes of the downloaded archives kept under DATADIR, so that extracting an archive again
+    # doesn't download it again. 0 disables the archive cache.
+    ARCHIVE_CACHE_SIZE: NonNegativeInt = 0
+
+    # Seconds to wait for the directory lock of a dataset while other processes or threads download, load, or delete it.
+    # None means waiting indefinitely.
+    LOCK_TIMEOUT: Optional[NonNegativeFloat] = 600.0
+
+    # Whether parsed subdatasets are kept in the data directory of each dataset as Arrow IPC files, which later loads
+    # memory-map instead of parsing the data files again. Requires pyarrow.
+    PARSED_CACHE: bool = False
+
+    # Whether the dtypes of loaded tables are changed to ones that use less memory, except those the schema gives
+    COMPACT_DTYPES: bool = False
+
     def __post_init_post_parse__(self) -> None:
         "This is called by :meth:`.__init__()` after data type validation."
         # DATADIR should be absolute.
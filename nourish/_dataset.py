@@ -20,21 +20,110 @@
 "Dataset downloading and loading functionality."
 
 
+import asyncio
+from concurrent.futures import Executor
+from contextlib import contextmanager
 from enum import IntFlag
-import hashlib
+import functools
+import json
+import logging
+import math
+import mimetypes
 import os
 import pathlib
 import shutil
-from typing import Any, Callable, Dict, Iterable, Optional
-
-import requests
+import stat
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, ContextManager, Dict, Iterable, Iterator, List, Optional, Sequence
+from uuid import uuid4
 
 from . import typing as typing_
-from .loaders import FormatLoaderMap
-from .loaders._format_loader_map import load_data_files
+from .exceptions import DownloadFailedError
+from .loaders import Filters, FormatLoaderMap
+from .loaders._format_loader_map import index_kwargs, iter_data_files, load_data_files, resolve_format
+from .loaders._selection import selection_kwargs
 from .schema import SchemaDict
-from ._extractors import extract_data_files, verify_data_files
-from ._lock import DirectoryLock
+from ._async import ClientSessionContext, run_in_executor
+from ._cache import ArchiveCache
+from ._compact import MemoryReport, compact_dtypes
+from ._download import (DOWNLOAD_SEGMENT_SIZE, adownload_archive, download_archive, download_archive_segmented,
+                        open_archive_stream)
+from ._extractors import (extract_data_files, extract_tar_stream, find_damaged_data_files, recorded_digest,
+                          repair_data_files, verify_data_files)
+from ._lock import DirectoryLock, DirectoryLockAcquisitionError
+from ._parsed_cache import ParsedCache
+
+if TYPE_CHECKING:
+    import aiohttp
+
+
+# Seconds between calls of the on_wait callback of Dataset.ensure_downloaded
+_WAIT_REPORT_INTERVAL = 1.0
+
+# Seconds between checks of Dataset.aensure_downloaded whether the download by another thread or task has finished
+_FLIGHT_POLL_INTERVAL = 0.05
+
+_logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    "A download of a dataset by one thread, which other threads of this process wait for instead of downloading."
+
+    def __init__(self) -> None:
+        self.done: threading.Event = threading.Event()
+        self.error: Optional[BaseException] = None
+
+
+# The downloads in progress in this process by Dataset.ensure_downloaded, keyed by data dir
+_flights: Dict[pathlib.Path, _Flight] = {}
+_flights_lock = threading.Lock()
+
+
+def _wait_slices(timeout: Optional[float], on_wait: Optional[Callable[[float], None]]) -> Iterator[float]:
+    """Split waiting for up to ``timeout`` into slices of at most :data:`_WAIT_REPORT_INTERVAL`.
+
+    :param timeout: Seconds to wait in total. ``None`` means waiting indefinitely.
+    :param on_wait: Called with the seconds waited so far after each slice.
+    :return: The duration of each slice.
+    """
+    start = time.monotonic()
+    deadline = math.inf if timeout is None else start + timeout
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        yield min(_WAIT_REPORT_INTERVAL, remaining)
+        if on_wait is not None:
+            on_wait(time.monotonic() - start)
+
+
+async def _await_event(event: threading.Event, slices: Iterator[float]) -> bool:
+    """Wait for ``event`` to be set without blocking the event loop, by checking it every
+    :data:`_FLIGHT_POLL_INTERVAL`.
+
+    :param slices: The durations of the slices of the wait, as generated by :func:`_wait_slices`.
+    :return: Whether ``event`` has been set before the slices ran out.
+    """
+    if event.is_set():
+        return True
+    for wait in slices:
+        deadline = time.monotonic() + wait
+        while time.monotonic() < deadline:
+            await asyncio.sleep(min(_FLIGHT_POLL_INTERVAL, deadline - time.monotonic()))
+            if event.is_set():
+                return True
+    return False
+
+
+@contextmanager
+def _holding(slot: Optional[ContextManager[Any]]) -> Iterator[None]:
+    "Enter ``slot`` for the duration of the context, unless it is ``None``."
+    if slot is None:
+        yield
+    else:
+        with slot:
+            yield
 
 
 class Dataset:
@@ -47,6 +136,8 @@ class Dataset:
     :param mode: Mode with which to treat a dataset. Available options are:
         :attr:`Dataset.InitializationMode.LAZY`, :attr:`Dataset.InitializationMode.DOWNLOAD_ONLY`,
         :attr:`Dataset.InitializationMode.LOAD_ONLY`, and :attr:`Dataset.InitializationMode.DOWNLOAD_AND_LOAD`.
+    :param lock_timeout: Seconds to wait for the directory lock while other processes or threads download, load, or
+        delete the dataset. ``0`` means failing immediately, ``None`` means waiting indefinitely.
     :raises ValueError: An invalid ``mode`` was specified for handling the dataset.
 
     Example:
@@ -79,18 +170,27 @@ class Dataset:
         LOAD_ONLY = 2
         DOWNLOAD_AND_LOAD = 3
 
+    # Maximum number of entries of the data dir whose states are part of the fingerprint of the tree
+    _MAX_FINGERPRINTED_ENTRIES = 256
+
     def __init__(self, schema: SchemaDict,
                  data_dir: typing_.PathLike,  *,
-                 mode: InitializationMode = InitializationMode.LAZY) -> None:
+                 mode: InitializationMode = InitializationMode.LAZY,
+                 lock_timeout: Optional[float] = 0.0) -> None:
         """Constructor method.
         """
 
         self._schema: SchemaDict = schema
         self._data_dir_: pathlib.Path = pathlib.Path(os.path.abspath(data_dir))
         self._data: Optional[Dict[str, Any]] = None
+        self._memory_reports: Dict[str, MemoryReport] = {}
+        # The last verification stamp written or read by this object, so that checks in quick succession (e.g.,
+        # is_downloaded followed by load) don't even read the stamp file again
+        self._verification: Optional[Dict[str, Any]] = None
         # Put directory lock under self._nourish_dir. We use self._nourish_dir_ instead of self._nourish_dir because we
         # don't want to have the directory created in lazy mode upon construction of a Dataset object.
         self._lock: DirectoryLock = DirectoryLock(self._nourish_dir_)
+        self._lock_timeout: Optional[float] = lock_timeout
 
         if not isinstance(mode, Dataset.InitializationMode):
             raise ValueError(f'{mode} not a valid mode')
@@ -133,50 +233,444 @@ class Dataset:
         "Same as :attr:`_file_list_file_`, but create the parent directory if it does not exist."
         return self._nourish_dir / 'files.list'
 
+    @property
+    def _download_journal_file(self) -> pathlib.Path:
+        """Path to the file that records the progress of a partial archive download, so that an interrupted download can
+        be resumed. Create the parent directory if it does not exist."""
+        return self._nourish_dir / 'download.journal'
+
+    @property
+    def _download_failure_file_(self) -> pathlib.Path:
+        """Path to the file that records the time and the error of the last failed download by
+        :meth:`.ensure_downloaded`, so that other processes that waited for it fail as well."""
+        return self._nourish_dir_ / 'download.failed'
+
+    @property
+    def _verification_stamp_file_(self) -> pathlib.Path:
+        """Path to the file that records the last time the extracted files were found to match the file list, along
+        with a fingerprint of the tree at that time. See :meth:`.is_downloaded`."""
+        return self._nourish_dir_ / 'verified.stamp'
+
+    @property
+    def _verified_digests_file_(self) -> pathlib.Path:
+        """Path to the file that records the state of the data files whose content was found intact by
+        :meth:`.verify`."""
+        return self._nourish_dir_ / 'verified.digests'
+
+    @property
+    def _index_dir_(self) -> pathlib.Path:
+        """Directory where loaders keep indexes of the data files, e.g., the line indexes of memory-mapped plain text
+        files, so that nothing is written to the extracted file tree. See :attr:`.Loader.takes_index_dir`."""
+        return self._nourish_dir_ / 'indexes'
+
     def download(self,
-                 check: bool = True) -> None:
-        """Downloads, extracts, and removes dataset archive. It adds a directory write lock during execution.
+                 check: bool = True, *,
+                 connections: int = 1,
+                 segment_size: int = DOWNLOAD_SEGMENT_SIZE,
+                 stream_extract: bool = False,
+                 extraction_workers: int = 1,
+                 native_extraction: bool = False,
+                 network_slot: Optional[ContextManager[Any]] = None,
+                 extraction_slot: Optional[ContextManager[Any]] = None,
+                 archive_cache: Optional[ArchiveCache] = None) -> None:
+        """Downloads, extracts, and removes dataset archive. It adds a directory write lock during execution. If a
+        previous download was interrupted, the partial archive is resumed rather than downloaded again from scratch.
 
         :param check: Check to make sure the data files are not already present in :attr:`._data_dir` (passed in via
             ``data_dir`` in the constructor :class:`Dataset`) by running :meth:`.is_downloaded`. If set to ``True``,
             raise an error if they are present and prevent a subsequent download. Set to ``False`` to remove this
             safeguard, and subsequent calls to :meth:`.download` will then overwrite data files if they were previously
             downloaded to :attr:`._data_dir`.
+        :param connections: Number of concurrent connections used to download the archive. If greater than 1 and the
+            server supports range requests, the archive is split into byte ranges that are downloaded in parallel.
+            Segmented downloads are not resumed if interrupted.
+        :param segment_size: Maximum size in bytes of a byte range when ``connections`` is greater than 1.
+        :param stream_extract: If ``True`` and the archive is a (compressed) tarball, extract its members while it is
+            being downloaded instead of saving the archive to the disk first. The extracted files are only considered
+            valid after the SHA512 checksum of the whole archive has been verified, and they are removed again if the
+            verification fails. ``connections`` and ``segment_size`` are ignored in this mode, and an interrupted
+            download can't be resumed. Other types of archives are downloaded as usual.
+        :param extraction_workers: Maximum number of worker processes that extract the archive in parallel. Only zip
+            archives and bzip2 and xz files with multiple blocks are extracted in parallel.
+        :param native_extraction: If ``True``, extract the archive with native tools, such as ``pigz`` and GNU ``tar``,
+            if they are on ``PATH``.
+        :param network_slot: A context manager, such as a :class:`threading.Semaphore`, that is held while the archive
+            is being downloaded. Sharing it between datasets limits how many of them are downloaded at the same time.
+        :param extraction_slot: Same as ``network_slot``, but held while the archive is being extracted. Both are held
+            during a stream extraction, ``network_slot`` first.
+        :param archive_cache: If given, an archive found in the cache is extracted without accessing the network, and a
+            downloaded archive is moved into the cache instead of being removed. Stream extractions don't add archives
+            to the cache.
         :raises RuntimeError: The dataset was previously downloaded as indicated by :meth:`.is_downloaded`
             returning ``True``.
         :raises NotADirectoryError: :attr:`Dataset._data_dir` (passed in via ``data_dir`` in the constructor
             :class:`Dataset`) points to an existing file that is not a directory.
-        :raises OSError: The SHA512 checksum of a downloaded dataset doesn't match the expected checksum.
+        :raises OSError: The SHA512 checksum of a downloaded dataset doesn't match the expected checksum, or a segment
+            of a segmented download failed.
+        :raises requests.HTTPError: The server responded with an error status.
         :raises exceptions.DirectoryLockAcquisitionError: Failed to acquire the directory lock.
         """
 
         if check and self.is_downloaded():
-            raise RuntimeError(f'{self.__class__.__name__}.download() was previously called. To overwrite existing '
-                               f'data files, rerun {self.__class__.__name__}.download() with ``check`` set to '
-                               f'``False``.')
+            raise self._previously_downloaded_error()
+
+        with self._lock.locking_with_exception(write=True, timeout=self._lock_timeout):
+            self._download_while_locked(connections=connections, segment_size=segment_size,
+                                        stream_extract=stream_extract, extraction_workers=extraction_workers,
+                                        native_extraction=native_extraction, network_slot=network_slot,
+                                        extraction_slot=extraction_slot, archive_cache=archive_cache)
+
+    def _download_while_locked(self, *,
+                               connections: int = 1,
+                               segment_size: int = DOWNLOAD_SEGMENT_SIZE,
+                               stream_extract: bool = False,
+                               extraction_workers: int = 1,
+                               native_extraction: bool = False,
+                               network_slot: Optional[ContextManager[Any]] = None,
+                               extraction_slot: Optional[ContextManager[Any]] = None,
+                               archive_cache: Optional[ArchiveCache] = None) -> None:
+        "Download and extract the dataset while the directory write lock is held. See :meth:`.download`."
 
         download_url = self._schema['download_url']
         download_file_name = pathlib.Path(os.path.basename(download_url))
 
-        with self._lock.locking_with_exception(write=True):
-            archive_fp = self._nourish_dir / download_file_name
-            response = requests.get(download_url, stream=True)
-            archive_fp.write_bytes(response.content)
+        self._forget_verification()
+        if archive_cache is not None:
+            with _holding(extraction_slot):
+                if self._extract_cached_archive(archive_cache, extraction_workers=extraction_workers,
+                                                native_extraction=native_extraction):
+                    return
+
+        # mimetypes.guess_type doesn't accept path-like objects until python 3.8
+        if stream_extract and mimetypes.guess_type(download_file_name.name)[0] == 'application/x-tar':
+            with _holding(network_slot), _holding(extraction_slot), open_archive_stream(download_url) as stream:
+                extract_tar_stream(stream, data_dir=self._data_dir, file_list_file=self._file_list_file,
+                                   verify=lambda: self._check_sha512(download_url, stream.hexdigest()))
+            return
+
+        archive_fp = self._nourish_dir / download_file_name
+        with _holding(network_slot):
+            if connections > 1:
+                computed_hash = download_archive_segmented(download_url, archive_fp,
+                                                           connections=connections,
+                                                           segment_size=segment_size,
+                                                           journal_fp=self._download_journal_file)
+            else:
+                computed_hash = download_archive(download_url, archive_fp, journal_fp=self._download_journal_file)
+        self._check_sha512(archive_fp, computed_hash)
+
+        with _holding(extraction_slot):
+            extract_data_files(path=archive_fp, data_dir=self._data_dir, file_list_file=self._file_list_file,
+                               workers=extraction_workers, native=native_extraction)
+        self._dispose_archive(archive_fp, archive_cache)
+
+    def ensure_downloaded(self, *, on_wait: Optional[Callable[[float], None]] = None, **options: Any) -> bool:
+        """Download the dataset unless it has been downloaded, once for all concurrent callers: Of the calls for the
+        same data dir, from threads of this process or from other processes, the first downloads the dataset, while the
+        others wait for it to finish and return without downloading the dataset again. If that download fails, the
+        calls that waited for it fail as well rather than trying again. Waiting for a download by another thread or
+        process is bounded by ``lock_timeout`` (passed in via the constructor :class:`Dataset`).
+
+        :param on_wait: Called with the seconds waited so far about once every second while waiting for a download of
+            the dataset by another thread or process.
+        :param options: Keyword arguments passed to :meth:`.download`, except ``check``.
+        :raises exceptions.DownloadFailedError: The download by another thread or process that this call waited for
+            failed.
+        :raises exceptions.DirectoryLockAcquisitionError: The download by another thread or process didn't finish
+            within ``lock_timeout``.
+        :raises Exception: Same as :meth:`.download` if this call downloads the dataset.
+        :return: ``True`` if this call downloaded the dataset, ``False`` if it had been downloaded already or by
+            another thread or process.
+        """
+
+        if self.is_downloaded():
+            return False
+
+        with _flights_lock:
+            flight = _flights.get(self._data_dir_)
+            leading = flight is None
+            if flight is None:
+                flight = _flights[self._data_dir_] = _Flight()
+
+        if not leading:
+            slices = _wait_slices(self._lock_timeout, on_wait)
+            if not (flight.done.is_set() or any(flight.done.wait(wait) for wait in slices)):
+                raise self._wait_timeout_error()
+            if flight.error is not None:
+                raise DownloadFailedError(f'Another thread failed to download "{self._data_dir_}"'
+                                          f'\ncaused by:\n{flight.error!r}') from flight.error
+            return False
+
+        try:
+            return self._download_once(on_wait=on_wait, **options)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with _flights_lock:
+                del _flights[self._data_dir_]
+            flight.done.set()
+
+    def _download_once(self, *, on_wait: Optional[Callable[[float], None]], **options: Any) -> bool:
+        """Coordinate :meth:`.ensure_downloaded` with other processes through the directory lock.
+
+        :return: Same as :meth:`.ensure_downloaded`.
+        """
+
+        waiting_since = time.time()
+        slices = _wait_slices(self._lock_timeout, on_wait)
+        waited = False
+        while not self._lock.lock(write=True):
+            # Another process is downloading the dataset (or loading it). Waiting for a read lock lets all processes
+            # that wait for the same download proceed together once it has finished.
+            waited = True
+            wait = next(slices, None)
+            if wait is None:
+                raise self._wait_timeout_error()
+            if self._lock.lock(write=False, timeout=wait):
+                try:
+                    if self.is_downloaded():
+                        return False
+                    self._raise_failure_since(waiting_since)
+                finally:
+                    self._lock.unlock()
+
+        try:
+            if self.is_downloaded():
+                return False
+            if waited:
+                self._raise_failure_since(waiting_since)
+            try:
+                self._download_while_locked(**options)
+            except BaseException as e:
+                self._write_record(self._download_failure_file_, {'failed_at': time.time(), 'error': repr(e)})
+                raise
+            if self._download_failure_file_.exists():
+                self._download_failure_file_.unlink()
+            return True
+        finally:
+            self._lock.unlock()
+
+    def _raise_failure_since(self, since: float) -> None:
+        """Raise the error of a download by another process that failed after ``since``, if there is one.
+
+        :param since: Seconds since the epoch.
+        :raises exceptions.DownloadFailedError: The download failed.
+        """
+        try:
+            failure = json.loads(self._download_failure_file_.read_text())
+        except (OSError, ValueError):
+            return
+        if failure['failed_at'] >= since:
+            raise DownloadFailedError(f'Another process failed to download "{self._data_dir_}"'
+                                      f'\ncaused by:\n{failure["error"]}')
+
+    def _wait_timeout_error(self) -> DirectoryLockAcquisitionError:
+        "The error raised when a download by another thread or process didn't finish in time."
+        return DirectoryLockAcquisitionError(
+            f'Timed out waiting for another thread or process to download "{self._data_dir_}"')
+
+    async def adownload(self,
+                        check: bool = True, *,
+                        session: Optional['aiohttp.ClientSession'] = None,
+                        executor: Optional[Executor] = None,
+                        extraction_workers: int = 1,
+                        native_extraction: bool = False,
+                        archive_cache: Optional[ArchiveCache] = None) -> None:
+        """Awaitable counterpart of :meth:`.download`. The archive is received with :mod:`aiohttp` without blocking the
+        event loop, while checking whether the dataset has been downloaded and extracting the archive are run in
+        ``executor``. Segmented downloads and stream extraction are not supported.
+
+        If the task is cancelled, the directory write lock is released before the cancellation propagates. A cancelled
+        download can be resumed like an interrupted one; a cancelled extraction is run to its end first, because it
+        can't be interrupted.
+
+        :param check: Same as ``check`` in :meth:`.download`.
+        :param session: The :class:`aiohttp.ClientSession` used to download the archive. ``None`` means creating a
+            session for this call.
+        :param executor: The executor that runs blocking operations. ``None`` means the default executor of the event
+            loop.
+        :param extraction_workers: Same as ``extraction_workers`` in :meth:`.download`.
+        :param native_extraction: Same as ``native_extraction`` in :meth:`.download`.
+        :param archive_cache: Same as ``archive_cache`` in :meth:`.download`.
+        :raises RuntimeError: See :meth:`.download`.
+        :raises NotADirectoryError: See :meth:`.download`.
+        :raises OSError: The SHA512 checksum of a downloaded dataset doesn't match the expected checksum.
+        :raises aiohttp.ClientResponseError: The server responded with an error status.
+        :raises ImportError: :mod:`aiohttp` is not installed.
+        :raises exceptions.DirectoryLockAcquisitionError: Failed to acquire the directory lock.
+        """
+
+        if check and await run_in_executor(executor, self.is_downloaded):
+            raise self._previously_downloaded_error()
+
+        async with self._lock.alocking_with_exception(write=True, timeout=self._lock_timeout):
+            await self._adownload_while_locked(session=session, executor=executor,
+                                               extraction_workers=extraction_workers,
+                                               native_extraction=native_extraction, archive_cache=archive_cache)
+
+    async def _adownload_while_locked(self, *,
+                                      session: Optional['aiohttp.ClientSession'] = None,
+                                      executor: Optional[Executor] = None,
+                                      extraction_workers: int = 1,
+                                      native_extraction: bool = False,
+                                      archive_cache: Optional[ArchiveCache] = None) -> None:
+        "Download and extract the dataset while the directory write lock is held. See :meth:`.adownload`."
 
-            computed_hash = hashlib.sha512(archive_fp.read_bytes()).hexdigest()
-            actual_hash = self._schema['sha512sum']
-            if not actual_hash == computed_hash:
-                raise OSError(f'{archive_fp} has a SHA512 checksum of: ({computed_hash}) '
-                              f'which is different from the expected SHA512 checksum of: ({actual_hash}) '
-                              f'the file may by corrupted.')
+        download_url = self._schema['download_url']
+
+        self._forget_verification()
+        if archive_cache is not None and await run_in_executor(
+                executor, functools.partial(self._extract_cached_archive, archive_cache,
+                                            extraction_workers=extraction_workers,
+                                            native_extraction=native_extraction)):
+            return
+
+        archive_fp = self._nourish_dir / os.path.basename(download_url)
+        async with ClientSessionContext(session) as client:
+            computed_hash = await adownload_archive(download_url, archive_fp, session=client,
+                                                    journal_fp=self._download_journal_file)
+        self._check_sha512(archive_fp, computed_hash)
+
+        await run_in_executor(executor, functools.partial(extract_data_files, path=archive_fp,
+                                                          data_dir=self._data_dir,
+                                                          file_list_file=self._file_list_file,
+                                                          workers=extraction_workers,
+                                                          native=native_extraction))
+        self._dispose_archive(archive_fp, archive_cache)
+
+    async def aensure_downloaded(self, *,
+                                 on_wait: Optional[Callable[[float], None]] = None,
+                                 executor: Optional[Executor] = None,
+                                 **options: Any) -> bool:
+        """Awaitable counterpart of :meth:`.ensure_downloaded`. Calls of both for the same data dir download the dataset
+        only once between them. The dataset is downloaded as by :meth:`.adownload`, and waiting for another thread,
+        task, or process doesn't block the event loop.
+
+        :param on_wait: Same as ``on_wait`` in :meth:`.ensure_downloaded`.
+        :param executor: Same as ``executor`` in :meth:`.adownload`.
+        :param options: Keyword arguments passed to :meth:`.adownload`, except ``check``.
+        :raises exceptions.DownloadFailedError: Same as :meth:`.ensure_downloaded`.
+        :raises exceptions.DirectoryLockAcquisitionError: Same as :meth:`.ensure_downloaded`.
+        :raises Exception: Same as :meth:`.adownload` if this call downloads the dataset.
+        :return: Same as :meth:`.ensure_downloaded`.
+        """
+
+        if await run_in_executor(executor, self.is_downloaded):
+            return False
 
-            extract_data_files(path=archive_fp, data_dir=self._data_dir, file_list_file=self._file_list_file)
+        with _flights_lock:
+            flight = _flights.get(self._data_dir_)
+            leading = flight is None
+            if flight is None:
+                flight = _flights[self._data_dir_] = _Flight()
+
+        if not leading:
+            if not await _await_event(flight.done, _wait_slices(self._lock_timeout, on_wait)):
+                raise self._wait_timeout_error()
+            if flight.error is not None:
+                raise DownloadFailedError(f'Another thread failed to download "{self._data_dir_}"'
+                                          f'\ncaused by:\n{flight.error!r}') from flight.error
+            return False
+
+        try:
+            return await self._adownload_once(on_wait=on_wait, executor=executor, **options)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with _flights_lock:
+                del _flights[self._data_dir_]
+            flight.done.set()
+
+    async def _adownload_once(self, *, on_wait: Optional[Callable[[float], None]], executor: Optional[Executor],
+                              **options: Any) -> bool:
+        """Awaitable counterpart of :meth:`._download_once`.
+
+        :return: Same as :meth:`.ensure_downloaded`.
+        """
+
+        waiting_since = time.time()
+        slices = _wait_slices(self._lock_timeout, on_wait)
+        waited = False
+        while not self._lock.lock(write=True):
+            # See _download_once
+            waited = True
+            wait = next(slices, None)
+            if wait is None:
+                raise self._wait_timeout_error()
+            if await self._lock.alock(write=False, timeout=wait):
+                try:
+                    if await run_in_executor(executor, self.is_downloaded):
+                        return False
+                    self._raise_failure_since(waiting_since)
+                finally:
+                    self._lock.unlock()
+
+        try:
+            if await run_in_executor(executor, self.is_downloaded):
+                return False
+            if waited:
+                self._raise_failure_since(waiting_since)
+            try:
+                await self._adownload_while_locked(executor=executor, **options)
+            except BaseException as e:
+                self._write_record(self._download_failure_file_, {'failed_at': time.time(), 'error': repr(e)})
+                raise
+            if self._download_failure_file_.exists():
+                self._download_failure_file_.unlink()
+            return True
+        finally:
+            self._lock.unlock()
+
+    def _extract_cached_archive(self, archive_cache: ArchiveCache, *, extraction_workers: int = 1,
+                                native_extraction: bool = False) -> bool:
+        """Extract the archive of this dataset from ``archive_cache`` if it is there.
+
+        :param extraction_workers: See :meth:`.download`.
+        :param native_extraction: See :meth:`.download`.
+        :return: ``True`` if the archive has been found and extracted.
+        """
+        # Pinned, so that evictions by other processes in the meantime don't remove it
+        with archive_cache.pinning(self._schema['sha512sum']) as archive:
+            if archive is None:
+                return False
+            extract_data_files(path=archive, data_dir=self._data_dir, file_list_file=self._file_list_file,
+                               workers=extraction_workers, native=native_extraction)
+        return True
+
+    def _dispose_archive(self, archive_fp: pathlib.Path, archive_cache: Optional[ArchiveCache]) -> None:
+        "Move an extracted archive into ``archive_cache``, or remove it if it isn't cached."
+        if archive_cache is None or not archive_cache.put(archive_fp, self._schema['sha512sum']):
             os.remove(archive_fp)
 
+    def _previously_downloaded_error(self) -> RuntimeError:
+        "The error raised when downloading a dataset that has already been downloaded with ``check`` set."
+        return RuntimeError(f'{self.__class__.__name__}.download() was previously called. To overwrite existing '
+                            f'data files, rerun {self.__class__.__name__}.download() with ``check`` set to '
+                            f'``False``.')
+
+    def _check_sha512(self, archive: typing_.PathLike, computed_hash: str) -> None:
+        """Compare the SHA512 checksum of a downloaded archive with the one in the schema.
+
+        :param archive: Path or URL of the archive, used in the error message.
+        :param computed_hash: The hex digest of the SHA512 checksum of the downloaded archive.
+        :raises OSError: The checksums don't match.
+        """
+        actual_hash = self._schema['sha512sum']
+        if not actual_hash == computed_hash:
+            raise OSError(f'{archive} has a SHA512 checksum of: ({computed_hash}) '
+                          f'which is different from the expected SHA512 checksum of: ({actual_hash}) '
+                          f'the file may by corrupted.')
+
     def load(self,
              subdatasets: Optional[Iterable[str]] = None,
              format_loader_map: Optional[FormatLoaderMap] = None,
-             check: bool = True) -> Dict[str, Any]:
+             check: bool = True, *,
+             parsed_cache: bool = False,
+             columns: Optional[Sequence[str]] = None,
+             filters: Optional[Filters] = None,
+             compact: bool = False) -> Dict[str, Any]:
         """Load data files to RAM. It adds a directory read lock during execution.
 
         :param subdatasets: The subdatasets to load. ``None`` means all subdatasets.
@@ -185,36 +679,202 @@ class Dataset:
             ``data_dir`` in the constructor :class:`Dataset`) before loading them by running :meth:`.is_downloaded`.
             If set to ``True``, raise an error if they are missing and prevent attempting to load them. Set to ``False``
             to remove this safeguard.
+        :param parsed_cache: If ``True``, keep the parsed dataframes in :file:`.nourish.dataset/parsed` under the data
+            directory, and memory-map them instead of parsing the data files again as long as the data files, their
+            loader, and their format options don't change. Requires :mod:`pyarrow`.
+        :param columns: The columns to load of each subdataset. ``None`` means all columns. Only these columns and
+            those that ``filters`` refer to are parsed, or read from the cache of parsed subdatasets.
+        :param filters: The conditions that the loaded rows of each subdataset satisfy, e.g.,
+            ``[('HOURLYVISIBILITY', '>', 5)]``. ``None`` means all rows. The rows are filtered while they are parsed, or
+            read from the cache of parsed subdatasets, so that the rows that aren't selected are never held in memory.
+            See :data:`.loaders.Filters`.
+        :param compact: If ``True``, change the dtypes of the columns of the loaded tables to ones that use less memory,
+            e.g., categorical for string columns with few distinct values, and the smallest integer type that holds the
+            values of an integer column. Columns whose types the format options of the schema give keep them. The memory
+            used before and after is logged and kept in :attr:`.memory_reports`.
         :raises RuntimeError: The dataset was not previously downloaded as indicated by :meth:`.is_downloaded`
             returning ``False``.
         :raises FileNotFoundError: The dataset files for a particular subdataset are not found on the disk. Either this
             is because :func:`~Dataset.download` was never called, or the dataset was only partially downloaded.
         :raises exceptions.DirectoryLockAcquisitionError: Failed to acquire the directory lock.
+        :raises ImportError: ``parsed_cache`` is ``True`` and :mod:`pyarrow` is not installed.
+        :raises ValueError: ``filters`` are malformed, or the loader of a subdataset doesn't support selecting columns
+            or rows.
         :return: Loaded data objects. Same as :attr:`.data`.
         """
 
         if subdatasets is None:
             subdatasets = self._schema['subdatasets'].keys()
 
+        cache = ParsedCache(self._nourish_dir_ / 'parsed') if parsed_cache else None
+
         if check and not self.is_downloaded():
             raise RuntimeError(f'Downloaded data files are not present in {self._data_dir_} or are corrupted.')
 
-        with self._lock.locking_with_exception(write=False):
+        with self._lock.locking_with_exception(write=False, timeout=self._lock_timeout):
             self._data = {}
+            self._memory_reports = {}
             for subdataset in subdatasets:
                 subdataset_schema = self._schema['subdatasets'][subdataset]
                 try:
-                    self._data[subdataset] = load_data_files(fmt=subdataset_schema['format'],
-                                                             path=self._data_dir / subdataset_schema['path'],
-                                                             format_loader_map=format_loader_map)
+                    if cache is None:
+                        self._data[subdataset] = load_data_files(fmt=subdataset_schema['format'],
+                                                                 path=self._data_dir / subdataset_schema['path'],
+                                                                 format_loader_map=format_loader_map,
+                                                                 columns=columns, filters=filters,
+                                                                 index_dir=self._index_dir_)
+                    else:
+                        self._data[subdataset] = self._load_with_cache(cache, subdataset, subdataset_schema,
+                                                                       format_loader_map=format_loader_map,
+                                                                       columns=columns, filters=filters)
                 except FileNotFoundError as e:
                     self._data = None
-                    raise FileNotFoundError(
-                        f'Failed to load subdataset "{subdataset}" because some files are not found. '
-                        f'Did you forget to call {self.__class__.__name__}.download()?\nCaused by:\n{e}')
+                    raise self._subdataset_not_found_error(subdataset, e)
+                if compact:
+                    self._compact(subdataset, subdataset_schema, format_loader_map=format_loader_map)
 
         return self.data
 
+    def _compact(self, subdataset: str, subdataset_schema: SchemaDict, *,
+                 format_loader_map: Optional[FormatLoaderMap]) -> None:
+        "Compact the dtypes of a loaded subdataset, keeping the types that its format options give."
+
+        assert self._data is not None
+        _, fmt_options = resolve_format(subdataset_schema['format'], format_loader_map)
+        self._data[subdataset], report = compact_dtypes(self._data[subdataset],
+                                                        pinned=fmt_options.get('columns', {}).keys())
+        if report is not None:
+            self._memory_reports[subdataset] = report
+            _logger.info('Compacted subdataset "%s" of dataset "%s" from %d to %d bytes.',
+                         subdataset, self._schema['name'], report.before, report.after)
+
+    def _load_with_cache(self, cache: ParsedCache, subdataset: str, subdataset_schema: SchemaDict, *,
+                         format_loader_map: Optional[FormatLoaderMap],
+                         columns: Optional[Sequence[str]],
+                         filters: Optional[Filters]) -> Any:
+        """Load a subdataset from the cache of parsed subdatasets, or parse it and store it in the cache. A selection
+        is read from the cache if the whole subdataset is there; otherwise only the selection is parsed, and nothing is
+        stored, so that selecting never parses more than it loads.
+
+        :return: The loaded subdataset.
+        """
+
+        loader, fmt_options = resolve_format(subdataset_schema['format'], format_loader_map)
+        selection = selection_kwargs(columns, filters)
+        index = index_kwargs(loader, self._index_dir_)
+        path = self._data_dir / subdataset_schema['path']
+        st = path.stat()
+        if not stat.S_ISREG(st.st_mode):  # Changes to the content of directories aren't tracked
+            return loader.load(path, fmt_options, **selection, **index)
+
+        digest = recorded_digest(self._file_list_file_, subdataset_schema['path']) \
+            if self._file_list_file_.exists() else None
+        key = cache.key(path=subdataset_schema['path'], digest=digest, size=st.st_size, mtime_ns=st.st_mtime_ns,
+                        loader=f'{type(loader).__module__}.{type(loader).__qualname__}',
+                        loader_config=loader.cache_key(), format=subdataset_schema['format'])
+        data = cache.get(subdataset, key, **selection)
+        if data is None:
+            data = loader.load(path, fmt_options, **selection, **index)
+            if not selection:
+                cache.put(subdataset, key, data)
+        return data
+
+    def iter_load(self, subdataset: str, *,
+                  chunksize: int,
+                  format_loader_map: Optional[FormatLoaderMap] = None,
+                  check: bool = True,
+                  columns: Optional[Sequence[str]] = None,
+                  filters: Optional[Filters] = None) -> Iterator[Any]:
+        """Load a subdataset in chunks, e.g., dataframes of ``chunksize`` rows each for CSV files, or lists of
+        ``chunksize`` lines each for plain text files, so that subdatasets larger than RAM can be processed. The chunks
+        are parsed with the same format options as :meth:`.load`.
+
+        A directory read lock is held from the first chunk until the iterator is exhausted, closed, or garbage
+        collected. Each iterator holds a lock of its own, so several iterators may be open at the same time.
+
+        :param subdataset: The subdataset to load.
+        :param chunksize: The size of each chunk, e.g., the number of rows of a table.
+        :param format_loader_map: Same as :meth:`.load`.
+        :param check: Same as :meth:`.load`.
+        :param columns: Same as :meth:`.load`.
+        :param filters: Same as :meth:`.load`. Chunks have fewer rows than ``chunksize`` if rows are filtered out.
+        :raises KeyError: ``subdataset`` is not a subdataset of the dataset.
+        :raises RuntimeError: See :meth:`.load`.
+        :raises FileNotFoundError: See :meth:`.load`. Raised when iterating starts.
+        :raises NotImplementedError: The loader of the format of the subdataset doesn't support loading in chunks.
+            Raised when iterating starts.
+        :raises exceptions.DirectoryLockAcquisitionError: Failed to acquire the directory lock. Raised when iterating
+            starts.
+        :return: An iterator of the loaded chunks.
+        """
+
+        subdataset_schema = self._schema['subdatasets'][subdataset]
+
+        if check and not self.is_downloaded():
+            raise RuntimeError(f'Downloaded data files are not present in {self._data_dir_} or are corrupted.')
+
+        return self._iter_chunks(subdataset, subdataset_schema, chunksize=chunksize,
+                                 format_loader_map=format_loader_map, columns=columns, filters=filters)
+
+    def _iter_chunks(self, subdataset: str, subdataset_schema: SchemaDict, *,
+                     chunksize: int,
+                     format_loader_map: Optional[FormatLoaderMap],
+                     columns: Optional[Sequence[str]],
+                     filters: Optional[Filters]) -> Iterator[Any]:
+        "The generator behind :meth:`.iter_load`. As a generator, it releases the lock in all the ways it can end."
+
+        # Not self._lock, whose lock file only one holder can use at a time
+        with DirectoryLock(self._nourish_dir_).locking_with_exception(write=False, timeout=self._lock_timeout):
+            try:
+                chunks = iter_data_files(fmt=subdataset_schema['format'],
+                                         path=self._data_dir / subdataset_schema['path'],
+                                         chunksize=chunksize,
+                                         format_loader_map=format_loader_map,
+                                         columns=columns, filters=filters)
+            except FileNotFoundError as e:
+                raise self._subdataset_not_found_error(subdataset, e)
+            try:
+                yield from chunks
+            finally:
+                close = getattr(chunks, 'close', None)
+                if close is not None:
+                    close()
+
+    def _subdataset_not_found_error(self, subdataset: str, cause: FileNotFoundError) -> FileNotFoundError:
+        "The error raised when the files of a subdataset are missing."
+        return FileNotFoundError(f'Failed to load subdataset "{subdataset}" because some files are not found. '
+                                 f'Did you forget to call {self.__class__.__name__}.download()?\nCaused by:\n{cause}')
+
+    async def aload(self,
+                    subdatasets: Optional[Iterable[str]] = None,
+                    format_loader_map: Optional[FormatLoaderMap] = None,
+                    check: bool = True, *,
+                    parsed_cache: bool = False,
+                    columns: Optional[Sequence[str]] = None,
+                    filters: Optional[Filters] = None,
+                    compact: bool = False,
+                    executor: Optional[Executor] = None) -> Dict[str, Any]:
+        """Awaitable counterpart of :meth:`.load`, which loads the data files in ``executor``. If the task is cancelled,
+        the cancellation propagates after the loading has finished and released the directory read lock; the loaded
+        data is then discarded.
+
+        :param parsed_cache: See :meth:`.load`.
+        :param columns: See :meth:`.load`.
+        :param filters: See :meth:`.load`.
+        :param compact: See :meth:`.load`.
+        :param executor: The executor that loads the data files. ``None`` means the default executor of the event loop.
+        :raises RuntimeError: See :meth:`.load`.
+        :raises FileNotFoundError: See :meth:`.load`.
+        :raises exceptions.DirectoryLockAcquisitionError: Failed to acquire the directory lock.
+        :raises ImportError: See :meth:`.load`.
+        :raises ValueError: See :meth:`.load`.
+        :return: Loaded data objects. Same as :attr:`.data`.
+        """
+
+        return await run_in_executor(executor, functools.partial(self.load, subdatasets, format_loader_map, check,
+                                                                 parsed_cache=parsed_cache, columns=columns,
+                                                                 filters=filters, compact=compact))
+
     def delete(self, *, force: bool = False) -> None:
         """Clear the data directory. It adds a directory write lock before deletion during execution if the data
         directory exists.
@@ -227,8 +887,9 @@ class Dataset:
             if force:
                 lock_func: Callable = self._lock.locking
             else:
-                lock_func = self._lock.locking_with_exception
+                lock_func = functools.partial(self._lock.locking_with_exception, timeout=self._lock_timeout)
             with lock_func(write=True):
+                self._verification = None
                 shutil.rmtree(self._data_dir_)
 
     @property
@@ -242,19 +903,34 @@ class Dataset:
         # doesn't cause security issues as in the BaseSchemata class
         return self._data
 
-    def is_downloaded(self) -> bool:
+    @property
+    def memory_reports(self) -> Dict[str, MemoryReport]:
+        """The memory used by each table loaded by the last :meth:`.load` before and after its dtypes were compacted.
+        Empty unless ``compact`` was ``True``."""
+        return self._memory_reports
+
+    def is_downloaded(self, *, use_stamp: bool = True) -> bool:
         """Check to see if the dataset was downloaded. We determine this by comparing the extracted file tree with the file
         list :meth:`._file_list_file` (their existence, types, and sizes). In this way, if the extraction of the archive
         failed, this should return ``False`` and the user would not be misled. For performance reasons, we do not
         examine the content of the extracted files.
 
+        A successful comparison is recorded in a verification stamp together with a fingerprint of the tree: the file
+        list, :attr:`Dataset._data_dir`, and the types, sizes, and modification times of up to
+        :attr:`_MAX_FINGERPRINTED_ENTRIES` of its entries. As long as the fingerprint doesn't change, later checks
+        list only :attr:`Dataset._data_dir` and stat a bounded number of files, regardless of the size of the tree.
+
+        :param use_stamp: If ``False``, always compare the whole file tree with the file list.
         :return: ``True`` if the dataset has been downloaded and ``False`` otherwise.
 
         .. warning::
 
             :meth:`.is_downloaded` will search for the dataset files in :attr:`Dataset._data_dir` (passed in via
             ``data_dir`` in the constructor :class:`Dataset`). If after downloading, you manipulate the data files
-            outside the control of this library, this method may produce unexpected behavior.
+            outside the control of this library, this method may produce unexpected behavior. In particular, files
+            that are modified in place, or added to or removed from directories, below the subdirectories of
+            :attr:`Dataset._data_dir` don't change the fingerprint; pass ``use_stamp=False`` or call :meth:`.verify` to
+            detect such changes.
         """
 
         # The method to detect whether the dataset has been downloaded can certainly be improved by balancing how much
@@ -266,4 +942,165 @@ class Dataset:
             # File not found, may not have finished downloading at all and we treat it as so. We can't control users'
             # own tweaking with the directory.
             return False
-        return verify_data_files(data_dir=self._data_dir, file_list_file=self._file_list_file_)
+
+        # Fingerprint the tree before comparing it, so that changes made during the comparison invalidate the stamp
+        fingerprint = self._fingerprint()
+        if use_stamp and fingerprint is not None and self._is_stamped(fingerprint):
+            return True
+        if not verify_data_files(data_dir=self._data_dir, file_list_file=self._file_list_file_):
+            return False
+        if fingerprint is not None:
+            self._write_verification_stamp(fingerprint)
+        return True
+
+    def _fingerprint(self) -> Optional[Dict[str, Any]]:
+        """The fingerprint of the file list and the extracted tree: the states of the file list, the data dir, and the
+        first :attr:`_MAX_FINGERPRINTED_ENTRIES` entries of the data dir by name, other than
+        :attr:`Dataset._nourish_dir`. The entries are stated in one pass of :func:`os.scandir`.
+
+        :return: The fingerprint in a JSON-compatible form, or ``None`` if the file list or the data dir is missing.
+        """
+        try:
+            file_list_stat = os.stat(self._file_list_file_)
+            data_dir_stat = os.stat(self._data_dir_)
+            with os.scandir(self._data_dir_) as scanned:
+                entries = sorted((entry for entry in scanned if entry.name != self._nourish_dir_.name),
+                                 key=lambda entry: entry.name)[:self._MAX_FINGERPRINTED_ENTRIES]
+                entry_stats = {entry.name: entry.stat(follow_symlinks=False) for entry in entries}
+        except OSError:
+            return None
+        return {'file_list': [file_list_stat.st_ino, file_list_stat.st_size, file_list_stat.st_mtime_ns],
+                'data_dir': [data_dir_stat.st_ino, data_dir_stat.st_mtime_ns],
+                'entries': {name: [stat.S_IFMT(st.st_mode), st.st_size if stat.S_ISREG(st.st_mode) else 0,
+                                   st.st_mtime_ns]
+                            for name, st in entry_stats.items()}}
+
+    def _is_stamped(self, fingerprint: Dict[str, Any]) -> bool:
+        """Whether the tree with ``fingerprint`` was found to match the file list, according to the verification stamp
+        that this object last wrote or read, or else the stamp file.
+        """
+        if self._verification is not None and self._verification['fingerprint'] == fingerprint:
+            return True
+        # Another object may have stamped the tree since
+        self._verification = None
+        try:
+            with open(self._verification_stamp_file_, mode='r') as f:
+                stamp = json.load(f)
+            matched = stamp['fingerprint'] == fingerprint
+        except (OSError, ValueError, KeyError, TypeError):  # KeyError and TypeError: Written by an incompatible version
+            return False
+        if matched:
+            self._verification = stamp
+        return matched
+
+    def _write_verification_stamp(self, fingerprint: Dict[str, Any]) -> None:
+        "Record that the tree with ``fingerprint`` matches the file list."
+        self._verification = {'verified_at': time.time(), 'fingerprint': fingerprint}
+        self._write_record(self._verification_stamp_file_, self._verification)
+
+    @staticmethod
+    def _write_record(path: pathlib.Path, record: Any) -> None:
+        """Atomically write a record of a verification, such as the verification stamp, as JSON. Records only save time,
+        so they are skipped if they can't be written, e.g., because the data dir is read-only."""
+        tmp_file = path.with_name(f'.{path.name}-{uuid4()}')
+        try:
+            with open(tmp_file, mode='w') as f:
+                json.dump(record, f)
+            os.replace(tmp_file, path)
+        except OSError:
+            try:
+                tmp_file.unlink()
+            except OSError:
+                pass
+
+    def _forget_verification(self, *, digests: bool = True) -> None:
+        """Invalidate the records of verifications, because the extracted files are about to change.
+
+        :param digests: Whether to forget the files whose content was found intact by :meth:`.verify` as well.
+        """
+        self._verification = None
+        paths = [self._verification_stamp_file_]
+        if digests:
+            paths.append(self._verified_digests_file_)
+        for path in paths:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def verify(self, subdatasets: Optional[Iterable[str]] = None, *, deep: bool = False,
+               workers: int = 1) -> List[str]:
+        """Find the data files that are damaged. Unlike :meth:`.is_downloaded`, which stops at the first difference
+        between the extracted file tree and the file list, this reports every damaged file. It adds a directory read
+        lock during execution.
+
+        :param subdatasets: Only verify the data files of these subdatasets. ``None`` means all data files.
+        :param deep: If ``True``, also compare the content of the data files with the digests recorded in the file list
+            when the dataset was extracted: BLAKE2b digests, or the CRC32 checksums stored in zip archives. Files whose
+            size, modification time, and inode haven't changed since a previous deep verification found them intact
+            are not read again. Datasets extracted before digests were recorded are only compared by size.
+        :param workers: Maximum number of threads that read and hash the data files.
+        :raises RuntimeError: The dataset has not been downloaded.
+        :raises exceptions.DirectoryLockAcquisitionError: Failed to acquire the directory lock.
+        :return: The paths of the damaged data files relative to :attr:`Dataset._data_dir`, in sorted order. They can be
+            extracted again with :meth:`.repair`.
+        """
+
+        if not self._file_list_file_.exists():
+            raise RuntimeError(f'Dataset has not been downloaded. Call {self.__class__.__name__}.download() to '
+                               f'download it.')
+
+        paths = None
+        if subdatasets is not None:
+            paths = [self._schema['subdatasets'][subdataset]['path'] for subdataset in subdatasets]
+
+        with self._lock.locking_with_exception(write=False, timeout=self._lock_timeout):
+            if not deep:
+                return find_damaged_data_files(self._data_dir, self._file_list_file_, paths=paths)
+            try:
+                with open(self._verified_digests_file_, mode='r') as f:
+                    verified = json.load(f)
+            except (OSError, ValueError):
+                verified = {}
+            damaged = find_damaged_data_files(self._data_dir, self._file_list_file_, deep=True, workers=workers,
+                                              verified=verified, paths=paths)
+            self._write_record(self._verified_digests_file_, verified)
+        return damaged
+
+    def repair(self, damaged: Optional[Iterable[str]] = None, *,
+               workers: int = 1,
+               archive_cache: Optional[ArchiveCache] = None) -> List[str]:
+        """Extract damaged data files again, leaving the other data files alone. The archive is taken from
+        ``archive_cache`` if it is there, and downloaded again otherwise. It adds a directory write lock during
+        execution.
+
+        :param damaged: The paths of the data files to extract again, as returned by :meth:`.verify`. ``None`` means
+            the data files found damaged by a deep verification.
+        :param workers: Same as ``workers`` in :meth:`.verify`.
+        :param archive_cache: Same as ``archive_cache`` in :meth:`.download`.
+        :raises RuntimeError: The dataset has not been downloaded.
+        :raises OSError: The SHA512 checksum of the downloaded dataset doesn't match the expected checksum.
+        :raises requests.HTTPError: The server responded with an error status.
+        :raises exceptions.DirectoryLockAcquisitionError: Failed to acquire the directory lock.
+        :return: The paths of the data files that have been extracted again.
+        """
+
+        damaged = self.verify(deep=True, workers=workers) if damaged is None else list(damaged)
+        if not damaged:
+            return damaged
+
+        download_url = self._schema['download_url']
+        with self._lock.locking_with_exception(write=True, timeout=self._lock_timeout):
+            self._forget_verification(digests=False)
+            if archive_cache is not None:
+                with archive_cache.pinning(self._schema['sha512sum']) as archive:
+                    if archive is not None:
+                        repair_data_files(archive, self._data_dir, self._file_list_file, damaged)
+                        return damaged
+
+            archive_fp = self._nourish_dir / os.path.basename(download_url)
+            computed_hash = download_archive(download_url, archive_fp, journal_fp=self._download_journal_file)
+            self._check_sha512(archive_fp, computed_hash)
+            repair_data_files(archive_fp, self._data_dir, self._file_list_file, damaged)
+            self._dispose_archive(archive_fp, archive_cache)
+        return damaged
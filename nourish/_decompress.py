@@ -0,0 +1,404 @@
+# Copyright 2021 Edward Leardi. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"Block-parallel decompression of bzip2 and xz files."
+
+
+import bz2
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+import io
+import lzma
+import multiprocessing
+import pathlib
+import struct
+from typing import IO, Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+import zlib
+
+
+# Signature of a bzip2 block: the BCD-encoded digits of pi
+_BZ2_BLOCK_MAGIC = 0x314159265359
+# Signature of the end of a bzip2 stream: the BCD-encoded digits of sqrt(pi)
+_BZ2_EOS_MAGIC = 0x177245385090
+_BZ2_MAGIC_BITS = 48
+
+_XZ_HEADER_MAGIC = b'\xfd7zXZ\x00'
+_XZ_FOOTER_MAGIC = b'YZ'
+_XZ_HEADER_SIZE = 12
+_XZ_FOOTER_SIZE = 12
+
+# Number of bytes read at a time while looking for block boundaries
+_SCAN_CHUNK_SIZE = 4 * 1024 * 1024
+
+_serial_openers: Dict[str, Callable[..., Any]] = {
+    'bzip2': bz2.open,
+    'xz': lzma.open,
+}
+
+
+def _find_bit_pattern(data: bytes, pattern: int, nbits: int) -> Iterator[int]:
+    """Find all occurrences of a bit pattern that isn't necessarily byte-aligned.
+
+    For each of the 8 possible alignments, the bytes that the shifted pattern fully covers are searched with
+    :meth:`bytes.find`, and each hit is verified against the partially covered bytes on both ends.
+
+    :param data: The bytes to search.
+    :param pattern: The pattern, most significant bit first.
+    :param nbits: Number of bits in ``pattern``.
+    :return: Iterator of the bit offsets of the occurrences, unordered.
+    """
+    for shift in range(8):
+        nbytes = (shift + nbits + 7) // 8
+        pad = nbytes * 8 - shift - nbits
+        shifted = pattern << pad
+        mask = ((1 << nbits) - 1) << pad
+        head = 1 if shift else 0
+        tail = 1 if pad else 0
+        needle = shifted.to_bytes(nbytes, 'big')[head:nbytes - tail]
+        index = data.find(needle, head)
+        while index != -1:
+            start = index - head
+            window = data[start:start + nbytes]
+            if len(window) == nbytes and int.from_bytes(window, 'big') & mask == shifted:
+                yield start * 8 + shift
+            index = data.find(needle, index + 1)
+
+
+def _scan_bit_patterns(path: pathlib.Path, patterns: Tuple[int, ...], nbits: int) -> List[List[int]]:
+    """Find all occurrences of bit patterns in a file, reading it in chunks.
+
+    :param path: Path to the file.
+    :param patterns: The patterns to find.
+    :param nbits: Number of bits in each pattern.
+    :return: The sorted bit offsets of the occurrences of each pattern.
+    """
+    overlap = (nbits + 7) // 8 + 1
+    found: List[set] = [set() for _ in patterns]
+    with open(path, 'rb') as f:
+        offset = 0
+        previous = b''
+        for chunk in iter(lambda: f.read(_SCAN_CHUNK_SIZE), b''):
+            data = previous + chunk
+            base = (offset - len(previous)) * 8
+            for positions, pattern in zip(found, patterns):
+                positions.update(base + position for position in _find_bit_pattern(data, pattern, nbits))
+            offset += len(chunk)
+            previous = data[-overlap:]
+    return [sorted(positions) for positions in found]
+
+
+# A bzip2 block: its start and end bit offsets in the file, and the block size level of its stream
+_Bzip2Block = Tuple[int, int, int]
+
+
+def _bzip2_blocks(path: pathlib.Path) -> List[_Bzip2Block]:
+    """Locate the blocks of a (possibly multi-stream) bzip2 file.
+
+    Blocks aren't byte-aligned and their boundaries are only marked by signatures, which may also occur by chance in
+    the compressed data. Such false boundaries are not detected here, but make decoding the affected blocks fail.
+
+    :param path: Path to the bzip2 file.
+    :return: The blocks in order, or an empty list if the structure of the file isn't understood.
+    """
+
+    block_starts, stream_ends = _scan_bit_patterns(path, (_BZ2_BLOCK_MAGIC, _BZ2_EOS_MAGIC), _BZ2_MAGIC_BITS)
+    if not stream_ends:
+        return []
+
+    # Each stream starts with a byte-aligned header "BZh" followed by the block size level, and ends with the end of
+    # stream signature, its combined CRC, and padding to the next byte
+    stream_starts = [0] + [(end + _BZ2_MAGIC_BITS + 32 + 7) // 8 for end in stream_ends[:-1]]
+    levels = []
+    with open(path, 'rb') as f:
+        for start in stream_starts:
+            f.seek(start)
+            header = f.read(4)
+            if len(header) != 4 or header[:3] != b'BZh' or header[3:] not in b'123456789':
+                return []
+            levels.append(int(header[3:]))
+
+    blocks = []
+    boundaries = sorted(block_starts + stream_ends)
+    stream_end_set = set(stream_ends)
+    stream = 0
+    for start, end in zip(boundaries, boundaries[1:]):
+        if start in stream_end_set:
+            continue
+        while stream + 1 < len(stream_starts) and stream_starts[stream + 1] * 8 <= start:
+            stream += 1
+        blocks.append((start, end, levels[stream]))
+    return blocks
+
+
+def _decode_bzip2_block(path: pathlib.Path, start: int, end: int, level: int) -> bytes:
+    """Decode a bzip2 block on its own by wrapping it in a stream of its own. This runs in a worker process.
+
+    :param path: Path to the bzip2 file.
+    :param start: Bit offset of the block signature.
+    :param end: Bit offset of the end of the block.
+    :param level: Block size level of the stream the block belongs to.
+    :return: The decompressed data.
+    """
+
+    with open(path, 'rb') as f:
+        f.seek(start // 8)
+        data = f.read((end + 7) // 8 - start // 8)
+    nbits = end - start
+    block = (int.from_bytes(data, 'big') >> (len(data) * 8 - (end - start // 8 * 8))) & ((1 << nbits) - 1)
+    # The CRC of the block follows its signature. The combined CRC of a stream of a single block is the same.
+    crc = (block >> (nbits - _BZ2_MAGIC_BITS - 32)) & 0xffffffff
+    stream = (((block << _BZ2_MAGIC_BITS) | _BZ2_EOS_MAGIC) << 32) | crc
+    nbits += _BZ2_MAGIC_BITS + 32
+    padding = -nbits % 8
+    stream <<= padding
+    return bz2.decompress(b'BZh%d' % level + stream.to_bytes((nbits + padding) // 8, 'big'))
+
+
+def _read_xz_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    """Read a variable-length integer of the xz format.
+
+    :return: The integer and the position after it.
+    :raises ValueError: The integer is malformed.
+    """
+    value = 0
+    for i in range(9):
+        if pos + i >= len(data):
+            break
+        byte = data[pos + i]
+        value |= (byte & 0x7f) << (7 * i)
+        if not byte & 0x80:
+            return value, pos + i + 1
+    raise ValueError('Malformed variable-length integer')
+
+
+def _xz_varint(value: int) -> bytes:
+    "Encode a variable-length integer of the xz format."
+    encoded = bytearray()
+    while value >= 0x80:
+        encoded.append(value & 0x7f | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+
+def _pad4(size: int) -> int:
+    "Round ``size`` up to a multiple of 4, the alignment of xz structures."
+    return (size + 3) // 4 * 4
+
+
+# An xz block: the stream header, the offset of the block in the file, and its unpadded and uncompressed sizes
+_XzBlock = Tuple[bytes, int, int, int]
+
+
+def _xz_blocks(path: pathlib.Path) -> List[_XzBlock]:
+    """Locate the blocks of a (possibly multi-stream) xz file from the indexes at the end of its streams.
+
+    :param path: Path to the xz file.
+    :return: The blocks in order, or an empty list if the structure of the file isn't understood.
+    """
+
+    blocks: List[_XzBlock] = []
+    with open(path, 'rb') as f:
+        pos = f.seek(0, io.SEEK_END)
+        while pos > 0:
+            # Skip the stream padding, which consists of null bytes
+            f.seek(pos - 4)
+            if f.read(4) == b'\x00' * 4:
+                pos -= 4
+                continue
+
+            if pos < _XZ_HEADER_SIZE + _XZ_FOOTER_SIZE:
+                return []
+            f.seek(pos - _XZ_FOOTER_SIZE)
+            footer = f.read(_XZ_FOOTER_SIZE)
+            if footer[10:] != _XZ_FOOTER_MAGIC:
+                return []
+            index_size = (struct.unpack('<I', footer[4:8])[0] + 1) * 4
+            index_start = pos - _XZ_FOOTER_SIZE - index_size
+            if index_start < _XZ_HEADER_SIZE:
+                return []
+            f.seek(index_start)
+            index = f.read(index_size)
+            if index[0] != 0:
+                return []
+
+            try:
+                count, cursor = _read_xz_varint(index, 1)
+                records = []
+                for _ in range(count):
+                    unpadded_size, cursor = _read_xz_varint(index, cursor)
+                    uncompressed_size, cursor = _read_xz_varint(index, cursor)
+                    records.append((unpadded_size, uncompressed_size))
+            except ValueError:
+                return []
+
+            stream_start = index_start - sum(_pad4(unpadded_size) for unpadded_size, _ in records) - _XZ_HEADER_SIZE
+            if stream_start < 0:
+                return []
+            f.seek(stream_start)
+            header = f.read(_XZ_HEADER_SIZE)
+            if header[:6] != _XZ_HEADER_MAGIC or header[6:8] != footer[8:10]:
+                return []
+
+            stream_blocks = []
+            offset = stream_start + _XZ_HEADER_SIZE
+            for unpadded_size, uncompressed_size in records:
+                stream_blocks.append((header, offset, unpadded_size, uncompressed_size))
+                offset += _pad4(unpadded_size)
+            blocks[:0] = stream_blocks
+            pos = stream_start
+    return blocks
+
+
+def _decode_xz_block(path: pathlib.Path, header: bytes, offset: int, unpadded_size: int,
+                     uncompressed_size: int) -> bytes:
+    """Decode an xz block on its own by wrapping it in a stream of its own with a one-record index. This runs in a
+    worker process.
+
+    :param path: Path to the xz file.
+    :param header: Header of the stream the block belongs to.
+    :param offset: Offset of the block in the file.
+    :param unpadded_size: Size of the block without its padding, as recorded in the index.
+    :param uncompressed_size: Size of the decompressed data, as recorded in the index.
+    :return: The decompressed data.
+    """
+
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        block = f.read(_pad4(unpadded_size))
+
+    index = b'\x00' + _xz_varint(1) + _xz_varint(unpadded_size) + _xz_varint(uncompressed_size)
+    index += b'\x00' * (-len(index) % 4)
+    index += struct.pack('<I', zlib.crc32(index))
+    footer = struct.pack('<I', len(index) // 4 - 1) + header[6:8]
+    footer = struct.pack('<I', zlib.crc32(footer)) + footer + _XZ_FOOTER_MAGIC
+    return lzma.decompress(header + block + index + footer, format=lzma.FORMAT_XZ)
+
+
+class _BlockReader(io.RawIOBase):
+    """Reads the decompressed data of a file whose blocks are decoded by a pool of worker processes, in order.
+
+    At most twice as many blocks as workers are decoded ahead of the reader. If a block fails to decode, e.g., because
+    a block boundary has been misdetected, the pool is abandoned and the rest of the data is read with the serial
+    decompressor instead.
+
+    :param path: Path to the compressed file.
+    :param compression: Name of the compression, ``'bzip2'`` or ``'xz'``.
+    :param decode: The function that decodes a block in a worker process.
+    :param blocks: Arguments of ``decode`` after ``path`` for each block, in order.
+    :param workers: Number of worker processes.
+    """
+
+    def __init__(self, path: pathlib.Path, compression: str, decode: Callable[..., bytes], blocks: List[Tuple],
+                 workers: int) -> None:
+        super().__init__()
+        self._path = path
+        self._compression = compression
+        self._decode = decode
+        self._blocks: Deque[Tuple] = deque(blocks)
+        # Forking a process that runs other threads, such as the lock heartbeat or a thread pool of the caller, can
+        # deadlock the child
+        self._executor: Optional[ProcessPoolExecutor] = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        self._pending: Deque[Future] = deque()
+        self._lookahead = workers * 2
+        self._buffer = memoryview(b'')
+        # Number of decompressed bytes passed to the reader
+        self._position = 0
+        self._serial: Optional[io.BufferedIOBase] = None
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b: Any) -> int:
+        while not self._buffer:
+            if self._serial is not None:
+                n = self._serial.readinto(b)
+                self._position += n
+                return n
+            if not self._fill():
+                return 0
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        self._position += n
+        return n
+
+    def _fill(self) -> bool:
+        """Move the next decoded block into the buffer.
+
+        :return: ``False`` if all blocks have been read.
+        """
+        assert self._executor is not None
+        while self._blocks and len(self._pending) < self._lookahead:
+            self._pending.append(self._executor.submit(self._decode, self._path, *self._blocks.popleft()))
+        if not self._pending:
+            return False
+        try:
+            self._buffer = memoryview(self._pending.popleft().result())
+        except Exception:
+            self._fall_back()
+        return True
+
+    def _fall_back(self) -> None:
+        "Abandon the pool and continue with the serial decompressor from the current position."
+        self._shutdown()
+        self._serial = _serial_openers[self._compression](self._path)
+        assert self._serial is not None
+        # Seeking forward decompresses and discards the data that has already been read
+        self._serial.seek(self._position)
+
+    def _shutdown(self) -> None:
+        "Cancel the blocks that haven't been decoded yet and stop the workers."
+        for future in self._pending:
+            future.cancel()
+        self._pending.clear()
+        self._blocks.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def close(self) -> None:
+        if not self.closed:
+            self._shutdown()
+            if self._serial is not None:
+                self._serial.close()
+        super().close()
+
+
+def open_compressed(path: pathlib.Path, compression: str, *, workers: int = 1) -> IO[bytes]:
+    """Open a bzip2 or xz file for reading its decompressed data. With more than one worker, the blocks of the file
+    are located and decoded in parallel by a pool of worker processes. Files that consist of a single block, or whose
+    structure isn't understood, are decompressed serially as with :func:`bz2.open` and :func:`lzma.open`.
+
+    Unlike the serial decompressors, the parallel decompressor doesn't verify the combined checksums of bzip2 streams,
+    only the checksum of each block.
+
+    :param path: Path to the compressed file.
+    :param compression: Name of the compression, ``'bzip2'`` or ``'xz'``.
+    :param workers: Maximum number of worker processes.
+    :return: A binary file object of the decompressed data.
+    """
+
+    if workers > 1:
+        blocks: List[Tuple]
+        decode: Callable[..., bytes]
+        if compression == 'bzip2':
+            blocks, decode = _bzip2_blocks(path), _decode_bzip2_block
+        else:
+            blocks, decode = _xz_blocks(path), _decode_xz_block
+        if len(blocks) > 1:
+            return io.BufferedReader(_BlockReader(path, compression, decode, blocks, min(workers, len(blocks))))
+    return _serial_openers[compression](path)
@@ -0,0 +1,462 @@
+# Copyright 2021 Edward Leardi. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"Dataset archive downloading functionality."
+
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import dataclasses
+from dataclasses import dataclass
+import hashlib
+import io
+import json
+import os
+import pathlib
+import re
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+import requests
+
+from ._http import get_session
+
+if TYPE_CHECKING:
+    import aiohttp
+
+
+# Size of the chunks in which an archive is streamed to disk. Memory usage during a download is bounded by this value
+# regardless of the size of the archive.
+DOWNLOAD_CHUNK_SIZE: int = 1024 * 1024
+
+# Default maximum size of a segment in a segmented download. See :func:`download_archive_segmented`.
+DOWNLOAD_SEGMENT_SIZE: int = 64 * 1024 * 1024
+
+# Number of bytes received between two consecutive updates of the download journal. This bounds how much of an
+# interrupted download has to be fetched again.
+JOURNAL_INTERVAL: int = 16 * 1024 * 1024
+
+
+@dataclass
+class _DownloadJournal:
+    """State of a partially downloaded archive. It is persisted next to the partial archive so that an interrupted
+    download can be continued later with a ``Range`` request.
+    """
+
+    # The URL being downloaded. A journal is discarded if the URL changes.
+    url: str
+    # Number of bytes of the archive that have been written to the disk.
+    bytes_received: int = 0
+    # SHA512 hex digest of the first ``bytes_received`` bytes of the archive. Python can't serialize a hash object, so
+    # the partial archive is rehashed upon resumption and compared with this digest before appending to it.
+    partial_sha512: str = hashlib.sha512().hexdigest()
+    # Validators sent by the server, used in ``If-Range`` so that a changed remote file is never appended to a stale
+    # partial archive.
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    @classmethod
+    def read(cls, journal_fp: pathlib.Path, url: str) -> Optional['_DownloadJournal']:
+        """Read a journal from the disk.
+
+        :param journal_fp: Path to the journal file.
+        :param url: The URL about to be downloaded.
+        :return: The journal, or ``None`` if it doesn't exist, can't be parsed, or belongs to a different URL.
+        """
+        try:
+            journal = cls(**json.loads(journal_fp.read_text(encoding='utf-8')))
+        except (OSError, ValueError, TypeError):
+            return None
+        if journal.url != url:
+            return None
+        return journal
+
+    def write(self, journal_fp: pathlib.Path) -> None:
+        """Atomically write the journal to the disk.
+
+        :param journal_fp: Path to the journal file.
+        """
+        tmp_fp = journal_fp.with_name(journal_fp.name + '.tmp')
+        tmp_fp.write_text(json.dumps(dataclasses.asdict(self)), encoding='utf-8')
+        os.replace(tmp_fp, journal_fp)
+
+    @property
+    def if_range(self) -> Optional[str]:
+        "The value of the ``If-Range`` header. Weak ETags can't be used here (RFC 7233, section 3.2)."
+        if self.etag is not None and not self.etag.startswith('W/'):
+            return self.etag
+        return self.last_modified
+
+
+def _restore_partial_archive(archive_fp: pathlib.Path, journal: _DownloadJournal,
+                             chunk_size: int) -> Optional['hashlib._Hash']:
+    """Rehash the partial archive recorded in ``journal`` and drop anything written after the last journal update.
+
+    :return: The hash object of the partial archive, or ``None`` if the partial archive can't be continued.
+    """
+
+    if journal.bytes_received <= 0 or not archive_fp.is_file() or \
+       archive_fp.stat().st_size < journal.bytes_received:
+        return None
+
+    hasher = hashlib.sha512()
+    remaining = journal.bytes_received
+    with open(archive_fp, mode='r+b') as f:
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            hasher.update(chunk)
+            remaining -= len(chunk)
+        if hasher.hexdigest() != journal.partial_sha512:
+            return None
+        f.truncate(journal.bytes_received)
+    return hasher
+
+
+def _remove_journal(journal_fp: pathlib.Path) -> None:
+    "Remove the journal file if it exists."
+    if journal_fp.exists():
+        journal_fp.unlink()
+
+
+class _JournaledWriter:
+    """Writes an archive to the disk as its chunks arrive, hashing them and recording the progress in the download
+    journal. It is shared by :func:`download_archive` and :func:`adownload_archive`, which only differ in how the
+    response is received.
+    """
+
+    def __init__(self, url: str, archive_fp: pathlib.Path, *,
+                 journal_fp: Optional[pathlib.Path],
+                 journal: Optional[_DownloadJournal],
+                 hasher: Optional['hashlib._Hash']) -> None:
+        self._url = url
+        self._archive_fp = archive_fp
+        self._journal_fp = journal_fp
+        self._journal = journal
+        self._hasher = hasher
+
+    def request_headers(self) -> Dict[str, str]:
+        "Headers that request the rest of the partial archive, if it can be continued."
+        headers: Dict[str, str] = {}
+        if self._journal is not None and self._hasher is not None:
+            headers['Range'] = f'bytes={self._journal.bytes_received}-'
+            if self._journal.if_range is not None:
+                headers['If-Range'] = self._journal.if_range
+        return headers
+
+    def must_restart(self, status_code: int, headers: Mapping[str, str]) -> bool:
+        """Check whether the server refused to continue the partial archive in a way that requires starting over with
+        a fresh request (e.g., the remote file has shrunk). The journal is removed if so.
+        """
+        if self._journal_fp is None or self._journal is None or self._hasher is None:
+            return False
+        content_range = re.match(r'bytes (\d+)-', headers.get('Content-Range', ''))
+        if status_code == requests.codes.requested_range_not_satisfiable or \
+           (status_code == requests.codes.partial_content and
+                (content_range is None or int(content_range.group(1)) != self._journal.bytes_received)):
+            _remove_journal(self._journal_fp)
+            return True
+        return False
+
+    def start(self, status_code: int, headers: Mapping[str, str]) -> None:
+        "Open the archive for writing after a successful response."
+        if status_code != requests.codes.partial_content or self._journal is None or self._hasher is None:
+            # Either this is a fresh download or the server ignored the range. Start from the beginning.
+            self._journal = _DownloadJournal(url=self._url)
+            self._hasher = hashlib.sha512()
+        self._journal.etag = headers.get('ETag')
+        self._journal.last_modified = headers.get('Last-Modified')
+        # Byte offsets in the decoded content don't correspond to ranges of an encoded response, so don't resume those.
+        self._resumable = self._journal_fp is not None and headers.get('Content-Encoding', 'identity') == 'identity'
+        self._last_checkpoint = self._journal.bytes_received
+        self._file = open(self._archive_fp, mode='ab' if self._journal.bytes_received > 0 else 'wb')
+
+    def write(self, chunk: bytes) -> None:
+        "Write and hash a chunk, updating the journal every :data:`JOURNAL_INTERVAL` bytes."
+        assert self._journal is not None and self._hasher is not None  # nosec: for mypy
+        self._file.write(chunk)
+        self._hasher.update(chunk)
+        self._journal.bytes_received += len(chunk)
+        if self._resumable and self._journal.bytes_received - self._last_checkpoint >= JOURNAL_INTERVAL:
+            self._checkpoint()
+            self._last_checkpoint = self._journal.bytes_received
+
+    def _checkpoint(self) -> None:
+        "Persist the download progress."
+        assert self._journal is not None and self._hasher is not None  # nosec: for mypy
+        self._file.flush()
+        self._journal.partial_sha512 = self._hasher.copy().hexdigest()
+        self._journal.write(self._journal_fp)  # type: ignore[arg-type]
+
+    def finish(self, error: Optional[BaseException]) -> str:
+        """Close the archive. If the download failed, record the progress so far.
+
+        :param error: The exception that interrupted the download, or ``None`` if all chunks have been written.
+        :return: The hex digest of the SHA512 checksum of the downloaded archive.
+        """
+        assert self._hasher is not None  # nosec: for mypy
+        try:
+            if error is not None and self._resumable:
+                self._checkpoint()
+        finally:
+            self._file.close()
+        if error is None and self._journal_fp is not None:
+            _remove_journal(self._journal_fp)
+        return self._hasher.hexdigest()
+
+
+def _open_journaled_writer(url: str, archive_fp: pathlib.Path, journal_fp: Optional[pathlib.Path],
+                           chunk_size: int) -> _JournaledWriter:
+    "Read the journal of a previous download, if any, and restore the partial archive it describes."
+    journal = _DownloadJournal.read(journal_fp, url) if journal_fp is not None else None
+    hasher = _restore_partial_archive(archive_fp, journal, chunk_size) if journal is not None else None
+    return _JournaledWriter(url, archive_fp, journal_fp=journal_fp, journal=journal, hasher=hasher)
+
+
+def download_archive(url: str, archive_fp: pathlib.Path, *,
+                     journal_fp: Optional[pathlib.Path] = None,
+                     chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> str:
+    """Download an archive to ``archive_fp`` in fixed-size chunks. The SHA512 checksum is updated as each chunk arrives,
+    so the archive is never held in memory as a whole and never read back from the disk.
+
+    If ``journal_fp`` is given, the progress of the download is recorded there. When a download is interrupted, the
+    next call continues from where the previous one stopped by sending a ``Range`` request. If the server ignores the
+    range, or the remote file has changed since, the archive is downloaded from the beginning instead.
+
+    :param url: URL of the archive.
+    :param archive_fp: Path to which the archive is written. Overwritten if it exists, unless it is a partial archive
+        recorded in ``journal_fp``.
+    :param journal_fp: Path to the download journal. ``None`` disables resumption.
+    :param chunk_size: Number of bytes read from the connection and written to the disk at a time.
+    :raises requests.HTTPError: The server responded with an error status.
+    :return: The hex digest of the SHA512 checksum of the downloaded archive.
+    """
+
+    writer = _open_journaled_writer(url, archive_fp, journal_fp, chunk_size)
+    with get_session().get(url, stream=True, headers=writer.request_headers()) as response:
+        if writer.must_restart(response.status_code, response.headers):
+            return download_archive(url, archive_fp, journal_fp=journal_fp, chunk_size=chunk_size)
+        response.raise_for_status()
+
+        writer.start(response.status_code, response.headers)
+        try:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                writer.write(chunk)
+        except BaseException as e:
+            writer.finish(e)
+            raise
+    return writer.finish(None)
+
+
+async def adownload_archive(url: str, archive_fp: pathlib.Path, *,
+                            session: 'aiohttp.ClientSession',
+                            journal_fp: Optional[pathlib.Path] = None,
+                            chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> str:
+    """Awaitable counterpart of :func:`download_archive`, which receives the archive with :mod:`aiohttp`. Chunks are
+    written to the disk as they arrive, and a cancelled download is recorded in the journal in the same way as an
+    interrupted one.
+
+    :param session: The :class:`aiohttp.ClientSession` used to send the requests.
+    :raises aiohttp.ClientResponseError: The server responded with an error status.
+    """
+
+    writer = _open_journaled_writer(url, archive_fp, journal_fp, chunk_size)
+    async with session.get(url, headers=writer.request_headers()) as response:
+        if writer.must_restart(response.status, response.headers):
+            return await adownload_archive(url, archive_fp, session=session, journal_fp=journal_fp,
+                                           chunk_size=chunk_size)
+        response.raise_for_status()
+
+        writer.start(response.status, response.headers)
+        try:
+            async for chunk in response.content.iter_chunked(chunk_size):
+                writer.write(chunk)
+        except BaseException as e:
+            writer.finish(e)
+            raise
+    return writer.finish(None)
+
+
+def _probe_range_support(url: str) -> Optional[Tuple[int, Optional[str]]]:
+    """Check whether the server serves byte ranges of ``url``.
+
+    :return: The size of the remote file and the validator to be used in ``If-Range``, or ``None`` if the server
+        doesn't serve byte ranges.
+    """
+
+    headers = {'Range': 'bytes=0-0', 'Accept-Encoding': 'identity'}
+    with get_session().get(url, stream=True, headers=headers) as response:
+        response.raise_for_status()
+        content_range = re.fullmatch(r'bytes 0-0/(\d+)', response.headers.get('Content-Range', ''))
+        if response.status_code != requests.codes.partial_content or content_range is None:
+            return None
+        journal = _DownloadJournal(url=url,
+                                   etag=response.headers.get('ETag'),
+                                   last_modified=response.headers.get('Last-Modified'))
+        return int(content_range.group(1)), journal.if_range
+
+
+def _download_segment(url: str, archive_fp: pathlib.Path, start: int, end: int, *,
+                      if_range: Optional[str], chunk_size: int) -> None:
+    """Download bytes ``start`` to ``end`` (inclusive) of ``url`` into the same position of ``archive_fp``.
+
+    :raises OSError: The server didn't serve the requested range, e.g., because the remote file has changed.
+    """
+
+    headers = {'Range': f'bytes={start}-{end}', 'Accept-Encoding': 'identity'}
+    if if_range is not None:
+        headers['If-Range'] = if_range
+
+    received = 0
+    with get_session().get(url, stream=True, headers=headers) as response:
+        response.raise_for_status()
+        content_range = re.match(r'bytes (\d+)-(\d+)/', response.headers.get('Content-Range', ''))
+        if response.status_code != requests.codes.partial_content or content_range is None or \
+           (int(content_range.group(1)), int(content_range.group(2))) != (start, end):
+            raise OSError(f'Failed to download bytes {start}-{end} of {url}: The server did not serve the requested '
+                          f'range. The remote file may have changed during the download.')
+        with open(archive_fp, mode='r+b') as f:
+            f.seek(start)
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                f.write(chunk)
+                received += len(chunk)
+
+    if received != end - start + 1:
+        raise OSError(f'Failed to download bytes {start}-{end} of {url}: Received {received} bytes.')
+
+
+def download_archive_segmented(url: str, archive_fp: pathlib.Path, *,
+                               connections: int,
+                               segment_size: int = DOWNLOAD_SEGMENT_SIZE,
+                               journal_fp: Optional[pathlib.Path] = None,
+                               chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> str:
+    """Download an archive over multiple connections. The archive is split into byte ranges that are fetched
+    concurrently into a preallocated file. Segments are hashed in order as soon as they are complete, so that computing
+    the SHA512 checksum overlaps with downloading the remaining segments.
+
+    If the server doesn't serve byte ranges, this falls back to :func:`download_archive`.
+
+    :param url: URL of the archive.
+    :param archive_fp: Path to which the archive is written. Overwritten if it exists.
+    :param connections: Maximum number of concurrent connections.
+    :param segment_size: Maximum number of bytes in a segment. Segments are made smaller if needed so that there are
+        at least ``connections`` of them.
+    :param journal_fp: Passed to :func:`download_archive` when falling back to it. Segmented downloads aren't resumed.
+    :param chunk_size: Number of bytes read from a connection and written to the disk at a time.
+    :raises requests.HTTPError: The server responded with an error status.
+    :raises OSError: A segment failed to download.
+    :return: The hex digest of the SHA512 checksum of the downloaded archive.
+    """
+
+    probe = _probe_range_support(url)
+    if probe is None:
+        return download_archive(url, archive_fp, journal_fp=journal_fp, chunk_size=chunk_size)
+    size, if_range = probe
+
+    segment_size = max(1, min(segment_size, -(-size // connections)))
+    segments: List[Tuple[int, int]] = [(start, min(start + segment_size, size) - 1)
+                                       for start in range(0, size, segment_size)]
+
+    # Preallocate the file so that every segment can be written to its final position independently
+    with open(archive_fp, mode='wb') as f:
+        f.truncate(size)
+
+    hasher = hashlib.sha512()
+    # The file is read unbuffered, because a read-ahead buffer may hold bytes of segments that were yet to be written
+    with ThreadPoolExecutor(max_workers=connections) as executor, open(archive_fp, mode='rb', buffering=0) as f:
+        futures = [executor.submit(_download_segment, url, archive_fp, start, end,
+                                   if_range=if_range, chunk_size=chunk_size)
+                   for start, end in segments]
+        try:
+            for future, (start, end) in zip(futures, segments):
+                future.result()
+                f.seek(start)
+                remaining = end - start + 1
+                while remaining > 0:
+                    chunk = f.read(min(chunk_size, remaining))
+                    hasher.update(chunk)
+                    remaining -= len(chunk)
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+    if journal_fp is not None:
+        # A previous, interrupted single-connection download of this archive has just been overwritten
+        _remove_journal(journal_fp)
+    return hasher.hexdigest()
+
+
+class ArchiveStream(io.RawIOBase):
+    """Read-only file object over the body of an archive download. Every byte that arrives is also fed into a SHA512
+    hash object, so that the archive can be consumed (e.g., extracted) and verified in a single pass without ever being
+    written to the disk.
+
+    :param chunks: The chunks of the archive in order.
+    """
+
+    def __init__(self, chunks: Iterable[bytes]) -> None:
+        """Constructor method.
+        """
+        super().__init__()
+        self._chunks: Iterator[bytes] = iter(chunks)
+        self._pending: memoryview = memoryview(b'')
+        self._hasher = hashlib.sha512()
+
+    def readable(self) -> bool:
+        "This stream is readable."
+        return True
+
+    def readinto(self, b: Any) -> int:
+        """Read bytes into a pre-allocated, writable bytes-like object.
+
+        :param b: The buffer to fill.
+        :return: The number of bytes read. 0 indicates the end of the archive.
+        """
+        while len(self._pending) == 0:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._hasher.update(chunk)
+            self._pending = memoryview(chunk)
+        n = min(len(b), len(self._pending))
+        b[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        return n
+
+    def hexdigest(self) -> str:
+        """Consume the rest of the archive and return its SHA512 checksum. Consumers such as :mod:`tarfile` may stop
+        reading before the end of the archive (e.g., at the end-of-archive marker), so the remaining bytes must still be
+        received and hashed.
+
+        :return: The hex digest of the SHA512 checksum of the whole archive.
+        """
+        for chunk in self._chunks:
+            self._hasher.update(chunk)
+        self._pending = memoryview(b'')
+        return self._hasher.hexdigest()
+
+
+@contextmanager
+def open_archive_stream(url: str, *, chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> Iterator[ArchiveStream]:
+    """Open a download of an archive as a stream that is hashed as it is read. See :class:`ArchiveStream`.
+
+    :param url: URL of the archive.
+    :param chunk_size: Number of bytes read from the connection at a time.
+    :raises requests.HTTPError: The server responded with an error status.
+    """
+
+    with get_session().get(url, stream=True) as response:
+        response.raise_for_status()
+        with ArchiveStream(response.iter_content(chunk_size=chunk_size)) as stream:
+            yield stream
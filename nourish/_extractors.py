@@ -17,16 +17,136 @@
 
 
 from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager, ExitStack
 import bz2
 import gzip
+import hashlib
+import io
 import json
 import lzma
-import mimetypes
+import multiprocessing
+import os
 import pathlib
-import shutil
+import stat
 import tarfile
-from typing import Dict, Union
+from typing import (IO, Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, TypeVar, Union,
+                    cast)
 import zipfile
+import zlib
+
+from . import _native
+from ._decompress import open_compressed
+from ._manifest import Manifest, ManifestEntry, ManifestWriter, is_manifest, normalize_name
+
+
+@contextmanager
+def _open_compressed(path: pathlib.Path, compression: str, *, workers: int, native: bool) -> Iterator[IO[bytes]]:
+    """Open a compressed file for reading its decompressed data with the fastest decompressor that is available.
+
+    :param path: Path to the compressed file.
+    :param compression: Name of the compression, ``'gzip'``, ``'bzip2'``, or ``'xz'``.
+    :param workers: Maximum number of worker processes of the pure-Python decompressor. See
+        :func:`_decompress.open_compressed`.
+    :param native: Whether to use the native decompressor of :func:`_native.decompressor`, if it is on ``PATH``.
+    :return: Context manager of the decompressed data.
+    """
+    command = _native.decompressor(compression) if native else None
+    if command is not None:
+        with _native.decompressed(command, path) as f:
+            yield f
+    elif compression == 'gzip':
+        with gzip.open(path) as f:
+            yield cast(IO[bytes], f)
+    else:
+        with open_compressed(path, compression, workers=workers) as f:
+            yield f
+
+
+# Algorithm of the digests of the extracted files that are recorded in the file list. Zip archives record the CRC32
+# checksums stored in the archive instead.
+DIGEST_ALGORITHM = 'blake2b'
+
+# Number of bytes read at a time while computing digests
+_DIGEST_CHUNK_SIZE = 1024 * 1024
+
+_Key = TypeVar('_Key')
+
+
+class _Crc32:
+    """CRC32 checksum with the interface of the hash objects of :mod:`hashlib`. Zip archives store the CRC32
+    checksums of their members.
+    """
+
+    def __init__(self) -> None:
+        self._crc = 0
+
+    def update(self, data: bytes) -> None:
+        self._crc = zlib.crc32(data, self._crc)
+
+    def hexdigest(self) -> str:
+        return f'{self._crc:08x}'
+
+
+def _new_hash(algorithm: str) -> Any:
+    """Create a hash object.
+
+    :param algorithm: ``'crc32'``, or the name of an algorithm in :mod:`hashlib`.
+    """
+    return _Crc32() if algorithm == 'crc32' else hashlib.new(algorithm)
+
+
+def _stream_digest(stream: IO[bytes], algorithm: str) -> str:
+    """Compute the digest of the rest of a stream.
+
+    :param stream: The stream.
+    :param algorithm: See :func:`_new_hash`.
+    :return: The hex digest.
+    """
+    hasher = _new_hash(algorithm)
+    for chunk in iter(lambda: stream.read(_DIGEST_CHUNK_SIZE), b''):
+        hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _file_digest(path: pathlib.Path, algorithm: str) -> str:
+    """Compute the digest of a file.
+
+    :param path: Path to the file.
+    :param algorithm: See :func:`_new_hash`.
+    :return: The hex digest.
+    """
+    with open(path, mode='rb') as f:
+        return _stream_digest(f, algorithm)
+
+
+def _file_digests(files: Dict[_Key, Tuple[pathlib.Path, str]], workers: int) -> Dict[_Key, str]:
+    """Compute the digests of files, in a thread pool if ``workers`` is greater than 1. Hashing releases the GIL, so the
+    threads hash in parallel.
+
+    :param files: The path to each file and the algorithm of its digest, keyed by anything, e.g., member.
+    :param workers: Maximum number of threads.
+    :return: The hex digest of each file, with the same keys as ``files``.
+    """
+    if workers > 1 and len(files) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            digests = list(executor.map(lambda file: _file_digest(*file), files.values()))
+    else:
+        digests = [_file_digest(*file) for file in files.values()]
+    return dict(zip(files.keys(), digests))
+
+
+def _copy_with_digest(source: IO[bytes], destination: IO[bytes]) -> str:
+    """Copy a stream like :func:`shutil.copyfileobj`, computing the :data:`DIGEST_ALGORITHM` digest of the data on the
+    way.
+
+    :return: The hex digest.
+    """
+    hasher = _new_hash(DIGEST_ALGORITHM)
+    for chunk in iter(lambda: source.read(_DIGEST_CHUNK_SIZE), b''):
+        hasher.update(chunk)
+        destination.write(chunk)
+    return hasher.hexdigest()
 
 
 class Extractor(ABC):
@@ -34,12 +154,17 @@ class Extractor(ABC):
     """
 
     @abstractmethod
-    def extract(self, path: pathlib.Path, data_dir: pathlib.Path, file_list_file: pathlib.Path) -> None:
+    def extract(self, path: pathlib.Path, data_dir: pathlib.Path, file_list_file: pathlib.Path, *,
+                workers: int = 1, native: bool = False) -> None:
         """Extracts dataset download by unarchiving and/or uncompressing the files. This must be overridden when inherited.
 
         :param path: Path to the dataset to extract.
         :param data_dir: Path to the data dir to extract data files to.
         :file_list_file: Path to the file that stores the list of files in the downloaded dataset.
+        :param workers: Maximum number of worker processes that extract in parallel. Extractors of formats that can't be
+            extracted in parallel ignore it.
+        :param native: Whether to extract with native tools, such as ``pigz`` and GNU ``tar``, if they are on ``PATH``.
+            Extractors without native backends ignore it.
         """
         pass
 
@@ -53,83 +178,454 @@ class Extractor(ABC):
         """
         pass
 
+    def damaged_members(self, data_dir: pathlib.Path, contents: dict) -> List[str]:
+        """Find the members that are missing or whose types or sizes differ from the metadata saved in
+        ``file_list_file``. Extractors that can tell which members are damaged override this.
+
+        :param data_dir: Path to the data dir containing the extracted files.
+        :param contents: Dict obtained from ``file_list_file`` with metadata of files in the downloaded dataset.
+        :raises NotImplementedError: The extractor can't tell which members are damaged.
+        :return: The names of the damaged members.
+        """
+        raise NotImplementedError(f'{self.__class__.__name__} can\'t tell which members are damaged')
+
+    def digests(self, contents: dict) -> Dict[str, Tuple[str, str]]:
+        """The digests of the content of the members recorded in ``file_list_file``.
+
+        :param contents: Dict obtained from ``file_list_file`` with metadata of files in the downloaded dataset.
+        :return: The algorithm and the hex digest of each member whose digest was recorded, keyed by member. Extractors
+            that don't record digests return an empty dict.
+        """
+        return {}
+
+    def extract_members(self, path: pathlib.Path, data_dir: pathlib.Path, file_list_file: pathlib.Path,
+                        names: Iterable[str]) -> None:
+        """Extract some members of the dataset download again, e.g., to repair them. Extractors that can't extract
+        single members extract the whole dataset download again.
+
+        :param path: Path to the dataset download.
+        :param data_dir: Path to the data dir to extract the data files to.
+        :param file_list_file: Path to the file that stores the list of files in the downloaded dataset.
+        :param names: The names of the members.
+        """
+        self.extract(path, data_dir, file_list_file)
+
+
+class _MemberStat(NamedTuple):
+    "The state of an extracted member on the disk."
+
+    # Whether the member is a symbolic link
+    is_symlink: bool
+    # The status of the member, following symbolic links
+    stat: os.stat_result
+
+
+def _scan_directory(directory: str, wanted: Dict[str, List[str]]) -> Dict[str, _MemberStat]:
+    """Stat the wanted entries of a directory in one pass of :func:`os.scandir`, which saves a lookup per entry and lets
+    network file systems return the attributes of many entries at once.
+
+    :param directory: Path to the directory.
+    :param wanted: The members to stat, keyed by their file names in ``directory``.
+    :return: The state of each member that was found, keyed by member.
+    """
+    found: Dict[str, _MemberStat] = {}
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                names = wanted.get(entry.name)
+                if names is None:
+                    continue
+                try:
+                    member = _MemberStat(entry.is_symlink(), entry.stat())
+                except OSError:  # A broken symbolic link, or removed in the meantime
+                    continue
+                for name in names:
+                    found[name] = member
+    except OSError:  # Missing or not a directory
+        pass
+    return found
+
+
+def _stat_members(data_dir: pathlib.Path, names: Iterable[str]) -> Dict[str, _MemberStat]:
+    """Stat the extracted members of an archive. The members are grouped by the directories they are in, and each
+    directory is scanned once, in a thread pool if there are several of them.
+
+    :param data_dir: Path to the data dir containing the extracted files.
+    :param names: The names of the members relative to ``data_dir``.
+    :return: The state of each member that exists, keyed by member. Broken symbolic links don't exist.
+    """
+
+    directories: Dict[str, Dict[str, List[str]]] = {}
+    for name in names:
+        path = os.path.normpath(os.path.join(data_dir, name))
+        directory, file_name = os.path.split(path)
+        directories.setdefault(directory, {}).setdefault(file_name, []).append(name)
+
+    if len(directories) > 1:
+        with ThreadPoolExecutor() as executor:
+            scanned = list(executor.map(_scan_directory, directories.keys(), directories.values()))
+    else:
+        scanned = [_scan_directory(directory, wanted) for directory, wanted in directories.items()]
+    found = {name: member for members in scanned for name, member in members.items()}
+
+    # File names that a directory listing doesn't spell the same way as the archive, e.g., on case-insensitive or
+    # normalizing file systems, are looked up one by one
+    for wanted in directories.values():
+        for file_names in wanted.values():
+            for name in file_names:
+                if name not in found:
+                    member_path = data_dir / name
+                    try:
+                        found[name] = _MemberStat(member_path.is_symlink(), member_path.stat())
+                    except OSError:
+                        pass
+    return found
+
+
+# The contents of a file list of an archive: the manifest, some of its entries, or a legacy JSON dict
+_ArchiveContents = Union[Iterable[ManifestEntry], Dict[str, Dict[str, Any]]]
+
+
+def _damaged_entries(data_dir: pathlib.Path, entries: Iterable[ManifestEntry], *,
+                     check_symlinks: bool = True) -> List[str]:
+    """Find the members of an archive that are missing or whose types or sizes differ from their entries.
+
+    :param data_dir: Path to the data dir containing the extracted files.
+    :param entries: The entries of the members.
+    :param check_symlinks: If ``False``, members that are symbolic links on the disk are not checked, because the
+        archive format doesn't record symbolic links.
+    :return: The names of the damaged members.
+    """
+    entries = list(entries)
+    members = _stat_members(data_dir, (entry.name for entry in entries))
+    damaged = []
+    for entry in entries:
+        if entry.name not in members:
+            # The file is missing
+            damaged.append(entry.name)
+            continue
+        is_symlink, st = members[entry.name]
+        if is_symlink and not check_symlinks:
+            continue
+        # We don't have stat type code that matches tarfile type code. We instead do an incomplete list of type
+        # comparison. We don't do uncommon types such as FIFO, character device, etc. here.
+        if entry.kind == tarfile.REGTYPE:  # Regular file
+            if not stat.S_ISREG(st.st_mode) or st.st_size != entry.size:
+                damaged.append(entry.name)
+        elif entry.kind == tarfile.DIRTYPE and not stat.S_ISDIR(st.st_mode):  # Directory type
+            damaged.append(entry.name)
+        elif entry.kind == tarfile.SYMTYPE and not is_symlink:  # Symbolic link type
+            damaged.append(entry.name)
+        else:
+            # We just let go any file types that we don't understand.
+            pass
+    return damaged
+
+
+def _entry_digests(entries: Iterable[ManifestEntry], algorithm: str) -> Dict[str, Tuple[str, str]]:
+    "The digests of the entries that have them, in the form returned by :meth:`Extractor.digests`."
+    return {entry.name: (algorithm, entry.digest) for entry in entries if entry.digest is not None}
+
+
+class _HashingTarFile(tarfile.TarFile):
+    """:class:`tarfile.TarFile` that computes the :data:`DIGEST_ALGORITHM` digests of the regular files as it extracts
+    them. tar archives don't store checksums of their members, and this saves reading the extracted files again.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        """Constructor method.
+        """
+        super().__init__(*args, **kwargs)
+        # The digest of each regular file that was extracted or hashed, keyed by the offset of its header in the archive
+        self.digests: Dict[int, str] = {}
+
+    def makefile(self, tarinfo: tarfile.TarInfo, targetpath: Any) -> None:
+        "Extract a regular file, computing its digest on the way."
+        source = self.extractfile(tarinfo)
+        assert source is not None
+        with source, open(targetpath, mode='wb') as target:
+            self.digests[tarinfo.offset] = _copy_with_digest(source, target)
+
+    def hash_member(self, tarinfo: tarfile.TarInfo) -> None:
+        """Compute the digest of a regular file without extracting it, e.g., while another program extracts it from the
+        same stream."""
+        source = self.extractfile(tarinfo)
+        assert source is not None
+        with source:
+            self.digests[tarinfo.offset] = _stream_digest(source, DIGEST_ALGORITHM)
+
 
 class _TarExtractor(Extractor):
     """Extractor that handles tarballs. Capable of handling files like: ``.tar``, ``.tar.gz``, ``.tar.bz2``,
     and ``.tar.xz``.
     """
 
-    def extract(self, path: pathlib.Path, data_dir: pathlib.Path, file_list_file: pathlib.Path) -> None:
+    def extract(self, path: pathlib.Path, data_dir: pathlib.Path, file_list_file: pathlib.Path, *,
+                workers: int = 1, native: bool = False) -> None:
         """Attempt to extract the tar archive. Save metadata about the list of files in the downloaded dataset in
         ``file_list_file``.
 
         :param path: Path to the tar archive.
         :param data_dir: Path to the data dir to extract data files to.
         :file_list_file: Path to the file that stores the list of files in the downloaded dataset.
+        :param workers: Maximum number of worker processes that decompress the blocks of a bzip2 or xz compressed
+            tarball in parallel. The members are then extracted as they are decompressed. See
+            :func:`_decompress.open_compressed`.
+        :param native: Whether to extract with GNU ``tar`` and a native decompressor, if they are on ``PATH``. See
+            :meth:`_extract_natively`.
         :raises tarfile.ReadError: The tar archive was unable to be read.
         """
+        if native and self._extract_natively(path, data_dir, file_list_file, workers=workers):
+            return
+
+        if workers > 1:
+            with open(path, mode='rb') as f:
+                compression = _sniff_compression(f.read(tarfile.BLOCKSIZE))
+            if compression in ('bzip2', 'xz'):
+                with open_compressed(path, compression, workers=workers) as stream:
+                    self.extract_stream(cast(io.IOBase, stream), data_dir, file_list_file, verify=lambda: None)
+                return
+
         try:
-            mytar = tarfile.open(path)
+            mytar = cast(_HashingTarFile, _HashingTarFile.open(path))
         except tarfile.ReadError as e:
             raise tarfile.ReadError(f'Failed to unarchive tar file "{path}"\ncaused by:\n{e}')
+        if file_list_file.exists():
+            # The previously extracted files are about to be overwritten and must no longer be considered valid
+            file_list_file.unlink()
+        manifest = ManifestWriter('application/x-tar', DIGEST_ALGORITHM)
+        regular_files: Dict[int, int] = {}
         with mytar:
-            FileListFileContents = Dict[str, Dict[str, int]]
-            contents: FileListFileContents = {}
-            metadata: Dict[str, Union[str, FileListFileContents]] = {}
-
-            metadata['type'] = 'application/x-tar'
-            for member in mytar.getmembers():
-                contents[member.name] = {'type': int(member.type)}
-                if member.isreg():  # For regular files, we also save its size
-                    contents[member.name]['size'] = member.size
-            metadata['contents'] = contents
-
-            with open(file_list_file, mode='w') as f:
-                # We do not specify 'utf-8' here to match the default encoding used by the OS, which also likely
-                # uses this encoding for accessing the filesystem.
-                json.dump(metadata, f, indent=2)
-            mytar.extractall(path=data_dir)
-
-    def verify_extraction(self, data_dir: pathlib.Path, contents: Dict[str, Dict[str, int]]) -> bool:
+            mytar.extractall(path=data_dir, members=self._recorded(mytar, manifest, regular_files))
+        self._add_digests(manifest, regular_files, mytar.digests)
+        manifest.write(file_list_file)
+
+    def extract_stream(self, fileobj: io.IOBase, data_dir: pathlib.Path, file_list_file: pathlib.Path, *,
+                       verify: Callable[[], None]) -> None:
+        """Extract a tar archive from a non-seekable stream, member by member as the bytes arrive. The file list is
+        built incrementally and only written to ``file_list_file``, which marks the extraction as valid, after
+        ``verify`` succeeds. If anything fails, the members extracted so far are removed again.
+
+        :param fileobj: The stream of the tar archive, optionally compressed with gzip, bzip2, or lzma.
+        :param data_dir: Path to the data dir to extract data files to.
+        :param file_list_file: Path to the file that stores the list of files in the downloaded dataset.
+        :param verify: Called once the whole archive has been extracted. It should raise an exception if the archive
+            turns out to be corrupted.
+        :raises tarfile.ReadError: The tar archive was unable to be read.
+        """
+
+        if file_list_file.exists():
+            # The previously extracted files are about to be overwritten and must no longer be considered valid
+            file_list_file.unlink()
+
+        manifest = ManifestWriter('application/x-tar', DIGEST_ALGORITHM)
+        regular_files: Dict[int, int] = {}
+        try:
+            try:
+                mytar = cast(_HashingTarFile, _HashingTarFile.open(fileobj=fileobj, mode='r|*'))
+            except tarfile.ReadError as e:
+                raise tarfile.ReadError(f'Failed to unarchive tar stream\ncaused by:\n{e}')
+            with mytar:
+                mytar.extractall(path=data_dir, members=self._recorded(mytar, manifest, regular_files))
+            verify()
+            self._add_digests(manifest, regular_files, mytar.digests)
+        except BaseException:
+            self._remove_members(data_dir, manifest.names())
+            raise
+
+        manifest.write(file_list_file)
+
+    def _extract_natively(self, path: pathlib.Path, data_dir: pathlib.Path, file_list_file: pathlib.Path, *,
+                          workers: int) -> bool:
+        """Extract the tar archive with GNU ``tar``. A compressed archive is decompressed with a native decompressor if
+        one is on ``PATH``, or in Python otherwise. :mod:`tarfile` lists the members from the same stream as ``tar``
+        extracts, so that the file list is the same as when extracting with :mod:`tarfile`, and computes the digests of
+        the regular files from it on the way. If anything fails, the members extracted so far are removed again.
+
+        :param path: Path to the tar archive.
+        :param data_dir: Path to the data dir to extract data files to.
+        :param file_list_file: Path to the file that stores the list of files in the downloaded dataset.
+        :param workers: See :meth:`extract`.
+        :raises tarfile.ReadError: The tar archive was unable to be read.
+        :raises OSError: A native tool failed.
+        :return: ``False`` if GNU ``tar`` isn't on ``PATH``, in which case nothing is extracted.
+        """
+
+        tar_command = _native.tar_extractor()
+        if tar_command is None:
+            return False
+        with open(path, mode='rb') as f:
+            compression = _sniff_compression(f.read(tarfile.BLOCKSIZE))
+
+        if file_list_file.exists():
+            # The previously extracted files are about to be overwritten and must no longer be considered valid
+            file_list_file.unlink()
+
+        manifest = ManifestWriter('application/x-tar', DIGEST_ALGORITHM)
+        regular_files: Dict[int, int] = {}
+        try:
+            with ExitStack() as stack:
+                source: IO[bytes]
+                if compression is None:
+                    source = stack.enter_context(open(path, mode='rb'))
+                else:
+                    source = stack.enter_context(_open_compressed(path, compression, workers=workers, native=True))
+                stream = stack.enter_context(_native.extracting_tar(tar_command, source, data_dir))
+                with cast(_HashingTarFile, _HashingTarFile.open(fileobj=stream, mode='r|')) as mytar:
+                    for member in self._recorded(mytar, manifest, regular_files):
+                        if member.isreg():
+                            mytar.hash_member(member)
+            self._add_digests(manifest, regular_files, mytar.digests)
+        except BaseException as e:
+            self._remove_members(data_dir, manifest.names())
+            if isinstance(e, tarfile.ReadError):
+                raise tarfile.ReadError(f'Failed to unarchive tar file "{path}"\ncaused by:\n{e}')
+            raise
+
+        manifest.write(file_list_file)
+        return True
+
+    @staticmethod
+    def _recorded(mytar: tarfile.TarFile, manifest: ManifestWriter,
+                  regular_files: Dict[int, int]) -> Iterator[tarfile.TarInfo]:
+        """Iterate over the members of a tar archive as they are read, adding each of them to ``manifest``.
+
+        :param mytar: The tar archive.
+        :param manifest: The manifest of the extracted members. Regular files are recorded with their sizes, and their
+            digests are added by :meth:`_add_digests` once they have been extracted.
+        :param regular_files: Filled with the index in ``manifest`` of each regular file, keyed by the offset of its
+            header in the archive.
+        """
+        for member in mytar:
+            if member.isreg():
+                regular_files[member.offset] = manifest.add(member.name, tarfile.REGTYPE, member.size)
+            else:
+                manifest.add(member.name, member.type)
+            yield member
+
+    @staticmethod
+    def _add_digests(manifest: ManifestWriter, regular_files: Dict[int, int], digests: Dict[int, str]) -> None:
+        """Add the digests that :class:`_HashingTarFile` computed to the manifest.
+
+        :param manifest: The manifest of the extracted members.
+        :param regular_files: The indices of the regular files in ``manifest``, as filled by :meth:`_recorded`.
+        :param digests: :attr:`_HashingTarFile.digests`.
+        """
+        for offset, index in regular_files.items():
+            digest = digests.get(offset)
+            if digest is not None:
+                manifest.set_digest(index, digest)
+
+    @staticmethod
+    def _remove_members(data_dir: pathlib.Path, names: Iterable[str]) -> None:
+        """Remove extracted members, deepest first so that directories are empty by the time they are removed.
+        Directories that still contain other files are left alone.
+
+        :param data_dir: Path to the data dir containing the extracted files.
+        :param names: The names of the members to remove.
+        """
+        for path in sorted((data_dir / name for name in names), key=lambda path: len(path.parts), reverse=True):
+            if path == data_dir:
+                continue
+            try:
+                if path.is_dir() and not path.is_symlink():
+                    path.rmdir()
+                elif path.exists() or path.is_symlink():
+                    path.unlink()
+            except OSError:
+                pass
+
+    def verify_extraction(self, data_dir: pathlib.Path, contents: _ArchiveContents) -> bool:
         """Verify the files were extracted properly using the metadata saved in ``file_list_file``.
 
         :param data_dir: Path to the data dir containing the extracted files.
-        :contents: Dict obtained from ``file_list_file`` with metadata of files in the downloaded dataset.
+        :contents: The manifest obtained from ``file_list_file``, or the dict in a legacy JSON file list, with metadata
+            of files in the downloaded dataset.
         :return: ``True`` if the dataset was extracted properly and ``False`` otherwise.
         """
-        for name, info in contents.items():
-            path = data_dir / name
-            if not path.exists():
-                # At least one file in the file list is missing
-                return False
-            # We don't have pathlib type code that matches tarfile type code. We instead do an incomplete list of
-            # type comparison. We don't do uncommon types such as FIFO, character device, etc. here.
-            if info['type'] == int(tarfile.REGTYPE):  # Regular file
-                if not path.is_file():
-                    return False
-                if path.stat().st_size != info['size']:
-                    return False
-            elif info['type'] == int(tarfile.DIRTYPE) and not path.is_dir():  # Directory type
-                return False
-            elif info['type'] == int(tarfile.SYMTYPE) and not path.is_symlink():  # Symbolic link type
-                return False
-            else:
-                # We just let go any file types that we don't understand.
-                pass
-        return True
+        return not self.damaged_members(data_dir, contents)
+
+    def damaged_members(self, data_dir: pathlib.Path, contents: _ArchiveContents) -> List[str]:
+        """Find the members that are missing or whose types or sizes differ from the metadata saved in
+        ``file_list_file``.
+
+        :param data_dir: Path to the data dir containing the extracted files.
+        :param contents: See :meth:`verify_extraction`.
+        :return: The names of the damaged members.
+        """
+        return _damaged_entries(data_dir, self._entries(contents))
+
+    def digests(self, contents: _ArchiveContents) -> Dict[str, Tuple[str, str]]:
+        """The digests of the regular files, which are recorded since :data:`DIGEST_ALGORITHM` was introduced.
+
+        :param contents: See :meth:`verify_extraction`.
+        :return: See :meth:`Extractor.digests`.
+        """
+        return _entry_digests(self._entries(contents), DIGEST_ALGORITHM)
+
+    @staticmethod
+    def _entries(contents: _ArchiveContents) -> Iterable[ManifestEntry]:
+        "The entries of the members, converted from the metadata in a legacy JSON file list if necessary."
+        if not isinstance(contents, dict):
+            return contents
+        # Legacy JSON file lists store the type codes as integers and don't normalize the names
+        return [ManifestEntry(name=name, kind=str(info['type']).encode(), size=info.get('size', 0),
+                              digest=info.get(DIGEST_ALGORITHM)) for name, info in contents.items()]
+
+    def extract_members(self, path: pathlib.Path, data_dir: pathlib.Path, file_list_file: pathlib.Path,
+                        names: Iterable[str]) -> None:
+        """Extract some members of the tar archive again. Whatever is at their paths now is removed first.
+
+        :param path: Path to the tar archive.
+        :param data_dir: Path to the data dir to extract the data files to.
+        :param file_list_file: Ignored, because the file list doesn't change.
+        :param names: The names of the members.
+        :raises tarfile.ReadError: The tar archive was unable to be read.
+        """
+        # Members are matched by their normalized names, so that, e.g., "./a.txt" and "a.txt" are the same member
+        paths = {normalize_name(name) for name in names}
+        self._remove_members(data_dir, paths)
+        try:
+            mytar = tarfile.open(path)
+        except tarfile.ReadError as e:
+            raise tarfile.ReadError(f'Failed to unarchive tar file "{path}"\ncaused by:\n{e}')
+        with mytar:
+            mytar.extractall(path=data_dir,
+                             members=[member for member in mytar if normalize_name(member.name) in paths])
+
+
+def _extract_zip_members(path: pathlib.Path, data_dir: pathlib.Path, indices: Iterable[int]) -> None:
+    """Extract some members of a zip archive. This runs in a worker process of :meth:`_ZipExtractor.extract`.
+
+    :param path: Path to the zip archive.
+    :param data_dir: Path to the data dir to extract data files to.
+    :param indices: The indices of the members in :meth:`zipfile.ZipFile.infolist`.
+    """
+    with zipfile.ZipFile(path) as myzip:
+        members = myzip.infolist()
+        for index in indices:
+            try:
+                myzip.extract(members[index], path=data_dir)
+            except FileExistsError:
+                # Another worker created the same parent directory after this one found it missing
+                myzip.extract(members[index], path=data_dir)
 
 
 class _ZipExtractor(Extractor):
     """Extractor that handles zip archives. Capable of handling files like: ``.zip``.
     """
 
-    def extract(self, path: pathlib.Path, data_dir: pathlib.Path, file_list_file: pathlib.Path) -> None:
+    def extract(self, path: pathlib.Path, data_dir: pathlib.Path, file_list_file: pathlib.Path, *,
+                workers: int = 1, native: bool = False) -> None:
         """Attempt to extract the zip archive. Save metadata about the list of files in the downloaded dataset in
         ``file_list_file``.
 
         :param path: Path to the zip archive.
         :param data_dir: Path to the data dir to extract data files to.
         :file_list_file: Path to the file that stores the list of files in the downloaded dataset.
+        :param workers: Maximum number of worker processes that extract in parallel. The members are independently
+            compressed, so they are split between the workers, each of which opens the archive on its own.
+        :param native: Ignored, because there are no native backends for zip archives.
         :raises zipfile.BadZipFile: The zip archive was unable to be read.
         """
         try:
@@ -137,40 +633,100 @@ class _ZipExtractor(Extractor):
         except zipfile.BadZipFile as e:
             raise zipfile.BadZipFile(f'Failed to unarchive zip file "{path}"\ncaused by:\n{e}')
         with myzip:
-            FileListFileContents = Dict[str, Dict[str, Union[bool, int]]]
-            contents: FileListFileContents = {}
-            metadata: Dict[str, Union[str, FileListFileContents]] = {}
-
-            metadata['type'] = 'application/zip'
-            for member in myzip.infolist():
-                contents[member.filename] = {'isdir': member.is_dir()}
-                if not member.is_dir():
-                    contents[member.filename]['size'] = member.file_size
-            metadata['contents'] = contents
-
-            with open(file_list_file, mode='w') as f:
-                json.dump(metadata, f, indent=2)
-            myzip.extractall(path=data_dir)
-
-    def verify_extraction(self, data_dir: pathlib.Path, contents: Dict[str, Dict[str, Union[bool, int]]]) -> bool:
+            manifest = ManifestWriter('application/zip', 'crc32')
+            members = myzip.infolist()
+            for member in members:
+                if member.is_dir():
+                    manifest.add(member.filename, tarfile.DIRTYPE)
+                else:
+                    manifest.add(member.filename, tarfile.REGTYPE, member.file_size, f'{member.CRC:08x}')
+            manifest.write(file_list_file)
+            batches = self._split_members(members, workers)
+            if len(batches) <= 1:
+                myzip.extractall(path=data_dir)
+                return
+
+        # Forking a process that runs other threads, such as the lock heartbeat or a thread pool of the caller, can
+        # deadlock the child
+        with ProcessPoolExecutor(max_workers=len(batches), mp_context=multiprocessing.get_context('spawn')) as executor:
+            futures = [executor.submit(_extract_zip_members, path, data_dir, batch) for batch in batches]
+            for future in futures:
+                future.result()
+
+    @staticmethod
+    def _split_members(members: List[zipfile.ZipInfo], workers: int) -> List[List[int]]:
+        """Split the members of a zip archive into batches of about the same compressed size, one for each worker.
+
+        :param members: The members in the order of :meth:`zipfile.ZipFile.infolist`.
+        :param workers: Maximum number of batches.
+        :return: The indices of the members in each non-empty batch. Within a batch, the members keep their order in
+            the archive, so that the archive is read mostly sequentially.
+        """
+        batches: List[List[int]] = [[] for _ in range(min(workers, len(members)))]
+        sizes = [0] * len(batches)
+        # Assigning the largest members first to the least loaded batch keeps the batches balanced
+        for index in sorted(range(len(members)), key=lambda i: members[i].compress_size, reverse=True):
+            lightest = sizes.index(min(sizes))
+            batches[lightest].append(index)
+            sizes[lightest] += members[index].compress_size
+        return [sorted(batch) for batch in batches if batch]
+
+    def verify_extraction(self, data_dir: pathlib.Path, contents: _ArchiveContents) -> bool:
         """Verify the files were extracted properly using the metadata saved in ``file_list_file``.
 
         :param data_dir: Path to the data dir containing the extracted files.
-        :contents: Dict obtained from ``file_list_file`` with metadata of files in the downloaded dataset.
+        :contents: The manifest obtained from ``file_list_file``, or the dict in a legacy JSON file list, with metadata
+            of files in the downloaded dataset.
         :return: ``True`` if the dataset was extracted properly and ``False`` otherwise.
         """
-        for name, info in contents.items():
-            path = data_dir / name
-            if not path.exists():
-                # At least one file in the file list is missing
-                return False
-            # Ignore checking symlinks
-            if not path.is_symlink():
-                if path.is_dir() != info['isdir']:
-                    return False
-                if not info['isdir'] and (path.stat().st_size != info['size']):
-                    return False
-        return True
+        return not self.damaged_members(data_dir, contents)
+
+    def damaged_members(self, data_dir: pathlib.Path, contents: _ArchiveContents) -> List[str]:
+        """Find the members that are missing or whose types or sizes differ from the metadata saved in
+        ``file_list_file``. Symbolic links are not checked.
+
+        :param data_dir: Path to the data dir containing the extracted files.
+        :param contents: See :meth:`verify_extraction`.
+        :return: The names of the damaged members.
+        """
+        return _damaged_entries(data_dir, self._entries(contents), check_symlinks=False)
+
+    def digests(self, contents: _ArchiveContents) -> Dict[str, Tuple[str, str]]:
+        """The CRC32 checksums of the files stored in the zip archive, which are recorded since
+        :data:`DIGEST_ALGORITHM` was introduced.
+
+        :param contents: See :meth:`verify_extraction`.
+        :return: See :meth:`Extractor.digests`.
+        """
+        return _entry_digests(self._entries(contents), 'crc32')
+
+    @staticmethod
+    def _entries(contents: _ArchiveContents) -> Iterable[ManifestEntry]:
+        "The entries of the members, converted from the metadata in a legacy JSON file list if necessary."
+        if not isinstance(contents, dict):
+            return contents
+        return [ManifestEntry(name=name, kind=tarfile.DIRTYPE if info['isdir'] else tarfile.REGTYPE,
+                              size=info.get('size', 0), digest=info.get('crc32')) for name, info in contents.items()]
+
+    def extract_members(self, path: pathlib.Path, data_dir: pathlib.Path, file_list_file: pathlib.Path,
+                        names: Iterable[str]) -> None:
+        """Extract some members of the zip archive again.
+
+        :param path: Path to the zip archive.
+        :param data_dir: Path to the data dir to extract the data files to.
+        :param file_list_file: Ignored, because the file list doesn't change.
+        :param names: The names of the members.
+        :raises zipfile.BadZipFile: The zip archive was unable to be read.
+        """
+        try:
+            myzip = zipfile.ZipFile(path)
+        except zipfile.BadZipFile as e:
+            raise zipfile.BadZipFile(f'Failed to unarchive zip file "{path}"\ncaused by:\n{e}')
+        paths = {normalize_name(name) for name in names}
+        with myzip:
+            for member in myzip.infolist():
+                if normalize_name(member.filename) in paths:
+                    myzip.extract(member, path=data_dir)
 
 
 # gzip.BadGzipFile wasn't added until Python 3.8, so we use our own exception
@@ -179,26 +735,53 @@ class _BadGzipFile(Exception):
     pass
 
 
-class _GzipExtractor(Extractor):
+class _CompressedFileExtractor(Extractor):
+    """Base class of the extractors of compressed flat files, whose only member is the uncompressed file.
+    """
+
+    def damaged_members(self, data_dir: pathlib.Path, contents: dict) -> List[str]:
+        """Find out whether the file is missing or its size differs from the metadata saved in ``file_list_file``.
+
+        :param data_dir: Path to the data dir containing the extracted file.
+        :param contents: Dict obtained from ``file_list_file`` with metadata of the file in the downloaded dataset.
+        :return: The name of the file if it is damaged.
+        """
+        return [] if self.verify_extraction(data_dir, contents) else [contents['filename']]
+
+    def digests(self, contents: dict) -> Dict[str, Tuple[str, str]]:
+        """The digest of the file, which is recorded since :data:`DIGEST_ALGORITHM` was introduced.
+
+        :param contents: Dict obtained from ``file_list_file`` with metadata of the file in the downloaded dataset.
+        :return: See :meth:`Extractor.digests`.
+        """
+        if DIGEST_ALGORITHM not in contents:
+            return {}
+        return {contents['filename']: (DIGEST_ALGORITHM, contents[DIGEST_ALGORITHM])}
+
+
+class _GzipExtractor(_CompressedFileExtractor):
     """Extractor that handles gzip compressed files. Capable of handling files like: ``.gz``, ``.txt.gz``, and
     ``.csv.gz``.
     """
 
-    def extract(self, path: pathlib.Path, data_dir: pathlib.Path, file_list_file: pathlib.Path) -> None:
+    def extract(self, path: pathlib.Path, data_dir: pathlib.Path, file_list_file: pathlib.Path, *,
+                workers: int = 1, native: bool = False) -> None:
         """Attempt to extract the gzip compressed file. Save metadata about the file in the downloaded dataset in
         ``file_list_file``.
 
         :param path: Path to the gzip file.
         :param data_dir: Path to the data dir to extract the data file to.
         :file_list_file: Path to the file that stores metadata of the file in the downloaded dataset.
+        :param workers: Ignored, because a gzip stream can only be decompressed sequentially.
+        :param native: Whether to decompress with ``pigz``, if it is on ``PATH``.
         :raises _BadGzipFile: The gzip file was unable to be read.
         :raises OSError: The extracted file is empty.
         """
         try:
-            mygzip = gzip.open(path)
             extracted_file_name = path.stem
-            with mygzip, open(data_dir / extracted_file_name, 'wb') as f_out:
-                shutil.copyfileobj(mygzip, f_out)
+            with _open_compressed(path, 'gzip', workers=workers, native=native) as mygzip, \
+                    open(data_dir / extracted_file_name, 'wb') as f_out:
+                digest = _copy_with_digest(mygzip, f_out)
         except OSError as e:
             raise _BadGzipFile(f'Failed to uncompress gzip file "{path}"\ncaused by:\n{e}')
         extracted_fp = data_dir / extracted_file_name
@@ -210,6 +793,7 @@ class _GzipExtractor(Extractor):
         metadata['type'] = 'gzip'
         contents['filename'] = extracted_file_name
         contents['size'] = extracted_fp.stat().st_size
+        contents[DIGEST_ALGORITHM] = digest
         if contents['size'] == 0:
             raise OSError(f'The extracted file {extracted_file_name} is empty.')
         metadata['contents'] = contents
@@ -238,26 +822,30 @@ class _BadBzip2File(Exception):
     pass
 
 
-class _Bzip2Extractor(Extractor):
+class _Bzip2Extractor(_CompressedFileExtractor):
     """Extractor that handles bzip2 compressed files. Capable of handling files like: ``.bz2``, ``.txt.bz2``, and
     ``.csv.bz2``.
     """
 
-    def extract(self, path: pathlib.Path, data_dir: pathlib.Path, file_list_file: pathlib.Path) -> None:
+    def extract(self, path: pathlib.Path, data_dir: pathlib.Path, file_list_file: pathlib.Path, *,
+                workers: int = 1, native: bool = False) -> None:
         """Attempt to extract the bzip2 compressed file. Save metadata about the file in the downloaded dataset in
         ``file_list_file``.
 
         :param path: Path to the bzip2 file.
         :param data_dir: Path to the data dir to extract the data file to.
         :file_list_file: Path to the file that stores metadata of the file in the downloaded dataset.
+        :param workers: Maximum number of worker processes that decompress the blocks of the file in parallel. See
+            :func:`_decompress.open_compressed`.
+        :param native: Whether to decompress with ``pbzip2``, if it is on ``PATH``. ``workers`` is ignored then.
         :raises _BadBzip2File: The bzip2 file was unable to be read.
         :raises OSError: The extracted file is empty.
         """
         try:
-            mybzip2 = bz2.open(path)
             extracted_file_name = path.stem
-            with mybzip2, open(data_dir / extracted_file_name, 'wb') as f_out:
-                shutil.copyfileobj(mybzip2, f_out)
+            with _open_compressed(path, 'bzip2', workers=workers, native=native) as mybzip2, \
+                    open(data_dir / extracted_file_name, 'wb') as f_out:
+                digest = _copy_with_digest(mybzip2, f_out)
         except OSError as e:
             raise _BadBzip2File(f'Failed to uncompress bzip2 file "{path}"\ncaused by:\n{e}')
         extracted_fp = data_dir / extracted_file_name
@@ -269,6 +857,7 @@ class _Bzip2Extractor(Extractor):
         metadata['type'] = 'bzip2'
         contents['filename'] = extracted_file_name
         contents['size'] = extracted_fp.stat().st_size
+        contents[DIGEST_ALGORITHM] = digest
         if contents['size'] == 0:
             raise OSError(f'The extracted file {extracted_file_name} is empty.')
         metadata['contents'] = contents
@@ -292,26 +881,30 @@ class _Bzip2Extractor(Extractor):
         return True
 
 
-class _LzmaExtractor(Extractor):
+class _LzmaExtractor(_CompressedFileExtractor):
     """Extractor that handles lzma compressed files. Capable of handling files like: ``.xz``, ``.txt.xz``, and
     ``.csv.xz``.
     """
 
-    def extract(self, path: pathlib.Path, data_dir: pathlib.Path, file_list_file: pathlib.Path) -> None:
+    def extract(self, path: pathlib.Path, data_dir: pathlib.Path, file_list_file: pathlib.Path, *,
+                workers: int = 1, native: bool = False) -> None:
         """Attempt to extract the lzma compressed file. Save metadata about the file in the downloaded dataset in
         ``file_list_file``.
 
         :param path: Path to the lzma file.
         :param data_dir: Path to the data dir to extract the data file to.
         :file_list_file: Path to the file that stores metadata of the file in the downloaded dataset.
+        :param workers: Maximum number of worker processes that decompress the blocks of the file in parallel. See
+            :func:`_decompress.open_compressed`.
+        :param native: Whether to decompress with ``xz``, if it is on ``PATH``. ``workers`` is ignored then.
         :raises lzma.LZMAError: The lzma file was unable to be read.
         :raises OSError: The extracted file is empty.
         """
         try:
-            mylzma = lzma.open(path)
             extracted_file_name = path.stem
-            with mylzma, open(data_dir / extracted_file_name, 'wb') as f_out:
-                shutil.copyfileobj(mylzma, f_out)
+            with _open_compressed(path, 'xz', workers=workers, native=native) as mylzma, \
+                    open(data_dir / extracted_file_name, 'wb') as f_out:
+                digest = _copy_with_digest(mylzma, f_out)
         except lzma.LZMAError as e:
             raise lzma.LZMAError(f'Failed to uncompress lzma file "{path}"\ncaused by:\n{e}')
         extracted_fp = data_dir / extracted_file_name
@@ -323,6 +916,7 @@ class _LzmaExtractor(Extractor):
         metadata['type'] = 'xz'
         contents['filename'] = extracted_file_name
         contents['size'] = extracted_fp.stat().st_size
+        contents[DIGEST_ALGORITHM] = digest
         if contents['size'] == 0:
             raise OSError(f'The extracted file {extracted_file_name} is empty.')
         metadata['contents'] = contents
@@ -346,13 +940,13 @@ class _LzmaExtractor(Extractor):
         return True
 
 
-# Keys based on ftype returned by mimetypes.guess_type
+# Keys based on mimetypes of archives
 archives = {
     'application/x-tar': _TarExtractor(),
     'application/zip': _ZipExtractor()
 }
 
-# Keys based on fencoding returned by mimetypes.guess_type
+# Keys based on names of compressions
 compressions = {
     'gzip': _GzipExtractor(),
     'bzip2': _Bzip2Extractor(),
@@ -360,49 +954,134 @@ compressions = {
 }
 
 extractor_map = {**archives, **compressions}
-read_errors = (tarfile.ReadError, zipfile.BadZipFile, _BadGzipFile, _BadBzip2File, lzma.LZMAError)
 
 
-# We first run the extractor determined by guess_type
-# If that returns an error or guess_type doesn’t know the type try all extractors
-# If none of the extractors work raise an error that says file type unsupported
-def extract_data_files(path: pathlib.Path, data_dir: pathlib.Path, file_list_file: pathlib.Path) -> None:
-    """Choose extractor based on filetype and extract the data files.
+# Leading bytes of each compression format
+_compression_magic_numbers = {
+    b'\x1f\x8b': 'gzip',
+    b'BZh': 'bzip2',
+    b'\xfd7zXZ\x00': 'xz',
+}
+
+# Leading bytes of a zip archive: a local file header, or the end of central directory record of an empty archive
+_zip_magic_numbers = (b'PK\x03\x04', b'PK\x05\x06')
+
+_compression_openers: Dict[str, Callable[..., Any]] = {
+    'gzip': gzip.open,
+    'bzip2': bz2.open,
+    'xz': lzma.open,
+}
+
+
+def _is_tar_header(block: bytes) -> bool:
+    """Check whether a block is the header of the first member of a tar archive. The checksum of the header is verified,
+    so this recognizes the old v7 format that lacks the ``ustar`` magic as well.
+
+    :param block: The first bytes of the (uncompressed) file.
+    :return: ``True`` if ``block`` is a valid tar header.
+    """
+    try:
+        tarfile.TarInfo.frombuf(block[:tarfile.BLOCKSIZE], tarfile.ENCODING, 'surrogateescape')
+    except tarfile.HeaderError:
+        return False
+    return True
+
+
+def _sniff_compression(header: bytes) -> Optional[str]:
+    """Detect the compression of a file from its leading bytes.
+
+    :param header: The first bytes of the file.
+    :return: The key of the matching extractor in :data:`compressions`, or ``None`` if the file isn't compressed with
+        a supported compression.
+    """
+    for magic_number, compression in _compression_magic_numbers.items():
+        if header.startswith(magic_number):
+            return compression
+    return None
+
+
+def _sniff_format(path: pathlib.Path) -> Optional[str]:
+    """Detect the format of a dataset download from its leading bytes, regardless of its file name. Compressed files
+    are looked into to tell a compressed tarball from a compressed flat file.
+
+    :param path: Path to the dataset download.
+    :return: The key of the matching extractor in :data:`extractor_map`, or ``None`` if the format isn't recognized.
+    """
+
+    with open(path, mode='rb') as f:
+        header = f.read(tarfile.BLOCKSIZE)
+
+    if header.startswith(_zip_magic_numbers):
+        return 'application/zip'
+    compression = _sniff_compression(header)
+    if compression is not None:
+        try:
+            # Only the first block of the decompressed stream is decompressed, e.g., one bzip2 block at most
+            with _compression_openers[compression](path) as f:
+                header = f.read(tarfile.BLOCKSIZE)
+        except (OSError, EOFError, lzma.LZMAError):
+            # Corrupted. Let the extractor of the compression report it.
+            return compression
+        return 'application/x-tar' if _is_tar_header(header) else compression
+    if _is_tar_header(header):
+        return 'application/x-tar'
+    return None
+
+
+def extract_data_files(path: pathlib.Path, data_dir: pathlib.Path, file_list_file: pathlib.Path, *,
+                       workers: int = 1, native: bool = False) -> None:
+    """Choose extractor based on the leading bytes of the file and extract the data files.
 
     :param path: Path to the dataset to extract.
     :param data_dir: Path to the data dir to extract the data file to.
     :param file_list_file: Path to the file that stores the list of files in the downloaded dataset.
+    :param workers: Maximum number of worker processes used by extractors that can extract in parallel.
+    :param native: Whether to extract with native tools, such as ``pigz`` and GNU ``tar``, if they are on ``PATH``.
     :raises RuntimeError: Dataset filetype is not (yet) supported.
     """
 
-    # mimetypes.guess_type doesn't accept path-like objects until python 3.8
-    ftype, fencoding = mimetypes.guess_type(path.name)
+    extractor_key = _sniff_format(path)
+    if extractor_key is None:
+        # Unsupported flat file or compression/archive type
+        raise RuntimeError('Filetype not (yet) supported')
+    extractor_map[extractor_key].extract(path, data_dir, file_list_file, workers=workers, native=native)
 
-    # 1. Check if mimetypes.guess_type guesses a working extractor
-    if any(key in extractor_map.keys() for key in (ftype, fencoding)):
-        # Check if file is an archive, otherwise file must be a compressed flat file
-        if ftype in archives:
-            extractor = archives[ftype]
-        elif fencoding in compressions:
-            extractor = compressions[fencoding]
-        try:
-            extractor.extract(path, data_dir, file_list_file)
-        except read_errors:
-            pass
-        else:
-            return
 
-    # 2. Otherwise try all extractors and see if one works
-    for extractor in extractor_map.values():
-        try:
-            extractor.extract(path, data_dir, file_list_file)
-        except read_errors:
-            pass
-        else:
-            return
+def extract_tar_stream(fileobj: io.IOBase, data_dir: pathlib.Path, file_list_file: pathlib.Path, *,
+                       verify: Callable[[], None]) -> None:
+    """Extract a tar archive while it is being downloaded. See :meth:`_TarExtractor.extract_stream`.
+
+    :param fileobj: The stream of the tar archive, optionally compressed with gzip, bzip2, or lzma.
+    :param data_dir: Path to the data dir to extract the data files to.
+    :param file_list_file: Path to the file that stores the list of files in the downloaded dataset.
+    :param verify: Called once the whole archive has been extracted. It should raise an exception if the archive turns
+        out to be corrupted, in which case the extracted files are removed.
+    """
+    _TarExtractor().extract_stream(fileobj, data_dir, file_list_file, verify=verify)
+
+
+@contextmanager
+def _reading_file_list(file_list_file: pathlib.Path) -> Iterator[Tuple[Extractor, Any]]:
+    """Read a file list, which is a :class:`_manifest.Manifest` for archives, and JSON for compressed files and for
+    archives extracted before manifests were introduced.
+
+    :param file_list_file: Path to the file containing the list of files in the downloaded dataset.
+    :return: Context manager of the extractor of the dataset and the contents of the file list, which the methods of
+        the extractor take.
+    """
+    if is_manifest(file_list_file):
+        with Manifest(file_list_file) as manifest:
+            yield extractor_map[manifest.type], manifest
+    else:
+        with open(file_list_file, mode='r') as f:
+            metadata = json.load(f)
+        yield extractor_map[metadata['type']], metadata['contents']
 
-    # 3. Otherwise assume unsupported flat file or compression/archive type
-    raise RuntimeError('Filetype not (yet) supported')
+
+def _is_under(name: str, paths: List[str]) -> bool:
+    "Whether the member ``name`` is at or below one of the normalized ``paths``."
+    name = normalize_name(name)
+    return any(path in ('.', name) or name.startswith(path + '/') for path in paths)
 
 
 def verify_data_files(data_dir: pathlib.Path, file_list_file: pathlib.Path) -> bool:
@@ -413,7 +1092,87 @@ def verify_data_files(data_dir: pathlib.Path, file_list_file: pathlib.Path) -> b
     :return: ``True`` if the dataset was extracted properly and ``False`` otherwise.
     """
 
-    with open(file_list_file, mode='r') as f:
-        metadata = json.load(f)
-    extractor = extractor_map[metadata['type']]
-    return extractor.verify_extraction(data_dir, metadata['contents'])
+    with _reading_file_list(file_list_file) as (extractor, contents):
+        return extractor.verify_extraction(data_dir, contents)
+
+
+def find_damaged_data_files(data_dir: pathlib.Path, file_list_file: pathlib.Path, *, deep: bool = False,
+                            workers: int = 1, verified: Optional[Dict[str, List[int]]] = None,
+                            paths: Optional[Iterable[str]] = None) -> List[str]:
+    """Find the extracted files that don't match the metadata saved in ``file_list_file``.
+
+    :param data_dir: Path to the data dir containing the extracted files.
+    :param file_list_file: Path to the file containing the list of files in the downloaded dataset.
+    :param deep: If ``True``, also compare the content of the files with the digests recorded in ``file_list_file``.
+        Files without recorded digests, e.g., extracted before digests were recorded, are only compared by size.
+    :param workers: Maximum number of threads that compute digests.
+    :param verified: The state (size, modification time in nanoseconds, and inode) of each file whose content was found
+        intact by an earlier deep verification, keyed by member. Files whose state hasn't changed are not read again.
+        Updated in place with the result of this verification.
+    :param paths: If given, only the files at or below these paths relative to ``data_dir`` are verified, e.g., the
+        files of some subdatasets. Manifests look them up without reading the other entries.
+    :return: The names of the damaged members in sorted order.
+    """
+
+    normalized_paths = ['.'] if paths is None else [normalize_name(path) for path in paths]
+    with _reading_file_list(file_list_file) as (extractor, contents):
+        if paths is not None and isinstance(contents, Manifest):
+            contents = list({entry.name: entry for path in normalized_paths for entry in contents.under(path)}.values())
+        damaged = {name for name in extractor.damaged_members(data_dir, contents) if _is_under(name, normalized_paths)}
+        if not deep:
+            return sorted(damaged)
+        digests = {name: digest for name, digest in extractor.digests(contents).items()
+                   if _is_under(name, normalized_paths)}
+
+    if verified is None:
+        verified = {}
+    for name in list(verified):
+        if _is_under(name, normalized_paths) and (name not in digests or name in damaged):
+            del verified[name]
+    members = _stat_members(data_dir, (name for name in digests if name not in damaged))
+    states: Dict[str, List[int]] = {}
+    for name, member in members.items():
+        state = [member.stat.st_size, member.stat.st_mtime_ns, member.stat.st_ino]
+        if verified.get(name) != state:
+            states[name] = state
+
+    computed = _file_digests({name: (data_dir / name, digests[name][0]) for name in states}, workers)
+    for name, digest in computed.items():
+        if digest == digests[name][1]:
+            verified[name] = states[name]
+        else:
+            damaged.add(name)
+            verified.pop(name, None)
+    return sorted(damaged)
+
+
+def recorded_digest(file_list_file: pathlib.Path, name: str) -> Optional[Tuple[str, str]]:
+    """The digest of the content of a data file recorded in ``file_list_file``. Manifests look it up without reading the
+    other entries.
+
+    :param file_list_file: Path to the file containing the list of files in the downloaded dataset.
+    :param name: Path to the data file relative to the data dir.
+    :return: The algorithm and the hex digest, or ``None`` if no digest of the file was recorded.
+    """
+
+    name = normalize_name(name)
+    with _reading_file_list(file_list_file) as (extractor, contents):
+        if isinstance(contents, Manifest):
+            entry = contents.find(name)
+            contents = [] if entry is None else [entry]
+        digests = extractor.digests(contents)
+    return {normalize_name(member): digest for member, digest in digests.items()}.get(name)
+
+
+def repair_data_files(path: pathlib.Path, data_dir: pathlib.Path, file_list_file: pathlib.Path,
+                      names: Iterable[str]) -> None:
+    """Extract damaged files again from the dataset download. See :meth:`Extractor.extract_members`.
+
+    :param path: Path to the dataset download.
+    :param data_dir: Path to the data dir to extract the data files to.
+    :param file_list_file: Path to the file containing the list of files in the downloaded dataset.
+    :param names: The names of the damaged members, as returned by :func:`find_damaged_data_files`.
+    """
+
+    with _reading_file_list(file_list_file) as (extractor, _):
+        extractor.extract_members(path, data_dir, file_list_file, names)
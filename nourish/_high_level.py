@@ -20,17 +20,30 @@
 
 # We don't use __all__ in this file because having every exposed function shown in __init__.py is more clear.
 
+import asyncio
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
 from copy import deepcopy
 import dataclasses
 import functools
+import os
 from textwrap import dedent
-from typing import Any, Callable, Dict, Iterable, Optional, Tuple, TypeVar, Union, cast
+import threading
+from typing import (TYPE_CHECKING, Any, Callable, ContextManager, Dict, Iterable, Optional, Sequence, Tuple, TypeVar,
+                    Union, cast)
 from packaging.version import parse as version_parser
+import requests
 
+from . import _http
+from ._async import ClientSessionContext
+from ._cache import ArchiveCache
 from ._config import Config
 from ._dataset import Dataset
+from .loaders import Filters
 from . import typing as typing_
-from ._schema import DatasetSchemata, FormatSchemata, LicenseSchemata, SchemaDict, SchemataManager
+from ._schema import BaseSchemata, DatasetSchemata, FormatSchemata, LicenseSchemata, SchemaDict, SchemataManager
+
+if TYPE_CHECKING:
+    import aiohttp
 
 # Global configurations --------------------------------------------------
 
@@ -67,6 +80,40 @@ def init(update_only: bool = True, **kwargs: Any) -> None:
     :param DATADIR: Default dataset directory to download/load to/from. The path can be either absolute or relative to
         the current working directory, but will be converted to the absolute path immediately in this function.
         Defaults to: :file:`~/.nourish/data`.
+    :param DOWNLOAD_CONNECTIONS: Number of concurrent connections used to download a dataset archive. Values greater
+        than 1 split the archive into byte ranges that are downloaded in parallel, if the server supports range
+        requests. Defaults to 1.
+    :param DOWNLOAD_SEGMENT_SIZE: Maximum size in bytes of a byte range when ``DOWNLOAD_CONNECTIONS`` is greater than 1.
+        Defaults to 64 MiB.
+    :param STREAM_EXTRACT: If ``True``, extract tarballs while they are being downloaded, so that the archive never
+        lands on the disk. Takes precedence over ``DOWNLOAD_CONNECTIONS``. Defaults to ``False``.
+    :param EXTRACTION_WORKERS: Maximum number of worker processes that extract a zip archive, or decompress a bzip2 or
+        xz file with multiple blocks, in parallel. Defaults to 1.
+    :param NATIVE_EXTRACTION: If ``True``, extract archives with native multithreaded tools: ``pigz``, ``pbzip2``,
+        and ``xz`` for decompression, and GNU ``tar`` for tarballs. Tools that aren't on ``PATH`` are replaced by the
+        pure-Python extractors. Defaults to ``False``.
+    :param HTTP_POOL_SIZE: Maximum number of keep-alive connections per host in the HTTP session shared by all network
+        I/O. Defaults to 10.
+    :param HTTP_MAX_RETRIES: Maximum number of retries of a request that failed to connect or received a transient
+        error status. Defaults to 3.
+    :param HTTP_BACKOFF_FACTOR: Factor in seconds of the exponential backoff between retries. Defaults to 0.5.
+    :param HTTP_TIMEOUT: Connect and read timeout in seconds of HTTP requests. Defaults to 60.
+
+    :param ARCHIVE_CACHE_SIZE: Maximum total size in bytes of the dataset archives that are kept in
+        :file:`DATADIR/.nourish.archives` after extraction. An archive in the cache is extracted again without being
+        downloaded, e.g., after the dataset has been deleted. The least recently used archives are removed when the
+        cache grows larger. Defaults to 0, which disables the cache.
+    :param LOCK_TIMEOUT: Seconds to wait for the directory lock of a dataset while other processes or threads download,
+        load, or delete the same dataset. ``None`` means waiting indefinitely. Defaults to 600.
+    :param PARSED_CACHE: If ``True``, keep the parsed tables of each dataset as Arrow IPC files under its data
+        directory, and memory-map them in later loads instead of parsing the data files again. The files are replaced
+        when the data files or their format options change. Requires :mod:`pyarrow` (``pip install nourish[arrow]``).
+        Defaults to ``False``.
+    :param COMPACT_DTYPES: If ``True``, change the dtypes of the columns of loaded tables to ones that use less memory,
+        e.g., categorical for string columns with few distinct values. Columns whose types the schema gives keep them.
+        See :meth:`dataset.Dataset.load`. Defaults to ``False``.
+
+    The ``HTTP_*`` configs don't apply if a session has been set with :func:`set_http_session`.
     """
     global _global_config, _schemata_manager
 
@@ -80,6 +127,29 @@ def init(update_only: bool = True, **kwargs: Any) -> None:
         _global_config = Config(**kwargs)
         _schemata_manager = None
 
+    _http.configure_default_session(pool_size=_global_config.HTTP_POOL_SIZE,
+                                    max_retries=_global_config.HTTP_MAX_RETRIES,
+                                    backoff_factor=_global_config.HTTP_BACKOFF_FACTOR,
+                                    timeout=_global_config.HTTP_TIMEOUT)
+
+
+def set_http_session(session: Optional[requests.Session]) -> None:
+    """Set the HTTP session used for all network I/O, such as retrieving schemata files and downloading datasets. This
+    is useful for applications that need to tune the connection pool, proxies, authentication, etc. beyond the
+    ``HTTP_*`` configs in :func:`init`.
+
+    :param session: The session to use. It must be safe to share between threads if datasets are downloaded with
+        multiple connections. ``None`` means going back to the session that is created from the ``HTTP_*`` configs.
+
+    Example:
+
+    >>> import requests
+    >>> session = requests.Session()
+    >>> set_http_session(session)
+    >>> set_http_session(None)
+    """
+    _http.set_session(session)
+
 
 init(update_only=False)
 
@@ -161,7 +231,10 @@ def _handle_version_param(func: _DecoratedFuncType) -> _DecoratedFuncType:
 def load_dataset(name: str, *,
                  version: str = 'latest',
                  download: bool = True,
-                 subdatasets: Union[Iterable[str], None] = None) -> Dict[str, Any]:
+                 subdatasets: Union[Iterable[str], None] = None,
+                 chunksize: Optional[int] = None,
+                 columns: Optional[Sequence[str]] = None,
+                 filters: Optional[Filters] = None) -> Dict[str, Any]:
     """High level function that wraps :class:`dataset.Dataset` class's load and download functionality. Downloads to and
     loads from directory: :file:`DATADIR/dataset_schemata_name/name/version` where ``DATADIR`` is in
     ``nourish.get_config().DATADIR``. ``DATADIR`` can be changed by calling :func:`init`.
@@ -172,6 +245,13 @@ def load_dataset(name: str, *,
         available versions for a dataset by calling :func:`list_all_datasets`.
     :param download: Whether or not the dataset should be downloaded before loading.
     :param subdatasets: An iterable containing the subdatasets to load. ``None`` means all subdatasets.
+    :param chunksize: If specified, don't load the subdatasets into RAM, but map each of them to an iterator of its
+        chunks of this size, e.g., dataframes of ``chunksize`` rows, or lists of ``chunksize`` lines of plain text.
+        See :meth:`dataset.Dataset.iter_load`.
+    :param columns: The columns to load of each subdataset. ``None`` means all columns. See
+        :meth:`dataset.Dataset.load`.
+    :param filters: The conditions that the loaded rows of each subdataset satisfy, e.g.,
+        ``[('HOURLYVISIBILITY', '>', 5)]``. ``None`` means all rows. See :meth:`dataset.Dataset.load`.
     :raises FileNotFoundError: The dataset files were not previously downloaded or can't be found, and ``download`` is
         ``False``.
     :return: Dictionary that holds all subdatasets.
@@ -186,16 +266,215 @@ def load_dataset(name: str, *,
     2 2010-01-01 03:00:00               5.0                33.0
     """
 
+    dataset = _make_dataset(export_schemata_manager().dataset_schemata, name, version)
+    return _download_and_load(dataset, download=download, subdatasets=subdatasets, chunksize=chunksize,
+                              columns=columns, filters=filters)
+
+
+async def aload_dataset(name: str, *,
+                        version: str = 'latest',
+                        download: bool = True,
+                        subdatasets: Union[Iterable[str], None] = None,
+                        columns: Optional[Sequence[str]] = None,
+                        filters: Optional[Filters] = None,
+                        session: Optional['aiohttp.ClientSession'] = None,
+                        executor: Optional[Executor] = None) -> Dict[str, Any]:
+    """Awaitable counterpart of :func:`load_dataset`. The schemata files and the dataset archive are retrieved with
+    :mod:`aiohttp`, and extracting and loading the dataset are run in ``executor``, so the event loop is never blocked.
+    Concurrent calls for the same dataset download it only once, as by :meth:`dataset.Dataset.aensure_downloaded`. See
+    :meth:`dataset.Dataset.adownload` and :meth:`dataset.Dataset.aload` for the behavior upon cancellation.
+
+    :param name: Same as ``name`` in :func:`load_dataset`.
+    :param version: Same as ``version`` in :func:`load_dataset`.
+    :param download: Same as ``download`` in :func:`load_dataset`.
+    :param subdatasets: Same as ``subdatasets`` in :func:`load_dataset`.
+    :param columns: Same as ``columns`` in :func:`load_dataset`.
+    :param filters: Same as ``filters`` in :func:`load_dataset`.
+    :param session: The :class:`aiohttp.ClientSession` used for all requests. ``None`` means creating a session from
+        the ``HTTP_POOL_SIZE`` and ``HTTP_TIMEOUT`` configs for this call.
+    :param executor: The executor that runs blocking operations. ``None`` means the default executor of the event loop.
+    :raises TypeError: ``name`` or ``version`` is not a string.
+    :raises KeyError: ``name`` or ``version`` is not valid.
+    :raises ImportError: :mod:`aiohttp` is not installed.
+    :return: Dictionary that holds all subdatasets.
+    """
+
+    async with ClientSessionContext(session, pool_size=get_config().HTTP_POOL_SIZE,
+                                    timeout=get_config().HTTP_TIMEOUT) as client:
+        # With the schemata loaded, validating the parameters no longer involves network I/O
+        await aload_schemata_manager(session=client)
+        version = _resolve_version(name, version=version)
+        dataset = _make_dataset(export_schemata_manager().dataset_schemata, name, version)
+
+        if download:
+            # Concurrent calls for the same dataset, in this or other processes, download it only once
+            await dataset.aensure_downloaded(session=client, executor=executor,
+                                             extraction_workers=get_config().EXTRACTION_WORKERS,
+                                             native_extraction=get_config().NATIVE_EXTRACTION,
+                                             archive_cache=_archive_cache())
+    try:
+        # The data files were just found downloaded, which needn't be checked again
+        return await dataset.aload(subdatasets=subdatasets, check=not download,
+                                   parsed_cache=get_config().PARSED_CACHE, columns=columns, filters=filters,
+                                   compact=get_config().COMPACT_DTYPES, executor=executor)
+    except RuntimeError as e:
+        raise RuntimeError('Failed to load the dataset because some files are not found. '
+                           'Did you forget to download the dataset (by specifying `download=True`)?'
+                           f'\nCaused by:\n{e}')
+
+
+def load_datasets(datasets: Iterable[Union[str, Tuple[str, str]]], *,
+                  download: bool = True,
+                  max_workers: Optional[int] = None,
+                  max_downloads: int = 4,
+                  max_extractions: Optional[int] = None,
+                  max_loads: Optional[int] = None) -> Dict[Union[str, Tuple[str, str]], Any]:
+    """Download and load multiple datasets concurrently. Each dataset is handled in the same way as
+    :func:`load_dataset`, but downloads, extractions and loads of different datasets overlap, each bounded by its own
+    limit.
+
+    :param datasets: The datasets to load. Each is either a dataset name, which refers to its latest version, or a
+        ``(name, version)`` tuple.
+    :param download: Whether or not the datasets should be downloaded before loading.
+    :param max_workers: Maximum number of datasets being handled at the same time. ``None`` means the default of
+        :class:`concurrent.futures.ThreadPoolExecutor`.
+    :param max_downloads: Maximum number of archives being downloaded at the same time.
+    :param max_extractions: Maximum number of archives being extracted at the same time. ``None`` means the number of
+        CPUs.
+    :param max_loads: Maximum number of datasets being loaded into RAM at the same time. ``None`` means the number of
+        CPUs.
+    :raises ValueError: A limit is not positive.
+    :return: Dictionary that maps each item in ``datasets`` to either a dictionary that holds all subdatasets, as
+        returned by :func:`load_dataset`, or the exception that prevented the dataset from being loaded. A failure of
+        one dataset doesn't affect the others.
+
+    Example:
+
+    >>> results = load_datasets(['gmb', ('noaa_jfk', '1.1.4')])
+    >>> sorted(results['gmb'].keys())
+    ['gmb_subset_full']
+    >>> sorted(results[('noaa_jfk', '1.1.4')].keys())
+    ['jfk_weather_cleaned']
+    """
+
+    cpu_count = os.cpu_count() or 1
+    for param, limit in (('max_downloads', max_downloads),
+                         ('max_extractions', max_extractions),
+                         ('max_loads', max_loads)):
+        if limit is not None and limit < 1:
+            raise ValueError(f'{param} must be positive, got {limit}.')
+    network_slot = threading.BoundedSemaphore(max_downloads)
+    extraction_slot = threading.BoundedSemaphore(max_extractions or cpu_count)
+    load_slot = threading.BoundedSemaphore(max_loads or cpu_count)
+
     dataset_schemata = export_schemata_manager().dataset_schemata
+    outcomes: Dict[Union[str, Tuple[str, str]], Union[Exception, Future]] = {}
+    # Items that resolve to the same dataset share a future, so that they don't compete for the same directory lock
+    futures: Dict[Tuple[str, str], Future] = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for item in datasets:
+            key = item if isinstance(item, str) else cast(Tuple[str, str], tuple(item))
+            try:
+                name, version = (key, 'latest') if isinstance(key, str) else key
+                version = _resolve_version(name, version=version)
+                if (name, version) not in futures:
+                    futures[(name, version)] = executor.submit(_download_and_load,
+                                                               _make_dataset(dataset_schemata, name, version),
+                                                               download=download,
+                                                               network_slot=network_slot,
+                                                               extraction_slot=extraction_slot,
+                                                               load_slot=load_slot)
+                outcomes[key] = futures[(name, version)]
+            except Exception as e:
+                outcomes[key] = e
+
+    results: Dict[Union[str, Tuple[str, str]], Any] = {}
+    for key, outcome in outcomes.items():
+        if isinstance(outcome, Future):
+            results[key] = outcome.exception() or outcome.result()
+        else:
+            results[key] = outcome
+    return results
+
+
+@_handle_name_param
+@_handle_version_param
+def _resolve_version(name: str, *, version: str = 'latest') -> str:
+    """Validate a dataset name and version.
+
+    :return: ``version``, or the latest version of the dataset if ``version`` is ``'latest'``.
+    """
+    return version
+
+
+def _make_dataset(dataset_schemata: BaseSchemata, name: str, version: str) -> Dataset:
+    """Create the :class:`dataset.Dataset` object that high-level functions use for a dataset. Its data directory is
+    :file:`DATADIR/dataset_schemata_name/name/version`.
+
+    :return: The lazily initialized :class:`dataset.Dataset` object.
+    """
     schema = dataset_schemata.export_schema('datasets', name, version)
     dataset_schemata_name = dataset_schemata.export_schema().get('name', 'default')
 
     data_dir = get_config().DATADIR / dataset_schemata_name / name / version
-    dataset = Dataset(schema=schema, data_dir=data_dir, mode=Dataset.InitializationMode.LAZY)
-    if download and not dataset.is_downloaded():
-        dataset.download()
+    return Dataset(schema=schema, data_dir=data_dir, mode=Dataset.InitializationMode.LAZY,
+                   lock_timeout=get_config().LOCK_TIMEOUT)
+
+
+def _archive_cache() -> Optional[ArchiveCache]:
+    """The archive cache configured by ``ARCHIVE_CACHE_SIZE``.
+
+    :return: The :class:`ArchiveCache` object, or ``None`` if the cache is disabled.
+    """
+    if get_config().ARCHIVE_CACHE_SIZE == 0:
+        return None
+    return ArchiveCache(get_config().DATADIR / '.nourish.archives', max_size=get_config().ARCHIVE_CACHE_SIZE)
+
+
+def _download_and_load(dataset: Dataset, *,
+                       download: bool,
+                       subdatasets: Union[Iterable[str], None] = None,
+                       chunksize: Optional[int] = None,
+                       columns: Optional[Sequence[str]] = None,
+                       filters: Optional[Filters] = None,
+                       network_slot: Optional[ContextManager[Any]] = None,
+                       extraction_slot: Optional[ContextManager[Any]] = None,
+                       load_slot: Optional[ContextManager[Any]] = None) -> Dict[str, Any]:
+    """Download the dataset with the global configs if requested and it isn't downloaded yet, then load it.
+
+    :param chunksize: If specified, return an iterator of the chunks of each subdataset rather than loading them.
+    :param columns: See :meth:`dataset.Dataset.load`.
+    :param filters: See :meth:`dataset.Dataset.load`.
+    :param network_slot: See :meth:`dataset.Dataset.download`.
+    :param extraction_slot: See :meth:`dataset.Dataset.download`.
+    :param load_slot: Same as ``network_slot``, but held while the dataset is being loaded.
+    :return: Dictionary that holds all subdatasets.
+    """
+    if download:
+        # Concurrent calls for the same dataset, in this or other processes, download it only once
+        dataset.ensure_downloaded(connections=get_config().DOWNLOAD_CONNECTIONS,
+                                  segment_size=get_config().DOWNLOAD_SEGMENT_SIZE,
+                                  stream_extract=get_config().STREAM_EXTRACT,
+                                  extraction_workers=get_config().EXTRACTION_WORKERS,
+                                  native_extraction=get_config().NATIVE_EXTRACTION,
+                                  network_slot=network_slot,
+                                  extraction_slot=extraction_slot,
+                                  archive_cache=_archive_cache())
+    # The data files were just found downloaded, which needn't be checked again
+    check = not download
     try:
-        return dataset.load(subdatasets=subdatasets)
+        if chunksize is not None:
+            if subdatasets is None:
+                subdatasets = dataset._schema['subdatasets'].keys()
+            return {subdataset: dataset.iter_load(subdataset, chunksize=chunksize, check=check, columns=columns,
+                                                  filters=filters)
+                    for subdataset in subdatasets}
+        if load_slot is None:
+            return dataset.load(subdatasets=subdatasets, check=check, parsed_cache=get_config().PARSED_CACHE,
+                                columns=columns, filters=filters, compact=get_config().COMPACT_DTYPES)
+        with load_slot:
+            return dataset.load(subdatasets=subdatasets, check=check, parsed_cache=get_config().PARSED_CACHE,
+                                columns=columns, filters=filters, compact=get_config().COMPACT_DTYPES)
     except RuntimeError as e:
         raise RuntimeError('Failed to load the dataset because some files are not found. '
                            'Did you forget to download the dataset (by specifying `download=True`)?'
@@ -324,6 +603,47 @@ def load_schemata_manager(*, force_reload: bool = False,
                 'licenses', LicenseSchemata(get_config().LICENSE_SCHEMATA_URL, tls_verification=tls_verification))
 
 
+async def aload_schemata_manager(*, force_reload: bool = False,
+                                 tls_verification: Union[bool, typing_.PathLike] = True,
+                                 session: Optional['aiohttp.ClientSession'] = None) -> None:
+    """Awaitable counterpart of :func:`load_schemata_manager`, which retrieves the schemata files concurrently with
+    :mod:`aiohttp`.
+
+    :param force_reload: Same as ``force_reload`` in :func:`load_schemata_manager`.
+    :param tls_verification: Same as ``tls_verification`` in :class:`schema.BaseSchemata`.
+    :param session: The :class:`aiohttp.ClientSession` used to retrieve the schemata files. ``None`` means creating a
+        session from the ``HTTP_POOL_SIZE`` and ``HTTP_TIMEOUT`` configs for this call.
+    :raises ValueError: See :class:`schema.BaseSchemata`.
+    :raises InsecureConnectionError: See :class:`schema.BaseSchemata`.
+    :raises ImportError: :mod:`aiohttp` is not installed.
+    """
+
+    global _schemata_manager
+
+    urls = {'datasets': (DatasetSchemata, get_config().DATASET_SCHEMATA_URL),
+            'formats': (FormatSchemata, get_config().FORMAT_SCHEMATA_URL),
+            'licenses': (LicenseSchemata, get_config().LICENSE_SCHEMATA_URL)}
+    if not force_reload and _schemata_manager is not None:
+        urls = {name: (schemata_class, url) for name, (schemata_class, url) in urls.items()
+                if _schemata_manager.schemata[name].retrieved_url_or_path != url}
+    if len(urls) == 0:
+        return
+
+    async with ClientSessionContext(session, pool_size=get_config().HTTP_POOL_SIZE,
+                                    timeout=get_config().HTTP_TIMEOUT) as client:
+        retrieved = await asyncio.gather(*(schemata_class.acreate(url, session=client,
+                                                                  tls_verification=tls_verification)
+                                           for schemata_class, url in urls.values()))
+    loaded = dict(zip(urls.keys(), retrieved))
+
+    if len(loaded) == 3:  # Force reload or clean slate, create a new SchemataManager object
+        _schemata_manager = SchemataManager(**loaded)  # type: ignore[arg-type]
+    else:
+        assert _schemata_manager is not None  # nosec: for mypy
+        for name, schemata in loaded.items():
+            _schemata_manager.update_schemata(name, schemata)
+
+
 def _get_schemata_manager() -> SchemataManager:
     """Return the :class:`SchemataManager` object managed by high-level functions. If it is not created, create it.
     This function is used by high-level APIs but it should not be a high-level function itself. It should only be
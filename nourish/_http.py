@@ -0,0 +1,127 @@
+# Copyright 2021 Edward Leardi. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"Shared HTTP session used for all network I/O."
+
+
+import threading
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+# Status codes that are worth retrying: rate limiting and transient server-side failures
+RETRY_STATUS_CODES = frozenset((429, 500, 502, 503, 504))
+
+
+class _PoolingAdapter(HTTPAdapter):
+    "A :class:`requests.adapters.HTTPAdapter` that applies a default timeout to requests that don't specify one."
+
+    def __init__(self, *, timeout: Optional[float], **kwargs: Any) -> None:
+        self._timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request: requests.PreparedRequest, stream: bool = False, timeout: Any = None, verify: Any = True,
+             cert: Any = None, proxies: Any = None) -> requests.Response:
+        if timeout is None:
+            timeout = self._timeout
+        return super().send(request, stream=stream, timeout=timeout, verify=verify, cert=cert, proxies=proxies)
+
+
+def create_session(*,
+                   pool_size: int = 10,
+                   max_retries: int = 3,
+                   backoff_factor: float = 0.5,
+                   timeout: Optional[float] = 60.0) -> requests.Session:
+    """Create a :class:`requests.Session` with keep-alive connection pools, retries and a default timeout.
+
+    :param pool_size: Maximum number of connections kept alive per host.
+    :param max_retries: Maximum number of retries of a request that failed to connect, failed to read the response
+        header, or received one of the statuses in :data:`RETRY_STATUS_CODES`. TLS errors are never retried.
+    :param backoff_factor: Factor of the exponential backoff between retries, in seconds.
+    :param timeout: Default connect and read timeout in seconds of requests that don't specify one. ``None`` means
+        waiting forever.
+    :return: The created session.
+    """
+
+    retry = Retry(total=max_retries,
+                  connect=max_retries,
+                  read=max_retries,
+                  status=max_retries,
+                  other=0,
+                  backoff_factor=backoff_factor,
+                  status_forcelist=RETRY_STATUS_CODES,
+                  # Let the caller handle the final error status with raise_for_status
+                  raise_on_status=False)
+    adapter = _PoolingAdapter(timeout=timeout, pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+# The session injected with set_session, if any
+_session: Optional[requests.Session] = None
+# The session created from _default_session_options when no session has been injected
+_default_session: Optional[requests.Session] = None
+_default_session_options: Dict[str, Any] = {}
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Get the session shared by all network I/O.
+
+    :return: The session passed to :func:`set_session`, or a session created by :func:`create_session` with the
+        options passed to :func:`configure_default_session` if no session has been set.
+    """
+    global _default_session
+
+    with _session_lock:
+        if _session is not None:
+            return _session
+        if _default_session is None:
+            _default_session = create_session(**_default_session_options)
+        return _default_session
+
+
+def set_session(session: Optional[requests.Session]) -> None:
+    """Set the session shared by all network I/O.
+
+    :param session: The session to use. ``None`` means going back to the default session.
+    """
+    global _session
+
+    with _session_lock:
+        _session = session
+
+
+def configure_default_session(**options: Any) -> None:
+    """Set the options of the default session. The default session is recreated the next time it is needed if the
+    options change.
+
+    :param options: Keyword arguments passed to :func:`create_session`.
+    """
+    global _default_session, _default_session_options
+
+    with _session_lock:
+        if options == _default_session_options:
+            return
+        _default_session_options = options
+        if _default_session is not None:
+            # Requests that are in progress keep their connections; the connections are closed when they are released.
+            _default_session.close()
+            _default_session = None
@@ -18,37 +18,190 @@
 "Directory lock."
 
 
+import asyncio
 from contextlib import contextmanager
 import itertools
+import json
+import logging
+import math
 import os
 import pathlib
+import random
+import socket
 import threading
+import time
+from types import TracebackType
 from uuid import uuid4
-from typing import Iterator
+from typing import Any, Dict, Iterator, NamedTuple, Optional, Type
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    # Windows
+    import msvcrt
+    fcntl = None  # type: ignore
 
 from . import typing as typing_
 
 
+# Name of the file whose kernel lock makes looking for other locks and creating a lock file atomic across processes on
+# Windows, which can't lock directories
+_GUARD_FILE_NAME = 'lock.guard'
+
+# Default seconds after the last heartbeat of a lock held from another host at which the lock expires
+LEASE = 120.0
+
+# Name of this host, which is recorded in lock files
+_HOST = socket.gethostname()
+
+# Upper bound of the size of the content of a lock file
+_MAX_OWNER_SIZE = 4096
+
+_logger = logging.getLogger(__name__)
+
+# Bounds in seconds of the exponential backoff between attempts to acquire a lock while waiting for it
+_MIN_BACKOFF = 0.005
+_MAX_BACKOFF = 0.5
+
+
+def _lock_fd(fd: int, *, blocking: bool) -> bool:
+    """Take the exclusive kernel lock of an open file. The lock is released when the file is closed, including when the
+    process that holds it dies.
+
+    :param fd: The file descriptor.
+    :param blocking: Whether to wait for the lock if another open file holds it.
+    :return: True if the lock has been taken, False if another open file holds it and ``blocking`` is ``False``.
+    """
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        else:  # pragma: no cover
+            msvcrt.locking(fd, msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+    except (BlockingIOError, PermissionError):
+        return False
+    return True
+
+
+def _waits(timeout: Optional[float]) -> Iterator[float]:
+    """Jittered exponential backoff between attempts to acquire a lock, so that processes waiting for the same lock
+    don't retry in lockstep.
+
+    :param timeout: Seconds after which to give up. ``None`` means never.
+    :return: Seconds to sleep before each retry.
+    """
+    deadline = math.inf if timeout is None else time.monotonic() + timeout
+    for attempt in itertools.count():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        delay = min(_MIN_BACKOFF * 2 ** attempt, _MAX_BACKOFF)
+        yield min(random.uniform(delay / 2, delay), remaining)  # nosec
+
+
+def _remove_lock_file(lock_file: pathlib.Path) -> None:
+    "Remove a lock file that is being unlocked, if it still exists."
+    try:
+        os.remove(lock_file)
+    except OSError:
+        # Removed by someone who found it unlocked or by force_clear_all_locks, or opened by someone on Windows. Either
+        # way, it's no longer held.
+        pass
+
+
 class DirectoryLockAcquisitionError(RuntimeError):
     "Raised when failed to acquire a lock."
 
 
+class StaleLock(NamedTuple):
+    """A lock whose holder is gone, which has been reclaimed. Reclaims are logged as warnings by the logger
+    ``nourish._lock``, and the log records carry the reclaimed lock as their ``stale_lock`` attribute."""
+    # Path to the removed lock file
+    path: pathlib.Path
+    # Whether it was a write lock
+    write: bool
+    # Host name and process ID of the holder, or None if the lock file doesn't record them (e.g., created by an older
+    # version)
+    host: Optional[str]
+    pid: Optional[int]
+    # Seconds since the holder last renewed the lock
+    age: float
+    # Why the holder is considered gone
+    reason: str
+
+
+class _Heartbeat(threading.Thread):
+    """Renews a lock file periodically by updating its modification time, so that processes on other hosts can tell
+    that the lock is still held.
+
+    :param path: Path to the lock file.
+    :param interval: Seconds between renewals.
+    """
+
+    def __init__(self, path: pathlib.Path, interval: float) -> None:
+        super().__init__(name=f'nourish-lock-heartbeat-{path.name}', daemon=True)
+        self._path = path
+        self._interval = interval
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self._stopped.wait(self._interval):
+            try:
+                os.utime(self._path)
+            except OSError:  # Removed by force_clear_all_locks
+                pass
+
+    def stop(self) -> None:
+        "Stop renewing the lock file."
+        self._stopped.set()
+
+
+def _parse_owner(content: bytes) -> Dict[str, Any]:
+    """Parse the content of a lock file.
+
+    :return: The host name and the process ID of the holder, or an empty dictionary if the lock file doesn't record
+        them.
+    """
+    try:
+        owner = json.loads(content)
+    except ValueError:
+        return {}
+    return owner if isinstance(owner, dict) else {}
+
+
 class DirectoryLock:
     """Read/write lock for a directory.
 
     A lock file is named as ``{read|write}.{pid}.{uuid}.lock``. This should be able to resolve all potential name
     clashes. We put process ID here in case someone wants to figure out which process created the file.
 
+    The holder of a lock keeps an exclusive kernel lock (``flock`` on POSIX systems) on its lock file. A lock file whose
+    kernel lock isn't held, e.g., because the process that created it died, is not a lock and is removed by whoever
+    comes across it. Looking for the lock files of others and creating a lock file happens under the kernel lock of
+    the directory itself (of the guard file ``lock.guard`` on Windows), so that no two processes or threads can acquire
+    conflicting locks at the same time.
+
+    On shared file systems, kernel locks may not be visible to other hosts. Lock files therefore record the host name
+    and the process ID of their holder, and the holder renews its lock file every ``lease / 4`` seconds. A lock held
+    from another host is considered held until it hasn't been renewed for ``lease`` seconds, and every process checks
+    for conflicting locks again after creating its lock file. Reclaimed locks are logged as :class:`StaleLock`.
+
     As a reservation for future compatibility, this class reserves all files starting with ``read.``/``write.`` and ends
-    with ``.lock`` for its own use.
+    with ``.lock``, as well as ``lock.guard``, for its own use.
 
     :param directory: The directory where lock files would be put.
+    :param lease: Seconds after the last renewal at which a lock held from another host expires.
     """
 
-    def __init__(self, directory: typing_.PathLike):
+    def __init__(self, directory: typing_.PathLike, *, lease: float = LEASE):
         self._uuid: str = str(uuid4())
         self._directory: pathlib.Path = pathlib.Path(directory)
+        self._lease: float = lease
         self._thread_lock: threading.Lock = threading.Lock()
+        # The open lock file whose kernel lock this object holds while it holds the directory lock, and the thread that
+        # renews it
+        self._fd: Optional[int] = None
+        self._lock_file: Optional[pathlib.Path] = None
+        self._heartbeat: Optional[_Heartbeat] = None
 
     @property
     def _lock_file_suffix(self) -> str:
@@ -70,22 +223,68 @@ class DirectoryLock:
 
         return self._directory.glob("write.*.lock")
 
-    def _does_read_lock_exist(self) -> bool:
-        "Returns True if a read lock file exists, otherwise False."
-        return next(self._get_read_locks(), None) is not None
+    def _is_held(self, lock_file: pathlib.Path) -> bool:
+        """Check whether a lock file is held. A lock file that isn't held is reclaimed, i.e., removed. Must be called
+        under the guard.
 
-    def _does_write_lock_exist(self) -> bool:
-        "Returns True if a write lock file exists, otherwise False."
-        return next(self._get_write_locks(), None) is not None
+        :param lock_file: Path to the lock file.
+        """
+        try:
+            fd = os.open(lock_file, os.O_RDONLY)
+        except FileNotFoundError:  # Unlocked in the meantime
+            return False
+        try:
+            if not _lock_fd(fd, blocking=False):
+                return True
+            owner = _parse_owner(os.read(fd, _MAX_OWNER_SIZE))
+            age = time.time() - os.fstat(fd).st_mtime
+        finally:
+            os.close(fd)
+
+        host, pid = owner.get('host'), owner.get('pid')
+        if host is None or host == _HOST:
+            reason = 'its holder no longer holds the kernel lock'
+        elif age < self._lease:
+            # The kernel lock of a holder on another host may not be visible here
+            return True
+        else:
+            reason = f'it has not been renewed for {self._lease} seconds'
+        try:
+            os.remove(lock_file)
+        except OSError:
+            return False
+        stale_lock = StaleLock(path=lock_file, write=lock_file.name.startswith('write.'), host=host, pid=pid, age=age,
+                               reason=reason)
+        _logger.warning('Reclaimed the stale %s lock "%s" of process %s on host %s, because %s.',
+                        'write' if stale_lock.write else 'read', lock_file, pid, host, reason,
+                        extra={'stale_lock': stale_lock})
+        return False
+
+    def _does_conflicting_lock_exist(self, *, write: bool, exclude: Optional[pathlib.Path] = None) -> bool:
+        """Returns True if a lock is held that conflicts with a lock of the kind of ``write``, otherwise False.
+
+        :param exclude: A lock file to ignore, i.e., the lock file of this object.
+        """
+        lock_files = itertools.chain(self._get_write_locks(), self._get_read_locks() if write else ())
+        return any(self._is_held(f) for f in lock_files if f != exclude)
 
-    def lock(self, *, write: bool) -> bool:
-        """Lock the directory (create the lock file in the directory). If the directory does not exist, create it.
+    @contextmanager
+    def _guarding(self) -> Iterator[None]:
+        "Hold the kernel lock of the guard. It is only held briefly, so this waits for it without a timeout."
+        if fcntl is not None:
+            fd = os.open(self._directory, os.O_RDONLY)
+        else:  # pragma: no cover
+            fd = os.open(self._directory / _GUARD_FILE_NAME, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            _lock_fd(fd, blocking=True)
+            yield
+        finally:
+            os.close(fd)
 
-        :param write: Whether this is a write lock or a read lock. A write lock excludes others from both reading and
-            writing, while a read lock only excludes writing. Multiple read locks can exist at the same time, but only
-            one write lock may exist at any single moment.
-        :return: True if lock succeeds, False if fails. This function does not throw exceptions because :meth:`.lock` is
-            also used for peeking whether the lock is obtainable.
+    def _try_lock(self, *, write: bool) -> bool:
+        """Try once to lock the directory.
+
+        :return: True if lock succeeds, False if a conflicting lock is held.
         """
 
         lock_file = self._directory / f'{"write" if write else "read"}{self._lock_file_suffix}'
@@ -95,19 +294,61 @@ class DirectoryLock:
                 self._directory.mkdir(parents=True)
             if not self._directory.is_dir():
                 raise NotADirectoryError(f'"{self._directory}" exists and is not a directory.')
-            if write:  # write lock
-                if self._does_read_lock_exist() or self._does_write_lock_exist():
+            with self._guarding():
+                if self._does_conflicting_lock_exist(write=write):
                     return False
-                else:
-                    lock_file.touch(exist_ok=False)
-            else:  # read lock
-                if self._does_write_lock_exist():
+                fd = os.open(lock_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+                # Nobody else on this host has this new file open, because looking at lock files also takes the guard
+                _lock_fd(fd, blocking=True)
+                os.write(fd, json.dumps({'host': _HOST, 'pid': os.getpid()}).encode())
+                # Processes on other hosts may not see the guard. Of two of them that create conflicting lock files at
+                # the same time, at least one sees the lock file of the other here and backs off.
+                if self._does_conflicting_lock_exist(write=write, exclude=lock_file):
+                    os.close(fd)
+                    os.remove(lock_file)
                     return False
-                else:
-                    lock_file.touch(exist_ok=False)
+                self._fd, self._lock_file = fd, lock_file
+                self._heartbeat = _Heartbeat(lock_file, self._lease / 4)
+                self._heartbeat.start()
 
         return True
 
+    def lock(self, *, write: bool, timeout: Optional[float] = 0.0) -> bool:
+        """Lock the directory (create the lock file in the directory). If the directory does not exist, create it.
+
+        :param write: Whether this is a write lock or a read lock. A write lock excludes others from both reading and
+            writing, while a read lock only excludes writing. Multiple read locks can exist at the same time, but only
+            one write lock may exist at any single moment.
+        :param timeout: Seconds to wait for conflicting locks to be released. ``0`` means trying only once, ``None``
+            means waiting indefinitely.
+        :return: True if lock succeeds, False if fails. This function does not throw exceptions because :meth:`.lock` is
+            also used for peeking whether the lock is obtainable.
+        """
+
+        if self._try_lock(write=write):
+            return True
+        for wait in _waits(timeout):
+            time.sleep(wait)
+            if self._try_lock(write=write):
+                return True
+        return False
+
+    async def alock(self, *, write: bool, timeout: Optional[float] = 0.0) -> bool:
+        """Awaitable counterpart of :meth:`.lock`, which waits for conflicting locks without blocking the event loop.
+
+        :param write: Same as ``write`` in :meth:`.lock`.
+        :param timeout: Same as ``timeout`` in :meth:`.lock`.
+        :return: Same as :meth:`.lock`.
+        """
+
+        if self._try_lock(write=write):
+            return True
+        for wait in _waits(timeout):
+            await asyncio.sleep(wait)
+            if self._try_lock(write=write):
+                return True
+        return False
+
     def unlock(self) -> bool:
         """Unlock the directory.
 
@@ -116,19 +357,29 @@ class DirectoryLock:
             where the lock has been removed as an expected usage.
         """
         with self._thread_lock:
-            lock_existed: bool = False
-            write_lock_file = self._directory / f'write{self._lock_file_suffix}'
-            if write_lock_file.exists():
-                write_lock_file.unlink()
-                lock_existed = True
-            read_lock_file = self._directory / f'read{self._lock_file_suffix}'
-            if read_lock_file.exists():
-                read_lock_file.unlink()
-                lock_existed = True
-            return lock_existed
+            if self._fd is None or self._lock_file is None or self._heartbeat is None:
+                return False
+            self._heartbeat.stop()
+            if fcntl is not None:
+                # Remove the lock file while still holding its kernel lock, so that nobody who waits for the lock finds
+                # it unlocked and reclaims it as stale
+                _remove_lock_file(self._lock_file)
+                os.close(self._fd)
+            else:  # pragma: no cover
+                # Windows doesn't remove files that are open. Whoever looks at lock files holds the guard.
+                with self._guarding():
+                    os.close(self._fd)
+                    _remove_lock_file(self._lock_file)
+            self._fd = self._lock_file = self._heartbeat = None
+            return True
+
+    def _acquisition_error(self, *, write: bool) -> DirectoryLockAcquisitionError:
+        "The error raised when failed to acquire the lock."
+        return DirectoryLockAcquisitionError(
+            f'Failed to acquire directory {"write" if write else "read"} lock for "{self._directory}"')
 
     @contextmanager
-    def locking(self, *, write: bool) -> Iterator[bool]:
+    def locking(self, *, write: bool, timeout: Optional[float] = 0.0) -> Iterator[bool]:
         """Same as :meth:`.lock`, but used in ``with`` statements.
 
         Example:
@@ -139,12 +390,12 @@ class DirectoryLock:
                # do the work ...
         """
         try:
-            yield self.lock(write=write)
+            yield self.lock(write=write, timeout=timeout)
         finally:
             self.unlock()
 
     @contextmanager
-    def locking_with_exception(self, *, write: bool) -> Iterator[None]:
+    def locking_with_exception(self, *, write: bool, timeout: Optional[float] = 0.0) -> Iterator[None]:
         """Similar to :meth:`.locking`, but raises exceptions if the lock is failed to acquire.
 
         :raises DirectoryLockAcquisitionError: Failed to acquire the directory lock.
@@ -156,16 +407,52 @@ class DirectoryLock:
            with some_lock.locking_with_exception(write=True):
                # do the work ...
         """
-        with self.locking(write=write) as lock:
+        with self.locking(write=write, timeout=timeout) as lock:
             if not lock:
-                raise DirectoryLockAcquisitionError(
-                    f'Failed to acquire directory {"write" if write else "read"} lock for "{self._directory}"')
+                raise self._acquisition_error(write=write)
             yield
 
+    def alocking_with_exception(self, *, write: bool, timeout: Optional[float] = 0.0) -> '_AsyncLocking':
+        """Same as :meth:`.locking_with_exception`, but used in ``async with`` statements. The lock is acquired with
+        :meth:`.alock`.
+
+        :raises DirectoryLockAcquisitionError: Failed to acquire the directory lock.
+
+        Example:
+
+        .. code-block:: python
+
+           async with some_lock.alocking_with_exception(write=True):
+               # do the work ...
+        """
+        return _AsyncLocking(self, write=write, timeout=timeout)
+
     def force_clear_all_locks(self) -> None:
         """Force clear all read locks. This is useful in situations such as those when system crashes and locks must be
-        reset.
+        reset. Holders of the cleared locks keep running, but no longer exclude others.
         """
 
         for f in itertools.chain(self._get_read_locks(), self._get_write_locks()):
             os.remove(f)
+
+
+class _AsyncLocking:
+    """Async context manager returned by :meth:`DirectoryLock.alocking_with_exception`.
+
+    :param lock: The directory lock.
+    :param write: Same as ``write`` in :meth:`DirectoryLock.lock`.
+    :param timeout: Same as ``timeout`` in :meth:`DirectoryLock.lock`.
+    """
+
+    def __init__(self, lock: DirectoryLock, *, write: bool, timeout: Optional[float]) -> None:
+        self._lock = lock
+        self._write = write
+        self._timeout = timeout
+
+    async def __aenter__(self) -> None:
+        if not await self._lock.alock(write=self._write, timeout=self._timeout):
+            raise self._lock._acquisition_error(write=self._write)
+
+    async def __aexit__(self, exc_type: Optional[Type[BaseException]], exc_value: Optional[BaseException],
+                        traceback: Optional[TracebackType]) -> None:
+        self._lock.unlock()
@@ -0,0 +1,315 @@
+# Copyright 2021 Edward Leardi. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Compact binary manifest of the members of an extracted archive.
+
+A manifest consists of a header followed by fixed-width columns and the member names, all little-endian::
+
+    header        magic, version, digest size, number of members, lengths of the archive type and the digest algorithm
+    type          the archive type, e.g., ``application/x-tar``, padded to a multiple of 8 bytes together with the
+                  digest algorithm
+    algorithm     the digest algorithm, e.g., ``blake2b``
+    name offsets  (members + 1) x uint64, the offsets of the names in the name blob
+    sizes         members x uint64
+    kinds         members x uint8, the tar type code of each member, e.g., ``0`` for regular files
+    flags         members x uint8, whether each member has a digest
+    digests       members x digest size, the raw digests
+    names         the UTF-8 encoded normalized member names, sorted bytewise
+
+Because the names are sorted and their offsets are stored, members and directories are looked up by binary search
+directly in the memory-mapped file, without reading the whole manifest.
+"""
+
+
+from array import array
+import bisect
+import itertools
+import mmap
+import os
+import pathlib
+import posixpath
+import struct
+import sys
+import tarfile
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence
+from uuid import uuid4
+
+
+# Leading bytes of a manifest. Legacy JSON file lists start with "{".
+MAGIC = b'\x89NRSMAN\n'
+
+_VERSION = 1
+
+_HEADER = struct.Struct('<8sIIQII')
+
+_UINT64 = struct.Struct('<Q')
+
+# Size of each digest algorithm in bytes
+_DIGEST_SIZES = {
+    'blake2b': 64,
+    'crc32': 4,
+}
+
+
+class ManifestEntry(NamedTuple):
+    "A member of an archive recorded in a manifest."
+    # Path of the member relative to the data dir, normalized and with "/" as the separator
+    name: str
+    # The tar type code of the member, e.g., tarfile.REGTYPE. Regular files of all kinds are recorded as REGTYPE.
+    kind: bytes
+    # Size of the member in bytes if it is a regular file, 0 otherwise
+    size: int
+    # Hex digest of the content of the member, or None if none was recorded
+    digest: Optional[str]
+
+
+def normalize_name(name: str) -> str:
+    """Normalize the name of a member, so that, e.g., ``./a.txt`` and ``a.txt``, or ``dir/`` and ``dir``, are the same.
+
+    :param name: The name of the member in the archive.
+    :return: The normalized name. The data dir itself is ``.``.
+    """
+    return posixpath.normpath(name.replace(os.sep, '/'))
+
+
+def _encode(name: str) -> bytes:
+    "Encode a name like the file system does."
+    return name.encode('utf-8', 'surrogateescape')
+
+
+def is_manifest(path: pathlib.Path) -> bool:
+    """Check whether a file list is a binary manifest rather than a legacy JSON file list.
+
+    :param path: Path to the file list.
+    """
+    with open(path, mode='rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class Manifest:
+    """A memory-mapped manifest. Members are only decoded when they are accessed.
+
+    :param path: Path to the manifest.
+    :raises ValueError: The file is not a manifest of a supported version.
+    """
+
+    def __init__(self, path: pathlib.Path) -> None:
+        """Constructor method.
+        """
+        try:
+            with open(path, mode='rb') as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError as e:  # An empty file can't be mapped
+            raise ValueError(f'Failed to read manifest "{path}"\ncaused by:\n{e}')
+        try:
+            magic, version, self._digest_size, self._count, type_length, algorithm_length = \
+                _HEADER.unpack_from(self._mmap)
+            if magic != MAGIC or version != _VERSION:
+                raise ValueError(f'{path} is not a manifest of version {_VERSION}')
+            offset = _HEADER.size
+            self.type: str = self._mmap[offset:offset + type_length].decode()
+            offset += type_length
+            self.digest_algorithm: Optional[str] = self._mmap[offset:offset + algorithm_length].decode() or None
+            offset += algorithm_length
+            self._name_offsets = offset + -offset % 8
+            self._sizes = self._name_offsets + (self._count + 1) * _UINT64.size
+            self._kinds = self._sizes + self._count * _UINT64.size
+            self._flags = self._kinds + self._count
+            self._digests = self._flags + self._count
+            self._names = self._digests + self._count * self._digest_size
+            if self._names + self._offset(self._count) != len(self._mmap):
+                raise ValueError(f'{path} is truncated')
+        except (struct.error, ValueError) as e:
+            self._mmap.close()
+            raise ValueError(f'Failed to read manifest "{path}"\ncaused by:\n{e}')
+
+    def close(self) -> None:
+        "Unmap the manifest. Entries that have been read stay valid."
+        self._mmap.close()
+
+    def __enter__(self) -> 'Manifest':
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _offset(self, index: int) -> int:
+        "The offset of the name of the member at ``index`` in the name blob."
+        return _UINT64.unpack_from(self._mmap, self._name_offsets + index * _UINT64.size)[0]
+
+    def _name(self, index: int) -> bytes:
+        "The encoded name of the member at ``index``."
+        return self._mmap[self._names + self._offset(index):self._names + self._offset(index + 1)]
+
+    def __getitem__(self, index: int) -> ManifestEntry:
+        if not 0 <= index < self._count:
+            raise IndexError('manifest index out of range')
+        digest = None
+        if self._mmap[self._flags + index]:
+            start = self._digests + index * self._digest_size
+            digest = self._mmap[start:start + self._digest_size].hex()
+        return ManifestEntry(name=self._name(index).decode('utf-8', 'surrogateescape'),
+                             kind=self._mmap[self._kinds + index:self._kinds + index + 1],
+                             size=_UINT64.unpack_from(self._mmap, self._sizes + index * _UINT64.size)[0],
+                             digest=digest)
+
+    def __iter__(self) -> Iterator[ManifestEntry]:
+        for index in range(self._count):
+            yield self[index]
+
+    def _bisect(self, name: bytes) -> int:
+        "The index of the first member whose name isn't less than ``name``."
+        return bisect.bisect_left(_Names(self), name)
+
+    def find(self, name: str) -> Optional[ManifestEntry]:
+        """Look up a member.
+
+        :param name: The name of the member, normalized or not.
+        :return: The member, or ``None`` if it is not in the manifest.
+        """
+        encoded = _encode(normalize_name(name))
+        index = self._bisect(encoded)
+        if index < self._count and self._name(index) == encoded:
+            return self[index]
+        return None
+
+    def under(self, path: str) -> Iterator[ManifestEntry]:
+        """The member at ``path`` and all members below it, e.g., the files of a subdataset.
+
+        :param path: Path relative to the data dir, normalized or not. ``.`` means all members.
+        :return: The members in sorted order.
+        """
+        path = normalize_name(path)
+        if path == '.':
+            yield from self
+            return
+        entry = self.find(path)
+        if entry is not None:
+            yield entry
+        # Members below path are contiguous, because all of their names start with "path/"
+        prefix = _encode(path + '/')
+        for index in range(self._bisect(prefix), self._bisect(_encode(path + '0'))):  # "0" follows "/"
+            yield self[index]
+
+
+class _Names(Sequence[bytes]):
+    "The sorted names of a manifest as a sequence, so that they can be searched by :mod:`bisect`."
+
+    def __init__(self, manifest: Manifest) -> None:
+        self._manifest = manifest
+
+    def __len__(self) -> int:
+        return len(self._manifest)
+
+    def __getitem__(self, index):  # type: ignore
+        return self._manifest._name(index)
+
+
+class ManifestWriter:
+    """Collects the members of an archive as they are extracted, then writes them as a manifest. Members are kept in
+    compact columns rather than as objects until they are sorted and written. If the same name is added more than once,
+    e.g., because a tar archive contains several versions of a file, the last one is kept.
+
+    :param archive_type: The archive type, i.e., the key of the extractor of the archive.
+    :param digest_algorithm: The algorithm of the digests of the members, or ``None`` if no digests are recorded.
+    """
+
+    def __init__(self, archive_type: str, digest_algorithm: Optional[str] = None) -> None:
+        """Constructor method.
+        """
+        self._type = archive_type
+        self._digest_algorithm = digest_algorithm
+        self._digest_size = 0 if digest_algorithm is None else _DIGEST_SIZES[digest_algorithm]
+        self._names: List[bytes] = []
+        self._kinds = bytearray()
+        self._sizes: List[int] = []
+        self._digests: Dict[int, bytes] = {}
+
+    def add(self, name: str, kind: bytes, size: int = 0, digest: Optional[str] = None) -> int:
+        """Add a member.
+
+        :param name: The name of the member in the archive.
+        :param kind: The tar type code of the member.
+        :param size: The size of the member if it is a regular file.
+        :param digest: The hex digest of the content of the member, if it is already known.
+        :return: The index of the member, which :meth:`set_digest` takes.
+        """
+        index = len(self._names)
+        self._names.append(_encode(normalize_name(name)))
+        self._kinds += kind
+        self._sizes.append(size)
+        if digest is not None:
+            self.set_digest(index, digest)
+        return index
+
+    def set_digest(self, index: int, digest: str) -> None:
+        """Set the digest of a member.
+
+        :param index: The index returned by :meth:`add`.
+        :param digest: The hex digest of the content of the member.
+        """
+        self._digests[index] = bytes.fromhex(digest)
+
+    def names(self) -> Iterator[str]:
+        "The normalized names of the members added so far, in the order they were added."
+        return (name.decode('utf-8', 'surrogateescape') for name in self._names)
+
+    def regular_files(self) -> Iterator[int]:
+        "The indices of the regular files added so far. Of several members of the same name, only the last one counts."
+        last = {name: index for index, name in enumerate(self._names)}
+        return (index for index in last.values() if self._kinds[index] == tarfile.REGTYPE[0])
+
+    def write(self, path: pathlib.Path) -> None:
+        """Write the manifest. It is written to a temporary file first and then renamed, so that a manifest is either
+        complete or absent.
+
+        :param path: Path to the manifest.
+        """
+
+        # Sorting the indices rather than the names keeps the last of several members of the same name
+        last = {name: index for index, name in enumerate(self._names)}
+        order = sorted(last.values(), key=self._names.__getitem__)
+
+        type_ = self._type.encode()
+        algorithm = (self._digest_algorithm or '').encode()
+        header = _HEADER.pack(MAGIC, _VERSION, self._digest_size, len(order), len(type_), len(algorithm))
+        header += type_ + algorithm
+        header += b'\0' * (-len(header) % 8)
+
+        columns = [array('Q', [0]), array('Q', (self._sizes[index] for index in order))]
+        columns[0].extend(itertools.accumulate(len(self._names[index]) for index in order))
+        if sys.byteorder == 'big':
+            for column in columns:
+                column.byteswap()
+        empty_digest = b'\0' * self._digest_size
+
+        tmp_path = path.with_name(f'.{path.name}-{uuid4()}')
+        try:
+            with open(tmp_path, mode='wb') as f:
+                f.write(header)
+                for column in columns:
+                    column.tofile(f)
+                f.write(bytes(self._kinds[index] for index in order))
+                f.write(bytes(index in self._digests for index in order))
+                f.write(b''.join(self._digests.get(index, empty_digest) for index in order))
+                f.write(b''.join(self._names[index] for index in order))
+            os.replace(tmp_path, path)
+        except BaseException:
+            if tmp_path.exists():
+                tmp_path.unlink()
+            raise
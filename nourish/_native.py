@@ -0,0 +1,172 @@
+# Copyright 2021 Edward Leardi. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"Extraction backends that run native multithreaded tools as subprocesses."
+
+
+from contextlib import contextmanager
+import functools
+import io
+import pathlib
+import shutil
+import subprocess  # nosec
+import tempfile
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple
+
+
+# Commands that decompress the file given as the last argument to the standard output, keyed by compression
+decompress_commands: Dict[str, Tuple[str, ...]] = {
+    'gzip': ('pigz', '-d', '-c'),
+    'bzip2': ('pbzip2', '-d', '-c'),
+    'xz': ('xz', '-d', '-c', '-T0'),
+}
+
+# Command that extracts a tarball from the standard input into the directory given as the last argument
+tar_command: Tuple[str, ...] = ('tar', '-x', '-f', '-', '--no-same-owner', '-C')
+
+
+@functools.lru_cache(maxsize=None)
+def _which(name: str) -> Optional[str]:
+    "Memoized :func:`shutil.which`."
+    return shutil.which(name)
+
+
+@functools.lru_cache(maxsize=None)
+def _is_gnu_tar(executable: str) -> bool:
+    """Check whether ``executable`` is GNU tar, whose options :data:`tar_command` relies on.
+
+    :param executable: Path to a tar executable.
+    """
+    command = [executable, '--version']
+    try:
+        version = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL).stdout  # nosec
+    except OSError:
+        return False
+    return b'GNU tar' in version
+
+
+def decompressor(compression: str) -> Optional[List[str]]:
+    """The native command that decompresses a file of ``compression`` to the standard output.
+
+    :param compression: Name of the compression, ``'gzip'``, ``'bzip2'``, or ``'xz'``.
+    :return: The command without the path to the file, or ``None`` if the tool isn't on ``PATH``.
+    """
+    name, *args = decompress_commands[compression]
+    executable = _which(name)
+    return None if executable is None else [executable, *args]
+
+
+def tar_extractor() -> Optional[List[str]]:
+    """The native command that extracts a tarball from the standard input.
+
+    :return: The command without the data dir, or ``None`` if GNU tar isn't on ``PATH``.
+    """
+    name, *args = tar_command
+    executable = _which(name)
+    return None if executable is None or not _is_gnu_tar(executable) else [executable, *args]
+
+
+def _error(command: List[str], returncode: int, stderr: IO[bytes]) -> OSError:
+    "The error raised when a native tool exits with a failure."
+    stderr.seek(0)
+    message = stderr.read().decode(errors='replace').strip()
+    return OSError(f'{pathlib.Path(command[0]).name} exited with status {returncode}\ncaused by:\n{message}')
+
+
+@contextmanager
+def decompressed(command: List[str], path: pathlib.Path) -> Iterator[IO[bytes]]:
+    """Run a native decompressor and read its output.
+
+    :param command: The command returned by :func:`decompressor`.
+    :param path: Path to the compressed file.
+    :raises OSError: The decompressor failed, e.g., because the file is corrupted.
+    :return: Context manager of the decompressed data, which must be read to its end. The decompressor is killed if
+        the context is left with an exception.
+    """
+    # The error messages go to a file rather than a pipe, which could fill up while nobody reads it
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(command + [str(path)], stdout=subprocess.PIPE, stderr=stderr)  # nosec
+        assert process.stdout is not None
+        try:
+            with process.stdout:
+                yield process.stdout
+        except BaseException:
+            process.kill()
+            process.wait()
+            raise
+        returncode = process.wait()
+        if returncode != 0:
+            raise _error(command, returncode, stderr)
+
+
+class _TeeReader(io.RawIOBase):
+    """Reads from a stream and writes everything it reads to another stream.
+
+    :param source: The stream to read from.
+    :param sink: The stream to copy the data to.
+    """
+
+    def __init__(self, source: IO[bytes], sink: IO[bytes]) -> None:
+        super().__init__()
+        self._source = source
+        self._sink = sink
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b: Any) -> int:
+        data = self._source.read(len(b))
+        self._sink.write(data)
+        b[:len(data)] = data
+        return len(data)
+
+
+@contextmanager
+def extracting_tar(command: List[str], source: IO[bytes], data_dir: pathlib.Path) -> Iterator[IO[bytes]]:
+    """Run native tar to extract a tarball into ``data_dir``, while the caller reads the same tarball, e.g., to list
+    its members.
+
+    :param command: The command returned by :func:`tar_extractor`.
+    :param source: The stream of the uncompressed tarball.
+    :param data_dir: Path to the data dir to extract the data files to.
+    :raises OSError: tar failed, e.g., because the tarball is corrupted.
+    :return: Context manager of a stream that reads ``source`` and feeds what it reads to tar. Whatever is left unread
+        at the end of the context is fed to tar as well.
+    """
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(command + [str(data_dir)], stdin=subprocess.PIPE, stderr=stderr)  # nosec
+        assert process.stdin is not None
+        try:
+            try:
+                tee = io.BufferedReader(_TeeReader(source, process.stdin))
+                yield tee
+                while tee.read(io.DEFAULT_BUFFER_SIZE):
+                    pass
+            finally:
+                try:
+                    process.stdin.close()
+                except BrokenPipeError:
+                    pass
+        except BrokenPipeError:
+            # tar exited early. Its exit status tells why.
+            if process.wait() == 0:
+                raise
+        except BaseException:
+            process.kill()
+            process.wait()
+            raise
+        returncode = process.wait()
+        if returncode != 0:
+            raise _error(command, returncode, stderr)
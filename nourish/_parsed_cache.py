@@ -0,0 +1,169 @@
+# Copyright 2021 Edward Leardi. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"Columnar cache of parsed subdatasets."
+
+
+import hashlib
+import json
+import os
+import pathlib
+from typing import Any, Optional, Sequence
+from uuid import uuid4
+
+import pandas as pd  # type: ignore[import]
+
+from . import typing as typing_
+from .loaders._selection import Filters, check_filters, filter_mask, needed_columns
+
+
+class ParsedCache:
+    """Stores parsed subdatasets as uncompressed Arrow IPC (Feather V2) files, so that loading a subdataset again
+    memory-maps the file instead of parsing the data files.
+
+    A subdataset is stored as :file:`{subdataset}.{key}.arrow` directly under ``cache_dir``, where ``subdataset`` is a
+    digest of the name of the subdataset and ``key`` is a digest of everything the parsed data depends on, see
+    :meth:`key`. A stored subdataset is only found under the same key, so that it is invalidated by any change of the
+    data file or of how it is loaded, and it is replaced when the subdataset is stored again. Only
+    :class:`pandas.DataFrame` objects are stored; other data, such as the strings of plain text files, aren't faster to
+    read from a cache than from the data files. Several processes may share a cache: files are only added by atomic
+    renames.
+
+    :param cache_dir: Directory of the cache. Created when the first subdataset is stored.
+    :raises ImportError: :mod:`pyarrow` is not installed.
+    """
+
+    # Version of the layout of the cache, which is part of every key
+    VERSION = 1
+
+    # Prefix of the name of a file that is being added to the cache
+    _TMP_PREFIX = '.tmp-'
+
+    def __init__(self, cache_dir: typing_.PathLike) -> None:
+        """Constructor method.
+        """
+        try:
+            import pyarrow.feather  # type: ignore[import]
+        except ImportError as e:
+            raise ImportError('The cache of parsed subdatasets requires pyarrow. Install it with '
+                              f'`pip install nourish[arrow]`.\nCaused by:\n{e}')
+        self._pyarrow = pyarrow
+        self._feather = pyarrow.feather
+        self._arrow_exception = pyarrow.ArrowException
+        self._cache_dir: pathlib.Path = pathlib.Path(os.path.abspath(cache_dir))
+
+    @classmethod
+    def key(cls, **parts: Any) -> str:
+        """Compute the key of a parsed subdataset.
+
+        :param parts: Everything the parsed data depends on, e.g., the state of the data file, the loader, and the
+            format options. The values must be JSON serializable or have a stable ``str``.
+        :return: Hex digest of ``parts`` and :attr:`VERSION`.
+        """
+        parts = {**parts, 'version': cls.VERSION}
+        return hashlib.blake2b(json.dumps(parts, sort_keys=True, default=str).encode(), digest_size=16).hexdigest()
+
+    @staticmethod
+    def _prefix(subdataset: str) -> str:
+        "The part of the file names of a subdataset that doesn't depend on the key."
+        return hashlib.blake2b(subdataset.encode(), digest_size=8).hexdigest()
+
+    def _path(self, subdataset: str, key: str) -> pathlib.Path:
+        "Path to the file of a parsed subdataset."
+        return self._cache_dir / f'{self._prefix(subdataset)}.{key}.arrow'
+
+    def get(self, subdataset: str, key: str, *,
+            columns: Optional[Sequence[str]] = None,
+            filters: Optional[Filters] = None) -> Optional[pd.DataFrame]:
+        """Look up a parsed subdataset. A file that can't be read, e.g., because it is corrupted, is removed.
+
+        Only the selected columns are converted to a :class:`pandas.DataFrame`. Rows are filtered on the columns that
+        ``filters`` refer to before the other columns are converted, so that the rows that aren't selected are never
+        copied out of the memory-mapped file.
+
+        :param subdataset: Name of the subdataset.
+        :param key: The key returned by :meth:`key`.
+        :param columns: The columns to load, in the order they are returned. ``None`` means all columns.
+        :param filters: The conditions that the loaded rows satisfy. The rows are renumbered. ``None`` means all rows.
+        :raises ValueError: ``filters`` are malformed, or a selected column is not in the subdataset.
+        :return: The parsed subdataset, or ``None`` if it isn't in the cache.
+        """
+
+        path = self._path(subdataset, key)
+        try:
+            table = self._feather.read_table(str(path), memory_map=True)
+        except FileNotFoundError:
+            return None
+        except (OSError, self._arrow_exception):
+            self._remove(path)
+            return None
+        if columns is None and filters is None:
+            return table.to_pandas()
+
+        needed = needed_columns(columns, filters)
+        missing = [column for column in needed or () if column not in table.schema.names]
+        if missing:
+            raise ValueError(f'Columns {missing} are not in subdataset "{subdataset}".')
+        if needed is not None:
+            table = table.select(needed)
+        if filters is not None:
+            check_filters(filters)
+            filter_columns = list(dict.fromkeys(column for column, _, _ in filters))
+            mask = filter_mask(table.select(filter_columns).to_pandas(), filters)
+            table = table.filter(self._pyarrow.array(mask.to_numpy()))
+        data = table.to_pandas()
+        if filters is not None:
+            data = data.reset_index(drop=True)
+        return data if columns is None else data[list(columns)]
+
+    def put(self, subdataset: str, key: str, data: Any) -> bool:
+        """Store a parsed subdataset and remove the files of the subdataset under other keys.
+
+        :param subdataset: Name of the subdataset.
+        :param key: The key returned by :meth:`key`.
+        :param data: The parsed subdataset.
+        :return: ``True`` if ``data`` has been stored, ``False`` if it can't be stored, e.g., because it isn't a
+            :class:`pandas.DataFrame`, or its columns aren't supported by Arrow IPC files.
+        """
+
+        # Arrow turns other column names into strings
+        if not isinstance(data, pd.DataFrame) or not all(isinstance(column, str) for column in data.columns):
+            return False
+
+        self._cache_dir.mkdir(parents=True, exist_ok=True)
+        target = self._path(subdataset, key)
+        tmp_path = self._cache_dir / f'{self._TMP_PREFIX}{uuid4()}'
+        try:
+            # Uncompressed, so that reading it memory-maps the columns rather than decompressing them
+            self._feather.write_feather(data, str(tmp_path), compression='uncompressed')
+            os.replace(tmp_path, target)
+        except (OSError, ValueError, TypeError, self._arrow_exception):
+            self._remove(tmp_path)
+            return False
+
+        for path in self._cache_dir.glob(f'{self._prefix(subdataset)}.*.arrow'):
+            if path != target:
+                self._remove(path)
+        return True
+
+    @staticmethod
+    def _remove(path: pathlib.Path) -> None:
+        "Remove a file from the cache if it is still there."
+        try:
+            path.unlink()
+        except FileNotFoundError:  # Removed by another process
+            pass
+        except PermissionError:  # Opened by another process on Windows; it will be replaced later
+            pass
@@ -20,16 +20,21 @@
 
 from abc import ABC
 from copy import deepcopy
-from typing import Any, Dict, Union
+from typing import TYPE_CHECKING, Any, Dict, Type, TypeVar, Union
 
 import yaml
 
 from . import typing as typing_
-from ._schemata_retrieval import retrieve_schemata_file
+from ._schemata_retrieval import aretrieve_schemata_file, retrieve_schemata_file
+
+if TYPE_CHECKING:
+    import aiohttp
 
 
 SchemaDict = Dict[str, Any]
 
+_BaseSchemataType = TypeVar('_BaseSchemataType', bound='BaseSchemata')
+
 
 class BaseSchemata(ABC):
     """Abstract class that provides functionality to load and export the contents of a schemata file.
@@ -46,12 +51,35 @@ class BaseSchemata(ABC):
                  tls_verification: Union[bool, typing_.PathLike] = True) -> None:
         """Constructor method.
         """
-        self._schemata: SchemaDict = self._load_retrieved_schemata(
-                                            retrieve_schemata_file(url_or_path, tls_verification=tls_verification))
+        self._initialize(url_or_path, retrieve_schemata_file(url_or_path, tls_verification=tls_verification))
+
+    def _initialize(self, url_or_path: Union[typing_.PathLike, str], schemata: str) -> None:
+        """Load the retrieved schemata file and remember where it was retrieved from.
+
+        :param url_or_path: URL or path from which the schemata file was retrieved.
+        :param schemata: Content of the retrieved schemata file.
+        """
+        self._schemata: SchemaDict = self._load_retrieved_schemata(schemata)
 
         # The URL or path from which the schemata was retrieved
         self._retrieved_url_or_path: Union[typing_.PathLike, str] = url_or_path
 
+    @classmethod
+    async def acreate(cls: Type[_BaseSchemataType], url_or_path: Union[typing_.PathLike, str], *,
+                      session: 'aiohttp.ClientSession',
+                      tls_verification: Union[bool, typing_.PathLike] = True) -> _BaseSchemataType:
+        """Awaitable counterpart of the constructor, which retrieves the schemata file without blocking the event loop.
+
+        :param session: The :class:`aiohttp.ClientSession` used to retrieve remote schemata files.
+        :raises ValueError: See :class:`BaseSchemata`.
+        :raises InsecureConnectionError: See :class:`BaseSchemata`.
+        :return: The schemata object.
+        """
+        content = await aretrieve_schemata_file(url_or_path, session=session, tls_verification=tls_verification)
+        schemata = cls.__new__(cls)
+        schemata._initialize(url_or_path, content)
+        return schemata
+
     def _load_retrieved_schemata(self, schemata: str) -> SchemaDict:
         """Safely loads retrieved schemata file.
 
@@ -18,9 +18,13 @@
 "Retrieve remote schemata file."
 
 
+from concurrent.futures import Executor
+import functools
+import os
 from pathlib import Path
 import re
-from typing import Union
+import ssl
+from typing import TYPE_CHECKING, Any, Dict, Optional, Union
 from urllib.parse import urlparse
 from urllib.request import urlopen
 
@@ -28,8 +32,13 @@ import requests
 import requests.exceptions
 
 from . import typing as typing_
+from ._async import run_in_executor
+from ._http import get_session
 from .exceptions import InsecureConnectionError
 
+if TYPE_CHECKING:
+    import aiohttp
+
 
 # Semantically, typing_.PathLike doesn't cover strings that represent URLs
 def retrieve_schemata_file(url_or_path: Union[typing_.PathLike, str], *,
@@ -58,8 +67,10 @@ def retrieve_schemata_file(url_or_path: Union[typing_.PathLike, str], *,
             if scheme == 'http' and tls_verification:
                 raise InsecureConnectionError((f'{url_or_path} is a http link and insecure. '
                                                'Set tls_verification=False to accept http links.'))
+            # requests takes the path to a CA bundle as a string only
+            verify = tls_verification if isinstance(tls_verification, bool) else os.fspath(tls_verification)
             try:
-                content = requests.get(url_or_path, allow_redirects=True, verify=tls_verification).content
+                content = get_session().get(url_or_path, allow_redirects=True, verify=verify).content
             except requests.exceptions.SSLError as e:
                 raise InsecureConnectionError((f'Failed to securely connect to {url_or_path}. Caused by:\n{e}'))
 
@@ -74,3 +85,42 @@ def retrieve_schemata_file(url_or_path: Union[typing_.PathLike, str], *,
     else:
         # Not a URL, treated as a local file path
         return Path(url_or_path).read_text(encoding)
+
+
+async def aretrieve_schemata_file(url_or_path: Union[typing_.PathLike, str], *,
+                                  session: 'aiohttp.ClientSession',
+                                  encoding: str = 'utf-8',
+                                  tls_verification: Union[bool, typing_.PathLike] = True,
+                                  executor: Optional[Executor] = None) -> str:
+    """Awaitable counterpart of :func:`retrieve_schemata_file`. http and https URLs are retrieved with :mod:`aiohttp`;
+    other URLs and paths are read in ``executor``.
+
+    :param session: The :class:`aiohttp.ClientSession` used to send the request.
+    :param executor: The executor that reads local files. ``None`` means the default executor of the event loop.
+    """
+
+    url_or_path = str(url_or_path)
+    scheme = urlparse(url_or_path).scheme if re.match(r'[a-zA-Z0-9]+:\/\/', url_or_path) else None
+    if scheme not in ('http', 'https'):
+        return await run_in_executor(executor, functools.partial(retrieve_schemata_file, url_or_path,
+                                                                 encoding=encoding,
+                                                                 tls_verification=tls_verification))
+
+    import aiohttp
+
+    if scheme == 'http' and tls_verification:
+        raise InsecureConnectionError((f'{url_or_path} is a http link and insecure. '
+                                       'Set tls_verification=False to accept http links.'))
+    # Without the ssl option, the default of the session applies
+    options: Dict[str, Any] = {}
+    if tls_verification is False:
+        options['ssl'] = False
+    elif tls_verification is not True:
+        options['ssl'] = ssl.create_default_context(cafile=str(tls_verification))
+    try:
+        async with session.get(url_or_path, allow_redirects=True, **options) as response:
+            content = await response.read()
+    except aiohttp.ClientSSLError as e:
+        raise InsecureConnectionError((f'Failed to securely connect to {url_or_path}. Caused by:\n{e}'))
+
+    return content.decode(encoding)
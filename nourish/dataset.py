@@ -18,6 +18,8 @@
 "Dataset downloading and loading functionality."
 
 
+from ._cache import ArchiveCache
+from ._compact import MemoryReport
 from ._dataset import Dataset
 
-__all__ = ('Dataset',)
+__all__ = ('ArchiveCache', 'Dataset', 'MemoryReport')
@@ -24,3 +24,8 @@ from ._lock import DirectoryLockAcquisitionError
 class InsecureConnectionError(RuntimeError):
     "The connection is insecure."
     pass
+
+
+class DownloadFailedError(RuntimeError):
+    "A download of a dataset that was waited for failed in another thread or process."
+    pass
@@ -21,6 +21,7 @@
 from . import table, text
 from ._base import Loader
 from ._format_loader_map import FormatLoaderMap
+from ._selection import Filters
 
 __all__ = (
            # modules
@@ -29,4 +30,6 @@ __all__ = (
            # _format_loader_map
            'FormatLoaderMap',
            # _base
-           'Loader')
+           'Loader',
+           # _selection
+           'Filters')
@@ -20,26 +20,66 @@
 
 from abc import ABC, abstractmethod
 import os
-from typing import Any, Dict, Union
+from typing import Any, Dict, Iterator, Optional, Sequence, Union
 
 from .. import typing as typing_
 from .._schema import SchemaDict
+from ._selection import Filters
 
 
 class Loader(ABC):
     """Base class of all loaders.
     """
 
+    #: Whether :meth:`load` takes the keyword argument ``index_dir``, a directory outside of the data files where the
+    #: loader may keep indexes of the files it loads, e.g., one under the directory of a
+    #: :class:`~nourish.dataset.Dataset`. It is only passed if it is given. Loaders that keep indexes set this to
+    #: ``True``.
+    takes_index_dir: bool = False
+
     @abstractmethod
-    def load(self, path: Union[typing_.PathLike, Dict[str, str]], options: SchemaDict) -> Any:
+    def load(self, path: Union[typing_.PathLike, Dict[str, str]], options: SchemaDict, *,
+             columns: Optional[Sequence[str]] = None, filters: Optional[Filters] = None) -> Any:
         """Loads from a given path or a dict of path configurations. This must be overridden when inherited.
 
+        ``columns`` and ``filters`` are only passed if a subset of a table is selected, so loaders of data other than
+        tables may leave them out.
+
         :param path: The path or path configurations of the files to be loaded.
         :param options: Options passed to the loader.
+        :param columns: The columns to load, in the order they are returned. ``None`` means all columns.
+        :param filters: The conditions that the loaded rows satisfy, see :mod:`._selection`. The rows are renumbered.
+            ``None`` means all rows.
         :return: The object representing the loaded file.
         """
         self.check_path(path)
 
+    def iter_load(self, path: Union[typing_.PathLike, Dict[str, str]], options: SchemaDict, *,
+                  chunksize: int,
+                  columns: Optional[Sequence[str]] = None,
+                  filters: Optional[Filters] = None) -> Iterator[Any]:
+        """Loads from a given path in chunks, so that files larger than RAM can be processed piece by piece. Loaders
+        that support it override this.
+
+        :param path: The path or path configurations of the files to be loaded.
+        :param options: Options passed to the loader, the same as those of :meth:`.load`.
+        :param chunksize: The size of each chunk, e.g., the number of rows of a table.
+        :param columns: Same as :meth:`.load`.
+        :param filters: Same as :meth:`.load`.
+        :raises NotImplementedError: The loader doesn't support loading in chunks.
+        :return: An iterator of the objects representing the chunks of the loaded file.
+        """
+        raise NotImplementedError(f'{self.__class__.__name__} does not support loading in chunks.')
+
+    def cache_key(self) -> Dict[str, Any]:
+        """The configuration of the loader that affects what it loads, such as the arguments of its constructor. It is
+        part of the key of a parsed subdataset in the cache, so that loaders that are configured differently don't share
+        cached data. Loaders with such configuration override this.
+
+        :return: The configuration, which must be JSON serializable or have a stable ``str``.
+        """
+        return {}
+
     def check_path(self, path: Union[typing_.PathLike, Dict[str, str]]) -> None:
         """Check if the given path is a valid path to the file to be loaded. Raise an error if it is not.
 
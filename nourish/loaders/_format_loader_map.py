@@ -18,11 +18,13 @@
 "Format to loader map."
 
 
-from typing import Any, Dict, Mapping, Optional, Union
+import pathlib
+from typing import Any, Dict, Iterator, Mapping, Optional, Sequence, Tuple, Union
 
 from .._schema import SchemaDict
 
 from ._base import Loader
+from ._selection import Filters, selection_kwargs
 from .text import PlainTextLoader
 from .table import CSVPandasLoader
 
@@ -75,19 +77,17 @@ _default_format_loader_map: FormatLoaderMap = FormatLoaderMap({
 })
 
 
-def load_data_files(fmt: Union[str, SchemaDict], path: Union[str, Dict[str, str]], *,
-                    format_loader_map: FormatLoaderMap = None) -> Any:
-    """Load data files.
+def resolve_format(fmt: Union[str, SchemaDict],
+                   format_loader_map: Optional[FormatLoaderMap]) -> Tuple[Loader, SchemaDict]:
+    """Find the loader of a format.
 
     :param fmt: The format.
-    :param path: Path to the file(s).
-    :param format_loader_map: The format loader map to use.
+    :param format_loader_map: The format loader map to use. ``None`` means the default one.
     :raises TypeError: ``fmt`` is neither a string nor a dict.
-    :return: Loaded data file objects.
+    :raises RuntimeError: The format loader map does not specify a loader for the format.
+    :return: The loader and the options to pass to it.
     """
 
-    # We only support path as a plain path for now, but we will extend path to support regex and other types.
-
     if format_loader_map is None:
         format_loader_map = _default_format_loader_map
 
@@ -104,4 +104,59 @@ def load_data_files(fmt: Union[str, SchemaDict], path: Union[str, Dict[str, str]
     if fmt_id not in format_loader_map:
         raise RuntimeError(f'The format loader map does not specify a loader for format "{fmt_id}".')
 
-    return format_loader_map[fmt_id].load(path, fmt_options)
+    return format_loader_map[fmt_id], fmt_options
+
+
+def index_kwargs(loader: Loader, index_dir: Optional[pathlib.Path]) -> Dict[str, Any]:
+    """The keyword argument ``index_dir`` of :meth:`Loader.load`, passed only if it is given and the loader takes it.
+
+    :param loader: The loader.
+    :param index_dir: The directory where the loader may keep indexes, or ``None``.
+    :return: The keyword arguments.
+    """
+    return {'index_dir': index_dir} if index_dir is not None and loader.takes_index_dir else {}
+
+
+def load_data_files(fmt: Union[str, SchemaDict], path: Union[str, Dict[str, str]], *,
+                    format_loader_map: FormatLoaderMap = None,
+                    columns: Optional[Sequence[str]] = None,
+                    filters: Optional[Filters] = None,
+                    index_dir: Optional[pathlib.Path] = None) -> Any:
+    """Load data files.
+
+    :param fmt: The format.
+    :param path: Path to the file(s).
+    :param format_loader_map: The format loader map to use.
+    :param columns: The columns to load. ``None`` means all columns. See :meth:`Loader.load`.
+    :param filters: The conditions that the loaded rows satisfy. ``None`` means all rows. See :meth:`Loader.load`.
+    :param index_dir: The directory where the loader may keep indexes of the files, if it takes one. See
+        :attr:`Loader.takes_index_dir`.
+    :raises TypeError: ``fmt`` is neither a string nor a dict.
+    :return: Loaded data file objects.
+    """
+
+    # We only support path as a plain path for now, but we will extend path to support regex and other types.
+
+    loader, fmt_options = resolve_format(fmt, format_loader_map)
+    return loader.load(path, fmt_options, **selection_kwargs(columns, filters), **index_kwargs(loader, index_dir))
+
+
+def iter_data_files(fmt: Union[str, SchemaDict], path: Union[str, Dict[str, str]], *, chunksize: int,
+                    format_loader_map: Optional[FormatLoaderMap] = None,
+                    columns: Optional[Sequence[str]] = None,
+                    filters: Optional[Filters] = None) -> Iterator[Any]:
+    """Load data files in chunks.
+
+    :param fmt: The format.
+    :param path: Path to the file(s).
+    :param chunksize: The size of each chunk, e.g., the number of rows of a table.
+    :param format_loader_map: The format loader map to use.
+    :param columns: Same as :func:`load_data_files`.
+    :param filters: Same as :func:`load_data_files`.
+    :raises TypeError: ``fmt`` is neither a string nor a dict.
+    :raises NotImplementedError: The loader of the format doesn't support loading in chunks.
+    :return: An iterator of the loaded chunks.
+    """
+
+    loader, fmt_options = resolve_format(fmt, format_loader_map)
+    return loader.iter_load(path, fmt_options, chunksize=chunksize, **selection_kwargs(columns, filters))
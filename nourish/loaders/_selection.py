@@ -0,0 +1,103 @@
+# Copyright 2021 Edward Leardi. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Selecting the columns and rows of tabular subdatasets.
+
+Rows are selected by filters: a sequence of ``(column, operator, value)`` conditions that a row must all satisfy, e.g.,
+``[('DATE', '>=', '2010-01-01'), ('HOURLYVISIBILITY', '>', 5)]``. The operators are ``==``, ``!=``, ``<``, ``<=``,
+``>``, ``>=``, ``in``, and ``not in``, where the value of the last two is a collection of values. Values are compared
+with the parsed columns in the same way as pandas compares a :class:`pandas.Series` with them, e.g., strings are
+compared with datetime columns as timestamps.
+"""
+
+
+import operator
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd  # type: ignore[import]
+
+
+#: Conditions ``(column, operator, value)`` that a selected row all satisfies, e.g., ``[('HOURLYVISIBILITY', '>', 5)]``.
+#: The operators are ``==``, ``!=``, ``<``, ``<=``, ``>``, ``>=``, ``in``, and ``not in``.
+Filters = Sequence[Tuple[str, str, Any]]
+
+_OPERATORS: Dict[str, Callable[[pd.Series, Any], pd.Series]] = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    'in': lambda column, values: column.isin(values),
+    'not in': lambda column, values: ~column.isin(values),
+}
+
+
+def check_filters(filters: Filters) -> None:
+    """Check that filters are well-formed.
+
+    :param filters: The filters.
+    :raises ValueError: A filter is not a ``(column, operator, value)`` tuple, or its operator is not supported.
+    """
+    for condition in filters:
+        if not isinstance(condition, (tuple, list)) or len(condition) != 3:
+            raise ValueError(f'Filter {condition!r} is not a (column, operator, value) tuple.')
+        if condition[1] not in _OPERATORS:
+            raise ValueError(f'Unsupported filter operator "{condition[1]}". Supported operators are: '
+                             f'{", ".join(_OPERATORS)}.')
+
+
+def selection_kwargs(columns: Optional[Sequence[str]], filters: Optional[Filters]) -> Dict[str, Any]:
+    """The keyword arguments that pass a selection to :meth:`Loader.load`. Nothing is passed for what isn't selected,
+    so that loaders that don't support selections keep working without them.
+
+    :param columns: The selected columns. ``None`` means all columns.
+    :param filters: The filters that select rows. ``None`` means all rows.
+    :return: The keyword arguments.
+    """
+    kwargs: Dict[str, Any] = {}
+    if columns is not None:
+        kwargs['columns'] = columns
+    if filters is not None:
+        kwargs['filters'] = filters
+    return kwargs
+
+
+def needed_columns(columns: Optional[Sequence[str]], filters: Optional[Filters]) -> Optional[List[str]]:
+    """The columns that have to be read to select ``columns`` and filter by ``filters``.
+
+    :return: ``columns`` followed by the other columns that ``filters`` refer to, or ``None`` if ``columns`` is
+        ``None``, i.e., all columns have to be read.
+    """
+    if columns is None:
+        return None
+    needed = list(columns)
+    for column, _, _ in filters or ():
+        if column not in needed:
+            needed.append(column)
+    return needed
+
+
+def filter_mask(data: pd.DataFrame, filters: Filters) -> pd.Series:
+    """Evaluate filters.
+
+    :param data: The rows to filter. It has at least the columns that ``filters`` refer to.
+    :param filters: The filters. Must have been checked by :func:`check_filters`.
+    :return: Boolean series of whether each row satisfies all filters.
+    """
+    mask = pd.Series(True, index=data.index)
+    for column, op, value in filters:
+        mask &= _OPERATORS[op](data[column], value).fillna(False).astype(bool)
+    return mask
@@ -18,22 +18,88 @@
 "Tabular data loaders."
 
 
-from typing import Dict, Union
+import re
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Union
 
 import pandas as pd  # type: ignore[import]
+from pandas.api.types import infer_dtype, is_datetime64_any_dtype, is_object_dtype  # type: ignore[import]
 
 from .. import typing as typing_
 from ..schema import SchemaDict
 from ._base import Loader
+from ._selection import Filters, check_filters, filter_mask, needed_columns
+
+
+# Parser engines of pandas.read_csv
+_ENGINES = ('c', 'python', 'pyarrow')
+
+# The first version of pandas whose read_csv has the pyarrow engine
+_PYARROW_PANDAS_VERSION = (1, 4)
+
+# Number of rows parsed at a time when rows are filtered, so that only the selected rows are held in memory
+_FILTER_CHUNKSIZE = 65536
+
+
+def _check_engine(engine: str) -> None:
+    """Check that a parser engine is supported and its dependencies are installed.
+
+    :param engine: Name of the engine.
+    :raises ValueError: The engine is not supported.
+    :raises ImportError: The engine is ``'pyarrow'`` and :mod:`pyarrow` is not installed, or pandas is older than 1.4.
+    """
+    if engine not in _ENGINES:
+        raise ValueError(f'Unsupported CSV engine "{engine}". Supported engines are: {", ".join(_ENGINES)}.')
+    if engine == 'pyarrow':
+        try:
+            import pyarrow  # type: ignore[import]  # noqa: F401
+        except ImportError as e:
+            raise ImportError('The pyarrow engine of CSVPandasLoader requires pyarrow. Install it with '
+                              f'`pip install nourish[arrow]`.\nCaused by:\n{e}')
+        pandas_version = tuple(int(part) for part in re.findall(r'\d+', pd.__version__)[:2])
+        if pandas_version < _PYARROW_PANDAS_VERSION:
+            raise ImportError('The pyarrow engine of CSVPandasLoader requires pandas 1.4 or later, but pandas '
+                              f'{pd.__version__} is installed.')
+
+
+def _is_temporal(series: pd.Series) -> bool:
+    "Whether a column parsed by PyArrow holds dates, times, or timestamps."
+    if is_datetime64_any_dtype(series.dtype):
+        return True
+    return is_object_dtype(series.dtype) and infer_dtype(series, skipna=True) in ('date', 'time', 'datetime')
 
 
 class CSVPandasLoader(Loader):
     """CSV to Pandas dataframe loader.
+
+    :param engine: The parser engine of :func:`pandas.read_csv`, which the ``engine`` option of a format overrides.
+        ``'pyarrow'`` parses with the multithreaded CSV reader of PyArrow, which requires pandas 1.4 or later and
+        :mod:`pyarrow` (``pip install nourish[arrow]``). ``None`` means pandas' default C parser.
+    :param temporal_as_strings: PyArrow parses dates, times, and timestamps in the columns whose types the ``columns``
+        option doesn't give, which the other engines leave as strings. If ``True``, the ``'pyarrow'`` engine parses such
+        columns again with pandas' C parser, so that all engines load the same dataframe. This costs a second pass over
+        the file whenever there are such columns, because PyArrow can't be told not to infer dates and times.
+    :raises ValueError: ``engine`` is not supported.
+    :raises ImportError: ``engine`` is ``'pyarrow'`` and :mod:`pyarrow` is not installed, or pandas is older than 1.4.
     """
 
-    def load(self, path: Union[typing_.PathLike, Dict[str, str]], options: SchemaDict) -> pd.DataFrame:
-        """The type hint says Dict, because this loader will be handling those situations in the future, perhaps via a
-        ``IteratingLoader`` class.
+    def __init__(self, engine: Optional[str] = None, *, temporal_as_strings: bool = False) -> None:
+        """Constructor method.
+        """
+        if engine is not None:
+            _check_engine(engine)
+        self._engine = engine
+        self._temporal_as_strings = temporal_as_strings
+
+    def cache_key(self) -> Dict[str, Any]:
+        """The configuration of the loader, see :meth:`Loader.cache_key`.
+
+        :return: The engine of the loader and whether it parses dates and times as strings.
+        """
+        return {'engine': self._engine, 'temporal_as_strings': self._temporal_as_strings}
+
+    def load(self, path: Union[typing_.PathLike, Dict[str, str]], options: SchemaDict, *,
+             columns: Optional[Sequence[str]] = None, filters: Optional[Filters] = None) -> pd.DataFrame:
+        """The type hint says Dict, because this loader will be handling those situations in the future.
 
         :param path: The path to the CSV file.
         :param options:
@@ -43,15 +109,140 @@ class CSVPandasLoader(Loader):
                - ``no_header`` key specifies if the first row of the CSV file contains the headers. Defaults to False.
                  If the value is set to anything "truthy" in Python, the first row of the CSV will be read as data.
                - ``encoding`` key specifies the encoding of the CSV file. Defaults to UTF-8.
+               - ``engine`` key specifies the parser engine, overriding the one the loader was created with. The
+                 engines produce the same dataframe from the same options, except for the dates and times that the
+                 ``'pyarrow'`` engine parses in the columns missing from ``columns``; see ``temporal_as_strings`` in
+                 :class:`CSVPandasLoader`.
+        :param columns: The columns to load. Only these columns and those that ``filters`` refer to are parsed.
+        :param filters: The conditions that the loaded rows satisfy. The rows are filtered chunk by chunk as they are
+            parsed, except by the ``'pyarrow'`` engine, which parses all rows of the needed columns at once.
         :raises TypeError: ``path`` is not a path object.
+        :raises ValueError: The engine is not supported, or ``filters`` are malformed.
+        :raises ImportError: The engine is ``'pyarrow'`` and :mod:`pyarrow` is not installed.
         :return: Data loaded into a :class:`pandas.DataFrame`.
         """
 
         super().load(path, options)
 
+        kwargs = self._read_csv_kwargs(options, usecols=needed_columns(columns, filters))
+        if filters is None:
+            data = self._read_whole_csv(path, options, kwargs, temporal_as_strings=self._temporal_as_strings)
+            return data if columns is None else data[list(columns)]
+
+        check_filters(filters)
+        if kwargs['engine'] == 'pyarrow':
+            chunks: Iterator[pd.DataFrame] = iter((self._read_whole_csv(
+                path, options, kwargs, temporal_as_strings=self._temporal_as_strings),))
+        else:
+            chunks = pd.read_csv(path, chunksize=_FILTER_CHUNKSIZE, **kwargs)
+        return pd.concat(list(self._select(chunks, columns, filters)))
+
+    def iter_load(self, path: Union[typing_.PathLike, Dict[str, str]], options: SchemaDict, *,
+                  chunksize: int,
+                  columns: Optional[Sequence[str]] = None,
+                  filters: Optional[Filters] = None) -> Iterator[pd.DataFrame]:
+        """Load the CSV file in dataframes of ``chunksize`` rows each. Only one chunk is held in memory at a time, and
+        every chunk is parsed with the same options as :meth:`.load`, so that the chunks concatenated are the same as
+        the dataframe that :meth:`.load` returns. PyArrow doesn't parse in chunks, so the ``'pyarrow'`` engine is
+        replaced by pandas' default C parser, which loads dates and times as :meth:`.load` does with
+        ``temporal_as_strings``.
+
+        :param path: The path to the CSV file.
+        :param options: Same as :meth:`.load`.
+        :param chunksize: The number of rows parsed at a time. Chunks have fewer rows if ``filters`` are given.
+        :param columns: Same as :meth:`.load`.
+        :param filters: Same as :meth:`.load`.
+        :raises TypeError: ``path`` is not a path object.
+        :raises ValueError: ``filters`` are malformed.
+        :return: An iterator of :class:`pandas.DataFrame`. It has a ``close`` method that closes the file.
+        """
+
+        self.check_path(path)
+
+        kwargs = self._read_csv_kwargs(options, usecols=needed_columns(columns, filters), chunked=True)
+        if filters is not None:
+            check_filters(filters)
+        chunks = pd.read_csv(path, chunksize=chunksize, **kwargs)
+        if columns is None and filters is None:
+            return chunks
+        return self._select(chunks, columns, filters)
+
+    @staticmethod
+    def _read_whole_csv(path: Union[typing_.PathLike, Dict[str, str]], options: SchemaDict,
+                        kwargs: Dict[str, Any], *, temporal_as_strings: bool) -> pd.DataFrame:
+        """Parse a whole CSV file.
+
+        :param path: The path to the CSV file.
+        :param options: The loader options.
+        :param kwargs: The keyword arguments of :func:`pandas.read_csv` returned by :meth:`_read_csv_kwargs`.
+        :param temporal_as_strings: Whether the ``'pyarrow'`` engine parses the columns whose types aren't given, and
+            in which PyArrow inferred dates or times, again with the C parser. See :class:`CSVPandasLoader`.
+        :return: The parsed dataframe.
+        """
+
+        data = pd.read_csv(path, **kwargs)
+        if kwargs['engine'] != 'pyarrow' or not temporal_as_strings:
+            return data
+
+        given = options.get('columns', {})
+        temporal = [column for column in data.columns if column not in given and _is_temporal(data[column])]
+        if temporal:
+            strings = pd.read_csv(path, **{**kwargs, 'engine': None, 'usecols': temporal, 'dtype': {},
+                                           'parse_dates': False})
+            for column in temporal:
+                data[column] = strings[column]
+        return data
+
+    @staticmethod
+    def _select(chunks: Iterator[pd.DataFrame], columns: Optional[Sequence[str]],
+                filters: Optional[Filters]) -> Iterator[pd.DataFrame]:
+        """Select the columns and rows of each chunk. Rows are renumbered across chunks, so that the selected chunks
+        concatenated are numbered from 0.
+
+        :param chunks: The chunks parsed with the needed columns.
+        :param columns: The columns to select. ``None`` means all columns.
+        :param filters: The conditions that the selected rows satisfy. ``None`` means all rows.
+        :return: The selected chunks. The first chunk is kept even if no row is selected, so that there is always at
+            least one chunk with the columns and types of the data.
+        """
+        start = 0
+        try:
+            for index, chunk in enumerate(chunks):
+                if filters is not None:
+                    chunk = chunk[filter_mask(chunk, filters)]
+                    if index > 0 and len(chunk) == 0:
+                        continue
+                    chunk.index = pd.RangeIndex(start, start + len(chunk))
+                    start += len(chunk)
+                yield chunk if columns is None else chunk[list(columns)]
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
+
+    def _read_csv_kwargs(self, options: SchemaDict, *, usecols: Optional[List[str]] = None,
+                         chunked: bool = False) -> Dict[str, Any]:
+        """Translate the loader options to keyword arguments of :func:`pandas.read_csv`.
+
+        :param options: The loader options.
+        :param usecols: The columns to parse. ``None`` means all columns. Columns other than these may still be parsed,
+            so the caller selects them from the result.
+        :param chunked: Whether the file is parsed in chunks.
+        """
+
+        engine = options.get('engine', self._engine)
+        if engine is not None:
+            _check_engine(engine)
+        if chunked and engine == 'pyarrow':  # PyArrow doesn't parse in chunks
+            engine = None
+        if engine == 'pyarrow' and options.get('no_header'):  # The pyarrow engine can't select columns by given names
+            usecols = None
+
         parse_dates = []
         dtypes = {}
         for column, type_ in options.get('columns', {}).items():
+            if usecols is not None and column not in usecols:
+                continue
             if type_ == 'datetime':
                 # pandas has this unusual handling of date datatype. Instead of specifying as a data type of a column,
                 # we have to pass in `parse_dates`.
@@ -67,12 +258,14 @@ class CSVPandasLoader(Loader):
         else:
             header = 'infer'
 
-        return pd.read_csv(path, dtype=dtypes,
-                           # The following line after "if" is for circumventing
-                           # https://github.com/pandas-dev/pandas/issues/38489
-                           # TODO: Remove the if-else part of the following line once pandas has released version >1.1.5
-                           # The bug above has been fixed.
-                           parse_dates=parse_dates if len(parse_dates) > 0 else False,
-                           header=header, names=names,
-                           encoding=options.get('encoding', 'utf-8'),
-                           delimiter=options.get('delimiter', ','))
+        return dict(dtype=dtypes,
+                    # The following line after "if" is for circumventing
+                    # https://github.com/pandas-dev/pandas/issues/38489
+                    # TODO: Remove the if-else part of the following line once pandas has released version >1.1.5
+                    # The bug above has been fixed.
+                    parse_dates=parse_dates if len(parse_dates) > 0 else False,
+                    header=header, names=names,
+                    encoding=options.get('encoding', 'utf-8'),
+                    delimiter=options.get('delimiter', ','),
+                    usecols=usecols,
+                    engine=engine)
@@ -18,31 +18,139 @@
 "Text file loaders."
 
 
+import codecs
+import itertools
 import pathlib
-from typing import cast, Dict, Union
+from typing import cast, Dict, Iterator, List, Optional, Sequence, Tuple, Union
 
 from .. import typing as typing_
 from ..schema import SchemaDict
 from ._base import Loader
+from ._selection import Filters
+from ._text_lines import TextLines
+
+
+# Size of the buffer of text files read in chunks
+_BUFFER_SIZE = 1024 * 1024
+
+# The line endings that the newline modes of open() end lines with, longest first
+_LINE_ENDINGS: Dict[Optional[str], Tuple[str, ...]] = {
+    None: ('\n',),  # Universal newlines, translated to "\n"
+    '': ('\r\n', '\n', '\r'),
+    '\n': ('\n',),
+    '\r': ('\r',),
+    '\r\n': ('\r\n',),
+}
 
 
 class PlainTextLoader(Loader):
     """Plain text to string loader.
+
+    :param memory_map: If ``True``, load plain text files as :class:`TextLines`, which memory-map the files and decode
+        lines only when they are accessed, instead of reading them into a ``str``. The ``memory_map`` format option
+        overrides this.
     """
 
-    def load(self, path: Union[typing_.PathLike, Dict[str, str]], options: SchemaDict) -> str:
+    def __init__(self, memory_map: bool = False) -> None:
+        """Constructor method.
+        """
+        self._memory_map = memory_map
+
+    takes_index_dir = True
+
+    def load(self, path: Union[typing_.PathLike, Dict[str, str]], options: SchemaDict, *,
+             columns: Optional[Sequence[str]] = None,
+             filters: Optional[Filters] = None,
+             index_dir: Optional[typing_.PathLike] = None) -> Union[str, TextLines]:
         """The type hint says Dict, because this loader will be handling those situations in the future.
 
         :param path: The path to the plain text file.
         :param options:
                - ``encoding`` key specifies the encoding of the plain text.
+               - ``memory_map`` key specifies whether the file is loaded as :class:`TextLines`. Defaults to the
+                 ``memory_map`` of the loader.
+        :param columns: Not supported, since plain text has no columns.
+        :param filters: Not supported, since plain text has no rows.
+        :param index_dir: The directory of the line indexes of memory-mapped files, see :class:`TextLines`.
         :raises TypeError: ``path`` is not a path object.
-        :return: Data loaded into a ``str``.
+        :raises ValueError: ``columns`` or ``filters`` is given, or the file is memory-mapped and its encoding is not
+            supported by :class:`TextLines`.
+        :return: Data loaded into a ``str``, or the :class:`TextLines` of the file if it is memory-mapped.
         """
 
         super().load(path, options)
 
+        if columns is not None or filters is not None:
+            raise ValueError(f'{self.__class__.__name__} does not support selecting columns or rows.')
+
         encoding = options.get('encoding', 'utf-8')
         # We can remove usage of cast once Dict[str, str] handling is added
         path = cast(typing_.PathLike, path)
+        if options.get('memory_map', self._memory_map):
+            return TextLines(path, encoding, index_dir)
         return pathlib.Path(path).read_text(encoding=encoding)
+
+    def iter_load(self, path: Union[typing_.PathLike, Dict[str, str]], options: SchemaDict, *,
+                  chunksize: int,
+                  columns: Optional[Sequence[str]] = None,
+                  filters: Optional[Filters] = None) -> Iterator[List[str]]:
+        """Load the lines of a plain text file in lists of ``chunksize`` lines each. The file is read with a large
+        buffer, and only one chunk is held in memory at a time, so that files of any size can be streamed through.
+
+        :param path: The path to the plain text file.
+        :param options:
+               - ``encoding`` key specifies the encoding of the plain text.
+               - ``newline`` key specifies which line endings end lines, the same as ``newline`` of :func:`open`.
+                 Defaults to ``None``, i.e., ``\\n``, ``\\r\\n``, and ``\\r``, which are all translated to
+                 ``\\n``.
+               - ``keepends`` key specifies whether the lines include their line endings. Defaults to ``False``, in
+                 which case the lines are the same as ``str.splitlines()`` of the text for the default ``newline``.
+        :param chunksize: The number of lines of each chunk. The last chunk may have fewer lines.
+        :param columns: Not supported, since plain text has no columns.
+        :param filters: Not supported, since plain text has no rows.
+        :raises TypeError: ``path`` is not a path object.
+        :raises ValueError: ``columns`` or ``filters`` is given, or ``newline`` is not supported.
+        :raises LookupError: The encoding is unknown.
+        :return: An iterator of lists of lines. It has a ``close`` method that closes the file.
+        """
+
+        self.check_path(path)
+
+        if columns is not None or filters is not None:
+            raise ValueError(f'{self.__class__.__name__} does not support selecting columns or rows.')
+        newline = options.get('newline')
+        if newline not in _LINE_ENDINGS:
+            raise ValueError(f'Unsupported newline {newline!r}. Supported newlines are: '
+                             f'{", ".join(repr(n) for n in _LINE_ENDINGS)}.')
+        encoding = options.get('encoding', 'utf-8')
+        codecs.lookup(encoding)
+
+        return self._iter_lines(cast(typing_.PathLike, path), encoding=encoding, newline=newline,
+                                keepends=options.get('keepends', False), chunksize=chunksize)
+
+    @staticmethod
+    def _iter_lines(path: typing_.PathLike, *, encoding: str, newline: Optional[str], keepends: bool,
+                    chunksize: int) -> Iterator[List[str]]:
+        "The generator behind :meth:`.iter_load`, which opens the file when iterating starts."
+
+        endings = _LINE_ENDINGS[newline]
+        with open(path, mode='r', encoding=encoding, newline=newline, buffering=_BUFFER_SIZE) as f:
+            while True:
+                chunk = list(itertools.islice(f, chunksize))
+                if not chunk:
+                    return
+                if not keepends:
+                    chunk = [_strip_line_ending(line, endings) for line in chunk]
+                yield chunk
+
+
+def _strip_line_ending(line: str, endings: Tuple[str, ...]) -> str:
+    """Remove the line ending of a line read from a text file.
+
+    :param line: The line.
+    :param endings: The line endings that end lines, longest first. The last line may have none.
+    """
+    for ending in endings:
+        if line.endswith(ending):
+            return line[:-len(ending)]
+    return line
@@ -0,0 +1,258 @@
+# Copyright 2021 Edward Leardi. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Memory-mapped lines of text files.
+
+The offsets of the lines of a text file can be persisted in a line index in a directory of line indexes, such as one
+under the directory of a dataset that this library manages, all little-endian::
+
+    header   magic, version, the size and the modification time in nanoseconds of the text file
+    offsets  (lines + 1) x uint64, the offset of each line in the text file, followed by the size of the text file
+
+Both files are memory-mapped, so that processes that read the same text file share its pages and the pages of its index
+in the page cache rather than each holding a copy of the text.
+"""
+
+
+import codecs
+import hashlib
+import mmap
+import os
+import pathlib
+import struct
+from typing import Any, Iterator, Optional, Sequence, Tuple, Union, overload
+from uuid import uuid4
+
+import numpy as np
+
+from .. import typing as typing_
+
+
+# Leading bytes of a line index
+MAGIC = b'\x89NRSLIN\n'
+
+_VERSION = 1
+
+_HEADER = struct.Struct('<8sIQq')
+
+# Number of bytes scanned for newlines at a time while building a line index
+_SCAN_SIZE = 64 * 1024 * 1024
+
+
+def index_path(path: pathlib.Path, index_dir: pathlib.Path) -> pathlib.Path:
+    """The path of the line index of a text file. The name of the index includes a digest of the absolute path of the
+    text file, so that text files of the same name in different directories can share a directory of line indexes.
+
+    :param path: Path to the text file.
+    :param index_dir: The directory of line indexes.
+    """
+    digest = hashlib.blake2b(os.fsencode(os.path.abspath(path)), digest_size=8).hexdigest()
+    return index_dir / f'{path.name}.{digest}.lines'
+
+
+class TextLines(Sequence[str]):
+    """The lines of a text file, memory-mapped and decoded only when they are accessed. Lines are split at ``\\n`` and
+    don't include their line endings, of which ``\\r\\n`` is recognized, too. For files with these line endings, the
+    lines are the same as ``str.splitlines()`` of the text.
+
+    Indexing a line takes constant time. Slicing returns a :class:`TextLines` of the selected lines without reading
+    them. The offsets of the lines are read from the line index of the file in ``index_dir``, see :func:`index_path`.
+    It is built when it is missing or outdated, and kept in memory only if it can't be written or ``index_dir`` is
+    ``None``. A :class:`TextLines` can be pickled, e.g., to send it to worker processes, which then map the same file
+    instead of receiving the text.
+
+    :param path: Path to the text file.
+    :param encoding: The encoding of the text file. Only encodings that encode ``\\n`` as the single byte ``\\n``, such
+        as UTF-8 and Latin-1, are supported.
+    :param index_dir: The directory of line indexes, which is created if it is missing. ``None`` means that the line
+        index is built each time and kept in memory only, so that nothing is written.
+    :raises ValueError: The encoding is not supported.
+    :raises LookupError: The encoding is unknown.
+    """
+
+    def __init__(self, path: typing_.PathLike, encoding: str = 'utf-8',
+                 index_dir: Optional[typing_.PathLike] = None) -> None:
+        """Constructor method.
+        """
+        if '\n'.encode(encoding) != b'\n' or codecs.lookup(encoding).name.startswith(('utf-16', 'utf-32')):
+            raise ValueError(f'Memory-mapped text files of encoding "{encoding}" are not supported.')
+        self._path: pathlib.Path = pathlib.Path(os.path.abspath(path))
+        self._encoding = encoding
+        self._index_dir = None if index_dir is None else pathlib.Path(os.path.abspath(index_dir))
+        self._text, self._index, self._offsets = _open(self._path, self._index_dir)
+        self._lines: range = range(len(self._offsets) - 1)
+
+    def close(self) -> None:
+        """Unmap the file and its index, which slices of this object share. Lines that have been read stay valid. The
+        index stays mapped until the slices that share it are closed, too."""
+        self._offsets = self._offsets[:0]
+        self._lines = range(0)
+        for m in (self._text, self._index):
+            if m is not None:
+                try:
+                    m.close()
+                except BufferError:  # The offsets are still read from it by a slice
+                    pass
+
+    def __enter__(self) -> 'TextLines':
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._lines)
+
+    @overload
+    def __getitem__(self, index: int) -> str:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> 'TextLines':
+        ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[str, 'TextLines']:
+        if isinstance(index, slice):
+            view = object.__new__(TextLines)
+            view.__dict__.update(self.__dict__)
+            view._lines = self._lines[index]
+            return view
+        try:
+            return self._line(self._lines[index])
+        except IndexError:
+            raise IndexError('TextLines index out of range')
+
+    def __iter__(self) -> Iterator[str]:
+        for line in self._lines:
+            yield self._line(line)
+
+    def __repr__(self) -> str:
+        return f'<{self.__class__.__name__} of {len(self)} lines of "{self._path}">'
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return _reopen, (self._path, self._encoding, self._index_dir, self._lines)
+
+    def _line(self, line: int) -> str:
+        "Decode the line at position ``line`` of the file."
+        start, end = int(self._offsets[line]), int(self._offsets[line + 1])
+        assert self._text is not None
+        data = self._text[start:end]
+        if data.endswith(b'\n'):
+            data = data[:-1]
+        if data.endswith(b'\r'):
+            data = data[:-1]
+        return data.decode(self._encoding)
+
+
+def _reopen(path: pathlib.Path, encoding: str, index_dir: Optional[pathlib.Path], lines: range) -> TextLines:
+    "Map the lines of a pickled :class:`TextLines` again."
+    text_lines = TextLines(path, encoding, index_dir)
+    text_lines._lines = lines
+    return text_lines
+
+
+def _open(path: pathlib.Path,
+          index_dir: Optional[pathlib.Path]) -> Tuple[Optional[mmap.mmap], Optional[mmap.mmap], np.ndarray]:
+    """Map a text file and read its line index, building the index if it is missing or outdated.
+
+    :param path: Path to the text file.
+    :param index_dir: The directory of line indexes, or ``None`` if the index is kept in memory only.
+
+    :return: The mapped text file and line index, either of which is ``None`` if it is empty or kept in memory only,
+        and the offsets of the lines.
+    """
+
+    with open(path, mode='rb') as f:
+        st = os.fstat(f.fileno())
+        # An empty file can't be mapped
+        text = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if st.st_size > 0 else None
+
+    try:
+        index = None if index_dir is None else _read_index(index_path(path, index_dir), st)
+    except BaseException:
+        if text is not None:
+            text.close()
+        raise
+    if index is not None:
+        return text, index, np.frombuffer(index, dtype='<u8', offset=_HEADER.size)
+
+    offsets = _scan(text, st.st_size)
+    if index_dir is not None:
+        _write_index(index_path(path, index_dir), st, offsets)
+    return text, None, offsets
+
+
+def _read_index(path: pathlib.Path, st: os.stat_result) -> Optional[mmap.mmap]:
+    """Map a line index.
+
+    :param path: Path to the line index.
+    :param st: The state of the text file.
+    :return: The mapped line index, or ``None`` if it is missing, can't be read, or is not of the text file as it is.
+    """
+
+    try:
+        with open(path, mode='rb') as f:
+            index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):  # Missing or empty
+        return None
+    try:
+        header = _HEADER.unpack_from(index)
+    except struct.error:  # Truncated
+        header = None
+    size = len(index) - _HEADER.size
+    if header != (MAGIC, _VERSION, st.st_size, st.st_mtime_ns) or size < 8 or size % 8 != 0:
+        index.close()
+        return None
+    return index
+
+
+def _scan(text: Optional[mmap.mmap], size: int) -> np.ndarray:
+    """Find the offsets of the lines of a text file.
+
+    :param text: The mapped text file, or ``None`` if it is empty.
+    :param size: The size of the text file.
+    :return: The offset of each line followed by ``size``.
+    """
+
+    starts = [np.zeros(1, dtype=np.uint64)]
+    for offset in range(0, size, _SCAN_SIZE):
+        assert text is not None
+        block = np.frombuffer(text, dtype=np.uint8, count=min(_SCAN_SIZE, size - offset), offset=offset)
+        starts.append(np.flatnonzero(block == ord('\n')).astype(np.uint64) + np.uint64(offset + 1))
+    offsets = np.concatenate(starts + [np.array([size], dtype=np.uint64)])
+    if size == 0 or offsets[-2] == size:  # No line after the last newline
+        offsets = offsets[:-1]
+    return offsets
+
+
+def _write_index(path: pathlib.Path, st: os.stat_result, offsets: np.ndarray) -> None:
+    """Write a line index. It is written to a temporary file first and then renamed, so that an index is either
+    complete or absent. Nothing is written if the directory of line indexes can't be created or written.
+
+    :param path: Path to the line index.
+    :param st: The state of the text file.
+    :param offsets: The offsets of the lines.
+    """
+
+    tmp_path = path.with_name(f'{path.name}-{uuid4()}')
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, mode='wb') as f:
+            f.write(_HEADER.pack(MAGIC, _VERSION, st.st_size, st.st_mtime_ns))
+            f.write(offsets.astype('<u8', copy=False).tobytes())
+        os.replace(tmp_path, path)
+    except OSError:
+        if tmp_path.exists():
+            tmp_path.unlink()
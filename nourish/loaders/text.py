@@ -19,5 +19,6 @@
 
 
 from ._text import PlainTextLoader
+from ._text_lines import TextLines
 
-__all__ = ('PlainTextLoader',)
+__all__ = ('PlainTextLoader', 'TextLines')
@@ -34,9 +34,15 @@ setuptools.setup(
         "dataclasses; python_version < '3.7.0'",  # backported dataclasses
         "packaging >= 20.4",
         "pandas >= 1.1.0",
-        "pydantic >= 1.7.2",
+        "pydantic >= 1.8.0",
         "PyYAML >= 5.3.1",
-        "requests >= 2.24.0"],
+        "requests >= 2.25.0",
+        "urllib3 >= 1.26.0"],
+    extras_require={
+        # The asyncio API
+        "async": ["aiohttp >= 3.7.0"],
+        # The pyarrow engine of CSVPandasLoader
+        "arrow": ["pyarrow >= 1.0.1"]},
     classifiers=[
         "Development Status :: 3 - Alpha",
         "Intended Audience :: Developers",
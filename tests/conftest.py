@@ -18,8 +18,10 @@
 import copy
 import hashlib
 from http.server import HTTPServer, SimpleHTTPRequestHandler
+import io
 import os
 from pathlib import Path
+import re
 from ssl import PROTOCOL_TLS_SERVER, SSLContext
 from tempfile import TemporaryDirectory
 import threading
@@ -83,6 +85,37 @@ def chdir_tmp_path(tmp_path):
     os.chdir(cur_dir)
 
 
+class RangeHTTPRequestHandler(SimpleHTTPRequestHandler):
+    """Same as ``SimpleHTTPRequestHandler``, but also serves single byte ranges of regular files (``Range: bytes=a-b``).
+    ``If-Range`` is honored against the ``Last-Modified`` header."""
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        range_match = re.fullmatch(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+        if range_match is None or not os.path.isfile(path):
+            return super().send_head()
+
+        with open(path, 'rb') as f:
+            content = f.read()
+            last_modified = self.date_time_string(os.fstat(f.fileno()).st_mtime)
+        if self.headers.get('If-Range', last_modified) != last_modified:
+            # The file changed since the client last saw it, serve the whole file
+            return super().send_head()
+
+        start = int(range_match.group(1))
+        end = min(int(range_match.group(2) or len(content) - 1), len(content) - 1)
+        if start >= len(content):
+            self.send_error(416)
+            return None
+        self.send_response(206)
+        self.send_header('Content-Type', self.guess_type(path))
+        self.send_header('Content-Range', f'bytes {start}-{end}/{len(content)}')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Last-Modified', last_modified)
+        self.end_headers()
+        return io.BytesIO(content[start:end + 1])
+
+
 @pytest.fixture(scope='session')
 def local_http_server() -> HTTPServer:
     "A local http server that serves the source directory."
@@ -103,7 +136,7 @@ def local_http_server_root_url(local_http_server) -> str:
 
 @pytest.fixture(scope='session')
 def local_https_server() -> HTTPServer:
-    "A local https server that serves the source directory."
+    "A local https server that serves the source directory. Unlike ``local_http_server``, it supports range requests."
 
     # Merge certifi's CA bundle (used as default by requests) with ours. This is done by a simple concatenation of the
     # two pem files. Although pem files are text files, we treat them as binaries to avoid unexpected EOL conversions.
@@ -114,7 +147,7 @@ def local_https_server() -> HTTPServer:
     # Ensure CURL_CA_BUNDLE isn't involved
     os.environ.pop('CURL_CA_BUNDLE', None)
 
-    with HTTPServer(("localhost", 8081), SimpleHTTPRequestHandler) as httpd:
+    with HTTPServer(("localhost", 8081), RangeHTTPRequestHandler) as httpd:
         context = SSLContext(PROTOCOL_TLS_SERVER)
         context.load_cert_chain('tests/tls/server.pem', keyfile='tests/tls/server.key')
         httpd.socket = context.wrap_socket(httpd.socket, server_side=True)
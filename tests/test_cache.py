@@ -0,0 +1,219 @@
+# Copyright 2021 Edward Leardi. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import hashlib
+import os
+import time
+
+import pytest
+import requests
+
+import nourish._dataset
+from nourish import init, load_dataset
+from nourish.dataset import ArchiveCache, Dataset
+from nourish._high_level import _get_schemata_manager
+
+
+def _make_archive(path, content):
+    "Write an archive and return the hex digest of its SHA512 checksum."
+    path.write_bytes(content)
+    return hashlib.sha512(content).hexdigest()
+
+
+class TestArchiveCache:
+    "Test :class:`ArchiveCache`."
+
+    def test_put_and_get(self, tmp_path):
+        "Test that an archive is moved into the cache under its checksum and keeps its suffixes."
+
+        cache = ArchiveCache(tmp_path / 'cache', max_size=1000)
+        archive_fp = tmp_path / 'dataset.tar.gz'
+        sha512 = _make_archive(archive_fp, b'archive')
+        assert cache.get(sha512) is None
+
+        assert cache.put(archive_fp, sha512) is True
+        assert not archive_fp.exists()
+        assert cache.get(sha512) == tmp_path / 'cache' / f'{sha512}.tar.gz'
+        assert cache.get(sha512).read_bytes() == b'archive'
+
+    def test_corrupted_archive(self, tmp_path):
+        "Test that an archive that no longer matches its checksum is removed from the cache."
+
+        cache = ArchiveCache(tmp_path / 'cache', max_size=1000)
+        sha512 = _make_archive(tmp_path / 'dataset.zip', b'archive')
+        cache.put(tmp_path / 'dataset.zip', sha512)
+        (tmp_path / 'cache' / f'{sha512}.zip').write_bytes(b'tampered')
+
+        assert cache.get(sha512) is None
+        assert list((tmp_path / 'cache').iterdir()) == []
+
+    def test_lru_eviction(self, tmp_path):
+        "Test that the least recently used archives are evicted when the cache exceeds its budget."
+
+        cache = ArchiveCache(tmp_path / 'cache', max_size=25)
+        hashes = []
+        for i in range(3):
+            hashes.append(_make_archive(tmp_path / f'{i}.zip', bytes([i]) * 10))
+            cache.put(tmp_path / f'{i}.zip', hashes[-1])
+            # Make sure that modification times differ regardless of the resolution of the file system
+            os.utime(cache.get(hashes[-1]), (i, i))
+        # Only two archives fit in the budget, so the first one has been evicted
+        assert cache.get(hashes[0]) is None
+        assert cache.get(hashes[1]) is not None
+
+        # Accessing archive 1 makes archive 2 the least recently used one
+        os.utime(cache.get(hashes[2]), (10, 10))
+        os.utime(cache.get(hashes[1]), (20, 20))
+        cache.put(tmp_path / 'new.zip', _make_archive(tmp_path / 'new.zip', b'\xff' * 10))
+        assert cache.get(hashes[2]) is None
+        assert cache.get(hashes[1]) is not None
+
+    def test_pinning(self, tmp_path):
+        "Test that a pinned archive can be read after it has been evicted, and that its pin is removed afterwards."
+
+        cache = ArchiveCache(tmp_path / 'cache', max_size=10)
+        sha512 = _make_archive(tmp_path / 'dataset.tar.gz', b'archive')
+        with cache.pinning(sha512) as archive:
+            assert archive is None
+        cache.put(tmp_path / 'dataset.tar.gz', sha512)
+
+        with cache.pinning(sha512) as archive:
+            assert archive.name.endswith('.tar.gz') and archive != cache.get(sha512)
+            # Less recently used than the next archive, but not as old as a pin left behind by a crashed process
+            os.utime(cache.get(sha512), (time.time() - 60,) * 2)
+            cache.put(tmp_path / 'other.zip', _make_archive(tmp_path / 'other.zip', b'other'))
+            assert cache.get(sha512) is None
+            assert archive.read_bytes() == b'archive'
+        assert sorted(path.name for path in (tmp_path / 'cache').iterdir()) == [
+            hashlib.sha512(b'other').hexdigest() + '.zip']
+
+    def test_pinning_corrupted_archive(self, tmp_path):
+        "Test that a pinned archive is verified in the same way as by get."
+
+        cache = ArchiveCache(tmp_path / 'cache', max_size=1000)
+        sha512 = _make_archive(tmp_path / 'dataset.zip', b'archive')
+        cache.put(tmp_path / 'dataset.zip', sha512)
+        (tmp_path / 'cache' / f'{sha512}.zip').write_bytes(b'tampered')
+        with cache.pinning(sha512) as archive:
+            assert archive is None
+        assert list((tmp_path / 'cache').iterdir()) == []
+
+    def test_leftover_tmp_files(self, tmp_path):
+        "Test that temporary files that crashed processes left behind are removed when archives are added."
+
+        cache = ArchiveCache(tmp_path / 'cache', max_size=1000)
+        cache.cache_dir.mkdir()
+        for name in ('.tmp-old', '.tmp-new.tar.gz'):
+            (cache.cache_dir / name).write_bytes(b'partial')
+        os.utime(cache.cache_dir / '.tmp-old', (0, 0))
+        sha512 = _make_archive(tmp_path / 'dataset.zip', b'archive')
+        cache.put(tmp_path / 'dataset.zip', sha512)
+        assert sorted(path.name for path in cache.cache_dir.iterdir()) == ['.tmp-new.tar.gz', f'{sha512}.zip']
+
+    def test_archive_larger_than_budget(self, tmp_path):
+        "Test that an archive that alone exceeds the budget is left in place."
+
+        cache = ArchiveCache(tmp_path / 'cache', max_size=5)
+        archive_fp = tmp_path / 'dataset.zip'
+        sha512 = _make_archive(archive_fp, b'too large')
+        assert cache.put(archive_fp, sha512) is False
+        assert archive_fp.exists()
+        assert cache.get(sha512) is None
+
+
+class TestCachedDownload:
+    "Test downloading datasets with an archive cache."
+
+    @pytest.fixture
+    def test_schema(self, dataset_base_url, dataset_dir, gmb_schema):
+        "A schema whose archive is one of the extractables."
+        gmb_schema['download_url'] = f'{dataset_base_url}/extractables/test.tar.gz'
+        gmb_schema['sha512sum'] = hashlib.sha512((dataset_dir / 'extractables/test.tar.gz').read_bytes()).hexdigest()
+        return gmb_schema
+
+    @pytest.fixture
+    def no_network(self, monkeypatch):
+        "Fail all requests sent with the shared session."
+
+        def get(*args, **kwargs):
+            raise requests.ConnectionError('No network')
+
+        monkeypatch.setattr(requests.Session, 'get', get)
+
+    def test_cache_hit_skips_network(self, request, test_schema, tmp_path):
+        "Test that an archive in the cache is extracted into any data directory without accessing the network."
+
+        cache = ArchiveCache(tmp_path / 'cache', max_size=1024 * 1024)
+        first = Dataset(test_schema, data_dir=tmp_path / 'first', mode=Dataset.InitializationMode.LAZY)
+        first.download(archive_cache=cache)
+        assert cache.get(test_schema['sha512sum']) is not None
+        assert sorted(p.name for p in first._nourish_dir.iterdir()) == ['files.list']
+
+        request.getfixturevalue('no_network')
+        first.delete()
+        first.download(archive_cache=cache)
+        assert first.is_downloaded() is True
+        second = Dataset(test_schema, data_dir=tmp_path / 'second', mode=Dataset.InitializationMode.LAZY)
+        second.download(archive_cache=cache)
+        assert second._file_list_file.read_bytes() == first._file_list_file.read_bytes()
+
+    def test_evicted_while_extracting(self, request, test_schema, tmp_path, monkeypatch):
+        "Test that an archive that another process evicts while it is being extracted is still extracted."
+
+        cache = ArchiveCache(tmp_path / 'cache', max_size=1024 * 1024)
+        Dataset(test_schema, data_dir=tmp_path / 'first', mode=Dataset.InitializationMode.LAZY).download(
+            archive_cache=cache)
+        extract = nourish._dataset.extract_data_files
+
+        def evicting_extract(**kwargs):
+            for path in cache.cache_dir.iterdir():
+                if not path.name.startswith('.tmp-'):
+                    path.unlink()
+            extract(**kwargs)
+
+        monkeypatch.setattr('nourish._dataset.extract_data_files', evicting_extract)
+        request.getfixturevalue('no_network')
+        dataset = Dataset(test_schema, data_dir=tmp_path / 'second', mode=Dataset.InitializationMode.LAZY)
+        dataset.download(archive_cache=cache)
+        assert dataset.is_downloaded() is True
+        assert list(cache.cache_dir.iterdir()) == []
+
+    def test_corrupted_cache_entry(self, test_schema, tmp_path):
+        "Test that a corrupted archive in the cache is downloaded again."
+
+        cache = ArchiveCache(tmp_path / 'cache', max_size=1024 * 1024)
+        cache.cache_dir.mkdir()
+        (cache.cache_dir / (test_schema['sha512sum'] + '.tar.gz')).write_bytes(b'corrupted')
+        dataset = Dataset(test_schema, data_dir=tmp_path / 'data', mode=Dataset.InitializationMode.LAZY)
+        dataset.download(archive_cache=cache)
+        assert dataset.is_downloaded() is True
+        # The cache entry has been replaced by the downloaded archive, which passes the verification
+        assert cache.get(test_schema['sha512sum']) is not None
+
+    def test_config(self, test_schema, tmp_path):
+        "Test that load_dataset caches archives under DATADIR if ARCHIVE_CACHE_SIZE is set."
+
+        test_schema['subdatasets'] = {'test': {'name': 'Test', 'description': 'Test', 'format': 'txt',
+                                               'path': 'test.txt'}}
+        _get_schemata_manager().dataset_schemata._schemata['datasets']['gmb']['1.0.2'] = test_schema
+
+        init(DATADIR=tmp_path, ARCHIVE_CACHE_SIZE=0)
+        load_dataset('gmb', version='1.0.2')
+        assert not (tmp_path / '.nourish.archives').exists()
+
+        init(DATADIR=tmp_path / 'cached', ARCHIVE_CACHE_SIZE=1024 ** 3)
+        load_dataset('gmb', version='1.0.2')
+        assert [p.name for p in (tmp_path / 'cached' / '.nourish.archives').iterdir()] == \
+            [test_schema['sha512sum'] + '.tar.gz']
@@ -0,0 +1,97 @@
+# Copyright 2021 Edward Leardi. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from nourish._compact import CATEGORY_RATIO, MemoryReport, compact_dtypes
+
+
+@pytest.fixture
+def data():
+    "A table with columns of each kind that can be compacted, and of kinds that can't."
+    n = 1000
+    return pd.DataFrame({'int': np.arange(n),
+                         'float': np.arange(n) / 4,
+                         'precise_float': np.arange(n) / 3,
+                         'labels': pd.Series(['spam', 'eggs', np.nan, 'ham'] * (n // 4), dtype=object),
+                         'names': pd.Series([f'name-{i}' for i in range(n)], dtype=object),
+                         'mixed': pd.Series([1, 'a'] * (n // 2), dtype=object),
+                         'date': pd.to_datetime(['2021-01-01'] * n),
+                         'flag': [True, False] * (n // 2)})
+
+
+class TestCompactDtypes:
+    "Test :func:`compact_dtypes`."
+
+    def test_compact(self, data):
+        "Test that columns get compact dtypes without changing their values, and that the memory is reported."
+
+        compacted, report = compact_dtypes(data)
+        assert compacted['int'].dtype == np.int16
+        assert compacted['float'].dtype == np.float32
+        assert compacted['precise_float'].dtype == np.float64
+        assert isinstance(compacted['labels'].dtype, pd.CategoricalDtype)
+        assert compacted['mixed'].dtype == object
+        assert compacted['date'].dtype == data['date'].dtype
+        assert compacted['flag'].dtype == bool
+        pd.testing.assert_frame_equal(compacted, data, check_dtype=False, check_categorical=False)
+        if compacted['names'].dtype != object:  # Arrow-backed strings require pyarrow
+            assert compacted['names'].astype(object).tolist() == data['names'].tolist()
+
+        assert isinstance(report, MemoryReport)
+        assert report.before == data.memory_usage(deep=True).sum()
+        assert report.after == compacted.memory_usage(deep=True).sum()
+        assert report.after < report.before / 2
+        assert report.dtypes['int'] == 'int16'
+        assert report.dtypes['labels'] == 'category'
+        assert 'precise_float' not in report.dtypes and 'date' not in report.dtypes
+
+        # Compacting again changes nothing
+        assert compact_dtypes(compacted)[1].dtypes == {}
+
+    def test_pinned(self, data):
+        "Test that pinned columns keep their dtypes."
+
+        compacted, report = compact_dtypes(data, pinned=['int', 'labels'])
+        assert compacted['int'].dtype == np.int64
+        assert compacted['labels'].dtype == object
+        assert compacted['float'].dtype == np.float32
+        assert set(report.dtypes).isdisjoint({'int', 'labels'})
+
+    def test_category_ratio(self):
+        "Test that only string columns with few distinct values become categorical."
+
+        n = 100
+        distinct = int(n * CATEGORY_RATIO)
+        few = pd.Series([f'value-{i % distinct}' for i in range(n)], dtype=object)
+        many = pd.Series([f'value-{i % (distinct + 1)}' for i in range(n)], dtype=object)
+        compacted, _ = compact_dtypes(pd.DataFrame({'few': few, 'many': many}))
+        assert isinstance(compacted['few'].dtype, pd.CategoricalDtype)
+        assert not isinstance(compacted['many'].dtype, pd.CategoricalDtype)
+
+    def test_duplicate_columns(self):
+        "Test that columns of the same name are compacted separately."
+
+        data = pd.DataFrame([[1, 0.1], [2, 0.2]], columns=['a', 'a'])
+        compacted, _ = compact_dtypes(data)
+        assert list(compacted.columns) == ['a', 'a']
+        assert compacted.dtypes.tolist() == [np.int8, np.float64]
+
+    def test_not_a_table(self):
+        "Test that data other than tables is returned unchanged."
+
+        assert compact_dtypes('text') == ('text', None)
@@ -15,18 +15,42 @@
 # limitations under the License.
 #
 
+import asyncio
 import hashlib
+import io
+import json
+import logging
 from json import JSONDecodeError
 import os
 import pathlib
+import sys
+import tarfile
+import threading
+import time
 
 import pandas as pd
 import pytest
 
-from nourish.dataset import Dataset
-from nourish.exceptions import DirectoryLockAcquisitionError
-from nourish.loaders import FormatLoaderMap
-from nourish.loaders.text import PlainTextLoader
+from nourish.dataset import ArchiveCache, Dataset
+from nourish.exceptions import DirectoryLockAcquisitionError, DownloadFailedError
+from nourish._lock import DirectoryLock
+from nourish.loaders import FormatLoaderMap, Loader
+from nourish.loaders.table import CSVPandasLoader
+from nourish.loaders.text import PlainTextLoader, TextLines
+from nourish._extractors import _file_digest, extract_data_files
+
+
+@pytest.fixture
+def downloaded_dataset(dataset_base_url, dataset_dir, gmb_schema, tmp_path):
+    "A dataset that is downloaded from one of the extractables."
+
+    gmb_schema['download_url'] = f'{dataset_base_url}/extractables/test.tar.gz'
+    gmb_schema['sha512sum'] = hashlib.sha512((dataset_dir / 'extractables/test.tar.gz').read_bytes()).hexdigest()
+    gmb_schema['subdatasets'] = {'test': {'name': 'Test', 'description': 'Test', 'format': 'txt',
+                                          'path': 'test.txt'}}
+    dataset = Dataset(gmb_schema, data_dir=tmp_path / 'data', mode=Dataset.InitializationMode.LAZY)
+    dataset.download()
+    return dataset
 
 
 class TestDataset:
@@ -273,8 +297,8 @@ class TestDataset:
     def test_directory_write_lock_present(self, downloaded_gmb_dataset):
         "Test various functions when a write directory lock is present."
 
-        lock_file = downloaded_gmb_dataset._nourish_dir_ / 'write.ding-dong.lock'
-        lock_file.touch()
+        holder = DirectoryLock(downloaded_gmb_dataset._nourish_dir_)
+        assert holder.lock(write=True) is True
 
         f_stat = downloaded_gmb_dataset._file_list_file_.stat()
         self._test_lock_exception(
@@ -301,8 +325,8 @@ class TestDataset:
     def test_directory_read_lock_present(self, downloaded_gmb_dataset):
         "Test various functions when a directory read lock is present."
 
-        lock_file = downloaded_gmb_dataset._nourish_dir_ / 'read.king-kong.lock'
-        lock_file.touch()
+        holder = DirectoryLock(downloaded_gmb_dataset._nourish_dir_)
+        assert holder.lock(write=False) is True
 
         f_stat = downloaded_gmb_dataset._file_list_file_.stat()
         self._test_lock_exception(
@@ -321,3 +345,817 @@ class TestDataset:
         # We purposefully use _file_list_file instead of _file_list_file_ to create the parent directory so that
         # TemporaryDirectory doesn't complain during test cleanup of downloaded_gmb_dataset (Python < 3.8)
         assert not downloaded_gmb_dataset._file_list_file.exists()
+
+    def test_lock_timeout(self, downloaded_dataset):
+        "Test that loading waits for up to ``lock_timeout`` while someone else holds the directory write lock."
+
+        holder = DirectoryLock(downloaded_dataset._nourish_dir_)
+        assert holder.lock(write=True) is True
+
+        impatient = Dataset(downloaded_dataset._schema, data_dir=downloaded_dataset._data_dir_, lock_timeout=0.05)
+        with pytest.raises(DirectoryLockAcquisitionError):
+            impatient.load()
+
+        timer = threading.Timer(0.2, holder.unlock)
+        timer.start()
+        try:
+            patient = Dataset(downloaded_dataset._schema, data_dir=downloaded_dataset._data_dir_, lock_timeout=None)
+            assert list(patient.load().keys()) == ['test']
+        finally:
+            timer.join()
+
+
+class TestIterLoad:
+    "Test loading subdatasets in chunks."
+
+    @pytest.fixture
+    def csv_dataset(self, downloaded_dataset):
+        "The downloaded dataset with the CSV file as a subdataset."
+
+        options = {'no_header': True, 'columns': {'a': 'str', 'b': 'str'}}
+        downloaded_dataset._schema['subdatasets']['csv'] = {'name': 'CSV', 'description': 'CSV', 'path': 'test.csv',
+                                                            'format': {'id': 'csv', 'options': options}}
+        return downloaded_dataset
+
+    @staticmethod
+    def _is_locked(dataset):
+        "Whether someone holds a directory lock of ``dataset``."
+        lock = DirectoryLock(dataset._nourish_dir_)
+        if lock.lock(write=True):
+            lock.unlock()
+            return False
+        return True
+
+    def test_iter_load(self, csv_dataset):
+        "Test that the chunks make up the loaded subdataset and that the read lock is held while iterating."
+
+        expected = csv_dataset.load(subdatasets=['csv'])['csv']
+        chunks = csv_dataset.iter_load('csv', chunksize=2)
+        assert not self._is_locked(csv_dataset)  # Nothing is held until iterating starts
+        first = next(chunks)
+        assert len(first) == 2
+        assert self._is_locked(csv_dataset)
+        # Other iterators and loads may read at the same time
+        assert len(list(csv_dataset.iter_load('csv', chunksize=2))) == -(-len(expected) // 2)
+        csv_dataset.load(subdatasets=['csv'])
+        pd.testing.assert_frame_equal(pd.concat([first, *chunks]), expected)
+        assert not self._is_locked(csv_dataset)
+
+    def test_text(self, csv_dataset):
+        "Test that the lines of plain text subdatasets are streamed in chunks."
+
+        lines = csv_dataset.load(subdatasets=['test'])['test'].splitlines()
+        chunks = list(csv_dataset.iter_load('test', chunksize=2))
+        assert all(len(chunk) == 2 for chunk in chunks[:-1])
+        assert sum(chunks, []) == lines
+        assert not self._is_locked(csv_dataset)
+
+    def test_close(self, csv_dataset):
+        "Test that the read lock is released when the iterator is closed before it is exhausted."
+
+        chunks = csv_dataset.iter_load('csv', chunksize=1)
+        next(chunks)
+        chunks.close()
+        assert not self._is_locked(csv_dataset)
+
+    def test_errors(self, csv_dataset, tmp_path):
+        "Test the errors of unknown subdatasets, undownloaded datasets, and formats that can't be loaded in chunks."
+
+        with pytest.raises(KeyError):
+            csv_dataset.iter_load('nonexistent', chunksize=1)
+
+        class UnchunkedLoader(PlainTextLoader):
+            iter_load = Loader.iter_load
+
+        with pytest.raises(NotImplementedError):
+            next(csv_dataset.iter_load('test', chunksize=1,
+                                       format_loader_map=FormatLoaderMap({'txt': UnchunkedLoader()})))
+        assert not self._is_locked(csv_dataset)
+
+        dataset = Dataset(csv_dataset._schema, data_dir=tmp_path / 'undownloaded', mode=Dataset.InitializationMode.LAZY)
+        with pytest.raises(RuntimeError) as e:
+            dataset.iter_load('csv', chunksize=1)
+        assert str(e.value) == f'Downloaded data files are not present in {dataset._data_dir_} or are corrupted.'
+        with pytest.raises(FileNotFoundError) as e:
+            next(dataset.iter_load('csv', chunksize=1, check=False))
+        assert 'Failed to load subdataset "csv" because some files are not found.' in str(e.value)
+
+    def test_lock_timeout(self, csv_dataset):
+        "Test that iterating fails to start while someone else holds the directory write lock."
+
+        holder = DirectoryLock(csv_dataset._nourish_dir_)
+        assert holder.lock(write=True) is True
+        chunks = csv_dataset.iter_load('csv', chunksize=1, check=False)
+        with pytest.raises(DirectoryLockAcquisitionError):
+            next(chunks)
+        holder.unlock()
+
+
+class TestParsedCache:
+    "Test loading subdatasets with the cache of parsed subdatasets."
+
+    @pytest.fixture
+    def csv_dataset(self, downloaded_dataset):
+        "The downloaded dataset with the CSV file as its only subdataset."
+
+        downloaded_dataset._schema['subdatasets'] = {
+            'csv': {'name': 'CSV', 'description': 'CSV', 'path': 'test.csv',
+                    'format': {'id': 'csv', 'options': {'no_header': True, 'columns': {'a': 'str', 'b': 'str'}}}}}
+        return downloaded_dataset
+
+    def test_load(self, csv_dataset, monkeypatch):
+        "Test that the parsed subdataset is memory-mapped from the cache as long as nothing it depends on changes."
+
+        pytest.importorskip('pyarrow')
+
+        expected = csv_dataset.load()['csv']
+        pd.testing.assert_frame_equal(csv_dataset.load(parsed_cache=True)['csv'], expected)
+        assert len(list((csv_dataset._nourish_dir_ / 'parsed').iterdir())) == 1
+
+        def fail(*args, **kwargs):
+            raise AssertionError('The data file is parsed again')
+
+        with monkeypatch.context() as m:
+            m.setattr(pd, 'read_csv', fail)
+            pd.testing.assert_frame_equal(csv_dataset.load(parsed_cache=True)['csv'], expected)
+
+        # Changed options and data files are parsed again
+        csv_dataset._schema['subdatasets']['csv']['format']['options']['columns'] = {'x': 'str', 'y': 'str'}
+        assert list(csv_dataset.load(parsed_cache=True)['csv'].columns) == ['x', 'y']
+        (csv_dataset._data_dir_ / 'test.csv').write_text('1,2\n')
+        assert csv_dataset.load(parsed_cache=True, check=False)['csv'].values.tolist() == [['1', '2']]
+        assert len(list((csv_dataset._nourish_dir_ / 'parsed').iterdir())) == 1
+
+        csv_dataset.delete()
+        assert not csv_dataset._nourish_dir_.exists()
+
+    def test_loader_config(self, csv_dataset, monkeypatch):
+        "Test that a subdataset cached by a loader isn't read from the cache by a differently configured loader."
+
+        pytest.importorskip('pyarrow')
+
+        expected = csv_dataset.load(parsed_cache=True)['csv']
+        engines = []
+        read_csv = pd.read_csv
+
+        def recording_read_csv(*args, **kwargs):
+            engines.append(kwargs.get('engine'))
+            return read_csv(*args, **kwargs)
+
+        monkeypatch.setattr(pd, 'read_csv', recording_read_csv)
+        format_loader_map = FormatLoaderMap({'csv': CSVPandasLoader(engine='pyarrow')})
+        for _ in range(2):
+            pd.testing.assert_frame_equal(
+                csv_dataset.load(parsed_cache=True, format_loader_map=format_loader_map)['csv'], expected)
+        assert engines == ['pyarrow']
+        csv_dataset.load(parsed_cache=True)
+        assert engines == ['pyarrow', None]
+
+    def test_selection(self, csv_dataset, monkeypatch):
+        "Test that selections are parsed without being cached, and read from the cache once the subdataset is cached."
+
+        pytest.importorskip('pyarrow')
+
+        full = csv_dataset.load()['csv']
+        filters = [('a', 'in', ['this', 'test'])]
+        expected = full.loc[full['a'].isin(['this', 'test']), ['a']].reset_index(drop=True)
+        pd.testing.assert_frame_equal(csv_dataset.load(columns=['a'], filters=filters)['csv'], expected)
+        pd.testing.assert_frame_equal(csv_dataset.load(parsed_cache=True, columns=['a'], filters=filters)['csv'],
+                                      expected)
+        assert not (csv_dataset._nourish_dir_ / 'parsed').exists()
+
+        csv_dataset.load(parsed_cache=True)
+        with monkeypatch.context() as m:
+            m.setattr(pd, 'read_csv', None)
+            pd.testing.assert_frame_equal(csv_dataset.load(parsed_cache=True, columns=['a'], filters=filters)['csv'],
+                                          expected)
+
+    def test_not_cached(self, downloaded_dataset):
+        "Test that data other than dataframes is loaded, but not cached."
+
+        pytest.importorskip('pyarrow')
+
+        assert downloaded_dataset.load(parsed_cache=True) == downloaded_dataset.load()
+        assert not (downloaded_dataset._nourish_dir_ / 'parsed').exists()
+
+    def test_no_pyarrow(self, csv_dataset, monkeypatch):
+        "Test that loading with the parsed cache requires pyarrow."
+
+        monkeypatch.setitem(sys.modules, 'pyarrow', None)  # Makes importing pyarrow fail
+        monkeypatch.setitem(sys.modules, 'pyarrow.feather', None)
+        with pytest.raises(ImportError):
+            csv_dataset.load(parsed_cache=True)
+
+
+class TestCompact:
+    "Test loading subdatasets with compact dtypes."
+
+    def test_load(self, downloaded_dataset, caplog):
+        "Test that the columns the schema doesn't give types of are compacted, and that the memory is reported."
+
+        downloaded_dataset._schema['subdatasets']['csv'] = {
+            'name': 'CSV', 'description': 'CSV', 'path': 'test.csv',
+            'format': {'id': 'csv', 'options': {'columns': {'a': 'str'}}}}
+        (downloaded_dataset._data_dir_ / 'test.csv').write_text('a,b,c\n' + 'x,1,y\n' * 100)
+        expected = downloaded_dataset.load(check=False)
+        assert downloaded_dataset.memory_reports == {}
+
+        with caplog.at_level(logging.INFO, logger='nourish._dataset'):
+            data = downloaded_dataset.load(compact=True, check=False)
+        assert data['test'] == expected['test']
+        assert data['csv']['a'].dtype == expected['csv']['a'].dtype
+        assert data['csv']['b'].dtype == 'int8'
+        assert isinstance(data['csv']['c'].dtype, pd.CategoricalDtype)
+        assert list(downloaded_dataset.memory_reports) == ['csv']
+        report = downloaded_dataset.memory_reports['csv']
+        assert report.dtypes == {'b': 'int8', 'c': 'category'}
+        assert report.after < report.before
+        assert f'from {report.before} to {report.after} bytes' in caplog.text
+
+
+class TestAsyncDataset:
+    "Test the asyncio API of the Dataset class."
+
+    @pytest.fixture
+    def test_dataset(self, dataset_base_url, dataset_dir, gmb_schema, tmp_path):
+        "A lazily initialized dataset that is downloaded from one of the extractables."
+
+        pytest.importorskip('aiohttp')
+        gmb_schema['download_url'] = f'{dataset_base_url}/extractables/test.tar.gz'
+        gmb_schema['sha512sum'] = hashlib.sha512((dataset_dir / 'extractables/test.tar.gz').read_bytes()).hexdigest()
+        gmb_schema['subdatasets'] = {'test': {'name': 'Test', 'description': 'Test', 'format': 'txt',
+                                              'path': 'test.txt'}}
+        return Dataset(gmb_schema, data_dir=tmp_path, mode=Dataset.InitializationMode.LAZY)
+
+    @staticmethod
+    def _lock_files(dataset):
+        "Directory lock files of ``dataset``."
+        return list(dataset._nourish_dir_.glob('*.lock'))
+
+    def test_adownload_and_aload(self, test_dataset):
+        "Test that the dataset is downloaded and loaded in the same way as the blocking API."
+
+        asyncio.run(test_dataset.adownload())
+        assert test_dataset.is_downloaded() is True
+        assert not (test_dataset._nourish_dir / 'test.tar.gz').exists()
+        data = asyncio.run(test_dataset.aload())
+        assert list(data.keys()) == ['test']
+        assert data == test_dataset.load()
+
+        with pytest.raises(RuntimeError) as e:
+            asyncio.run(test_dataset.adownload())
+        assert 'Dataset.download() was previously called.' in str(e.value)
+
+    def test_cancelled_download(self, monkeypatch, test_dataset):
+        "Test that cancelling a download releases the directory lock."
+
+        async def stalled_download(*args, **kwargs):
+            await asyncio.sleep(3600)
+
+        monkeypatch.setattr('nourish._dataset.adownload_archive', stalled_download)
+
+        async def cancel():
+            task = asyncio.ensure_future(test_dataset.adownload())
+            while len(self._lock_files(test_dataset)) == 0:
+                await asyncio.sleep(0.01)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(cancel())
+        assert self._lock_files(test_dataset) == []
+
+    def test_cancelled_extraction(self, monkeypatch, test_dataset):
+        "Test that a cancelled extraction is finished before the directory lock is released."
+
+        started = threading.Event()
+        original_extract_data_files = extract_data_files
+
+        def slow_extract_data_files(*args, **kwargs):
+            started.set()
+            time.sleep(0.2)
+            original_extract_data_files(*args, **kwargs)
+
+        monkeypatch.setattr('nourish._dataset.extract_data_files', slow_extract_data_files)
+
+        async def cancel():
+            task = asyncio.ensure_future(test_dataset.adownload())
+            while not started.is_set():
+                await asyncio.sleep(0.01)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            # The extraction finished while the lock was still held
+            assert test_dataset.is_downloaded() is True
+
+        asyncio.run(cancel())
+        assert self._lock_files(test_dataset) == []
+
+    def test_aload_lock_present(self, test_dataset):
+        "Test that aload fails if a directory write lock is present."
+
+        asyncio.run(test_dataset.adownload())
+        holder = DirectoryLock(test_dataset._nourish_dir_)
+        assert holder.lock(write=True) is True
+        with pytest.raises(DirectoryLockAcquisitionError):
+            asyncio.run(test_dataset.aload())
+        with pytest.raises(DirectoryLockAcquisitionError):
+            asyncio.run(test_dataset.adownload(check=False))
+        holder.unlock()
+
+    def test_adownload_lock_timeout(self, gmb_schema, test_dataset):
+        "Test that adownload waits for the directory lock without blocking the event loop."
+
+        dataset = Dataset(gmb_schema, data_dir=test_dataset._data_dir_, lock_timeout=None)
+        holder = DirectoryLock(dataset._nourish_dir)
+        assert holder.lock(write=False) is True
+
+        async def download():
+            asyncio.get_event_loop().call_later(0.2, holder.unlock)
+            await dataset.adownload()
+
+        asyncio.run(download())
+        assert dataset.is_downloaded() is True
+
+
+class TestEnsureDownloaded:
+    "Test downloading a dataset once for all concurrent callers with :meth:`Dataset.ensure_downloaded`."
+
+    @pytest.fixture
+    def schema(self, dataset_base_url, dataset_dir, gmb_schema):
+        "The schema of a dataset that is downloaded from one of the extractables."
+
+        gmb_schema['download_url'] = f'{dataset_base_url}/extractables/test.tar.gz'
+        gmb_schema['sha512sum'] = hashlib.sha512((dataset_dir / 'extractables/test.tar.gz').read_bytes()).hexdigest()
+        gmb_schema['subdatasets'] = {'test': {'name': 'Test', 'description': 'Test', 'format': 'txt',
+                                              'path': 'test.txt'}}
+        return gmb_schema
+
+    @pytest.fixture
+    def downloads(self, monkeypatch):
+        """Slow down downloads, so that concurrent callers overlap, and record them. Setting ``downloads['error']``
+        makes them fail."""
+
+        downloads = {'count': 0, 'started': threading.Event(), 'error': None}
+        original = Dataset._download_while_locked
+
+        def slow_download(self, **options):
+            downloads['count'] += 1
+            downloads['started'].set()
+            time.sleep(0.3)
+            if downloads['error'] is not None:
+                raise downloads['error']
+            original(self, **options)
+
+        original_async = Dataset._adownload_while_locked
+
+        async def slow_adownload(self, **options):
+            downloads['count'] += 1
+            downloads['started'].set()
+            await asyncio.sleep(0.3)
+            if downloads['error'] is not None:
+                raise downloads['error']
+            await original_async(self, **options)
+
+        monkeypatch.setattr(Dataset, '_download_while_locked', slow_download)
+        monkeypatch.setattr(Dataset, '_adownload_while_locked', slow_adownload)
+        monkeypatch.setattr('nourish._dataset._WAIT_REPORT_INTERVAL', 0.05)
+        return downloads
+
+    @staticmethod
+    def _run_concurrently(func, count):
+        "Run ``func`` in ``count`` threads at the same time and return their results or the exceptions they raised."
+
+        results = [None] * count
+
+        def run(i):
+            try:
+                results[i] = func()
+            except Exception as e:
+                results[i] = e
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_threads(self, downloads, schema, tmp_path):
+        "Test that of several threads, only one downloads the dataset and the others wait for it."
+
+        results = self._run_concurrently(
+            lambda: Dataset(schema, data_dir=tmp_path, lock_timeout=None).ensure_downloaded(), 4)
+        assert sorted(results) == [False, False, False, True]
+        assert downloads['count'] == 1
+        assert Dataset(schema, data_dir=tmp_path).ensure_downloaded() is False
+        assert list(Dataset(schema, data_dir=tmp_path).load().keys()) == ['test']
+
+    def test_thread_failure(self, downloads, schema, tmp_path):
+        "Test that the failure of the thread that downloads the dataset is propagated to the threads that wait for it."
+
+        downloads['error'] = OSError('Network is down')
+        results = self._run_concurrently(
+            lambda: Dataset(schema, data_dir=tmp_path, lock_timeout=None).ensure_downloaded(), 3)
+        assert sorted(type(result).__name__ for result in results) == \
+            ['DownloadFailedError', 'DownloadFailedError', 'OSError']
+        assert all('Network is down' in str(result) for result in results)
+        assert downloads['count'] == 1
+
+        # Later calls try again
+        downloads['error'] = None
+        assert Dataset(schema, data_dir=tmp_path).ensure_downloaded() is True
+
+    @staticmethod
+    async def _gather(schema, data_dir, count):
+        "Run :meth:`Dataset.aensure_downloaded` in ``count`` tasks at the same time and return their results or errors."
+        return await asyncio.gather(*(Dataset(schema, data_dir=data_dir, lock_timeout=None).aensure_downloaded()
+                                      for _ in range(count)), return_exceptions=True)
+
+    def test_tasks(self, downloads, schema, tmp_path):
+        "Test that of several tasks, only one downloads the dataset and the others wait for it."
+
+        pytest.importorskip('aiohttp')
+        assert sorted(asyncio.run(self._gather(schema, tmp_path, 4))) == [False, False, False, True]
+        assert downloads['count'] == 1
+        assert asyncio.run(Dataset(schema, data_dir=tmp_path).aensure_downloaded()) is False
+        assert list(Dataset(schema, data_dir=tmp_path).load().keys()) == ['test']
+
+    def test_task_failure(self, downloads, schema, tmp_path):
+        "Test that the failure of the task that downloads the dataset is propagated to the tasks that wait for it."
+
+        pytest.importorskip('aiohttp')
+        downloads['error'] = OSError('Network is down')
+        results = asyncio.run(self._gather(schema, tmp_path, 3))
+        assert sorted(type(result).__name__ for result in results) == \
+            ['DownloadFailedError', 'DownloadFailedError', 'OSError']
+        assert downloads['count'] == 1
+
+        downloads['error'] = None
+        assert asyncio.run(Dataset(schema, data_dir=tmp_path).aensure_downloaded()) is True
+
+    def test_threads_and_tasks(self, downloads, schema, tmp_path):
+        "Test that tasks wait for a download by a thread of the same process."
+
+        pytest.importorskip('aiohttp')
+        leader = threading.Thread(target=Dataset(schema, data_dir=tmp_path).ensure_downloaded)
+        leader.start()
+        downloads['started'].wait()
+        try:
+            assert asyncio.run(self._gather(schema, tmp_path, 2)) == [False, False]
+        finally:
+            leader.join()
+        assert downloads['count'] == 1
+
+    def test_task_and_other_process(self, downloads, schema, tmp_path):
+        "Test that a task waits for a download by another process, which is stood in for as in test_other_process."
+
+        pytest.importorskip('aiohttp')
+        leader = threading.Thread(target=Dataset(schema, data_dir=tmp_path)._download_once, kwargs={'on_wait': None})
+        leader.start()
+        downloads['started'].wait()
+        waits = []
+        try:
+            dataset = Dataset(schema, data_dir=tmp_path, lock_timeout=None)
+            assert asyncio.run(dataset._adownload_once(on_wait=waits.append, executor=None)) is False
+        finally:
+            leader.join()
+        assert downloads['count'] == 1
+        assert len(waits) > 0 and waits == sorted(waits)
+
+    def test_other_process(self, downloads, schema, tmp_path):
+        """Test that a download by another process is waited for. Other processes are stood in for by calling
+        :meth:`Dataset._download_once` directly, which bypasses the coordination of threads."""
+
+        leader = threading.Thread(target=Dataset(schema, data_dir=tmp_path)._download_once, kwargs={'on_wait': None})
+        leader.start()
+        downloads['started'].wait()
+        waits = []
+        try:
+            assert Dataset(schema, data_dir=tmp_path, lock_timeout=None)._download_once(on_wait=waits.append) is False
+        finally:
+            leader.join()
+        assert downloads['count'] == 1
+        assert len(waits) > 0 and waits == sorted(waits)
+
+    def test_other_process_failure(self, downloads, schema, tmp_path):
+        "Test that the failure of a download by another process is propagated to the processes that wait for it."
+
+        downloads['error'] = OSError('Network is down')
+        leader = Dataset(schema, data_dir=tmp_path)
+        failures = []
+
+        def lead():
+            try:
+                leader._download_once(on_wait=None)
+            except OSError as e:
+                failures.append(e)
+
+        thread = threading.Thread(target=lead)
+        thread.start()
+        downloads['started'].wait()
+        try:
+            with pytest.raises(DownloadFailedError) as e:
+                Dataset(schema, data_dir=tmp_path, lock_timeout=None)._download_once(on_wait=None)
+        finally:
+            thread.join()
+        assert 'Another process failed to download' in str(e.value)
+        assert "OSError('Network is down')" in str(e.value)
+        assert len(failures) == 1
+
+        # Later calls try again, and a successful download clears the failure
+        downloads['error'] = None
+        assert Dataset(schema, data_dir=tmp_path).ensure_downloaded() is True
+        assert not leader._download_failure_file_.exists()
+
+    def test_timeout(self, schema, tmp_path):
+        "Test that waiting for a download by another thread or process is bounded by ``lock_timeout``."
+
+        dataset = Dataset(schema, data_dir=tmp_path, lock_timeout=0.1)
+        holder = DirectoryLock(dataset._nourish_dir)
+        assert holder.lock(write=True) is True
+        with pytest.raises(DirectoryLockAcquisitionError) as e:
+            dataset.ensure_downloaded()
+        assert str(e.value) == f'Timed out waiting for another thread or process to download "{tmp_path}"'
+        holder.unlock()
+
+        # A download by another thread that is stuck until released
+        class Stuck:
+            entered = threading.Event()
+            released = threading.Event()
+
+            def __enter__(self):
+                self.entered.set()
+                self.released.wait()
+
+            def __exit__(self, *exc_info):
+                pass
+
+        stuck = Stuck()
+        leader = threading.Thread(target=Dataset(schema, data_dir=tmp_path).ensure_downloaded,
+                                  kwargs={'network_slot': stuck})
+        leader.start()
+        stuck.entered.wait()
+        try:
+            with pytest.raises(DirectoryLockAcquisitionError):
+                dataset.ensure_downloaded()
+        finally:
+            stuck.released.set()
+            leader.join()
+        assert dataset.is_downloaded() is True
+
+
+class TestVerificationStamp:
+    "Test the verification stamp that speeds up :meth:`Dataset.is_downloaded`."
+
+    @staticmethod
+    def _fail(*args, **kwargs):
+        "Replaces :func:`verify_data_files` to fail the test if the whole file tree is compared with the file list."
+        raise AssertionError('The file tree was compared with the file list')
+
+    def test_fast_path(self, downloaded_dataset, monkeypatch):
+        "Test that a stamped dataset isn't compared with the file list again, even by another object."
+
+        assert downloaded_dataset.is_downloaded() is True
+        assert downloaded_dataset._verification_stamp_file_.exists()
+        monkeypatch.setattr('nourish._dataset.verify_data_files', self._fail)
+        assert downloaded_dataset.is_downloaded() is True
+        other = Dataset(downloaded_dataset._schema, data_dir=downloaded_dataset._data_dir,
+                        mode=Dataset.InitializationMode.LAZY)
+        assert other.is_downloaded() is True
+        assert other.load() == downloaded_dataset.load()
+
+    def test_memo(self, downloaded_dataset, monkeypatch):
+        "Test that the stamp is remembered by the object that read or wrote it."
+
+        assert downloaded_dataset.is_downloaded() is True
+        downloaded_dataset._verification_stamp_file_.unlink()
+        monkeypatch.setattr('nourish._dataset.verify_data_files', self._fail)
+        assert downloaded_dataset.is_downloaded() is True
+
+    def test_removed_file(self, downloaded_dataset):
+        "Test that removing a data file invalidates the stamp."
+
+        assert downloaded_dataset.is_downloaded() is True
+        (downloaded_dataset._data_dir / 'test.txt').unlink()
+        assert downloaded_dataset.is_downloaded() is False
+        # Failures are not stamped
+        assert downloaded_dataset.is_downloaded() is False
+
+    @pytest.mark.parametrize('name', ('subdir/test.txt', 'subdir/deeper/deepest/test.txt'))
+    @pytest.mark.parametrize('change', ('remove', 'truncate', 'resize'))
+    def test_changed_file_in_subdir(self, name, change, gmb_schema, tmp_path):
+        """Test that removing a data file from a subdirectory of the data dir invalidates the stamp, and that other
+        changes in subdirectories are found with ``use_stamp=False``."""
+
+        tar_fp = tmp_path / 'test.tar'
+        with tarfile.open(tar_fp, mode='w') as mytar:
+            info = tarfile.TarInfo(name)
+            info.size = 4
+            mytar.addfile(info, io.BytesIO(b'test'))
+        dataset = Dataset(gmb_schema, data_dir=tmp_path / 'data', mode=Dataset.InitializationMode.LAZY)
+        dataset._nourish_dir_.mkdir(parents=True)
+        extract_data_files(tar_fp, dataset._data_dir_, dataset._file_list_file_)
+        assert dataset.is_downloaded() is True
+        path = dataset._data_dir / name
+        if change == 'remove':
+            path.unlink()
+        else:
+            os.truncate(path, 0 if change == 'truncate' else 5)
+        if change == 'remove' and name == 'subdir/test.txt':
+            assert dataset.is_downloaded() is False
+        assert dataset.is_downloaded(use_stamp=False) is False
+
+    def test_bounded(self, downloaded_dataset, monkeypatch):
+        "Test that a stamped dataset is checked without listing any directory below the data dir."
+
+        assert downloaded_dataset.is_downloaded() is True
+        (downloaded_dataset._data_dir / 'subdir').mkdir()
+        assert downloaded_dataset.is_downloaded() is True
+        scanned = []
+        scandir = os.scandir
+        monkeypatch.setattr(os, 'scandir', lambda path='.': scanned.append(path) or scandir(path))
+        monkeypatch.setattr('nourish._dataset.verify_data_files', self._fail)
+        assert downloaded_dataset.is_downloaded() is True
+        assert scanned == [downloaded_dataset._data_dir_]
+
+    def test_many_entries(self, downloaded_dataset, monkeypatch):
+        "Test that only the first entries of the data dir are fingerprinted, while the data dir itself still is."
+
+        monkeypatch.setattr(Dataset, '_MAX_FINGERPRINTED_ENTRIES', 1)
+        assert downloaded_dataset.is_downloaded() is True
+        monkeypatch.setattr('nourish._dataset.verify_data_files', self._fail)
+        fingerprint = downloaded_dataset._fingerprint()
+        assert list(fingerprint['entries']) == ['test.csv']
+        with open(downloaded_dataset._data_dir / 'test.txt', mode='a') as f:
+            f.write('more text')
+        assert downloaded_dataset.is_downloaded() is True
+        (downloaded_dataset._data_dir / 'extra.txt').write_text('extra')
+        with pytest.raises(AssertionError, match='compared'):
+            downloaded_dataset.is_downloaded()
+
+    def test_modified_file(self, downloaded_dataset):
+        "Test that a data file that is modified in place invalidates the stamp."
+
+        assert downloaded_dataset.is_downloaded() is True
+        with open(downloaded_dataset._data_dir / 'test.txt', mode='a') as f:
+            f.write('more text')
+        assert downloaded_dataset.is_downloaded() is False
+
+    def test_added_file(self, downloaded_dataset, monkeypatch):
+        "Test that adding a file to the data dir invalidates the stamp, while adding files of this library doesn't."
+
+        assert downloaded_dataset.is_downloaded() is True
+        (downloaded_dataset._nourish_dir_ / 'parsed').mkdir()
+        monkeypatch.setattr('nourish._dataset.verify_data_files', self._fail)
+        assert downloaded_dataset.is_downloaded() is True
+        (downloaded_dataset._data_dir / 'extra.txt').write_text('extra')
+        with pytest.raises(AssertionError, match='compared'):
+            downloaded_dataset.is_downloaded()
+
+    def test_line_index(self, downloaded_dataset, monkeypatch):
+        "Test that the line indexes of memory-mapped text are kept out of the data files, so that the stamp holds."
+
+        assert downloaded_dataset.is_downloaded() is True
+        files = sorted(downloaded_dataset._data_dir.iterdir())
+        format_loader_map = FormatLoaderMap({'txt': PlainTextLoader(memory_map=True)})
+        monkeypatch.setattr('nourish._dataset.verify_data_files', self._fail)
+        for parsed_cache in (False, True):
+            data = downloaded_dataset.load(format_loader_map=format_loader_map, parsed_cache=parsed_cache)
+            assert all(isinstance(lines, TextLines) for lines in data.values())
+        assert sorted(downloaded_dataset._data_dir.iterdir()) == files
+        assert len(list(downloaded_dataset._index_dir_.iterdir())) == len(data)
+
+    def test_modified_file_list(self, downloaded_dataset):
+        "Test that rewriting the file list invalidates the stamp."
+
+        assert downloaded_dataset.is_downloaded() is True
+        downloaded_dataset._file_list_file.write_text('nonsense\n', encoding='utf-8')
+        with pytest.raises(JSONDecodeError):
+            downloaded_dataset.is_downloaded()
+
+    def test_no_stamp(self, downloaded_dataset, monkeypatch):
+        "Test that ``use_stamp=False`` compares the file tree with the file list even if it is stamped."
+
+        assert downloaded_dataset.is_downloaded() is True
+        monkeypatch.setattr('nourish._dataset.verify_data_files', self._fail)
+        with pytest.raises(AssertionError, match='compared'):
+            downloaded_dataset.is_downloaded(use_stamp=False)
+
+    @pytest.mark.parametrize('content', ('nonsense', '{}'))
+    def test_invalid_stamp(self, content, downloaded_dataset):
+        "Test that an unreadable stamp is replaced."
+
+        downloaded_dataset._verification_stamp_file_.write_text(content)
+        assert downloaded_dataset.is_downloaded() is True
+        assert 'fingerprint' in json.loads(downloaded_dataset._verification_stamp_file_.read_text())
+
+    def test_unwritable_stamp(self, downloaded_dataset, monkeypatch, tmp_path):
+        "Test that the dataset is still found downloaded if the stamp can't be written."
+
+        monkeypatch.setattr(Dataset, '_verification_stamp_file_', property(lambda self: tmp_path / 'missing/stamp'))
+        assert downloaded_dataset.is_downloaded() is True
+        assert not (tmp_path / 'missing').exists()
+        assert list(downloaded_dataset._nourish_dir_.glob('.verified.stamp-*')) == []
+
+    def test_delete(self, downloaded_dataset, monkeypatch):
+        "Test that deleting the dataset forgets the stamp."
+
+        assert downloaded_dataset.is_downloaded() is True
+        monkeypatch.setattr('nourish._dataset.verify_data_files', self._fail)
+        downloaded_dataset.delete()
+        assert downloaded_dataset.is_downloaded() is False
+
+
+class TestDeepVerification:
+    "Test finding and repairing damaged data files."
+
+    def test_intact(self, downloaded_dataset):
+        "Test that an intact dataset has no damaged files, and that the intact files are recorded."
+
+        assert downloaded_dataset.verify() == []
+        assert downloaded_dataset.verify(deep=True, workers=2) == []
+        verified = json.loads(downloaded_dataset._verified_digests_file_.read_text())
+        assert sorted(verified) == ['test.csv', 'test.txt']
+
+    def test_damaged(self, downloaded_dataset):
+        "Test that missing files are found by a shallow verification, and corrupted files by a deep one."
+
+        (downloaded_dataset._data_dir / 'test.csv').unlink()
+        path = downloaded_dataset._data_dir / 'test.txt'
+        path.write_bytes(b'x' * path.stat().st_size)
+        assert downloaded_dataset.verify() == ['test.csv']
+        assert downloaded_dataset.verify(deep=True) == ['test.csv', 'test.txt']
+        assert json.loads(downloaded_dataset._verified_digests_file_.read_text()) == {}
+
+    def test_subdatasets(self, downloaded_dataset):
+        "Test that only the files of the given subdatasets are verified."
+
+        assert downloaded_dataset.verify(deep=True) == []
+        (downloaded_dataset._data_dir / 'test.csv').unlink()
+        assert downloaded_dataset.verify(['test'], deep=True) == []
+        # The records of the other files are kept
+        assert sorted(json.loads(downloaded_dataset._verified_digests_file_.read_text())) == ['test.csv', 'test.txt']
+        assert downloaded_dataset.verify() == ['test.csv']
+        (downloaded_dataset._data_dir / 'test.txt').write_text('corrupted')
+        assert downloaded_dataset.verify(['test']) == ['test.txt']
+
+    def test_incremental(self, downloaded_dataset, monkeypatch):
+        "Test that files that haven't changed since they were found intact are not read again."
+
+        assert downloaded_dataset.verify(deep=True) == []
+        hashed = []
+
+        def file_digest(path, algorithm):
+            hashed.append(path.name)
+            return _file_digest(path, algorithm)
+
+        monkeypatch.setattr('nourish._extractors._file_digest', file_digest)
+        assert downloaded_dataset.verify(deep=True) == []
+        assert hashed == []
+
+        path = downloaded_dataset._data_dir / 'test.txt'
+        os.utime(path, ns=(path.stat().st_atime_ns, path.stat().st_mtime_ns + 1000))
+        assert downloaded_dataset.verify(deep=True) == []
+        assert hashed == ['test.txt']
+
+        # Unreadable records are discarded
+        downloaded_dataset._verified_digests_file_.write_text('nonsense')
+        assert downloaded_dataset.verify(deep=True) == []
+        assert sorted(hashed) == ['test.csv', 'test.txt', 'test.txt']
+
+    def test_not_downloaded(self, tmp_path, gmb_schema):
+        "Test verifying a dataset that hasn't been downloaded."
+
+        dataset = Dataset(gmb_schema, data_dir=tmp_path, mode=Dataset.InitializationMode.LAZY)
+        with pytest.raises(RuntimeError) as e:
+            dataset.verify()
+        assert 'Dataset has not been downloaded.' in str(e.value)
+
+    def test_repair(self, downloaded_dataset):
+        "Test that damaged files are extracted again from a downloaded archive, and that other files are left alone."
+
+        (downloaded_dataset._data_dir / 'test.txt').write_text('corrupted')
+        csv_inode = (downloaded_dataset._data_dir / 'test.csv').stat().st_ino
+        assert downloaded_dataset.repair() == ['test.txt']
+        assert downloaded_dataset.verify(deep=True) == []
+        assert downloaded_dataset.is_downloaded() is True
+        assert (downloaded_dataset._data_dir / 'test.csv').stat().st_ino == csv_inode
+        assert list(downloaded_dataset._nourish_dir.glob('*.tar.gz')) == []
+
+        # Nothing to repair
+        assert downloaded_dataset.repair() == []
+
+    def test_repair_from_cache(self, downloaded_dataset, monkeypatch, tmp_path):
+        "Test that damaged files are extracted again from a cached archive without accessing the network."
+
+        archive_cache = ArchiveCache(tmp_path / 'cache', max_size=2 ** 20)
+        downloaded_dataset.download(check=False, archive_cache=archive_cache)
+
+        def download_archive(*args, **kwargs):
+            raise AssertionError('The archive was downloaded')
+
+        monkeypatch.setattr('nourish._dataset.download_archive', download_archive)
+        (downloaded_dataset._data_dir / 'test.csv').unlink()
+        assert downloaded_dataset.repair(['test.csv'], archive_cache=archive_cache) == ['test.csv']
+        assert downloaded_dataset.verify(deep=True) == []
@@ -0,0 +1,214 @@
+# Copyright 2021 Edward Leardi. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import bz2
+import hashlib
+import io
+import json
+import lzma
+import random
+import struct
+import tarfile
+
+import pytest
+
+from nourish._decompress import (_BlockReader, _bzip2_blocks, _decode_bzip2_block, _decode_xz_block, _xz_blocks,
+                                 open_compressed)
+from nourish._extractors import extract_data_files
+
+
+@pytest.fixture(scope='module')
+def data():
+    "Text that spans several bzip2 blocks of the smallest block size."
+    rng = random.Random(0)
+    words = [''.join(rng.choice('abcdefghij') for _ in range(rng.randint(2, 9))) for _ in range(1000)]
+    return ' '.join(rng.choice(words) for _ in range(60000)).encode()
+
+
+@pytest.fixture
+def bzip2_file(data, tmp_path):
+    "A bzip2 file of one stream with several blocks."
+    path = tmp_path / 'data.bz2'
+    path.write_bytes(bz2.compress(data, compresslevel=1))
+    return path
+
+
+@pytest.fixture
+def multi_stream_bzip2_file(data, tmp_path):
+    "A bzip2 file of two concatenated streams of different block sizes, as written by parallel compressors."
+    path = tmp_path / 'data-multi-stream.bz2'
+    path.write_bytes(bz2.compress(data[:100000], compresslevel=1) + bz2.compress(data[100000:], compresslevel=9))
+    return path
+
+
+@pytest.fixture
+def xz_file(data, tmp_path):
+    "An xz file of three concatenated single-block streams."
+    path = tmp_path / 'data.xz'
+    path.write_bytes(b''.join(lzma.compress(data[i:i + 150000]) for i in range(0, len(data), 150000)))
+    return path
+
+
+class TestOpenCompressed:
+    "Test :func:`open_compressed`."
+
+    @pytest.mark.parametrize('compressed_file, compression', (('bzip2_file', 'bzip2'),
+                                                              ('multi_stream_bzip2_file', 'bzip2'),
+                                                              ('xz_file', 'xz')))
+    def test_parallel(self, compressed_file, compression, data, request):
+        "Test that the blocks are decoded in parallel and reassembled in order."
+
+        path = request.getfixturevalue(compressed_file)
+        with open_compressed(path, compression, workers=3) as f:
+            assert isinstance(f.raw, _BlockReader)
+            assert f.read(1000) == data[:1000]
+            assert f.read() == data[1000:]
+
+    def test_spawned_workers(self, xz_file, data):
+        "Test that the worker processes are spawned rather than forked from a process that may run other threads."
+
+        with open_compressed(xz_file, 'xz', workers=2) as f:
+            assert f.raw._executor._mp_context.get_start_method() == 'spawn'
+            assert f.read() == data
+
+    @pytest.mark.parametrize('compressed_file, compression', (('test.txt.bz2', 'bzip2'), ('test.txt.xz', 'xz')))
+    def test_single_block(self, compressed_file, compression, dataset_dir):
+        "Test that files of a single block are decompressed serially."
+
+        path = dataset_dir / 'extractables' / compressed_file
+        with open_compressed(path, compression, workers=3) as f:
+            assert not isinstance(f, io.BufferedReader)
+
+    def test_workers_one(self, bzip2_file, data):
+        "Test that a single worker means decompressing serially."
+
+        with open_compressed(bzip2_file, 'bzip2') as f:
+            assert isinstance(f, bz2.BZ2File)
+            assert f.read() == data
+
+    @pytest.mark.parametrize('compressed_file, compression', (('bzip2_file', 'bzip2'), ('xz_file', 'xz')))
+    def test_fall_back(self, compressed_file, compression, data, request):
+        "Test that the serial decompressor takes over at the current position when a block fails to decode."
+
+        path = request.getfixturevalue(compressed_file)
+        if compression == 'bzip2':
+            blocks, decode = _bzip2_blocks(path), _decode_bzip2_block
+            # A misdetected block boundary
+            blocks[2] = (blocks[2][0] + 1,) + blocks[2][1:]
+        else:
+            blocks, decode = _xz_blocks(path), _decode_xz_block
+            # A corrupted index
+            blocks[1] = blocks[1][:3] + (blocks[1][3] + 1,)
+        with io.BufferedReader(_BlockReader(path, compression, decode, blocks, workers=2)) as f:
+            assert f.read(1000) == data[:1000]
+            assert f.read() == data[1000:]
+            assert f.raw._serial is not None
+
+
+class TestBlocks:
+    "Test locating and decoding blocks."
+
+    def test_bzip2_blocks(self, bzip2_file, multi_stream_bzip2_file, data):
+        "Test that the bzip2 blocks decode to the original data when decoded one by one."
+
+        for path in (bzip2_file, multi_stream_bzip2_file):
+            blocks = _bzip2_blocks(path)
+            assert len(blocks) > 2
+            assert b''.join(_decode_bzip2_block(path, *block) for block in blocks) == data
+        assert {block[2] for block in _bzip2_blocks(multi_stream_bzip2_file)} == {1, 9}
+
+    def test_xz_blocks(self, xz_file, data, tmp_path):
+        "Test that the xz blocks decode to the original data when decoded one by one, also with stream padding."
+
+        padded = tmp_path / 'padded.xz'
+        padded.write_bytes(lzma.compress(data[:1000]) + b'\x00' * 8 + lzma.compress(data[1000:]) + b'\x00' * 4)
+        for path, count in ((xz_file, 3), (padded, 2)):
+            blocks = _xz_blocks(path)
+            assert len(blocks) == count
+            assert b''.join(_decode_xz_block(path, *block) for block in blocks) == data
+
+    @pytest.mark.parametrize('content', (b'BZh9', bz2.compress(b'a') + b'XXXX' + bz2.compress(b'b')))
+    def test_bzip2_not_understood(self, content, tmp_path):
+        "Test that files whose structure isn't understood have no blocks, so that they are decompressed serially."
+
+        path = tmp_path / 'test.bz2'
+        path.write_bytes(content)
+        assert _bzip2_blocks(path) == []
+
+    def test_xz_not_understood(self, tmp_path):
+        "Test that xz files whose structure isn't understood have no blocks, so that they are decompressed serially."
+
+        stream = bytearray(lzma.compress(b'test'))
+        index_size = (struct.unpack('<I', stream[-8:-4])[0] + 1) * 4
+        index_start = len(stream) - 12 - index_size
+
+        def mutated(offset, value):
+            result = bytearray(stream)
+            result[offset:offset + len(value)] = value
+            return bytes(result)
+
+        for content in (b'test',  # Too short
+                        bytes(stream[:-2]) + b'XX',  # No footer
+                        mutated(-8, struct.pack('<I', 1000)),  # Index larger than the stream
+                        mutated(index_start, b'\x01'),  # Not an index
+                        mutated(index_start + 1, b'\xff' * 9),  # Malformed number of records
+                        mutated(index_start + 1, b'\x01\xff\xff\x7f'),  # Blocks larger than the stream
+                        mutated(6, b'\x00\x01'),  # Stream flags differ between the header and the footer
+                        ):
+            path = tmp_path / 'test.xz'
+            path.write_bytes(content)
+            assert _xz_blocks(path) == []
+
+
+class TestParallelExtractors:
+    "Test extracting bzip2 and xz files with multiple workers."
+
+    @pytest.mark.parametrize('compression', ('bzip2', 'xz'))
+    def test_compressed_tarball(self, compression, data, tmp_path):
+        "Test that compressed tarballs extracted in parallel have the same files and file list as extracted serially."
+
+        tar_fp = tmp_path / 'test.tar'
+        with tarfile.open(tar_fp, mode='w') as mytar:
+            for i in range(3):
+                info = tarfile.TarInfo(f'dir/{i}.txt')
+                info.size = len(data)
+                mytar.addfile(info, io.BytesIO(data))
+        archive_fp = tmp_path / 'test.tar.compressed'
+        if compression == 'bzip2':
+            archive_fp.write_bytes(bz2.compress(tar_fp.read_bytes(), compresslevel=1))
+        else:
+            tar = tar_fp.read_bytes()
+            archive_fp.write_bytes(b''.join(lzma.compress(tar[i:i + 200000]) for i in range(0, len(tar), 200000)))
+
+        file_lists = []
+        for workers in (1, 2):
+            data_dir = tmp_path / f'workers-{workers}'
+            data_dir.mkdir()
+            file_list_file = tmp_path / f'files-{workers}.list'
+            extract_data_files(archive_fp, data_dir, file_list_file, workers=workers)
+            file_lists.append(file_list_file.read_bytes())
+            assert (data_dir / 'dir/2.txt').read_bytes() == data
+        assert file_lists[0] == file_lists[1]
+
+    @pytest.mark.parametrize('compressed_file', ('bzip2_file', 'xz_file'))
+    def test_compressed_file(self, compressed_file, data, request, tmp_path):
+        "Test extracting a compressed flat file in parallel."
+
+        path = request.getfixturevalue(compressed_file)
+        file_list_file = tmp_path / 'files.list'
+        extract_data_files(path, tmp_path, file_list_file, workers=2)
+        assert (tmp_path / 'data').read_bytes() == data
+        assert json.loads(file_list_file.read_text())['contents'] == {'filename': 'data', 'size': len(data),
+                                                                      'blake2b': hashlib.blake2b(data).hexdigest()}
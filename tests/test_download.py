@@ -0,0 +1,289 @@
+# Copyright 2021 Edward Leardi. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import asyncio
+import hashlib
+import json
+
+import pytest
+import requests
+
+from nourish.dataset import Dataset
+from nourish._async import ClientSessionContext
+from nourish._download import _DownloadJournal, adownload_archive, download_archive, download_archive_segmented
+
+
+class TestDownloadArchive:
+    "Test :func:`download_archive`."
+
+    @pytest.mark.parametrize('chunk_size', (1, 7, 1024, 1024 * 1024))
+    def test_chunked_download(self, dataset_base_url, dataset_dir, tmp_path, chunk_size):
+        "Test that the archive is written and hashed correctly regardless of the chunk size."
+
+        source = dataset_dir / 'extractables' / 'test.tar.gz'
+        archive_fp = tmp_path / 'test.tar.gz'
+        computed_hash = download_archive(f'{dataset_base_url}/extractables/test.tar.gz', archive_fp,
+                                         chunk_size=chunk_size)
+        assert archive_fp.read_bytes() == source.read_bytes()
+        assert computed_hash == hashlib.sha512(source.read_bytes()).hexdigest()
+
+    def test_overwrite(self, dataset_base_url, dataset_dir, tmp_path):
+        "Test that an existing file is overwritten rather than appended to."
+
+        archive_fp = tmp_path / 'test.zip'
+        archive_fp.write_bytes(b'garbage' * 1000)
+        download_archive(f'{dataset_base_url}/extractables/test.zip', archive_fp)
+        assert archive_fp.read_bytes() == (dataset_dir / 'extractables' / 'test.zip').read_bytes()
+
+
+class TestResumableDownload:
+    "Test resumption of interrupted downloads in :func:`download_archive`."
+
+    @pytest.fixture
+    def source(self, dataset_dir):
+        "The archive being downloaded in these tests."
+        return dataset_dir / 'extractables' / 'test.tar.gz'
+
+    @pytest.fixture
+    def status_codes(self, monkeypatch):
+        "Status codes of the responses received by :func:`download_archive`."
+
+        codes = []
+        original_get = requests.Session.get
+
+        def get(self, *args, **kwargs):
+            response = original_get(self, *args, **kwargs)
+            codes.append(response.status_code)
+            return response
+
+        monkeypatch.setattr(requests.Session, 'get', get)
+        return codes
+
+    @staticmethod
+    def _write_partial(archive_fp, journal_fp, url, content):
+        "Write a partial archive and its journal as an interrupted download would have left them."
+        archive_fp.write_bytes(content)
+        journal_fp.write_text(json.dumps({'url': url,
+                                          'bytes_received': len(content),
+                                          'partial_sha512': hashlib.sha512(content).hexdigest()}))
+
+    def test_interrupted_download_is_resumed(self, monkeypatch, dataset_base_url, source, tmp_path, status_codes):
+        "Test that a download interrupted midway records its progress and continues from there with a range request."
+
+        url = f'{dataset_base_url}/extractables/test.tar.gz'
+        archive_fp, journal_fp = tmp_path / 'test.tar.gz', tmp_path / 'download.journal'
+        chunk_size = 16
+
+        # Interrupt the download after two chunks
+        original_iter_content = requests.Response.iter_content
+
+        def interrupted_iter_content(self, *args, **kwargs):
+            for i, chunk in enumerate(original_iter_content(self, *args, **kwargs)):
+                if i == 2:
+                    raise requests.exceptions.ConnectionError('Connection lost')
+                yield chunk
+
+        monkeypatch.setattr(requests.Response, 'iter_content', interrupted_iter_content)
+        with pytest.raises(requests.exceptions.ConnectionError):
+            download_archive(url, archive_fp, journal_fp=journal_fp, chunk_size=chunk_size)
+        journal = json.loads(journal_fp.read_text())
+        assert journal['bytes_received'] == 2 * chunk_size
+        assert archive_fp.read_bytes() == source.read_bytes()[:2 * chunk_size]
+
+        monkeypatch.setattr(requests.Response, 'iter_content', original_iter_content)
+        computed_hash = download_archive(url, archive_fp, journal_fp=journal_fp, chunk_size=chunk_size)
+        assert status_codes == [200, 206]
+        assert computed_hash == hashlib.sha512(source.read_bytes()).hexdigest()
+        assert archive_fp.read_bytes() == source.read_bytes()
+        assert not journal_fp.exists()
+
+    def test_bytes_after_last_journal_update_are_dropped(self, dataset_base_url, source, tmp_path, status_codes):
+        "Test that bytes written to the partial archive after the last journal update are discarded."
+
+        url = f'{dataset_base_url}/extractables/test.tar.gz'
+        archive_fp, journal_fp = tmp_path / 'test.tar.gz', tmp_path / 'download.journal'
+        self._write_partial(archive_fp, journal_fp, url, source.read_bytes()[:100])
+        with open(archive_fp, 'ab') as f:
+            f.write(b'garbage')
+
+        computed_hash = download_archive(url, archive_fp, journal_fp=journal_fp)
+        assert status_codes == [206]
+        assert computed_hash == hashlib.sha512(source.read_bytes()).hexdigest()
+        assert archive_fp.read_bytes() == source.read_bytes()
+
+    def test_server_ignores_range(self, local_http_server_root_url, source, tmp_path, status_codes):
+        "Test falling back to a full download when the server doesn't support range requests."
+
+        url = f'{local_http_server_root_url}/tests/datasets/extractables/test.tar.gz'
+        archive_fp, journal_fp = tmp_path / 'test.tar.gz', tmp_path / 'download.journal'
+        self._write_partial(archive_fp, journal_fp, url, source.read_bytes()[:100])
+
+        computed_hash = download_archive(url, archive_fp, journal_fp=journal_fp)
+        assert status_codes == [200]
+        assert computed_hash == hashlib.sha512(source.read_bytes()).hexdigest()
+        assert archive_fp.read_bytes() == source.read_bytes()
+
+    @pytest.mark.parametrize('journal_change', (
+        # The partial archive doesn't match the hash in the journal
+        {'partial_sha512': hashlib.sha512(b'something else').hexdigest()},
+        # The journal was written for a different URL
+        {'url': 'https://example.com/other.tar.gz'},
+        # The remote file has changed since the partial download
+        {'last_modified': 'Thu, 01 Jan 1970 00:00:00 GMT'},
+    ))
+    def test_partial_archive_discarded(self, dataset_base_url, source, tmp_path, status_codes, journal_change):
+        "Test that a partial archive that can't be safely continued is downloaded again from the beginning."
+
+        url = f'{dataset_base_url}/extractables/test.tar.gz'
+        archive_fp, journal_fp = tmp_path / 'test.tar.gz', tmp_path / 'download.journal'
+        self._write_partial(archive_fp, journal_fp, url, source.read_bytes()[:100])
+        journal = json.loads(journal_fp.read_text())
+        journal.update(journal_change)
+        journal_fp.write_text(json.dumps(journal))
+
+        computed_hash = download_archive(url, archive_fp, journal_fp=journal_fp)
+        assert status_codes == [200]
+        assert computed_hash == hashlib.sha512(source.read_bytes()).hexdigest()
+        assert archive_fp.read_bytes() == source.read_bytes()
+
+    def test_range_not_satisfiable(self, dataset_base_url, source, tmp_path, status_codes):
+        "Test that the download starts over when the partial archive is longer than the remote file."
+
+        url = f'{dataset_base_url}/extractables/test.tar.gz'
+        archive_fp, journal_fp = tmp_path / 'test.tar.gz', tmp_path / 'download.journal'
+        self._write_partial(archive_fp, journal_fp, url, source.read_bytes() + b'trailing')
+
+        computed_hash = download_archive(url, archive_fp, journal_fp=journal_fp)
+        assert status_codes == [416, 200]
+        assert computed_hash == hashlib.sha512(source.read_bytes()).hexdigest()
+        assert archive_fp.read_bytes() == source.read_bytes()
+
+
+class TestSegmentedDownload:
+    "Test :func:`download_archive_segmented`."
+
+    @pytest.fixture
+    def range_requests(self, monkeypatch):
+        "Range headers of the requests sent by :func:`download_archive_segmented`."
+
+        ranges = []
+        original_get = requests.Session.get
+
+        def get(self, *args, headers=None, **kwargs):
+            ranges.append((headers or {}).get('Range'))
+            return original_get(self, *args, headers=headers, **kwargs)
+
+        monkeypatch.setattr(requests.Session, 'get', get)
+        return ranges
+
+    @pytest.mark.parametrize('connections, segment_size', ((2, 1024 * 1024), (4, 100), (16, 16)))
+    def test_segmented_download(self, dataset_base_url, dataset_dir, tmp_path, range_requests,
+                                connections, segment_size):
+        "Test that segments are all downloaded to their positions and the whole archive is hashed."
+
+        source = dataset_dir / 'extractables' / 'test.zip'
+        size = source.stat().st_size
+        archive_fp = tmp_path / 'test.zip'
+        computed_hash = download_archive_segmented(f'{dataset_base_url}/extractables/test.zip', archive_fp,
+                                                   connections=connections, segment_size=segment_size)
+        assert archive_fp.read_bytes() == source.read_bytes()
+        assert computed_hash == hashlib.sha512(source.read_bytes()).hexdigest()
+
+        # One probe, then at least one request per connection and no request larger than segment_size
+        assert range_requests[0] == 'bytes=0-0'
+        segments = [tuple(int(i) for i in r[len('bytes='):].split('-')) for r in range_requests[1:]]
+        assert len(segments) >= min(connections, size)
+        assert all(end - start + 1 <= segment_size for start, end in segments)
+        assert sorted(segments)[0][0] == 0 and sorted(segments)[-1][1] == size - 1
+
+    def test_server_ignores_range(self, local_http_server_root_url, dataset_dir, tmp_path, range_requests):
+        "Test falling back to a single connection when the server doesn't support range requests."
+
+        source = dataset_dir / 'extractables' / 'test.zip'
+        archive_fp = tmp_path / 'test.zip'
+        computed_hash = download_archive_segmented(
+            f'{local_http_server_root_url}/tests/datasets/extractables/test.zip', archive_fp, connections=4)
+        assert range_requests == ['bytes=0-0', None]
+        assert archive_fp.read_bytes() == source.read_bytes()
+        assert computed_hash == hashlib.sha512(source.read_bytes()).hexdigest()
+
+    def test_remote_file_changed(self, monkeypatch, dataset_base_url, tmp_path):
+        "Test that a segmented download fails if the remote file changes midway."
+
+        monkeypatch.setattr(_DownloadJournal, 'if_range', 'Thu, 01 Jan 1970 00:00:00 GMT')
+        with pytest.raises(OSError) as e:
+            download_archive_segmented(f'{dataset_base_url}/extractables/test.zip', tmp_path / 'test.zip',
+                                       connections=2)
+        assert 'The remote file may have changed during the download.' in str(e.value)
+
+    def test_dataset_download(self, dataset_base_url, dataset_dir, gmb_schema, tmp_path):
+        "Test ``Dataset.download`` with multiple connections."
+
+        gmb_schema['download_url'] = f'{dataset_base_url}/extractables/test.tar.gz'
+        gmb_schema['sha512sum'] = hashlib.sha512((dataset_dir / 'extractables/test.tar.gz').read_bytes()).hexdigest()
+        dataset = Dataset(gmb_schema, data_dir=tmp_path, mode=Dataset.InitializationMode.LAZY)
+        dataset.download(connections=3, segment_size=64)
+        assert dataset.is_downloaded() is True
+
+
+class TestAsyncDownload:
+    "Test :func:`adownload_archive`."
+
+    @pytest.fixture(autouse=True)
+    def require_aiohttp(self):
+        pytest.importorskip('aiohttp')
+
+    @staticmethod
+    def _download(url, archive_fp, **kwargs):
+        "Run :func:`adownload_archive` with a new session in a new event loop."
+
+        async def download():
+            async with ClientSessionContext(None) as session:
+                return await adownload_archive(url, archive_fp, session=session, **kwargs)
+
+        return asyncio.run(download())
+
+    @pytest.mark.parametrize('chunk_size', (7, 1024 * 1024))
+    def test_download(self, dataset_base_url, dataset_dir, tmp_path, chunk_size):
+        "Test that the archive is written and hashed correctly."
+
+        source = dataset_dir / 'extractables' / 'test.tar.gz'
+        archive_fp = tmp_path / 'test.tar.gz'
+        computed_hash = self._download(f'{dataset_base_url}/extractables/test.tar.gz', archive_fp,
+                                       chunk_size=chunk_size)
+        assert archive_fp.read_bytes() == source.read_bytes()
+        assert computed_hash == hashlib.sha512(source.read_bytes()).hexdigest()
+
+    def test_resume(self, dataset_base_url, dataset_dir, tmp_path):
+        "Test that a partial archive left by an interrupted download is continued."
+
+        url = f'{dataset_base_url}/extractables/test.tar.gz'
+        source = dataset_dir / 'extractables' / 'test.tar.gz'
+        archive_fp, journal_fp = tmp_path / 'test.tar.gz', tmp_path / 'download.journal'
+        TestResumableDownload._write_partial(archive_fp, journal_fp, url, source.read_bytes()[:100])
+
+        computed_hash = self._download(url, archive_fp, journal_fp=journal_fp)
+        assert computed_hash == hashlib.sha512(source.read_bytes()).hexdigest()
+        assert archive_fp.read_bytes() == source.read_bytes()
+        assert not journal_fp.exists()
+
+    def test_error_status(self, dataset_base_url, tmp_path):
+        "Test that an error status is raised."
+
+        import aiohttp
+
+        with pytest.raises(aiohttp.ClientResponseError) as e:
+            self._download(f'{dataset_base_url}/extractables/nonexistent.tar.gz', tmp_path / 'nonexistent.tar.gz')
+        assert e.value.status == 404
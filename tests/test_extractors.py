@@ -13,15 +13,23 @@
 # limitations under the License.
 #
 
+from concurrent.futures import ProcessPoolExecutor
 import copy
 import hashlib
+import io
 import json
+import os
+import stat
 import tarfile
+import zipfile
 
 import pytest
 
 from nourish.dataset import Dataset
-from nourish._extractors import Extractor
+from nourish._extractors import (_extract_zip_members, _file_digest, _reading_file_list, _sniff_format, _stat_members,
+                                 _ZipExtractor, extract_data_files, extract_tar_stream, extractor_map, Extractor,
+                                 find_damaged_data_files, recorded_digest, repair_data_files, verify_data_files)
+from nourish._manifest import Manifest, ManifestEntry, ManifestWriter, normalize_name
 
 
 class TestBaseExtractor:
@@ -56,6 +64,25 @@ class TestBaseExtractor:
         MyExtractor().extract(None, None, None)
         MyExtractor().verify_extraction(None, None)
 
+    def test_default_methods(self):
+        "Test the methods of Extractor that don't need to be overridden."
+
+        extracted = []
+
+        class MyExtractor(Extractor):
+            def extract(self, path, data_dir, file_list_file):
+                extracted.append(path)
+
+            def verify_extraction(self, data_dir, contents):
+                return True
+
+        with pytest.raises(NotImplementedError):
+            MyExtractor().damaged_members(None, {})
+        assert MyExtractor().digests({}) == {}
+        # Extracting some members extracts everything
+        MyExtractor().extract_members('archive', None, None, ['a'])
+        assert extracted == ['archive']
+
 
 class TestExtractors:
     "Test Extractors functionality."
@@ -94,9 +121,8 @@ class TestExtractors:
         fake_schema['sha512sum'] = hashlib.sha512((dataset_dir / 'extractables' / extractable).read_bytes()).hexdigest()
         dataset = Dataset(fake_schema, data_dir=tmp_path, mode=Dataset.InitializationMode.DOWNLOAD_ONLY)
         assert dataset.is_downloaded() is True
-        with open(dataset._file_list_file, mode='r') as f:
-            file_list = json.load(f)
-        assert file_list['type'] == extractable_type
+        with _reading_file_list(dataset._file_list_file) as (extractor, _):
+            assert extractor is extractor_map[extractable_type]
 
     def test_unsupported_file_extensions(self, tmp_path, gmb_schema,
                                          schemata_file_https_url, schemata_file_relative_dir):
@@ -120,29 +146,46 @@ class TestExtractors:
         tar_gz_dataset = Dataset(fake_schema, data_dir=tmp_path, mode=Dataset.InitializationMode.DOWNLOAD_ONLY)
         assert tar_gz_dataset.is_downloaded() is True
 
-        # Content of the file list
-        with open(tar_gz_dataset._file_list_file, mode='r') as f:
-            file_list = json.load(f)
+        # Content of the manifest
+        with Manifest(tar_gz_dataset._file_list_file) as manifest:
+            entries = {entry.name: entry for entry in manifest}
+        assert sorted(entries) == ['.', 'test.csv', 'test.txt']
 
-        def test_incorrect_file_list(change: dict):
-            "Test a single case that somewhere in the file list things are wrong."
+        def test_incorrect_file_list(*changes: ManifestEntry):
+            "Test a single case that somewhere in the manifest things are wrong."
 
-            wrong_file_list = copy.deepcopy(file_list)
-            wrong_file_list['contents'].update(change)
-            with open(tar_gz_dataset._file_list_file, mode='w') as f:
-                json.dump(wrong_file_list, f)
+            writer = ManifestWriter('application/x-tar', 'blake2b')
+            for entry in {**entries, **{entry.name: entry for entry in changes}}.values():
+                writer.add(*entry)
+            writer.write(tar_gz_dataset._file_list_file)
             assert tar_gz_dataset.is_downloaded() is False
 
         # Can't find a file
-        test_incorrect_file_list({'non-existing-file': {'type': int(tarfile.REGTYPE)}})
+        test_incorrect_file_list(ManifestEntry('non-existing-file', tarfile.REGTYPE, 0, None))
         # File type incorrect
-        test_incorrect_file_list({'.': {'type': int(tarfile.REGTYPE)}})
-        test_incorrect_file_list({'./test.csv': {'type': int(tarfile.DIRTYPE)}})
-        test_incorrect_file_list({'./test.txt': {'type': int(tarfile.SYMTYPE)}})
+        test_incorrect_file_list(ManifestEntry('.', tarfile.REGTYPE, 0, None))
+        test_incorrect_file_list(entries['test.csv']._replace(kind=tarfile.DIRTYPE))
+        test_incorrect_file_list(entries['test.txt']._replace(kind=tarfile.SYMTYPE))
         # Size incorrect
-        changed = copy.deepcopy(file_list['contents']['./test.csv'])
-        changed['size'] += 100
-        test_incorrect_file_list({'./test.csv': changed})
+        test_incorrect_file_list(entries['test.csv']._replace(size=entries['test.csv'].size + 100))
+
+    def test_legacy_json_file_list(self, dataset_dir, tmp_path):
+        "Test that JSON file lists written before manifests were introduced are still read."
+
+        extract_data_files(dataset_dir / 'extractables/test.zip', tmp_path, tmp_path / 'files.list')
+        (tmp_path / 'test-dir/test.csv').unlink()
+        for archive_type, contents in (
+                ('application/x-tar', {'.': {'type': int(tarfile.DIRTYPE)},
+                                       './test-dir/test.csv': {'type': int(tarfile.REGTYPE), 'size': 26},
+                                       './test-dir/test.txt': {'type': int(tarfile.REGTYPE), 'size': 21}}),
+                ('application/zip', {'test-dir/': {'isdir': True},
+                                     'test-dir/test.csv': {'isdir': False, 'size': 26},
+                                     'test-dir/test.txt': {'isdir': False, 'size': 21}})):
+            file_list_file = tmp_path / f'{archive_type.replace("/", "-")}.list'
+            file_list_file.write_text(json.dumps({'type': archive_type, 'contents': contents}, indent=2))
+            assert verify_data_files(tmp_path, file_list_file) is False
+            damaged = find_damaged_data_files(tmp_path, file_list_file, deep=True)
+            assert [normalize_name(name) for name in damaged] == ['test-dir/test.csv']
 
     def test_zip_extractor(self, dataset_base_url, dataset_dir, gmb_schema, tmp_path):
         "Test _ZipExtractor to make sure zip datasets are properly extracted and verified."
@@ -153,27 +196,25 @@ class TestExtractors:
         zip_dataset = Dataset(fake_schema, data_dir=tmp_path, mode=Dataset.InitializationMode.DOWNLOAD_ONLY)
         assert zip_dataset.is_downloaded() is True
 
-        # Content of the file list
-        with open(zip_dataset._file_list_file, mode='r') as f:
-            file_list = json.load(f)
+        # Content of the manifest
+        with Manifest(zip_dataset._file_list_file) as manifest:
+            entries = {entry.name: entry for entry in manifest}
 
-        def test_incorrect_file_list(change: dict):
-            "Test a single case that somewhere in the file list things are wrong."
+        def test_incorrect_file_list(*changes: ManifestEntry):
+            "Test a single case that somewhere in the manifest things are wrong."
 
-            wrong_file_list = copy.deepcopy(file_list)
-            wrong_file_list['contents'].update(change)
-            with open(zip_dataset._file_list_file, mode='w') as f:
-                json.dump(wrong_file_list, f)
+            writer = ManifestWriter('application/zip', 'crc32')
+            for entry in {**entries, **{entry.name: entry for entry in changes}}.values():
+                writer.add(*entry)
+            writer.write(zip_dataset._file_list_file)
             assert zip_dataset.is_downloaded() is False
 
         # Can't find a file
-        test_incorrect_file_list({'non-existing-file': {'isdir': False}})
+        test_incorrect_file_list(ManifestEntry('non-existing-file', tarfile.REGTYPE, 0, None))
         # File type incorrect
-        test_incorrect_file_list({'test-dir/test.csv': {'isdir': True}})
+        test_incorrect_file_list(entries['test-dir/test.csv']._replace(kind=tarfile.DIRTYPE))
         # Size incorrect
-        changed = copy.deepcopy(file_list['contents']['test-dir/test.txt'])
-        changed['size'] += 100
-        test_incorrect_file_list({'test-dir/test.txt': changed})
+        test_incorrect_file_list(entries['test-dir/test.txt']._replace(size=entries['test-dir/test.txt'].size + 100))
 
     @pytest.mark.parametrize('compressed_file',
                              ('test.txt.gz',
@@ -223,3 +264,333 @@ class TestExtractors:
         with pytest.raises(OSError) as e:
             Dataset(fake_schema, data_dir=(tmp_path), mode=Dataset.InitializationMode.DOWNLOAD_ONLY)
         assert str(e.value) == ('The extracted file test-zerobyte.csv is empty.')
+
+
+class TestFormatSniffing:
+    "Test detecting the format of dataset downloads from their leading bytes."
+
+    @pytest.mark.parametrize('extractable, expected',
+                             [
+                                 ('test.tar', 'application/x-tar'),
+                                 ('test.tar.bz2', 'application/x-tar'),
+                                 ('test.tar.gz', 'application/x-tar'),
+                                 ('test.tar.xz', 'application/x-tar'),
+                                 ('test.zip', 'application/zip'),
+                                 ('test.txt.bz2', 'bzip2'),
+                                 ('test.txt.gz', 'gzip'),
+                                 ('test.txt.xz', 'xz'),
+                                 ('test-zerobyte.csv.gz', 'gzip'),
+                                 ('test-tar-gz', 'application/x-tar'),
+                                 ('test-csv-gz', 'gzip'),
+                                 ('test-csv-bz2.csv.xz', 'bzip2'),
+                                 ('README.md', None),
+                             ])
+    def test_sniff_format(self, dataset_dir, extractable, expected):
+        "Test that formats are detected regardless of the file names."
+
+        assert _sniff_format(dataset_dir / 'extractables' / extractable) == expected
+
+    def test_corrupted_compressed_file(self, tmp_path):
+        "Test that a corrupted compressed file is still dispatched to the extractor of its compression."
+
+        path = tmp_path / 'corrupted'
+        path.write_bytes(b'\x1f\x8b' + b'\x00' * 100)
+        assert _sniff_format(path) == 'gzip'
+
+    def test_empty_zip(self, tmp_path):
+        "Test that an empty zip archive, which has no local file header, is detected."
+
+        path = tmp_path / 'empty'
+        zipfile.ZipFile(path, mode='w').close()
+        assert _sniff_format(path) == 'application/zip'
+
+
+class TestStreamExtraction:
+    "Test extracting tarballs while they are being downloaded."
+
+    @staticmethod
+    def _fake_schema(schema, dataset_base_url, dataset_dir, extractable):
+        "Point ``schema`` to one of the extractables."
+        schema['download_url'] = dataset_base_url + '/extractables/' + extractable
+        schema['sha512sum'] = hashlib.sha512((dataset_dir / 'extractables' / extractable).read_bytes()).hexdigest()
+        return schema
+
+    @pytest.mark.parametrize('extractable', ('test.tar', 'test.tar.bz2', 'test.tar.gz', 'test.tar.xz'))
+    def test_stream_extract(self, dataset_base_url, dataset_dir, extractable, gmb_schema, tmp_path):
+        "Test that streamed extraction produces the same files and file list as extracting a downloaded archive."
+
+        schema = self._fake_schema(gmb_schema, dataset_base_url, dataset_dir, extractable)
+        streamed = Dataset(schema, data_dir=tmp_path / 'streamed', mode=Dataset.InitializationMode.LAZY)
+        streamed.download(stream_extract=True)
+        # The archive never landed on the disk
+        assert sorted(p.name for p in streamed._nourish_dir.iterdir()) == ['files.list']
+        assert streamed.is_downloaded() is True
+
+        downloaded = Dataset(schema, data_dir=tmp_path / 'downloaded', mode=Dataset.InitializationMode.DOWNLOAD_ONLY)
+        assert streamed._file_list_file.read_bytes() == downloaded._file_list_file.read_bytes()
+        for name in ('test.csv', 'test.txt'):
+            assert (streamed._data_dir / name).read_bytes() == (downloaded._data_dir / name).read_bytes()
+
+    def test_invalid_sha512(self, dataset_base_url, dataset_dir, gmb_schema, tmp_path):
+        "Test that extracted files are rolled back when the checksum of the streamed archive doesn't match."
+
+        schema = self._fake_schema(gmb_schema, dataset_base_url, dataset_dir, 'test.tar.gz')
+        schema['sha512sum'] = 'invalid hash example'
+        dataset = Dataset(schema, data_dir=tmp_path, mode=Dataset.InitializationMode.LAZY)
+        with pytest.raises(OSError) as e:
+            dataset.download(stream_extract=True)
+        assert 'the file may by corrupted' in str(e.value)
+        assert dataset.is_downloaded() is False
+        assert [p.name for p in tmp_path.iterdir()] == ['.nourish.dataset']
+        assert list(dataset._nourish_dir.iterdir()) == []
+
+    def test_non_tar_archive(self, dataset_base_url, dataset_dir, gmb_schema, tmp_path):
+        "Test that archives other than tarballs are downloaded as usual in streaming mode."
+
+        schema = self._fake_schema(gmb_schema, dataset_base_url, dataset_dir, 'test.zip')
+        dataset = Dataset(schema, data_dir=tmp_path, mode=Dataset.InitializationMode.LAZY)
+        dataset.download(stream_extract=True)
+        assert dataset.is_downloaded() is True
+
+    def test_not_a_tarball(self, dataset_base_url, dataset_dir, gmb_schema, tmp_path):
+        "Test a file that is named like a tarball, but isn't one."
+
+        schema = self._fake_schema(gmb_schema, dataset_base_url, dataset_dir, 'test.txt.gz')
+        schema['download_url'] = schema['download_url'].replace('test.txt.gz', 'test.txt.gz?.tar.gz')
+        dataset = Dataset(schema, data_dir=tmp_path, mode=Dataset.InitializationMode.LAZY)
+        with pytest.raises(tarfile.ReadError) as e:
+            dataset.download(stream_extract=True)
+        assert 'Failed to unarchive tar stream' in str(e.value)
+        assert dataset.is_downloaded() is False
+
+
+class TestParallelZipExtraction:
+    "Test extracting the members of zip archives in worker processes."
+
+    @pytest.fixture
+    def many_members_zip(self, tmp_path):
+        "A zip archive with many deflated members spread over nested directories."
+
+        path = tmp_path / 'many-members.zip'
+        with zipfile.ZipFile(path, mode='w', compression=zipfile.ZIP_DEFLATED) as myzip:
+            myzip.writestr('images/', b'')
+            for i in range(40):
+                myzip.writestr(f'images/{i % 5}/{i}.txt', f'member {i}\n'.encode() * (i + 1))
+        return path
+
+    def test_same_as_serial(self, many_members_zip, tmp_path):
+        "Test that a parallel extraction produces the same files and file list as a serial one."
+
+        results = []
+        for workers in (1, 4):
+            data_dir = tmp_path / f'workers-{workers}'
+            data_dir.mkdir()
+            file_list_file = tmp_path / f'files-{workers}.list'
+            extract_data_files(many_members_zip, data_dir, file_list_file, workers=workers)
+            assert verify_data_files(data_dir, file_list_file) is True
+            results.append((file_list_file.read_bytes(),
+                            {p.relative_to(data_dir): p.read_bytes() for p in data_dir.rglob('*') if p.is_file()}))
+        assert results[0] == results[1]
+        assert len(results[1][1]) == 40
+
+    def test_spawned_workers(self, many_members_zip, tmp_path, monkeypatch):
+        "Test that the worker processes are spawned rather than forked from a process that may run other threads."
+
+        start_methods = []
+
+        def recording_executor(*args, mp_context=None, **kwargs):
+            start_methods.append(None if mp_context is None else mp_context.get_start_method())
+            return ProcessPoolExecutor(*args, mp_context=mp_context, **kwargs)
+
+        monkeypatch.setattr('nourish._extractors.ProcessPoolExecutor', recording_executor)
+        extract_data_files(many_members_zip, tmp_path, tmp_path / 'files.list', workers=2)
+        assert start_methods == ['spawn']
+        assert verify_data_files(tmp_path, tmp_path / 'files.list') is True
+
+    def test_dataset_download(self, dataset_base_url, dataset_dir, gmb_schema, tmp_path):
+        "Test downloading a zip dataset with multiple extraction workers."
+
+        gmb_schema['download_url'] = dataset_base_url + '/extractables/test.zip'
+        gmb_schema['sha512sum'] = hashlib.sha512((dataset_dir / 'extractables/test.zip').read_bytes()).hexdigest()
+        dataset = Dataset(gmb_schema, data_dir=tmp_path, mode=Dataset.InitializationMode.LAZY)
+        dataset.download(extraction_workers=2)
+        assert dataset.is_downloaded() is True
+
+    def test_split_members(self, many_members_zip):
+        "Test that every member is assigned to exactly one batch, and that the batches are balanced."
+
+        with zipfile.ZipFile(many_members_zip) as myzip:
+            members = myzip.infolist()
+        batches = _ZipExtractor._split_members(members, 4)
+        assert len(batches) == 4
+        assert sorted(index for batch in batches for index in batch) == list(range(len(members)))
+        assert all(batch == sorted(batch) for batch in batches)
+        sizes = [sum(members[i].compress_size for i in batch) for batch in batches]
+        assert max(sizes) - min(sizes) <= max(member.compress_size for member in members)
+
+        # No more batches than members
+        assert sorted(_ZipExtractor._split_members(members[:2], 4)) == [[0], [1]]
+
+    def test_parent_directory_race(self, many_members_zip, monkeypatch, tmp_path):
+        "Test that a worker retries a member whose parent directory was created by another worker in the meantime."
+
+        original_extract = zipfile.ZipFile.extract
+        raised = []
+
+        def extract(self, member, path=None, pwd=None):
+            if not raised:
+                raised.append(member)
+                raise FileExistsError
+            return original_extract(self, member, path, pwd)
+
+        monkeypatch.setattr(zipfile.ZipFile, 'extract', extract)
+        _extract_zip_members(many_members_zip, tmp_path / 'data', [1])
+        assert raised[0].filename == 'images/0/0.txt'
+        assert (tmp_path / 'data' / 'images/0/0.txt').read_bytes() == b'member 0\n'
+
+
+class TestStatMembers:
+    "Test stating the extracted members of an archive."
+
+    @pytest.fixture
+    def data_dir(self, tmp_path):
+        "A data dir with files, directories, and symbolic links."
+
+        (tmp_path / 'dir/subdir').mkdir(parents=True)
+        (tmp_path / 'dir/a.txt').write_text('a')
+        (tmp_path / 'b.txt').write_text('bb')
+        (tmp_path / 'link').symlink_to('dir/a.txt')
+        (tmp_path / 'broken-link').symlink_to('missing.txt')
+        return tmp_path
+
+    def test_stat_members(self, data_dir):
+        "Test that existing members are found with their types and sizes, following symbolic links."
+
+        found = _stat_members(data_dir, ['dir/', 'dir/subdir', 'dir/a.txt', './b.txt', 'link', 'broken-link',
+                                         'missing.txt', 'missing-dir/c.txt'])
+        assert sorted(found) == ['./b.txt', 'dir/', 'dir/a.txt', 'dir/subdir', 'link']
+        assert stat.S_ISDIR(found['dir/'].stat.st_mode) and not found['dir/'].is_symlink
+        assert found['./b.txt'].stat.st_size == 2
+        assert found['link'].is_symlink and found['link'].stat.st_size == 1
+
+    def test_unlisted(self, data_dir, monkeypatch):
+        "Test that members missing from directory listings are looked up one by one."
+
+        monkeypatch.setattr('nourish._extractors._scan_directory', lambda directory, wanted: {})
+        found = _stat_members(data_dir, ['dir/a.txt', 'link', 'broken-link'])
+        assert sorted(found) == ['dir/a.txt', 'link']
+        assert found['link'].is_symlink and not found['dir/a.txt'].is_symlink
+
+
+class TestDamagedDataFiles:
+    "Test finding and repairing damaged data files with the digests recorded in the file list."
+
+    @pytest.mark.parametrize('extractable', ('test.tar.gz', 'test.zip', 'test.txt.gz', 'test.txt.bz2', 'test.txt.xz'))
+    def test_find_and_repair(self, dataset_dir, extractable, tmp_path):
+        "Test that corrupted files of the same size are found by a deep verification and extracted again."
+
+        path = dataset_dir / 'extractables' / extractable
+        file_list_file = tmp_path / 'files.list'
+        data_dir = tmp_path / 'data'
+        data_dir.mkdir()
+        extract_data_files(path, data_dir, file_list_file)
+        verified = {}
+        assert find_damaged_data_files(data_dir, file_list_file, deep=True, workers=2, verified=verified) == []
+        assert len(verified) > 0
+
+        text_file = next(p for p in data_dir.rglob('*.txt') if p.is_file())
+        content = text_file.read_bytes()
+        text_file.write_bytes(content[::-1])
+        assert find_damaged_data_files(data_dir, file_list_file) == []
+        damaged = find_damaged_data_files(data_dir, file_list_file, deep=True, verified=verified)
+        assert [os.path.normpath(name) for name in damaged] == [str(text_file.relative_to(data_dir))]
+        assert all(name not in verified for name in damaged)
+
+        repair_data_files(path, data_dir, file_list_file, damaged)
+        assert text_file.read_bytes() == content
+        assert find_damaged_data_files(data_dir, file_list_file, deep=True) == []
+
+    @pytest.mark.parametrize('extractable', ('test.tar.gz', 'test.zip', 'test.txt.gz'))
+    def test_recorded_digest(self, dataset_dir, extractable, tmp_path):
+        "Test looking up the recorded digest of a single file."
+
+        file_list_file = tmp_path / 'files.list'
+        data_dir = tmp_path / 'data'
+        data_dir.mkdir()
+        extract_data_files(dataset_dir / 'extractables' / extractable, data_dir, file_list_file)
+        text_file = next(p for p in data_dir.rglob('*.txt') if p.is_file())
+        algorithm, digest = recorded_digest(file_list_file, f'./{text_file.relative_to(data_dir)}')
+        assert digest == _file_digest(text_file, algorithm)
+        assert recorded_digest(file_list_file, 'nonexistent.txt') is None
+
+    @pytest.mark.parametrize('mode', ('file', 'parallel', 'stream'))
+    def test_tar_digests(self, mode, monkeypatch, tmp_path):
+        "Test that the digests of tar members are computed while they are extracted, without reading the files again."
+
+        path = tmp_path / 'test.tar.bz2'
+        with tarfile.open(path, mode='w:bz2') as mytar:
+            for name, content in (('dir/a.txt', b'old'), ('dir/a.txt', b'new content'), ('b.txt', b'b' * 3000000)):
+                info = tarfile.TarInfo(name)
+                info.size = len(content)
+                mytar.addfile(info, io.BytesIO(content))
+            link = tarfile.TarInfo('link.txt')
+            link.type, link.linkname = tarfile.LNKTYPE, 'b.txt'
+            mytar.addfile(link)
+        monkeypatch.setattr('nourish._extractors._file_digest', lambda *args: pytest.fail('An extracted file was read'))
+
+        data_dir = tmp_path / 'data'
+        data_dir.mkdir()
+        file_list_file = tmp_path / 'files.list'
+        if mode == 'stream':
+            with open(path, mode='rb') as f:
+                extract_tar_stream(f, data_dir, file_list_file, verify=lambda: None)
+        else:
+            extract_data_files(path, data_dir, file_list_file, workers=2 if mode == 'parallel' else 1)
+        for name in ('dir/a.txt', 'b.txt'):
+            algorithm, digest = recorded_digest(file_list_file, name)
+            assert digest == hashlib.new(algorithm, (data_dir / name).read_bytes()).hexdigest()
+        assert recorded_digest(file_list_file, 'link.txt') is None
+
+    def test_no_digests(self, dataset_dir, tmp_path):
+        "Test that files extracted before digests were recorded are only compared by size."
+
+        file_list_file = tmp_path / 'files.list'
+        extract_data_files(dataset_dir / 'extractables/test.txt.gz', tmp_path, file_list_file)
+        metadata = json.loads(file_list_file.read_text())
+        del metadata['contents']['blake2b']
+        file_list_file.write_text(json.dumps(metadata))
+        (tmp_path / 'test.txt').write_bytes(b'x' * metadata['contents']['size'])
+        assert find_damaged_data_files(tmp_path, file_list_file, deep=True) == []
+        (tmp_path / 'test.txt').unlink()
+        assert find_damaged_data_files(tmp_path, file_list_file, deep=True) == ['test.txt']
+
+    def test_repair_replaced_member(self, tmp_path):
+        "Test that a tar member whose path is now taken by something else is extracted again."
+
+        tar_fp = tmp_path / 'test.tar'
+        with tarfile.open(tar_fp, mode='w') as mytar:
+            info = tarfile.TarInfo('dir/a.txt')
+            info.size = 1
+            mytar.addfile(info, io.BytesIO(b'a'))
+        data_dir = tmp_path / 'data'
+        data_dir.mkdir()
+        file_list_file = tmp_path / 'files.list'
+        extract_data_files(tar_fp, data_dir, file_list_file)
+        (data_dir / 'dir/a.txt').unlink()
+        (data_dir / 'dir/a.txt').mkdir()
+        assert find_damaged_data_files(data_dir, file_list_file) == ['dir/a.txt']
+        repair_data_files(tar_fp, data_dir, file_list_file, ['./dir/a.txt'])
+        assert (data_dir / 'dir/a.txt').read_bytes() == b'a'
+
+    @pytest.mark.parametrize('extractable', ('test.tar', 'test.zip'))
+    def test_repair_corrupted_archive(self, extractable, tmp_path):
+        "Test that an unreadable archive is reported when repairing."
+
+        archive_fp = tmp_path / extractable
+        archive_fp.write_bytes(b'corrupted')
+        file_list_file = tmp_path / 'files.list'
+        file_list_file.write_text(json.dumps({'type': 'application/x-tar' if extractable == 'test.tar' else
+                                              'application/zip', 'contents': {}}))
+        with pytest.raises((tarfile.ReadError, zipfile.BadZipFile)) as e:
+            repair_data_files(archive_fp, tmp_path, file_list_file, ['a.txt'])
+        assert 'Failed to unarchive' in str(e.value)
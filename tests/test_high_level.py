@@ -15,20 +15,25 @@
 # limitations under the License.
 #
 
+import asyncio
 import dataclasses
+import hashlib
 import json
 import pathlib
 import re
+import threading
+import time
 
 from packaging.version import parse as version_parser
+import pandas as pd
 import pytest
 from pydantic import ValidationError
 
-from nourish import (describe_dataset, export_schemata_manager, get_config, get_dataset_metadata, init,
-                     list_all_datasets, load_dataset, load_schemata_manager)
+from nourish import (aload_dataset, aload_schemata_manager, describe_dataset, export_schemata_manager, get_config,
+                     get_dataset_metadata, init, list_all_datasets, load_dataset, load_datasets, load_schemata_manager)
 from nourish.dataset import Dataset
 from nourish._config import Config
-from nourish._high_level import _get_schemata_manager
+from nourish._high_level import _download_and_load, _get_schemata_manager
 
 # Global configurations --------------------------------------------------
 
@@ -79,6 +84,13 @@ class TestInit:
         assert re.search((r'1 validation error for Config\s+DATADIR\s+value'
                           r' is not a valid path \(type=type_error.path\)'), str(e.value))
 
+    @pytest.mark.parametrize('name', ('DOWNLOAD_CONNECTIONS', 'DOWNLOAD_SEGMENT_SIZE'))
+    def test_non_positive_download_configs(self, name):
+        "Test exception when the number of download connections or the segment size is not positive."
+
+        with pytest.raises(ValidationError):
+            init(**{name: 0})
+
     def test_custom_configs(self):
         "Test custom configs."
 
@@ -195,6 +207,23 @@ class TestLoadDataset:
         gmb_data = load_dataset('gmb', version='1.0.2', download=True)
         assert downloaded_gmb_dataset_data == gmb_data
 
+    def test_checked_once(self, tmp_path, dataset_base_url, dataset_dir, gmb_schema, monkeypatch):
+        "Test that a downloaded dataset is only checked once when it is downloaded if needed and then loaded."
+
+        init(DATADIR=tmp_path)
+        gmb_schema['download_url'] = f'{dataset_base_url}/extractables/test.tar.gz'
+        gmb_schema['sha512sum'] = hashlib.sha512((dataset_dir / 'extractables/test.tar.gz').read_bytes()).hexdigest()
+        gmb_schema['subdatasets'] = {'test': {'name': 'Test', 'description': 'Test', 'format': 'txt',
+                                              'path': 'test.txt'}}
+        dataset = Dataset(gmb_schema, data_dir=tmp_path / 'data', mode=Dataset.InitializationMode.LAZY)
+        expected = _download_and_load(dataset, download=True)
+        checks = []
+        is_downloaded = Dataset.is_downloaded
+        monkeypatch.setattr(Dataset, 'is_downloaded', lambda self, **kwargs: checks.append(kwargs) or
+                            is_downloaded(self, **kwargs))
+        assert _download_and_load(dataset, download=True) == expected
+        assert len(checks) == 1
+
     def test_loading_undownloaded(self, tmp_path):
         "Test loading before ``Dataset.download()`` has been called."
 
@@ -203,6 +232,96 @@ class TestLoadDataset:
             load_dataset('wikitext103', version='1.0.1', download=False)
         assert 'Did you forget to download the dataset (by specifying `download=True`)?' in str(e.value)
 
+    def test_chunksize_param(self, tmp_path, downloaded_noaa_jfk_dataset):
+        "Test that each subdataset is an iterator of its chunks if chunksize is specified."
+
+        init(DATADIR=tmp_path)
+        expected = downloaded_noaa_jfk_dataset.load()['jfk_weather_cleaned']
+        chunks = load_dataset('noaa_jfk', version='1.1.4', chunksize=10000)['jfk_weather_cleaned']
+        pd.testing.assert_frame_equal(pd.concat(chunks), expected)
+
+        with pytest.raises(RuntimeError) as e:
+            load_dataset('wikitext103', version='1.0.1', download=False, chunksize=10000)
+        assert 'Did you forget to download the dataset (by specifying `download=True`)?' in str(e.value)
+
+
+class TestLoadDatasets:
+    "Test high-level load_datasets function."
+
+    @pytest.fixture
+    def stage_tracker(self, monkeypatch):
+        """Replace downloading and loading with stubs that record the maximum number of datasets that were in each stage
+        at the same time."""
+
+        lock = threading.Lock()
+        current = {'download': 0, 'extraction': 0, 'load': 0}
+        peak = dict(current)
+        calls = []
+
+        def enter(stage):
+            with lock:
+                current[stage] += 1
+                peak[stage] = max(peak[stage], current[stage])
+            time.sleep(0.05)
+            with lock:
+                current[stage] -= 1
+
+        def download(self, *, network_slot, extraction_slot, **kwargs):
+            calls.append(self._schema['name'])
+            with network_slot:
+                enter('download')
+            with extraction_slot:
+                enter('extraction')
+
+        def load(self, subdatasets=None, check=True, parsed_cache=False, columns=None, filters=None, compact=False):
+            enter('load')
+            return {'name': self._schema['name']}
+
+        monkeypatch.setattr(Dataset, 'is_downloaded', lambda self: False)
+        monkeypatch.setattr(Dataset, '_download_while_locked', download)
+        monkeypatch.setattr(Dataset, 'load', load)
+        return peak, calls
+
+    def test_bounded_concurrency(self, tmp_path, stage_tracker):
+        "Test that each stage is bounded by its own limit."
+
+        init(DATADIR=tmp_path)
+        peak, calls = stage_tracker
+        results = load_datasets(['gmb', 'wikitext103', 'noaa_jfk'], max_downloads=1, max_extractions=2, max_loads=3)
+        assert sorted(calls) == sorted(result['name'] for result in results.values())
+        assert peak['download'] == 1
+        assert 1 <= peak['extraction'] <= 2
+        assert 1 <= peak['load'] <= 3
+
+    def test_errors_are_isolated(self, tmp_path, stage_tracker):
+        "Test that invalid datasets are reported in the results without affecting the others."
+
+        init(DATADIR=tmp_path)
+        _, calls = stage_tracker
+        results = load_datasets(['fake_dataset', ('gmb', 'fake_version'), 'gmb', ('gmb', '1.0.2')])
+        assert list(results.keys()) == ['fake_dataset', ('gmb', 'fake_version'), 'gmb', ('gmb', '1.0.2')]
+        assert isinstance(results['fake_dataset'], KeyError)
+        assert isinstance(results[('gmb', 'fake_version')], KeyError)
+        assert results['gmb'] == results[('gmb', '1.0.2')] == {'name': 'Groningen Meaning Bank Modified'}
+        # Both refer to the same dataset, which is only downloaded once
+        assert calls == ['Groningen Meaning Bank Modified']
+
+    @pytest.mark.parametrize('limit', ('max_downloads', 'max_extractions', 'max_loads'))
+    def test_non_positive_limits(self, limit):
+        "Test that non-positive limits are rejected."
+
+        with pytest.raises(ValueError) as e:
+            load_datasets(['gmb'], **{limit: 0})
+        assert str(e.value) == f'{limit} must be positive, got 0.'
+
+    def test_load_datasets(self, tmp_path, downloaded_gmb_dataset):
+        "Test that datasets are downloaded and loaded in the same way as load_dataset."
+
+        init(DATADIR=tmp_path)
+        assert load_datasets([('gmb', '1.0.2')]) == {('gmb', '1.0.2'): downloaded_gmb_dataset.load()}
+        results = load_datasets([('wikitext103', '1.0.1')], download=False)
+        assert 'Did you forget to download the dataset' in str(results[('wikitext103', '1.0.1')])
+
 
 def test_get_dataset_metadata():
     "Test ``get_dataset_metadata``."
@@ -285,3 +404,59 @@ class TestSchemataFunctions:
         new_format_schemata_url = schemata_file_absolute_dir / 'formats.yaml'
         init(update_only=True, FORMAT_SCHEMATA_URL=new_format_schemata_url)
         assert export_schemata_manager().format_schemata.retrieved_url_or_path == new_format_schemata_url
+
+    def test_aload_schemata_manager(self, loaded_schemata_manager, schemata_file_absolute_dir):
+        "Test high-level aload_schemata_manager function."
+
+        pytest.importorskip('aiohttp')
+        init(update_only=False,
+             DATASET_SCHEMATA_URL=loaded_schemata_manager.dataset_schemata.retrieved_url_or_path,
+             FORMAT_SCHEMATA_URL=loaded_schemata_manager.format_schemata.retrieved_url_or_path,
+             LICENSE_SCHEMATA_URL=loaded_schemata_manager.license_schemata.retrieved_url_or_path)
+        asyncio.run(aload_schemata_manager(force_reload=True))
+        for name in ('datasets', 'formats', 'licenses'):
+            assert (_get_schemata_manager().schemata[name].export_schema() ==
+                    loaded_schemata_manager.schemata[name].export_schema())
+
+        format_schemata = _get_schemata_manager().format_schemata
+        init(update_only=True,
+             # Different from the previous relative path used in loaded_schemata_manager
+             DATASET_SCHEMATA_URL=schemata_file_absolute_dir / 'datasets.yaml')
+        asyncio.run(aload_schemata_manager(force_reload=False))
+        # Only the changed schemata is reloaded
+        assert _get_schemata_manager().format_schemata is format_schemata
+        assert (_get_schemata_manager().dataset_schemata.retrieved_url_or_path ==
+                schemata_file_absolute_dir / 'datasets.yaml')
+
+
+class TestAsyncLoadDataset:
+    "Test high-level aload_dataset function."
+
+    @pytest.fixture(autouse=True)
+    def require_aiohttp(self):
+        pytest.importorskip('aiohttp')
+
+    def test_invalid_params(self, tmp_path):
+        "Test that invalid names and versions are rejected in the same way as load_dataset."
+
+        init(DATADIR=tmp_path)
+        with pytest.raises(KeyError) as e:
+            asyncio.run(aload_dataset('fake_dataset'))
+        assert 'is not a valid Nourish dataset' in str(e.value)
+        with pytest.raises(KeyError) as e:
+            asyncio.run(aload_dataset('gmb', version='fake_version'))
+        assert 'is not a valid Nourish version for the dataset "gmb"' in str(e.value)
+
+    def test_loading_undownloaded(self, tmp_path):
+        "Test loading before the dataset has been downloaded."
+
+        init(DATADIR=tmp_path)
+        with pytest.raises(RuntimeError) as e:
+            asyncio.run(aload_dataset('wikitext103', version='1.0.1', download=False))
+        assert 'Did you forget to download the dataset (by specifying `download=True`)?' in str(e.value)
+
+    def test_download_true(self, tmp_path, downloaded_gmb_dataset):
+        "Test that the dataset is downloaded and loaded in the same way as load_dataset."
+
+        init(DATADIR=tmp_path)
+        assert asyncio.run(aload_dataset('gmb', version='1.0.2')) == downloaded_gmb_dataset.load()
@@ -0,0 +1,120 @@
+# Copyright 2021 Edward Leardi. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import threading
+
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+
+from nourish import init, set_http_session
+from nourish._download import download_archive
+from nourish._http import create_session, get_session
+from nourish._schemata_retrieval import retrieve_schemata_file
+
+
+class TestCreateSession:
+    "Test :func:`create_session`."
+
+    def test_settings(self):
+        "Test that the pool size and retry policy are applied to both http and https."
+
+        session = create_session(pool_size=3, max_retries=5, backoff_factor=0.25)
+        for url in ('http://example.com', 'https://example.com'):
+            adapter = session.get_adapter(url)
+            assert adapter._pool_maxsize == 3
+            assert adapter.max_retries.total == 5
+            assert adapter.max_retries.backoff_factor == 0.25
+
+    @pytest.mark.parametrize('timeout, expected', ((None, 7.5), (2, 2), ((1, 3), (1, 3))))
+    def test_default_timeout(self, monkeypatch, local_http_server_root_url, timeout, expected):
+        "Test that the default timeout only applies to requests that don't specify one."
+
+        timeouts = []
+        original_send = HTTPAdapter.send
+
+        def send(self, request, **kwargs):
+            timeouts.append(kwargs['timeout'])
+            return original_send(self, request, **kwargs)
+
+        monkeypatch.setattr(HTTPAdapter, 'send', send)
+        create_session(timeout=7.5).get(f'{local_http_server_root_url}/setup.py', timeout=timeout)
+        assert timeouts == [expected]
+
+    def test_retry_on_error_status(self):
+        "Test that requests receiving a transient error status are retried."
+
+        statuses = [503, 503, 200]
+
+        class FlakyHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(statuses.pop(0))
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        with HTTPServer(('localhost', 0), FlakyHandler) as httpd:
+            threading.Thread(target=httpd.serve_forever, daemon=True).start()
+            url = f'http://localhost:{httpd.server_address[1]}/'
+            assert create_session(max_retries=2, backoff_factor=0).get(url).status_code == 200
+            assert statuses == []
+            httpd.shutdown()
+
+
+class TestSharedSession:
+    "Test the session shared by all network I/O."
+
+    @pytest.fixture
+    def recording_session(self):
+        "A session that records the URLs it requested, injected with :func:`nourish.set_http_session`."
+
+        class RecordingSession(requests.Session):
+            def __init__(self):
+                super().__init__()
+                self.urls = []
+
+            def request(self, method, url, *args, **kwargs):
+                self.urls.append(url)
+                return super().request(method, url, *args, **kwargs)
+
+        session = RecordingSession()
+        set_http_session(session)
+        yield session
+        set_http_session(None)
+
+    def test_injected_session(self, recording_session, schemata_file_https_url, dataset_base_url, tmp_path):
+        "Test that schemata retrieval and downloads use the injected session."
+
+        schemata_url = f'{schemata_file_https_url}/datasets.yaml'
+        archive_url = f'{dataset_base_url}/extractables/test.zip'
+        retrieve_schemata_file(schemata_url)
+        download_archive(archive_url, tmp_path / 'test.zip')
+        assert recording_session.urls == [schemata_url, archive_url]
+
+        set_http_session(None)
+        assert get_session() is not recording_session
+
+    def test_default_session_reused(self):
+        "Test that the default session is reused as long as the configs don't change."
+
+        session = get_session()
+        init(update_only=True)
+        assert get_session() is session
+        init(update_only=True, HTTP_POOL_SIZE=3)
+        assert get_session() is not session
+        assert get_session().get_adapter('https://example.com')._pool_maxsize == 3
@@ -16,7 +16,9 @@
 #
 
 from collections import namedtuple
+import pickle
 import re
+import sys
 
 import pytest
 import pandas as pd
@@ -26,8 +28,11 @@ from nourish.dataset import Dataset
 from nourish.loaders import Loader
 from nourish.loaders import FormatLoaderMap
 from nourish.loaders._format_loader_map import load_data_files
-from nourish.loaders.text import PlainTextLoader
+from nourish.loaders.text import PlainTextLoader, TextLines
+from nourish.loaders import _text_lines
 from nourish.loaders.table import CSVPandasLoader
+from nourish.loaders import _table
+from nourish.loaders._selection import check_filters
 
 
 class TestBaseLoader:
@@ -58,6 +63,17 @@ class TestBaseLoader:
         # This line shouldn't error out even though it calls an abstract method in its parent
         MyLoader().load(tmp_path, None)
 
+    def test_iter_load(self, tmp_path):
+        "Loader.iter_load() is not supported unless it is overridden."
+
+        class MyLoader(Loader):
+            def load(self, path, options):
+                pass
+
+        with pytest.raises(NotImplementedError) as e:
+            MyLoader().iter_load(tmp_path, {}, chunksize=10)
+        assert str(e.value) == 'MyLoader does not support loading in chunks.'
+
     def test_check_path(self):
         "Test Loader.check_path method."
 
@@ -132,6 +148,172 @@ class TestTextLoaders:
 
         assert str(e.value) == 'UTF-16 stream does not start with BOM'
 
+    @pytest.mark.parametrize('chunksize', (1, 2, 100))
+    @pytest.mark.parametrize('options, expected', (({}, ['a', 'b', 'c', '', 'd\u00e9']),
+                                                   ({'newline': ''}, ['a', 'b', 'c', '', 'd\u00e9']),
+                                                   ({'newline': '\n'}, ['a\r', 'b\rc', '', 'd\u00e9']),
+                                                   ({'newline': '\r\n'}, ['a', 'b\rc\n\nd\u00e9']),
+                                                   ({'keepends': True}, ['a\n', 'b\n', 'c\n', '\n', 'd\u00e9']),
+                                                   ({'newline': '', 'keepends': True},
+                                                    ['a\r\n', 'b\r', 'c\n', '\n', 'd\u00e9']),
+                                                   ({'encoding': 'latin-1'}, ['a', 'b', 'c', '', 'd\u00c3\u00a9'])))
+    def test_plain_text_iter_load(self, tmp_path, options, expected, chunksize):
+        "Test that the lines are streamed in chunks with the given encoding and newline handling."
+
+        text_file = tmp_path / 'some-text.txt'
+        text_file.write_bytes('a\r\nb\rc\n\nd\u00e9'.encode('utf-8'))
+        chunks = list(PlainTextLoader().iter_load(text_file, options, chunksize=chunksize))
+        assert sum(chunks, []) == expected
+        assert [len(chunk) for chunk in chunks] == [min(chunksize, len(expected) - i)
+                                                    for i in range(0, len(expected), chunksize)]
+        if not options:
+            assert sum(chunks, []) == PlainTextLoader().load(text_file, {}).splitlines()
+
+    def test_plain_text_iter_load_errors(self, tmp_path):
+        "Test the errors of PlainTextLoader.iter_load, which are raised before iterating starts."
+
+        text_file = tmp_path / 'some-text.txt'
+        text_file.write_text('a\nb\n', encoding='utf-8')
+        with pytest.raises(TypeError):
+            PlainTextLoader().iter_load(1, {}, chunksize=1)
+        with pytest.raises(ValueError) as e:
+            PlainTextLoader().iter_load(text_file, {'newline': 'x'}, chunksize=1)
+        assert str(e.value) == "Unsupported newline 'x'. Supported newlines are: None, '', '\\n', '\\r', '\\r\\n'."
+        with pytest.raises(LookupError):
+            PlainTextLoader().iter_load(text_file, {'encoding': 'non-encoding'}, chunksize=1)
+        with pytest.raises(ValueError):
+            PlainTextLoader().iter_load(text_file, {}, chunksize=1, columns=['a'])
+
+        chunks = PlainTextLoader().iter_load(text_file, {}, chunksize=1)
+        assert next(chunks) == ['a']
+        chunks.close()  # Closes the file
+
+    def test_plain_text_loader_selection(self, tmp_path):
+        "Test that PlainTextLoader refuses to select columns or rows."
+
+        text_file = tmp_path / 'some-text.txt'
+        text_file.write_text("I'm a text file :)", encoding='utf-8')
+        for selection in ({'columns': ['a']}, {'filters': [('a', '==', 1)]}):
+            with pytest.raises(ValueError) as e:
+                load_data_files('txt', text_file, **selection)
+            assert str(e.value) == 'PlainTextLoader does not support selecting columns or rows.'
+
+
+class TestTextLines:
+    "Test :class:`TextLines`."
+
+    @pytest.mark.parametrize('text', ('', 'a', 'a\n', '\n\n', 'a\r\nb\r\n\nc', 'h\u00e9llo\nw\u00f6rld\n\n'))
+    def test_lines(self, tmp_path, text):
+        "Test that the lines are the same as those of the text, whether the line index is built or read."
+
+        text_file = tmp_path / 'test.txt'
+        text_file.write_bytes(text.encode())
+        for index_dir in (None, tmp_path / 'indexes', tmp_path / 'indexes'):
+            with TextLines(text_file, index_dir=index_dir) as lines:
+                assert len(lines) == len(text.splitlines())
+                assert list(lines) == text.splitlines()
+                assert [lines[i] for i in range(-len(lines), len(lines))] == text.splitlines() * 2
+        assert _text_lines.index_path(text_file, tmp_path / 'indexes').exists()
+
+    def test_index_and_slice(self, tmp_path, monkeypatch):
+        "Test indexing and slicing, also of files scanned in several blocks."
+
+        monkeypatch.setattr(_text_lines, '_SCAN_SIZE', 7)
+        expected = [f'line {i}' for i in range(1000)]
+        text_file = tmp_path / 'test.txt'
+        text_file.write_text('\n'.join(expected))
+        lines = TextLines(text_file)
+        assert lines[0] == 'line 0'
+        assert lines[-1] == 'line 999'
+        with pytest.raises(IndexError) as e:
+            lines[1000]
+        assert str(e.value) == 'TextLines index out of range'
+
+        view = lines[10:100:3]
+        assert isinstance(view, TextLines)
+        assert list(view) == expected[10:100:3]
+        assert list(view[::-2]) == expected[10:100:3][::-2]
+        assert view[-1] == expected[97]
+        assert len(lines[2000:]) == 0
+
+    def test_persisted_index(self, tmp_path, monkeypatch):
+        "Test that the line index is read rather than built again, unless the text file has changed."
+
+        text_file = tmp_path / 'data/test.txt'
+        text_file.parent.mkdir()
+        text_file.write_text('a\nb\n')
+        index_dir = tmp_path / 'indexes'
+        TextLines(text_file, index_dir=index_dir).close()
+        # Nothing is written next to the text file
+        assert list(text_file.parent.iterdir()) == [text_file]
+
+        def fail(*args, **kwargs):
+            raise AssertionError('The line index is built again')
+
+        with monkeypatch.context() as m:
+            m.setattr(_text_lines, '_scan', fail)
+            assert list(TextLines(text_file, index_dir=index_dir)) == ['a', 'b']
+
+        # Text files of the same name elsewhere have indexes of their own
+        other_file = tmp_path / 'test.txt'
+        other_file.write_text('c\n')
+        assert list(TextLines(other_file, index_dir=index_dir)) == ['c']
+        assert len(list(index_dir.iterdir())) == 2
+
+        text_file.write_text('a\nbc\nd')
+        assert list(TextLines(text_file, index_dir=index_dir)) == ['a', 'bc', 'd']
+        _text_lines.index_path(text_file, index_dir).write_bytes(b'corrupted')
+        assert list(TextLines(text_file, index_dir=index_dir)) == ['a', 'bc', 'd']
+        monkeypatch.setattr(_text_lines, '_scan', fail)
+        assert list(TextLines(text_file, index_dir=index_dir)) == ['a', 'bc', 'd']
+
+    def test_index_not_written(self, tmp_path):
+        "Test that the line index is kept in memory if it can't be written."
+
+        text_file = tmp_path / 'test.txt'
+        text_file.write_text('a\nb\n')
+        index_dir = tmp_path / 'indexes'
+        _text_lines.index_path(text_file, index_dir).mkdir(parents=True)  # Makes writing the index fail
+        assert list(TextLines(text_file, index_dir=index_dir)) == ['a', 'b']
+        # No temporary file is left behind
+        assert list(index_dir.iterdir()) == [_text_lines.index_path(text_file, index_dir)]
+        # The directory of line indexes can't be created either
+        assert list(TextLines(text_file, index_dir=text_file / 'indexes')) == ['a', 'b']
+
+    def test_pickle(self, tmp_path):
+        "Test that pickled lines map the file again."
+
+        text_file = tmp_path / 'test.txt'
+        text_file.write_text('\n'.join(str(i) for i in range(10)))
+        lines = pickle.loads(pickle.dumps(TextLines(text_file, index_dir=tmp_path / 'indexes')[2:8]))
+        assert list(lines) == [str(i) for i in range(2, 8)]
+        assert lines._index_dir == tmp_path / 'indexes'
+
+    def test_encoding(self, tmp_path):
+        "Test that encodings other than UTF-8 are decoded, and that those not supported are refused."
+
+        text_file = tmp_path / 'test.txt'
+        text_file.write_text('caf\u00e9\nna\u00efve', encoding='latin-1')
+        assert list(TextLines(text_file, 'latin-1')) == ['caf\u00e9', 'na\u00efve']
+        for encoding in ('utf-16', 'utf-32-le'):
+            with pytest.raises(ValueError) as e:
+                TextLines(text_file, encoding)
+            assert str(e.value) == f'Memory-mapped text files of encoding "{encoding}" are not supported.'
+
+    def test_plain_text_loader(self, tmp_path):
+        "Test that PlainTextLoader loads TextLines if the loader or the format option says so."
+
+        text_file = tmp_path / 'some-text.txt'
+        text_file.write_text('line 1\nline 2\n', encoding='utf-8')
+        assert isinstance(PlainTextLoader().load(text_file, {}), str)
+        lines = PlainTextLoader(memory_map=True).load(text_file, {})
+        assert list(lines) == ['line 1', 'line 2']
+        assert isinstance(PlainTextLoader().load(text_file, {'memory_map': True}), TextLines)
+        assert isinstance(PlainTextLoader(memory_map=True).load(text_file, {'memory_map': False}), str)
+        assert list(tmp_path.iterdir()) == [text_file]
+        PlainTextLoader(memory_map=True).load(text_file, {}, index_dir=tmp_path / 'indexes')
+        assert _text_lines.index_path(text_file, tmp_path / 'indexes').exists()
+
 
 class TestTableLoaders:
 
@@ -244,6 +426,214 @@ class TestTableLoaders:
 
         assert str(e.value) == f'Unsupported path type "{type(integer)}".'
 
+    # Options of CSVPandasLoader, each applied to a CSV file written by _write_csv
+    csv_options = ({},
+                   {'columns': {'date': 'datetime', 'value': 'float', 'label': 'string'}},
+                   {'columns': {'date': 'datetime', 'value': 'float', 'label': 'string'}, 'no_header': True},
+                   {'columns': {'value': 'str'}},
+                   {'delimiter': ';', 'encoding': 'utf-16'},
+                   {'columns': {'date': 'datetime', 'value': 'float', 'label': 'string'}, 'delimiter': ';',
+                    'encoding': 'utf-16'})
+
+    @staticmethod
+    def _write_csv(path, options):
+        "Write a CSV file of 30 rows in the way ``options`` describe it."
+
+        rows = [f'2021-01-{day:02},{day / 4},label-{day}' for day in range(1, 31)]
+        if not options.get('no_header'):
+            rows.insert(0, 'date,value,label')
+        delimiter = options.get('delimiter', ',')
+        path.write_text('\n'.join(rows).replace(',', delimiter), encoding=options.get('encoding', 'utf-8'))
+
+    @pytest.mark.parametrize('options', csv_options)
+    @pytest.mark.parametrize('chunksize', (1, 7, 100))
+    def test_csv_pandas_iter_load(self, tmp_path, options, chunksize):
+        "Test that the chunks of CSVPandasLoader.iter_load have the same data and dtypes as CSVPandasLoader.load."
+
+        csv_file = tmp_path / 'test.csv'
+        self._write_csv(csv_file, options)
+
+        loader = CSVPandasLoader()
+        expected = loader.load(csv_file, options)
+        chunks = list(loader.iter_load(csv_file, options, chunksize=chunksize))
+        assert len(chunks) == -(-30 // chunksize)
+        assert all(len(chunk) <= chunksize for chunk in chunks)
+        for chunk in chunks:
+            assert chunk.dtypes.equals(expected.dtypes)
+        pd.testing.assert_frame_equal(pd.concat(chunks), expected)
+
+    @pytest.mark.parametrize('options', csv_options)
+    @pytest.mark.parametrize('engine', ('python', 'pyarrow'))
+    def test_csv_pandas_engine_parity(self, tmp_path, options, engine):
+        "Test that the engines load the same dataframe as the default engine, whether set by the loader or the format."
+
+        if engine == 'pyarrow':
+            pytest.importorskip('pyarrow')
+        csv_file = tmp_path / 'test.csv'
+        self._write_csv(csv_file, options)
+
+        expected = CSVPandasLoader().load(csv_file, options)
+        loader = CSVPandasLoader(engine=engine, temporal_as_strings=True)
+        pd.testing.assert_frame_equal(loader.load(csv_file, options), expected)
+        by_format = CSVPandasLoader(temporal_as_strings=True).load(csv_file, {**options, 'engine': engine})
+        pd.testing.assert_frame_equal(by_format, expected)
+        chunks = loader.iter_load(csv_file, options, chunksize=7)
+        pd.testing.assert_frame_equal(pd.concat(chunks), expected)
+
+    def test_csv_pandas_pyarrow_temporal(self, tmp_path, monkeypatch):
+        """Test that the pyarrow engine leaves dates and times in columns whose types aren't given as strings if
+        ``temporal_as_strings`` is set, and that it otherwise parses the file only once."""
+
+        pytest.importorskip('pyarrow')
+        csv_file = tmp_path / 'test.csv'
+        csv_file.write_text('date,timestamp,zoned,time,typed,value\n'
+                            '2021-01-01,2021-01-01T01:00:00,2021-01-01 01:00:00Z,12:00:00,2021-01-01,1\n'
+                            ',2021-01-02 02:30:00.5,,13:30,2021-01-02,2.5\n')
+        options = {'columns': {'typed': 'datetime'}}
+        expected = CSVPandasLoader().load(csv_file, options)
+        loader = CSVPandasLoader(engine='pyarrow', temporal_as_strings=True)
+        data = loader.load(csv_file, options)
+        pd.testing.assert_frame_equal(data, expected)
+        assert data['timestamp'].tolist() == ['2021-01-01T01:00:00', '2021-01-02 02:30:00.5']
+        selected = loader.load(csv_file, options, columns=['time'], filters=[('time', '==', '13:30')])
+        pd.testing.assert_frame_equal(selected, expected[['time']][1:].reset_index(drop=True))
+
+        read_csv = pd.read_csv
+        engines = []
+        monkeypatch.setattr(pd, 'read_csv', lambda *args, **kwargs: engines.append(kwargs['engine']) or
+                            read_csv(*args, **kwargs))
+        data = CSVPandasLoader(engine='pyarrow').load(csv_file, options)
+        assert engines == ['pyarrow']
+        assert is_datetime64_any_dtype(data['timestamp'])
+        pd.testing.assert_series_equal(data['value'], expected['value'])
+
+    def test_csv_pandas_engine_option(self, tmp_path, monkeypatch):
+        "Test that the engine option of a format overrides the engine of the loader."
+
+        csv_file = tmp_path / 'test.csv'
+        self._write_csv(csv_file, {})
+        engines = []
+        read_csv = pd.read_csv
+
+        def recording_read_csv(*args, **kwargs):
+            engines.append(kwargs['engine'])
+            return read_csv(*args, **kwargs)
+
+        monkeypatch.setattr(pd, 'read_csv', recording_read_csv)
+        loader = CSVPandasLoader(engine='python')
+        loader.load(csv_file, {})
+        loader.load(csv_file, {'engine': 'c'})
+        CSVPandasLoader().load(csv_file, {})
+        assert engines == ['python', 'c', None]
+
+    def test_csv_pandas_unsupported_engine(self, tmp_path, monkeypatch):
+        "Test the errors of unsupported engines and of the pyarrow engine without pyarrow or with an old pandas."
+
+        with pytest.raises(ValueError) as e:
+            CSVPandasLoader(engine='nonsense')
+        assert str(e.value) == 'Unsupported CSV engine "nonsense". Supported engines are: c, python, pyarrow.'
+        with pytest.raises(ValueError) as e:
+            CSVPandasLoader().load(tmp_path / 'test.csv', {'engine': 'nonsense'})
+        assert str(e.value) == 'Unsupported CSV engine "nonsense". Supported engines are: c, python, pyarrow.'
+
+        monkeypatch.setitem(sys.modules, 'pyarrow', None)  # Makes importing pyarrow fail
+        with pytest.raises(ImportError) as e:
+            CSVPandasLoader(engine='pyarrow')
+        assert 'Install it with `pip install nourish[arrow]`.' in str(e.value)
+
+        monkeypatch.undo()
+        pytest.importorskip('pyarrow')
+        monkeypatch.setattr(pd, '__version__', '1.3.5')
+        with pytest.raises(ImportError) as e:
+            CSVPandasLoader().load(tmp_path / 'test.csv', {'engine': 'pyarrow'})
+        assert str(e.value) == ('The pyarrow engine of CSVPandasLoader requires pandas 1.4 or later, but pandas '
+                                '1.3.5 is installed.')
+
+    @pytest.mark.parametrize('options', csv_options)
+    @pytest.mark.parametrize('engine', (None, 'python', 'pyarrow'))
+    def test_csv_pandas_selection(self, tmp_path, monkeypatch, options, engine):
+        "Test that selecting columns and rows while parsing gives the same dataframe as selecting them after loading."
+
+        if engine == 'pyarrow':
+            pytest.importorskip('pyarrow')
+        monkeypatch.setattr(_table, '_FILTER_CHUNKSIZE', 7)
+        csv_file = tmp_path / 'test.csv'
+        self._write_csv(csv_file, options)
+
+        loader = CSVPandasLoader(engine=engine, temporal_as_strings=True)
+        full = loader.load(csv_file, options)
+        values, dates = full['value'], full['date']
+        filters = [('value', '>', values[3]), ('value', 'not in', [values[10], values[20]]), ('date', '!=', dates[5])]
+        expected = full[(values > values[3]) & ~values.isin([values[10], values[20]]) & (dates != dates[5])]
+        expected = expected[['label', 'value']].reset_index(drop=True)
+        assert len(expected) == 23
+
+        pd.testing.assert_frame_equal(loader.load(csv_file, options, columns=['label', 'value'], filters=filters),
+                                      expected)
+        pd.testing.assert_frame_equal(loader.load(csv_file, options, columns=['label', 'date']),
+                                      full[['label', 'date']])
+        pd.testing.assert_frame_equal(loader.load(csv_file, options, filters=filters[:1]),
+                                      full[values > values[3]].reset_index(drop=True))
+        chunks = list(loader.iter_load(csv_file, options, chunksize=7, columns=['label', 'value'], filters=filters))
+        pd.testing.assert_frame_equal(pd.concat(chunks), expected)
+
+        # No row matches
+        empty = loader.load(csv_file, options, columns=['value'], filters=[('label', '==', 'nonexistent')])
+        assert len(empty) == 0
+        assert empty.dtypes.equals(full[['value']].dtypes)
+
+    @pytest.mark.parametrize('op, value, expected', (('==', 3, [3]),
+                                                     ('!=', 3, [1, 2, 4, 5]),
+                                                     ('<', 3, [1, 2]),
+                                                     ('<=', 3, [1, 2, 3]),
+                                                     ('>', 3, [4, 5]),
+                                                     ('>=', 3, [3, 4, 5]),
+                                                     ('in', (1, 5), [1, 5]),
+                                                     ('not in', [1, 5], [2, 3, 4])))
+    def test_csv_pandas_filter_operators(self, tmp_path, op, value, expected):
+        "Test the operators of filters."
+
+        csv_file = tmp_path / 'test.csv'
+        csv_file.write_text('a,b\n1,x\n2,y\n3,z\n4,\n5,x\n')
+        data = CSVPandasLoader().load(csv_file, {}, filters=[('a', op, value)])
+        assert data['a'].tolist() == expected
+        assert data.index.tolist() == list(range(len(expected)))
+
+    def test_csv_pandas_filter_missing_values(self, tmp_path):
+        "Test that missing values satisfy no filter other than ``!=`` and ``not in``."
+
+        csv_file = tmp_path / 'test.csv'
+        csv_file.write_text('a,b\n1,x\n2,\n3,z\n')
+        loader = CSVPandasLoader()
+        assert loader.load(csv_file, {}, filters=[('b', '<', 'y')])['a'].tolist() == [1]
+        assert loader.load(csv_file, {}, filters=[('b', '!=', 'x')])['a'].tolist() == [2, 3]
+        assert loader.load(csv_file, {}, filters=[('b', 'not in', ['x'])])['a'].tolist() == [2, 3]
+
+    def test_check_filters(self, tmp_path):
+        "Test the errors of malformed filters."
+
+        with pytest.raises(ValueError) as e:
+            check_filters([('a', '~', 1)])
+        assert str(e.value) == ('Unsupported filter operator "~". '
+                                'Supported operators are: ==, !=, <, <=, >, >=, in, not in.')
+        with pytest.raises(ValueError) as e:
+            check_filters([('a', '==')])
+        assert str(e.value) == "Filter ('a', '==') is not a (column, operator, value) tuple."
+
+        csv_file = tmp_path / 'test.csv'
+        csv_file.write_text('a,b\n1,x\n')
+        with pytest.raises(ValueError):
+            CSVPandasLoader().load(csv_file, {}, filters=['a == 1'])
+
+    def test_csv_pandas_iter_load_no_path(self):
+        "Test CSVPandasLoader.iter_load when fed in with non-path."
+
+        integer = 1
+        with pytest.raises(TypeError) as e:
+            CSVPandasLoader().iter_load(integer, {}, chunksize=10)
+
+        assert str(e.value) == f'Unsupported path type "{type(integer)}".'
+
     def test_csv_pandas_loader_non_option(self, tmp_path, noaa_jfk_schema):
         "Test CSVPandasLoader when None option is passed."
 
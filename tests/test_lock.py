@@ -15,7 +15,15 @@
 # limitations under the License.
 #
 
+import asyncio
+import json
+import logging
 import os
+import socket
+import subprocess
+import sys
+import threading
+import time
 
 import pytest
 
@@ -77,48 +85,227 @@ class TestDirectoryLock:
 
         self._ensure_unlock_fails(tmp_path)
 
+    @staticmethod
+    def _hold(directory: os.PathLike, write: bool) -> DirectoryLock:
+        "A utility function that holds a lock in ``directory`` on behalf of someone else."
+        lock = DirectoryLock(directory)
+        assert lock.lock(write=write) is True
+        return lock
+
+    def test_failing_write_lock(self, tmp_path):
+        "Test locking when a write lock is held. Unlocking without locking should also fail."
+
+        holder = self._hold(tmp_path, write=True)
+        for write in (True, False):
+            self._ensure_lock_fails(tmp_path, write)
+        self._ensure_unlock_fails(tmp_path)
+
+        holder.unlock()
+        self._ensure_lock_unlock_succeeds(tmp_path, write=True)
+
+    @pytest.mark.parametrize('readers', (1, 2))
+    def test_failing_read_lock(self, tmp_path, readers):
+        "Test locking when other read locks are held. Unlocking without locking should also fail."
+
+        holders = [self._hold(tmp_path, write=False) for _ in range(readers)]
+
+        self._ensure_lock_fails(tmp_path, write=True)
+        self._ensure_lock_unlock_succeeds(tmp_path, write=False)
+        self._ensure_unlock_fails(tmp_path)
+
+        for holder in holders:
+            holder.unlock()
+        self._ensure_lock_unlock_succeeds(tmp_path, write=True)
+
     @pytest.mark.parametrize('lock_file_list',
                              [
                                  # One write lock
                                  ('write.ding.dong.lock',),
-                                 # Two write locks
-                                 ('write.dong.ding.lock', 'write.777.lock'),
                                  # One write lock and one read lock
                                  ('write.ding.dong.lock', 'read.bing-bong.lock'),
                              ])
-    def test_failing_write_lock(self, tmp_path, lock_file_list):
-        "Test locking when other write locks are present. Unlocking without locking should also fail."
+    def test_stale_lock_files(self, tmp_path, lock_file_list):
+        "Test that lock files nobody holds, e.g., because their process died, don't lock and are removed."
 
         for f in lock_file_list:
             (tmp_path / f).touch()
+        # Lock files of older versions are empty. Others may not record their holder.
+        (tmp_path / lock_file_list[-1]).write_text('[]')
 
-        # Sanity check: lock files exist
-        assert all((tmp_path / f).exists() for f in lock_file_list)
+        self._ensure_lock_unlock_succeeds(tmp_path, write=True)
+        assert all(not (tmp_path / f).exists() for f in lock_file_list)
 
-        for write in (True, False):
-            self._ensure_lock_fails(tmp_path, write)
+    def test_other_process(self, tmp_path):
+        "Test that a lock held by another process excludes this one, and is released when that process dies."
 
-        self._ensure_unlock_fails(tmp_path)
+        script = ('import sys, time\n'
+                  'from nourish._lock import DirectoryLock\n'
+                  f'assert DirectoryLock({str(tmp_path)!r}).lock(write=False)\n'
+                  'print("locked", flush=True)\n'
+                  'time.sleep(3600)\n')
+        process = subprocess.Popen([sys.executable, '-c', script], stdout=subprocess.PIPE)
+        try:
+            assert process.stdout.readline() == b'locked\n'
+            self._ensure_lock_fails(tmp_path, write=True)
+            self._ensure_lock_unlock_succeeds(tmp_path, write=False)
+        finally:
+            process.kill()
+            process.wait()
+            process.stdout.close()
+        self._ensure_lock_unlock_succeeds(tmp_path, write=True)
 
-    @pytest.mark.parametrize('lock_file_list',
-                             [
-                                 # One read lock
-                                 ('read.ding.dong.lock',),
-                                 # Two read locks
-                                 ('read.dong.ding.lock', 'read.777.lock'),
-                             ])
-    def test_failing_read_lock(self, tmp_path, lock_file_list):
-        "Test locking when other read locks are present. Unlocking without locking should also fail."
+    def test_blocking(self, tmp_path):
+        "Test waiting for a lock that another thread releases."
 
-        for f in lock_file_list:
-            (tmp_path / f).touch()
+        holder = self._hold(tmp_path, write=True)
+        timer = threading.Timer(0.2, holder.unlock)
+        timer.start()
+        lock = DirectoryLock(tmp_path)
+        try:
+            assert lock.lock(write=False, timeout=None) is True
+        finally:
+            timer.join()
+        assert holder.unlock() is False  # Released by the timer
+        assert lock.unlock() is True
 
-        # Sanity check: lock files exist
-        assert all((tmp_path / f).exists() for f in lock_file_list)
+    def test_timeout(self, tmp_path):
+        "Test that waiting for a lock gives up after the timeout."
 
-        self._ensure_lock_fails(tmp_path, write=True)
-        self._ensure_lock_unlock_succeeds(tmp_path, write=False)
-        self._ensure_unlock_fails(tmp_path)
+        holder = self._hold(tmp_path, write=False)
+        lock = DirectoryLock(tmp_path)
+        start = time.monotonic()
+        assert lock.lock(write=True, timeout=0.2) is False
+        assert time.monotonic() - start >= 0.2
+        with pytest.raises(DirectoryLockAcquisitionError):
+            with lock.locking_with_exception(write=True, timeout=0.05):
+                pass
+        holder.unlock()
+
+    def test_async(self, tmp_path):
+        "Test acquiring a lock in a coroutine while the event loop keeps running."
+
+        holder = self._hold(tmp_path, write=True)
+        lock = DirectoryLock(tmp_path)
+
+        async def acquire():
+            with pytest.raises(DirectoryLockAcquisitionError) as e:
+                async with lock.alocking_with_exception(write=True):
+                    pass
+            assert str(e.value) == f'Failed to acquire directory write lock for "{tmp_path}"'
+            asyncio.get_event_loop().call_later(0.2, holder.unlock)
+            async with lock.alocking_with_exception(write=True, timeout=None):
+                assert (tmp_path / f'write{lock._lock_file_suffix}').exists()
+            assert not (tmp_path / f'write{lock._lock_file_suffix}').exists()
+            holder.lock(write=False)
+            assert await lock.alock(write=True, timeout=0.05) is False
+            holder.unlock()
+
+        asyncio.run(acquire())
+
+    @staticmethod
+    def _foreign_lock_file(directory, *, age):
+        "Create a write lock file held from another host, which was last renewed ``age`` seconds ago."
+        path = directory / 'write.1.foreign.lock'
+        path.write_text(json.dumps({'host': 'nourish-test-other-host', 'pid': 1}))
+        os.utime(path, (time.time() - age,) * 2)
+        return path
+
+    def test_other_host(self, caplog, tmp_path):
+        "Test that a lock held from another host is respected until its lease expires, then reclaimed and logged."
+
+        path = self._foreign_lock_file(tmp_path, age=10)
+        self._ensure_lock_fails(tmp_path, write=False)
+        assert path.exists()
+
+        os.utime(path, (time.time() - 200,) * 2)
+        with caplog.at_level(logging.WARNING, logger='nourish._lock'):
+            self._ensure_lock_unlock_succeeds(tmp_path, write=False)
+        assert not path.exists()
+        [record] = caplog.records
+        assert record.stale_lock.path == path
+        assert record.stale_lock.write is True
+        assert (record.stale_lock.host, record.stale_lock.pid) == ('nourish-test-other-host', 1)
+        assert record.stale_lock.age >= 200
+        assert 'has not been renewed for 120.0 seconds' in record.getMessage()
+
+    def test_dead_process_logged(self, caplog, tmp_path):
+        "Test that reclaiming the lock of a process on this host that died is logged."
+
+        script = ('import os\n'
+                  'from nourish._lock import DirectoryLock\n'
+                  f'assert DirectoryLock({str(tmp_path)!r}).lock(write=True)\n'
+                  'print(os.getpid(), flush=True)\n'
+                  'os._exit(0)\n')
+        pid = int(subprocess.run([sys.executable, '-c', script], stdout=subprocess.PIPE, check=True).stdout)
+        with caplog.at_level(logging.WARNING, logger='nourish._lock'):
+            self._ensure_lock_unlock_succeeds(tmp_path, write=True)
+        [record] = caplog.records
+        assert (record.stale_lock.host, record.stale_lock.pid) == (socket.gethostname(), pid)
+        assert record.stale_lock.write is True
+        assert 'no longer holds the kernel lock' in record.getMessage()
+
+    def test_contended_unlock(self, caplog, monkeypatch, tmp_path):
+        "Test that locks that are released while others wait for them are not reclaimed as stale."
+
+        remove = os.remove
+
+        def slow_remove(path):
+            # Widen the window in which a lock file that is being unlocked still exists
+            time.sleep(0.01)
+            remove(path)
+
+        monkeypatch.setattr(os, 'remove', slow_remove)
+
+        def cycle():
+            lock = DirectoryLock(tmp_path)
+            for _ in range(20):
+                assert lock.lock(write=True, timeout=None) is True
+                assert lock.unlock() is True
+
+        with caplog.at_level(logging.WARNING, logger='nourish._lock'):
+            threads = [threading.Thread(target=cycle) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        assert [record.stale_lock for record in caplog.records] == []
+
+    def test_conflict_after_creation(self, monkeypatch, tmp_path):
+        """Test backing off when a process on another host, which doesn't see the guard, created a conflicting lock file
+        at the same time."""
+
+        check = DirectoryLock._does_conflicting_lock_exist
+
+        def racing_check(self, **kwargs):
+            if 'exclude' not in kwargs:
+                # The other host creates its lock file right after this check
+                TestDirectoryLock._foreign_lock_file(tmp_path, age=0)
+                return False
+            return check(self, **kwargs)
+
+        monkeypatch.setattr(DirectoryLock, '_does_conflicting_lock_exist', racing_check)
+        lock = DirectoryLock(tmp_path)
+        assert lock.lock(write=False) is False
+        assert [path.name for path in tmp_path.iterdir()] == ['write.1.foreign.lock']
+        assert lock.unlock() is False
+
+    def test_heartbeat(self, tmp_path):
+        "Test that a held lock is renewed until it is unlocked."
+
+        lock = DirectoryLock(tmp_path, lease=0.2)
+        assert lock.lock(write=True) is True
+        path = tmp_path / f'write{lock._lock_file_suffix}'
+        os.utime(path, (0, 0))
+        time.sleep(0.2)
+        assert path.stat().st_mtime > 0
+
+        heartbeat = lock._heartbeat
+        lock.force_clear_all_locks()
+        time.sleep(0.1)  # The heartbeat survives the removal of the lock file
+        assert heartbeat.is_alive()
+        assert lock.unlock() is True
+        heartbeat.join(1)
+        assert not heartbeat.is_alive()
 
     @pytest.mark.parametrize('lock_file_list',
                              [
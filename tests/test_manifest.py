@@ -0,0 +1,144 @@
+# Copyright 2021 Edward Leardi. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import tarfile
+
+import pytest
+
+from nourish._manifest import is_manifest, Manifest, ManifestEntry, ManifestWriter, normalize_name
+
+
+@pytest.fixture
+def manifest_file(tmp_path):
+    "A manifest of members added in no particular order, some of them with digests."
+
+    writer = ManifestWriter('application/x-tar', 'blake2b')
+    writer.add('./dir/', tarfile.DIRTYPE)
+    writer.add('./dir/b.txt', tarfile.REGTYPE, 2, 'bb' * 64)
+    writer.add('./dir-other/c.txt', tarfile.REGTYPE, 3)
+    writer.add('./dir/a.txt', tarfile.REGTYPE, 1, 'aa' * 64)
+    writer.add('./dir/sub/link', tarfile.SYMTYPE)
+    writer.add('./', tarfile.DIRTYPE)
+    writer.add('./dir', tarfile.DIRTYPE)  # A duplicate of "./dir/", which replaces it
+    path = tmp_path / 'files.list'
+    writer.write(path)
+    return path
+
+
+class TestManifest:
+    "Test reading and writing manifests."
+
+    def test_round_trip(self, manifest_file):
+        "Test that the members are read back sorted by their normalized names."
+
+        assert is_manifest(manifest_file) is True
+        with Manifest(manifest_file) as manifest:
+            assert manifest.type == 'application/x-tar'
+            assert manifest.digest_algorithm == 'blake2b'
+            assert len(manifest) == 6
+            assert list(manifest) == [
+                ManifestEntry('.', tarfile.DIRTYPE, 0, None),
+                ManifestEntry('dir', tarfile.DIRTYPE, 0, None),
+                ManifestEntry('dir-other/c.txt', tarfile.REGTYPE, 3, None),
+                ManifestEntry('dir/a.txt', tarfile.REGTYPE, 1, 'aa' * 64),
+                ManifestEntry('dir/b.txt', tarfile.REGTYPE, 2, 'bb' * 64),
+                ManifestEntry('dir/sub/link', tarfile.SYMTYPE, 0, None),
+            ]
+            with pytest.raises(IndexError):
+                manifest[6]
+
+    def test_find(self, manifest_file):
+        "Test looking up members by their names, normalized or not."
+
+        with Manifest(manifest_file) as manifest:
+            assert manifest.find('./dir/b.txt').size == 2
+            assert manifest.find('dir/').kind == tarfile.DIRTYPE
+            assert manifest.find('dir/c.txt') is None
+            assert manifest.find('zzz') is None
+
+    def test_under(self, manifest_file):
+        "Test looking up the members at and below a path."
+
+        with Manifest(manifest_file) as manifest:
+            names = [entry.name for entry in manifest.under('./dir')]
+            assert names == ['dir', 'dir/a.txt', 'dir/b.txt', 'dir/sub/link']
+            assert [entry.name for entry in manifest.under('dir/sub')] == ['dir/sub/link']
+            assert [entry.name for entry in manifest.under('dir-other/c.txt')] == ['dir-other/c.txt']
+            assert len(list(manifest.under('.'))) == 6
+            assert list(manifest.under('missing')) == []
+
+    def test_no_digests(self, tmp_path):
+        "Test a manifest of an empty archive without digests."
+
+        path = tmp_path / 'files.list'
+        ManifestWriter('application/zip').write(path)
+        with Manifest(path) as manifest:
+            assert manifest.digest_algorithm is None
+            assert list(manifest) == []
+            assert manifest.find('a') is None
+
+    def test_undecodable_names(self, tmp_path):
+        "Test that names that aren't valid UTF-8 are kept like the file system keeps them."
+
+        name = b'caf\xe9.txt'.decode('utf-8', 'surrogateescape')
+        writer = ManifestWriter('application/x-tar')
+        writer.add(name, tarfile.REGTYPE, 1)
+        path = tmp_path / 'files.list'
+        writer.write(path)
+        with Manifest(path) as manifest:
+            assert manifest.find(name).name == name
+
+    @pytest.mark.parametrize('content', (b'{"type": "gzip", "contents": {}}', b'', b'\x89NRSMAN\n' + b'\0' * 3))
+    def test_not_manifest(self, content, tmp_path):
+        "Test reading files that are not manifests."
+
+        path = tmp_path / 'files.list'
+        path.write_bytes(content)
+        with pytest.raises(ValueError) as e:
+            Manifest(path)
+        assert 'manifest' in str(e.value)
+
+    def test_truncated(self, manifest_file):
+        "Test reading a manifest that is cut short."
+
+        manifest_file.write_bytes(manifest_file.read_bytes()[:-1])
+        with pytest.raises(ValueError) as e:
+            Manifest(manifest_file)
+        assert 'is truncated' in str(e.value)
+
+    def test_unsupported_version(self, manifest_file):
+        "Test reading a manifest of a future version."
+
+        content = bytearray(manifest_file.read_bytes())
+        content[8] = 2
+        manifest_file.write_bytes(bytes(content))
+        with pytest.raises(ValueError) as e:
+            Manifest(manifest_file)
+        assert 'is not a manifest of version 1' in str(e.value)
+
+    def test_failed_write(self, tmp_path):
+        "Test that no temporary file is left behind if the manifest can't be written."
+
+        (tmp_path / 'files.list').mkdir()
+        with pytest.raises(OSError):
+            ManifestWriter('application/zip').write(tmp_path / 'files.list')
+        assert [path.name for path in tmp_path.iterdir()] == ['files.list']
+
+    def test_normalize_name(self):
+        "Test normalizing the names of members."
+
+        assert normalize_name('./a/b/') == 'a/b'
+        assert normalize_name('./') == '.'
+        assert normalize_name('a//b') == 'a/b'
@@ -0,0 +1,145 @@
+# Copyright 2021 Edward Leardi. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import hashlib
+import io
+import subprocess
+import tarfile
+
+import pytest
+
+from nourish import _native
+from nourish.dataset import Dataset
+from nourish._extractors import extract_data_files
+
+
+@pytest.fixture
+def native_tools(monkeypatch):
+    """Use the single-threaded gzip and bzip2 in place of pigz and pbzip2, which may not be installed. Skip the test if
+    the tools aren't on ``PATH``."""
+
+    monkeypatch.setitem(_native.decompress_commands, 'gzip', ('gzip', '-d', '-c'))
+    monkeypatch.setitem(_native.decompress_commands, 'bzip2', ('bzip2', '-d', '-c'))
+    if _native.tar_extractor() is None or any(_native.decompressor(c) is None for c in _native.decompress_commands):
+        pytest.skip('Native tools are not installed')
+
+
+@pytest.fixture
+def no_native_tools(monkeypatch):
+    "Make all native tools look missing."
+    monkeypatch.setattr(_native, '_which', lambda name: None)
+
+
+class TestNativeExtraction:
+    "Test extracting with native tools."
+
+    @pytest.mark.parametrize('extractable',
+                             ('test.tar', 'test.tar.bz2', 'test.tar.gz', 'test.tar.xz', 'test-tar-gz',
+                              'test.txt.bz2', 'test.txt.gz', 'test.txt.xz', 'test-csv-gz', 'test-csv-bz2.csv.xz'))
+    def test_same_as_python(self, dataset_dir, extractable, monkeypatch, native_tools, tmp_path):
+        """Test that native tools produce the same files and file list as the pure-Python extractors, which both compute
+        the digests without reading the extracted files again."""
+
+        monkeypatch.setattr('nourish._extractors._file_digest', lambda *args: pytest.fail('An extracted file was read'))
+        path = dataset_dir / 'extractables' / extractable
+        results = []
+        for native in (False, True):
+            data_dir = tmp_path / str(native)
+            data_dir.mkdir()
+            file_list_file = tmp_path / f'{native}.list'
+            extract_data_files(path, data_dir, file_list_file, native=native)
+            results.append((file_list_file.read_bytes(),
+                            {p.relative_to(data_dir): p.read_bytes() for p in data_dir.rglob('*') if p.is_file()}))
+        assert results[0] == results[1]
+
+    def test_fallback(self, dataset_dir, no_native_tools, tmp_path):
+        "Test that the pure-Python extractors are used if the native tools are missing."
+
+        extract_data_files(dataset_dir / 'extractables/test.tar.gz', tmp_path, tmp_path / 'files.list', native=True)
+        assert (tmp_path / 'test.csv').exists()
+
+    def test_python_decompression(self, dataset_dir, monkeypatch, native_tools, tmp_path):
+        "Test that a tarball is decompressed in Python and extracted with tar if only the decompressor is missing."
+
+        monkeypatch.setitem(_native.decompress_commands, 'xz', ('nourish-missing-xz',))
+        extract_data_files(dataset_dir / 'extractables/test.tar.xz', tmp_path, tmp_path / 'files.list', native=True)
+        assert (tmp_path / 'test.csv').exists()
+
+    def test_corrupted_compressed_file(self, native_tools, tmp_path):
+        "Test that the error of a native decompressor is reported."
+
+        path = tmp_path / 'corrupted.csv.gz'
+        path.write_bytes(b'\x1f\x8b' + b'\x00' * 100)
+        with pytest.raises(Exception) as e:
+            extract_data_files(path, tmp_path, tmp_path / 'files.list', native=True)
+        assert 'gzip exited with status' in str(e.value)
+
+    def test_corrupted_tarball(self, native_tools, tmp_path):
+        "Test that the members extracted before a tarball turns out to be corrupted are removed."
+
+        tar_fp = tmp_path / 'test.tar'
+        with tarfile.open(tar_fp, mode='w') as mytar:
+            for name in ('a.txt', 'b.txt'):
+                info = tarfile.TarInfo(name)
+                info.size = 10000
+                mytar.addfile(info, io.BytesIO(b'x' * info.size))
+        # Truncated in the middle of the second member
+        tar_fp.write_bytes(tar_fp.read_bytes()[:15000])
+
+        data_dir = tmp_path / 'data'
+        data_dir.mkdir()
+        with pytest.raises(tarfile.ReadError) as e:
+            extract_data_files(tar_fp, data_dir, tmp_path / 'files.list', native=True)
+        assert 'Failed to unarchive tar file' in str(e.value)
+        assert list(data_dir.iterdir()) == []
+        assert not (tmp_path / 'files.list').exists()
+
+    def test_tar_failure(self, dataset_dir, monkeypatch, native_tools, tmp_path):
+        "Test that the error of tar is reported when it exits before reading the whole tarball."
+
+        monkeypatch.setattr(_native, 'tar_command', _native.tar_command[:-1] + ('--no-such-option', '-C'))
+        with pytest.raises(OSError) as e:
+            extract_data_files(dataset_dir / 'extractables/test.tar', tmp_path, tmp_path / 'files.list', native=True)
+        assert 'tar exited with status' in str(e.value)
+
+    def test_dataset_download(self, dataset_base_url, dataset_dir, gmb_schema, native_tools, tmp_path):
+        "Test downloading a dataset with native extraction."
+
+        gmb_schema['download_url'] = dataset_base_url + '/extractables/test.tar.gz'
+        gmb_schema['sha512sum'] = hashlib.sha512((dataset_dir / 'extractables/test.tar.gz').read_bytes()).hexdigest()
+        dataset = Dataset(gmb_schema, data_dir=tmp_path, mode=Dataset.InitializationMode.LAZY)
+        dataset.download(native_extraction=True)
+        assert dataset.is_downloaded() is True
+
+
+class TestToolDetection:
+    "Test detecting native tools."
+
+    def test_not_gnu_tar(self, monkeypatch, tmp_path):
+        "Test that tar implementations other than GNU tar are not used."
+
+        monkeypatch.setattr(_native, 'tar_command', ('python',) + _native.tar_command[1:])
+        if _native._which('python') is None:
+            pytest.skip('python is not on PATH')
+        assert _native.tar_extractor() is None
+
+    def test_broken_tar(self, monkeypatch, tmp_path):
+        "Test that a tar executable that can't be run is not used."
+
+        def run(*args, **kwargs):
+            raise OSError
+
+        monkeypatch.setattr(subprocess, 'run', run)
+        assert _native._is_gnu_tar.__wrapped__(str(tmp_path / 'tar')) is False
@@ -0,0 +1,116 @@
+# Copyright 2021 Edward Leardi. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import sys
+
+import pandas as pd
+import pytest
+
+from nourish._parsed_cache import ParsedCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    "A parsed cache in a temporary directory."
+    pytest.importorskip('pyarrow')
+    return ParsedCache(tmp_path / 'parsed')
+
+
+@pytest.fixture
+def data():
+    "A dataframe of the kinds of columns CSVPandasLoader produces."
+    return pd.DataFrame({'date': pd.to_datetime(['2021-01-01', '2021-01-02']),
+                         'value': [0.5, 1.5],
+                         'label': pd.Series(['a', None], dtype='string')})
+
+
+class TestParsedCache:
+    "Test :class:`ParsedCache`."
+
+    def test_put_and_get(self, cache, data, tmp_path):
+        "Test that a dataframe, including its index, is found under the key it was stored with only."
+
+        key = ParsedCache.key(size=10, options={'delimiter': ','})
+        assert cache.get('test', key) is None
+        assert cache.put('test', key, data) is True
+        pd.testing.assert_frame_equal(cache.get('test', key), data)
+        assert cache.get('other', key) is None
+        assert cache.get('test', ParsedCache.key(size=11, options={'delimiter': ','})) is None
+
+        data.index = [5, 3]
+        cache.put('test', key, data)
+        pd.testing.assert_frame_equal(cache.get('test', key), data)
+
+    def test_get_selection(self, cache, data):
+        "Test that the selected columns and rows are read from the cache, in the order the columns are given."
+
+        data = pd.concat([data, data], ignore_index=True)
+        key = ParsedCache.key(size=10)
+        cache.put('test', key, data)
+        pd.testing.assert_frame_equal(cache.get('test', key, columns=['value', 'date']), data[['value', 'date']])
+        pd.testing.assert_frame_equal(cache.get('test', key, columns=['label'], filters=[('value', '>', 1)]),
+                                      data.loc[[1, 3], ['label']].reset_index(drop=True))
+        pd.testing.assert_frame_equal(cache.get('test', key, filters=[('date', '==', '2021-01-01'),
+                                                                      ('label', 'in', ['a'])]),
+                                      data.loc[[0, 2]].reset_index(drop=True))
+
+        with pytest.raises(ValueError) as e:
+            cache.get('test', key, columns=['value'], filters=[('nonexistent', '==', 1)])
+        assert str(e.value) == "Columns ['nonexistent'] are not in subdataset \"test\"."
+
+    def test_key(self):
+        "Test that keys depend on the values of the parts only, not their order."
+
+        assert ParsedCache.key(a=1, b={'c': 2, 'd': 3}) == ParsedCache.key(b={'d': 3, 'c': 2}, a=1)
+        assert ParsedCache.key(a=1) != ParsedCache.key(a=2)
+        assert ParsedCache.key(a=1) != ParsedCache.key(b=1)
+
+    def test_replace(self, cache, data, tmp_path):
+        "Test that storing a subdataset under a new key removes it under the old key, but not other subdatasets."
+
+        cache.put('test', 'old', data)
+        cache.put('other', 'old', data)
+        cache.put('test', 'new', data.head(1))
+        assert cache.get('test', 'old') is None
+        assert len(cache.get('test', 'new')) == 1
+        assert len(cache.get('other', 'old')) == 2
+        assert len(list((tmp_path / 'parsed').iterdir())) == 2
+
+    def test_not_stored(self, cache, tmp_path):
+        "Test that data other than dataframes, and dataframes Arrow IPC files can't hold, aren't stored."
+
+        assert cache.put('test', 'key', 'plain text') is False
+        assert cache.put('test', 'key', pd.DataFrame({0: [1, 2]})) is False
+        assert cache.put('test', 'key', pd.DataFrame({'a': [1, 'mixed']})) is False
+        assert cache.get('test', 'key') is None
+        assert list((tmp_path / 'parsed').iterdir()) == []
+
+    def test_corrupted(self, cache, data, tmp_path):
+        "Test that a file that can't be read is removed from the cache."
+
+        cache.put('test', 'key', data)
+        path, = (tmp_path / 'parsed').iterdir()
+        path.write_bytes(b'corrupted')
+        assert cache.get('test', 'key') is None
+        assert not path.exists()
+
+    def test_no_pyarrow(self, monkeypatch, tmp_path):
+        "Test that the cache requires pyarrow."
+
+        monkeypatch.setitem(sys.modules, 'pyarrow', None)  # Makes importing pyarrow fail
+        monkeypatch.setitem(sys.modules, 'pyarrow.feather', None)
+        with pytest.raises(ImportError) as e:
+            ParsedCache(tmp_path)
+        assert 'Install it with `pip install nourish[arrow]`.' in str(e.value)
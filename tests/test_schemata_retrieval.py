@@ -15,12 +15,15 @@
 # limitations under the License.
 #
 
+import asyncio
+
 import pytest
 
 from nourish import export_schemata_manager, init, load_schemata_manager
 from nourish.schema import BaseSchemata
 from nourish.exceptions import InsecureConnectionError
-from nourish._schemata_retrieval import retrieve_schemata_file
+from nourish._async import ClientSessionContext
+from nourish._schemata_retrieval import aretrieve_schemata_file, retrieve_schemata_file
 
 
 class TestSchemataRetrieval:
@@ -128,3 +131,43 @@ class TestSecureSchemataRetrieval:
     def test_default_tls_verification(self, caller):
         "Ensure that ``tls_verification=True`` by default."
         assert caller.__kwdefaults__['tls_verification'] is True
+
+
+class TestAsyncSchemataRetrieval:
+    "Test :func:`aretrieve_schemata_file`."
+
+    @staticmethod
+    def _retrieve(url_or_path, **kwargs):
+        "Run :func:`aretrieve_schemata_file` with a new session in a new event loop."
+
+        async def retrieve():
+            async with ClientSessionContext(None) as session:
+                return await aretrieve_schemata_file(url_or_path, session=session, **kwargs)
+
+        pytest.importorskip('aiohttp')
+        return asyncio.run(retrieve())
+
+    @pytest.mark.parametrize('location_type', ('absolute_dir', 'relative_dir', 'file_url', 'https_url'))
+    def test_secure_retrieval(self, location_type, schemata_file_relative_dir, request):
+        "Test retrieving schemata files from every kind of location with TLS verification."
+
+        url_or_path = str(request.getfixturevalue('schemata_file_' + location_type)) + '/datasets.yaml'
+        assert self._retrieve(url_or_path) == (schemata_file_relative_dir / 'datasets.yaml').read_text(encoding='utf-8')
+
+    def test_insecure_retrieval(self, schemata_file_http_url, schemata_file_relative_dir):
+        "Test that http links are only accepted without TLS verification."
+
+        url = f'{schemata_file_http_url}/datasets.yaml'
+        with pytest.raises(InsecureConnectionError) as e:
+            self._retrieve(url)
+        assert url in str(e.value)
+        assert self._retrieve(url, tls_verification=False) == \
+            (schemata_file_relative_dir / 'datasets.yaml').read_text(encoding='utf-8')
+
+    def test_untrusted_certificate(self, schemata_file_https_url, untrust_self_signed_cert):
+        "Test that an untrusted certificate is rejected."
+
+        url = f'{schemata_file_https_url}/datasets.yaml'
+        with pytest.raises(InsecureConnectionError) as e:
+            self._retrieve(url)
+        assert url in str(e.value)